@@ -0,0 +1,203 @@
+"""
+Admission control: per-user/per-route rate limits and a global concurrency cap.
+
+``RateLimiter`` keeps a token bucket per (caller, route template) and is
+enforced as a router dependency in server.py, answering 429 with
+``Retry-After`` once a caller exceeds the route's rate. Rate limiting is off
+unless SKILLHUB_RATE_LIMITS is set, so existing clients, batch scripts and
+the perf tools see no 429s by default. Limits are ``rate/burst`` pairs per
+``"METHOD /route"``, ``*`` being the default; ``recommended`` enables
+``RECOMMENDED_RATE_LIMITS``:
+
+    SKILLHUB_RATE_LIMITS='*=20/40,GET /api/tasks/{task_id}/messages=2/10'
+    SKILLHUB_RATE_LIMITS=recommended
+
+``ConcurrencyLimiter`` bounds how many database-bound requests run at once.
+Excess requests wait in a FIFO queue; when the queue is full, or the wait
+predicted from recent service times exceeds ``max_wait_s``, the request is
+shed immediately with 503 instead of joining a queue it would time out in.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Iterable, Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+# Per caller: 20 requests/s (bursts of 40), slower message polling and task posting
+RECOMMENDED_RATE_LIMITS = "*=20/40,GET /api/tasks/{task_id}/messages=2/10,POST /api/tasks=1/5"
+
+
+class TokenBucket:
+    """``rate`` tokens per second up to ``burst``; one token per request"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Consume a token; returns 0 or the seconds until one is available"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+def parse_limits(value: str) -> Dict[str, Tuple[float, float]]:
+    limits = {}
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        route, _, spec = item.rpartition('=')
+        rate, _, burst = spec.partition('/')
+        limits[route.strip()] = (float(rate), float(burst or rate))
+    return limits
+
+
+class RateLimiter:
+    """Token buckets keyed by (caller, route); least recently used keys are evicted"""
+
+    def __init__(self, limits: Dict[str, Tuple[float, float]], max_keys: int = 100_000):
+        self.limits = limits
+        self.max_keys = max_keys
+        self.buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["RateLimiter"]:
+        value = os.environ.get('SKILLHUB_RATE_LIMITS', '').strip()
+        if value.lower() in ('', 'off', 'none'):
+            return None
+        return cls(parse_limits(RECOMMENDED_RATE_LIMITS if value.lower() == 'recommended' else value))
+
+    def check(self, caller: str, route: str) -> float:
+        """0 when admitted, otherwise seconds the caller should wait"""
+        limit = self.limits.get(route) or self.limits.get('*')
+        if limit is None:
+            return 0.0
+        now = time.monotonic()
+        key = (caller, route)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(limit[0], limit[1], now)
+            if len(self.buckets) > self.max_keys:
+                # An evicted bucket has usually refilled; dropping it loses nothing
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+        wait = bucket.take(now)
+        if wait:
+            self.rejected += 1
+        return wait
+
+
+class ConcurrencyLimiter:
+    """At most ``max_concurrent`` admitted requests, with a bounded FIFO queue"""
+
+    def __init__(self, max_concurrent: int = 64, max_queue: int = 256, max_wait_s: float = 2.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait_s = max_wait_s
+        self.active = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        # Smoothed seconds a request holds its slot
+        self.service_s = 0.05
+        self.shed = 0
+
+    @classmethod
+    def from_env(cls) -> "ConcurrencyLimiter":
+        return cls(
+            max_concurrent=int(os.environ.get('SKILLHUB_MAX_CONCURRENCY', 64)),
+            max_queue=int(os.environ.get('SKILLHUB_MAX_QUEUE', 256)),
+            max_wait_s=float(os.environ.get('SKILLHUB_MAX_QUEUE_WAIT_S', 2.0)),
+        )
+
+    def expected_wait(self, position: int) -> float:
+        return position * self.service_s / self.max_concurrent
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.expected_wait(len(self.waiters) + 1)))
+
+    async def acquire(self) -> Optional[int]:
+        """None once admitted, otherwise a Retry-After in seconds"""
+        if self.active < self.max_concurrent and not self.waiters:
+            self.active += 1
+            return None
+        if len(self.waiters) >= self.max_queue or \
+                self.expected_wait(len(self.waiters) + 1) > self.max_wait_s:
+            self.shed += 1
+            return self.retry_after()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await asyncio.wait({waiter}, timeout=self.max_wait_s)
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        if waiter.done() and not waiter.cancelled():
+            # release() handed its slot to us
+            return None
+        self._abandon(waiter)
+        self.shed += 1
+        return self.retry_after()
+
+    def _abandon(self, waiter: asyncio.Future):
+        if waiter.done() and not waiter.cancelled():
+            # Granted a slot we will not use: pass it on
+            self.release(None)
+        else:
+            waiter.cancel()
+            try:
+                self.waiters.remove(waiter)
+            except ValueError:
+                pass
+
+    def release(self, service_s: Optional[float]):
+        if service_s is not None:
+            self.service_s += 0.1 * (service_s - self.service_s)
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                # Hand the slot over directly so no newcomer can jump the queue
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict[str, float]:
+        return {"active": self.active, "queued": len(self.waiters), "shed": self.shed,
+                "service_ms": round(self.service_s * 1000, 2)}
+
+
+class AdmissionMiddleware:
+    """Runs ``/api`` requests (except ``exempt`` paths) through a ConcurrencyLimiter"""
+
+    def __init__(self, app, limiter: ConcurrencyLimiter, exempt: Iterable[str] = ()):
+        self.app = app
+        self.limiter = limiter
+        self.exempt = frozenset(exempt)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not scope['path'].startswith('/api') or scope['path'] in self.exempt:
+            await self.app(scope, receive, send)
+            return
+        retry_after = await self.limiter.acquire()
+        if retry_after is not None:
+            response = JSONResponse(status_code=503, content={"detail": "Server overloaded, retry later"},
+                                    headers={"Retry-After": str(retry_after)})
+            await response(scope, receive, send)
+            return
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limiter.release(time.perf_counter() - started)
@@ -0,0 +1,318 @@
+"""
+In-memory interval index of tasker bookings for availability search.
+
+"Which taskers in category Y are free on date X from 2 to 5pm" is answered
+without touching the bookings table: ``AvailabilityIndex`` keeps each
+tasker's live bookings as sorted start/end arrays and each category's
+taskers ordered by rating. A query walks the category's taskers best first
+and checks each with one bisect, stopping once it has ``limit`` free ones;
+its cost depends on how many taskers are busy, not on how many bookings
+exist. Bookings of one tasker never overlap (the schema's
+``bookings_no_overlap`` exclusion constraint), so a tasker's intervals
+sorted by start are sorted by end too.
+
+The index is advisory. The database constraint decides: a booking for a
+slot the index thought free, but that another process just took, fails
+with SQLSTATE 23P01 and the caller moves on to the next candidate.
+
+``AvailabilitySync`` keeps the index current the way ``BrowseIndexSync``
+keeps the browse index: a full rebuild in the background at start
+(``ready`` afterwards) and every ``rebuild_s`` (which also drops bookings
+that have ended), and in between, every ``interval_s``, a delta of taskers
+and bookings updated since the last sync. ``apply_booking`` and
+``apply_tasker`` take this process's own writes at once.
+"""
+
+import asyncio
+import logging
+import os
+from bisect import bisect_right, insort
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 1000
+# Seconds each delta looks back past the previous sync (commit lag, clock skew)
+OVERLAP_S = 5.0
+# Profile fields returned with each free tasker
+TASKER_SELECT = ('id, full_name, username, avatar_url, average_rating, total_reviews, hourly_rate, '
+                 'city, state, skills, available, role')
+BOOKING_SELECT = 'id, tasker_id, starts_at, ends_at, status'
+SUMMARY_FIELDS = ('id', 'full_name', 'username', 'avatar_url', 'average_rating', 'total_reviews',
+                  'hourly_rate', 'city', 'state')
+
+
+def epoch(value: Any) -> float:
+    """Seconds since the epoch of a datetime or ISO timestamp (naive means UTC)"""
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _key(value: Any) -> str:
+    return str(value or '').strip().lower()
+
+
+class _Schedule:
+    """One tasker's live bookings, sorted"""
+
+    __slots__ = ('starts', 'ends', 'ids')
+
+    def __init__(self):
+        self.starts: List[float] = []
+        self.ends: List[float] = []
+        self.ids: List[str] = []
+
+    def add(self, booking_id: str, starts: float, ends: float):
+        at = bisect_right(self.starts, starts)
+        self.starts.insert(at, starts)
+        self.ends.insert(at, ends)
+        self.ids.insert(at, booking_id)
+
+    def remove(self, booking_id: str):
+        at = self.ids.index(booking_id)
+        del self.starts[at], self.ends[at], self.ids[at]
+
+    def free(self, starts: float, ends: float) -> bool:
+        # The first booking ending after ``starts`` is the only one that can overlap
+        at = bisect_right(self.ends, starts)
+        return at == len(self.ends) or self.starts[at] >= ends
+
+
+class _Tasker:
+    __slots__ = ('rating', 'city', 'state', 'categories', 'available', 'summary')
+
+    def __init__(self, row: Dict[str, Any]):
+        self.rating = float(row.get('average_rating') or 0)
+        self.city = _key(row.get('city'))
+        self.state = _key(row.get('state'))
+        self.categories = frozenset(_key(skill) for skill in row.get('skills') or () if skill)
+        self.available = row.get('available') is not False
+        self.summary = {name: row.get(name) for name in SUMMARY_FIELDS}
+
+
+class AvailabilityIndex:
+    """Taskers by category and rating, with their live bookings"""
+
+    def __init__(self):
+        self.taskers: Dict[str, _Tasker] = {}
+        self.schedules: Dict[str, _Schedule] = {}
+        # booking id -> (tasker id, starts, ends)
+        self.bookings: Dict[str, Tuple[str, float, float]] = {}
+        # category -> [(-rating, tasker id)], best first
+        self.categories: Dict[str, List[Tuple[float, str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.taskers)
+
+    def replace(self, taskers: Iterable[Dict[str, Any]], bookings: Iterable[Dict[str, Any]]):
+        """Load from scratch (rows of TASKER_SELECT and BOOKING_SELECT)"""
+        self.__init__()
+        for row in taskers:
+            if row.get('role', 'tasker') == 'tasker':
+                tasker = self.taskers[row['id']] = _Tasker(row)
+                for category in tasker.categories:
+                    self.categories.setdefault(category, []).append((-tasker.rating, row['id']))
+        for members in self.categories.values():
+            members.sort()
+        for row in bookings:
+            self.upsert_booking(row)
+
+    # Taskers
+
+    def upsert_tasker(self, row: Dict[str, Any]):
+        """Add or refresh a profile; one that is no longer a tasker is dropped"""
+        self.remove_tasker(row['id'])
+        if row.get('role', 'tasker') != 'tasker':
+            return
+        tasker = self.taskers[row['id']] = _Tasker(row)
+        for category in tasker.categories:
+            insort(self.categories.setdefault(category, []), (-tasker.rating, row['id']))
+
+    def remove_tasker(self, tasker_id: str):
+        tasker = self.taskers.pop(tasker_id, None)
+        if tasker is None:
+            return
+        for category in tasker.categories:
+            self.categories[category].remove((-tasker.rating, tasker_id))
+
+    # Bookings
+
+    def upsert_booking(self, row: Dict[str, Any]):
+        """Add, move or (when cancelled) drop a booking"""
+        self.remove_booking(row['id'])
+        if row.get('status') == 'cancelled' or not row.get('tasker_id'):
+            return
+        starts, ends = epoch(row['starts_at']), epoch(row['ends_at'])
+        self.bookings[row['id']] = (row['tasker_id'], starts, ends)
+        schedule = self.schedules.get(row['tasker_id'])
+        if schedule is None:
+            schedule = self.schedules[row['tasker_id']] = _Schedule()
+        schedule.add(row['id'], starts, ends)
+
+    def remove_booking(self, booking_id: str):
+        booked = self.bookings.pop(booking_id, None)
+        if booked is None:
+            return
+        schedule = self.schedules[booked[0]]
+        schedule.remove(booking_id)
+        if not schedule.ids:
+            del self.schedules[booked[0]]
+
+    # Queries
+
+    def is_free(self, tasker_id: str, starts: float, ends: float) -> bool:
+        schedule = self.schedules.get(tasker_id)
+        return schedule is None or schedule.free(starts, ends)
+
+    def free(self, category: str, starts: float, ends: float, city: Optional[str] = None,
+             state: Optional[str] = None, limit: int = 20, exclude: Iterable[str] = ()) -> List[Dict[str, Any]]:
+        """Up to ``limit`` available taskers of ``category`` free over [starts, ends), best rated first"""
+        city, state, exclude = _key(city), _key(state), set(exclude)
+        found = []
+        for _, tasker_id in self.categories.get(_key(category), ()):
+            tasker = self.taskers[tasker_id]
+            if (not tasker.available or (city and tasker.city != city) or (state and tasker.state != state)
+                    or tasker_id in exclude or not self.is_free(tasker_id, starts, ends)):
+                continue
+            found.append(tasker.summary)
+            if len(found) >= limit:
+                break
+        return found
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "taskers": len(self.taskers),
+            "bookings": len(self.bookings),
+            "booked_taskers": len(self.schedules),
+            "categories": {category: len(members) for category, members in sorted(self.categories.items())},
+        }
+
+
+class AvailabilitySync:
+    """Loads an AvailabilityIndex and keeps it current with periodic deltas"""
+
+    def __init__(self, db: Any, client: Callable[[], Any], interval_s: float = 2.0, rebuild_s: float = 300.0):
+        self.index = AvailabilityIndex()
+        # ResilientExecutor and a getter for the current data client
+        self.db = db
+        self.client = client
+        self.interval_s = interval_s
+        self.rebuild_s = rebuild_s
+        self.ready = False
+        self.rebuilt_at: Optional[float] = None
+        self.synced_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self.rebuilds = 0
+        self.syncs = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls, db: Any, client: Callable[[], Any]) -> Optional["AvailabilitySync"]:
+        if os.environ.get('SKILLHUB_AVAILABILITY_INDEX', '1').lower() in ('0', 'false', 'off', 'no'):
+            return None
+        return cls(
+            db, client,
+            interval_s=float(os.environ.get('SKILLHUB_AVAILABILITY_SYNC_S', 2.0)),
+            rebuild_s=float(os.environ.get('SKILLHUB_AVAILABILITY_REBUILD_S', 300.0)),
+        )
+
+    def apply_booking(self, row: Dict[str, Any]):
+        """Take a booking this process just wrote (needs BOOKING_SELECT's fields)"""
+        self.index.upsert_booking(row)
+
+    def apply_tasker(self, row: Dict[str, Any]):
+        """Take a profile this process just wrote (a full row)"""
+        self.index.upsert_tasker(row)
+
+    def start(self):
+        """Load in the background (``ready`` once done), then keep syncing"""
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            # See HealthProber.stop(): wait_for() can swallow a cancel before Python 3.12
+            while not self._task.done():
+                self._task.cancel()
+                await asyncio.wait({self._task}, timeout=0.1)
+            if not self._task.cancelled():
+                self._task.exception()
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        first = True
+        while True:
+            if not first:
+                await asyncio.sleep(self.interval_s)
+            first = False
+            try:
+                if not self.ready or loop.time() - self.rebuilt_at >= self.rebuild_s:
+                    await self.rebuild()
+                else:
+                    await self.sync()
+                self.last_error = None
+            except Exception as e:
+                if self.last_error != str(e):
+                    logger.warning(f"Availability index sync failed: {e}")
+                self.last_error = str(e)
+
+    async def _load(self, operation: str, table: str, select: str, narrow) -> List[Dict[str, Any]]:
+        """Every row of ``narrow(query)``, paging by id"""
+        rows: List[Dict[str, Any]] = []
+        last_id = None
+        while True:
+            query = narrow(self.client().table(table).select(select))
+            if last_id is not None:
+                query = query.gt('id', last_id)
+            result = await self.db.read(operation, query.order('id').limit(PAGE_SIZE))
+            page = result.data or []
+            rows.extend(page)
+            if len(page) < PAGE_SIZE:
+                return rows
+            last_id = page[-1]['id']
+
+    async def rebuild(self):
+        """Reload every tasker and every booking that hasn't ended"""
+        started = datetime.now(timezone.utc)
+        taskers = await self._load('availability.taskers', 'profiles', TASKER_SELECT,
+                                   lambda query: query.eq('role', 'tasker'))
+        bookings = await self._load('availability.bookings', 'bookings', BOOKING_SELECT,
+                                    lambda query: query.neq('status', 'cancelled')
+                                    .gte('ends_at', started.isoformat()))
+        fresh = AvailabilityIndex()
+        await asyncio.to_thread(fresh.replace, taskers, bookings)
+        self.index = fresh
+        self.synced_at = started
+        self.rebuilt_at = asyncio.get_running_loop().time()
+        self.rebuilds += 1
+        self.ready = True
+
+    async def sync(self):
+        """Apply profiles and bookings updated since the last sync"""
+        started = datetime.now(timezone.utc)
+        since = (self.synced_at - timedelta(seconds=OVERLAP_S)).isoformat()
+        client = self.client()
+        taskers = await self.db.read('availability.taskers_changed', client.table('profiles')
+                                     .select(TASKER_SELECT).gte('updated_at', since))
+        bookings = await self.db.read('availability.bookings_changed', client.table('bookings')
+                                      .select(BOOKING_SELECT).gte('updated_at', since))
+        for row in taskers.data or []:
+            self.index.upsert_tasker(row)
+        for row in bookings.data or []:
+            self.index.upsert_booking(row)
+        self.synced_at = started
+        self.syncs += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.index.stats(),
+            "ready": self.ready,
+            "rebuilds": self.rebuilds,
+            "syncs": self.syncs,
+            "synced_at": self.synced_at.isoformat() if self.synced_at else None,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,161 @@
+"""
+Micro-batching of small inserts.
+
+Busy task chats produce many one-row message inserts. ``BatchWriter`` holds
+submitted rows for at most ``max_delay_s`` (or until ``max_batch`` rows are
+waiting) and hands them to ``write_rows`` as one multi-row insert; each
+caller gets back its own row.
+
+Batches are written one at a time and rows keep their submission order, so
+messages of a task are inserted in the order they were sent. If the
+database rejects a batch's statement (an ``APIError``: a constraint
+violation, a missing task, ...), nothing was written, and its rows are
+retried one by one so only the offending caller sees the error. Any other
+failure (the resilience layer's 503/504, an unexpected result) is final and
+fails the whole batch: the insert may have committed, and writing the rows
+again would duplicate them.
+
+Rows can also be ``enqueue``d fire-and-forget (notification fan-out): the
+caller doesn't wait, failures are logged and counted, and past
+``max_pending`` queued rows new ones are dropped rather than buffered
+without bound.
+
+Message batching is enabled per process with ``SKILLHUB_MESSAGE_BATCHING=1``;
+tuned with ``SKILLHUB_MESSAGE_BATCH_SIZE`` and ``SKILLHUB_MESSAGE_BATCH_DELAY_MS``.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from postgrest.exceptions import APIError
+
+logger = logging.getLogger(__name__)
+
+WriteRows = Callable[[List[Dict[str, Any]]], Awaitable[List[Any]]]
+
+
+class BatchWriter:
+    """Coalesces concurrent ``submit(row)`` calls into multi-row writes"""
+
+    def __init__(self, write_rows: WriteRows, max_batch: int = 50, max_delay_s: float = 0.005,
+                 max_pending: Optional[int] = None):
+        self.write_rows = write_rows
+        self.max_batch = max_batch
+        self.max_delay_s = max_delay_s
+        self.max_pending = max_pending
+        # (row, future or None when enqueued, submitted at)
+        self._pending: List[Tuple[Dict[str, Any], Optional[asyncio.Future], float]] = []
+        self._worker: Optional[asyncio.Task] = None
+        self._full: Optional[asyncio.Event] = None
+        self._closing = False
+        self.batches = 0
+        self.rows = 0
+        self.fallbacks = 0
+        self.failed = 0
+        self.dropped = 0
+
+    @classmethod
+    def from_env(cls, write_rows: WriteRows) -> Optional["BatchWriter"]:
+        if os.environ.get('SKILLHUB_MESSAGE_BATCHING', '').lower() not in ('1', 'true', 'yes'):
+            return None
+        return cls(
+            write_rows,
+            max_batch=int(os.environ.get('SKILLHUB_MESSAGE_BATCH_SIZE', 50)),
+            max_delay_s=float(os.environ.get('SKILLHUB_MESSAGE_BATCH_DELAY_MS', 5)) / 1000,
+        )
+
+    async def submit(self, row: Dict[str, Any]) -> Any:
+        """Queue ``row`` for the next batch and wait for its stored version"""
+        future = asyncio.get_running_loop().create_future()
+        self._append(row, future)
+        # A caller that disconnects must not drop its row from the batch
+        return await asyncio.shield(future)
+
+    def enqueue(self, row: Dict[str, Any]) -> bool:
+        """Queue ``row`` without waiting for it; False if it was dropped"""
+        if self.max_pending is not None and len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return False
+        self._append(row, None)
+        return True
+
+    def _append(self, row: Dict[str, Any], future: Optional[asyncio.Future]):
+        loop = asyncio.get_running_loop()
+        self._pending.append((row, future, loop.time()))
+        if self._worker is None:
+            self._full = asyncio.Event()
+            self._worker = asyncio.ensure_future(self._run())
+        elif len(self._pending) >= self.max_batch:
+            self._full.set()
+
+    async def close(self):
+        """Write whatever is pending without waiting out the latency budget"""
+        self._closing = True
+        if self._full is not None:
+            self._full.set()
+        if self._worker is not None:
+            await asyncio.wait({self._worker})
+        self._closing = False
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while self._pending:
+                wait = self._pending[0][2] + self.max_delay_s - loop.time()
+                if wait > 0 and len(self._pending) < self.max_batch and not self._closing:
+                    self._full.clear()
+                    try:
+                        await asyncio.wait_for(self._full.wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+                batch = self._pending[:self.max_batch]
+                del self._pending[:len(batch)]
+                self.batches += 1
+                self.rows += len(batch)
+                await self._write(batch)
+        finally:
+            self._worker = None
+            for _, future, _ in self._pending:
+                if future is not None:
+                    future.cancel()
+            self._pending.clear()
+
+    async def _write(self, batch: List[Tuple[Dict[str, Any], Optional[asyncio.Future], float]]):
+        try:
+            results = await self.write_rows([row for row, _, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"Batch insert returned {len(results)} rows for {len(batch)}")
+        except Exception as e:
+            if len(batch) == 1 or not isinstance(e, APIError):
+                unwaited = sum(future is None for _, future, _ in batch)
+                if unwaited:
+                    self.failed += unwaited
+                    logger.warning(f"Dropped {unwaited} queued row(s) after a failed write: {e}")
+                for _, future, _ in batch:
+                    _resolve(future, error=e)
+                return
+            # One bad row fails the whole statement; find it by writing rows one by one
+            self.fallbacks += 1
+            for item in batch:
+                await self._write([item])
+            return
+        for (_, future, _), result in zip(batch, results):
+            _resolve(future, result=result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"batches": self.batches, "rows": self.rows, "fallbacks": self.fallbacks,
+                "failed": self.failed, "dropped": self.dropped, "pending": len(self._pending),
+                "mean_batch": round(self.rows / self.batches, 2) if self.batches else None}
+
+
+def _resolve(future: Optional[asyncio.Future], result: Any = None, error: Optional[BaseException] = None):
+    if future is None or future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+        # The caller may have disconnected; don't warn about an unretrieved error
+        future.exception()
+    else:
+        future.set_result(result)
@@ -0,0 +1,156 @@
+"""
+Per-user change feed for offline-first clients (GET /api/sync).
+
+Triggers in supabase_schema.sql record every write to tasks, applications,
+messages, categories and profiles in ``public.change_log``, once per user
+who can see the row (``audience``; ``NIL_AUDIENCE`` for categories, which
+everyone syncs). The log keeps one row per (audience, entity, id): a new
+change moves it to a fresh ``seq`` and a delete turns it into a tombstone,
+so the log never holds more than one entry per row a user has seen.
+
+A client sends the token of its last sync and gets the rows past it, read
+by ``sync_log()`` from the (audience, xact, seq) index, so a resume costs one
+index range of the changes plus one batched fetch per entity, however large
+the account. With no token, the same read from the start returns everything
+the user can see. Each page carries a new token, and ``more`` when another
+page follows.
+
+Two edges are handled here:
+
+  * A transaction's rows become visible when it commits, which can be long
+    after it took its ``seq``. The feed is therefore ordered by the writing
+    transaction's id (``xact``), then ``seq``, and ``sync_log()`` marks a row
+    ``settled`` once every transaction with a lower id has finished (it is
+    below the snapshot's xmin). Tokens stop at the first unsettled row, which
+    comes again on the next sync (applying a change twice is harmless), so
+    no row can appear behind a token later.
+  * Tombstones are pruned after ``tombstone_days``. A token older than
+    that could have missed some, so the sync restarts from the beginning
+    with ``reset`` set, and the client replaces its cache instead of merging.
+
+Tokens are ``<xact>.<seq>.<issued>`` in base 36, where ``issued`` is when
+the client's view was last complete (epoch seconds).
+"""
+
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+NIL_AUDIENCE = '00000000-0000-0000-0000-000000000000'
+# Log entity -> response key
+ENTITY_KEYS = {
+    'task': 'tasks',
+    'application': 'applications',
+    'message': 'messages',
+    'category': 'categories',
+    'profile': 'profile',
+}
+
+
+# Position in the feed: (xact, seq) of the last row a client has
+Position = Tuple[int, int]
+
+
+@dataclass
+class SyncConfig:
+    page_size: int = 500
+    tombstone_days: int = 30
+
+    @classmethod
+    def from_env(cls) -> "SyncConfig":
+        return cls(
+            page_size=int(os.environ.get('SKILLHUB_SYNC_PAGE_SIZE', 500)),
+            tombstone_days=int(os.environ.get('SKILLHUB_SYNC_TOMBSTONE_DAYS', 30)),
+        )
+
+
+def _base36(value: int) -> str:
+    digits = '0123456789abcdefghijklmnopqrstuvwxyz'
+    encoded = ''
+    while True:
+        value, digit = divmod(value, 36)
+        encoded = digits[digit] + encoded
+        if not value:
+            return encoded
+
+
+def encode_token(after: Position, issued: int) -> str:
+    return f"{_base36(after[0])}.{_base36(after[1])}.{_base36(issued)}"
+
+
+def decode_token(token: str) -> Tuple[Position, int]:
+    """``((xact, seq), issued)`` of a sync token; 400 on a malformed one"""
+    try:
+        xact, seq, issued = (int(part, 36) for part in token.split('.'))
+        if xact < 0 or seq < 0 or issued < 0:
+            raise ValueError(token)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+    return (xact, seq), issued
+
+
+def start(token: Optional[str], config: SyncConfig, now: Optional[float] = None) -> Tuple[Position, int, bool]:
+    """``(after, issued, reset)`` for a sync from ``token``"""
+    now = time.time() if now is None else now
+    if not token:
+        return (0, 0), int(now), False
+    if token.count('.') == 1 and all(part.isalnum() for part in token.split('.')):
+        # A <seq>.<issued> token from before the feed was ordered by transaction
+        return (0, 0), int(now), True
+    after, issued = decode_token(token)
+    if issued < now - config.tombstone_days * 86400:
+        return (0, 0), int(now), True
+    return after, issued, False
+
+
+def next_token(log: List[Dict[str, Any]], after: Position, issued: int, full_page: bool,
+               now: Optional[float] = None) -> Tuple[str, bool]:
+    """Token to resume after this page of ``sync_log()`` rows, and whether another page follows
+
+    The token stops at the first unsettled row. Another page follows only
+    when the page was full and every row of it settled.
+    """
+    now = time.time() if now is None else now
+    kept = 0
+    for row in log:
+        if not row['settled']:
+            break
+        after, kept = (row['xact'], row['seq']), kept + 1
+    if full_page and kept == len(log):
+        return encode_token(after, issued), True
+    # Caught up: the client's view is complete as of this read
+    return encode_token(after, int(now)), False
+
+
+def changed_ids(log: List[Dict[str, Any]]) -> Tuple[Dict[str, List[str]], Dict[str, List[str]]]:
+    """Ids to fetch and ids deleted, per entity (a page holds each row at most once)"""
+    changed: Dict[str, List[str]] = {}
+    deleted: Dict[str, List[str]] = {}
+    for row in log:
+        (deleted if row['deleted'] else changed).setdefault(row['entity'], []).append(row['entity_id'])
+    return changed, deleted
+
+
+def assemble(changed: Dict[str, List[str]], deleted: Dict[str, List[str]],
+             rows: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Response body: changed rows per entity, and tombstone ids per entity
+
+    Logged rows that are gone by the time they are fetched (deleted since,
+    or no longer visible, like a deactivated category) become tombstones.
+    A client drops the ids it holds and ignores the rest.
+    """
+    body: Dict[str, Any] = {key: [] for key in ENTITY_KEYS.values()}
+    body['profile'] = None
+    gone: Dict[str, List[str]] = {entity: list(ids) for entity, ids in deleted.items()}
+    for entity, ids in changed.items():
+        found = {row['id']: row for row in rows.get(entity, [])}
+        gone.setdefault(entity, []).extend(i for i in ids if i not in found)
+        if entity == 'profile':
+            body['profile'] = next(iter(found.values()), None)
+        else:
+            body[ENTITY_KEYS[entity]] = [found[i] for i in ids if i in found]
+    body['deleted'] = {ENTITY_KEYS[entity]: ids for entity, ids in gone.items() if ids}
+    return body
@@ -0,0 +1,374 @@
+"""
+Near-duplicate detection of posted tasks with MinHash and LSH.
+
+Spam reposts of one task bloat the open-task feed. ``create_task`` asks the
+``DuplicateIndex`` whether a new task's text is a near copy of a recent
+open task:
+
+  * The text (title and description, lowercased words) is cut into word
+    3-gram shingles. A MinHash signature of ``num_perm`` values estimates
+    the Jaccard similarity of two shingle sets as the share of equal
+    values.
+  * Signatures are split into ``bands`` bands. Tasks sharing any band land
+    in the same bucket. A lookup reads one bucket per band and compares
+    only those candidates, however many tasks are indexed. With 16 bands
+    of 4 rows, a pair at similarity 0.8 shares a band 99.98% of the time,
+    and one at 0.3 less than 13% of the time.
+  * A candidate is a duplicate at ``threshold`` (0.8) when both tasks
+    belong to the same customer, or at ``cross_customer_threshold`` (0.95,
+    a near-verbatim copy) across accounts. Similar everyday tasks ("mount
+    a TV") from different customers stay apart.
+
+Memory is bounded: signatures live in one ``max_tasks`` x ``num_perm``
+uint32 ring, and indexing a task beyond ``max_tasks`` evicts the oldest one
+from it and from the buckets. ``stats()`` reports the footprint (about 1.1
+KB per task with the defaults).
+
+``DuplicateSync`` loads the newest posted tasks in the background at start
+(``ready`` afterwards) and adds tasks other processes created every
+``interval_s``. ``backfill()`` is the batch mode: it walks every posted
+task oldest first, signs a page at a time, and flags (or only reports) the
+ones that repeat an earlier task.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import sys
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MODES = ('flag', 'reject', 'off')
+PAGE_SIZE = 500
+# Seconds each delta looks back past the previous sync (commit lag, clock skew)
+OVERLAP_S = 5.0
+# Universal hashing (a * x + b) mod P over 32-bit shingle hashes stays within uint64
+PRIME = (1 << 31) - 1
+SHINGLE_WORDS = 3
+TASK_SELECT = 'id, customer_id, title, description, status, duplicate_of, created_at'
+_WORD_RE = re.compile(r"\w+")
+
+
+@dataclass
+class DedupConfig:
+    # flag: insert with duplicate_of set (kept out of the feed); reject: 409
+    mode: str = 'flag'
+    threshold: float = 0.8
+    cross_customer_threshold: float = 0.95
+    num_perm: int = 64
+    bands: int = 16
+    max_tasks: int = 50_000
+    interval_s: float = 5.0
+
+    @classmethod
+    def from_env(cls) -> "DedupConfig":
+        config = cls(
+            mode=os.environ.get('SKILLHUB_DEDUP_MODE', 'flag').lower(),
+            threshold=float(os.environ.get('SKILLHUB_DEDUP_THRESHOLD', 0.8)),
+            cross_customer_threshold=float(os.environ.get('SKILLHUB_DEDUP_CROSS_CUSTOMER_THRESHOLD', 0.95)),
+            max_tasks=int(os.environ.get('SKILLHUB_DEDUP_MAX_TASKS', 50_000)),
+            interval_s=float(os.environ.get('SKILLHUB_DEDUP_SYNC_S', 5.0)),
+        )
+        if config.mode not in MODES:
+            raise ValueError(f"SKILLHUB_DEDUP_MODE must be one of {', '.join(MODES)}")
+        return config
+
+
+def shingles(text: str) -> np.ndarray:
+    """crc32 of each word 3-gram of ``text`` (the words themselves for shorter texts)"""
+    words = _WORD_RE.findall(text.lower())
+    width = min(SHINGLE_WORDS, len(words))
+    return np.fromiter({zlib.crc32(' '.join(words[i:i + width]).encode())
+                        for i in range(len(words) - width + 1)} if words else (), np.uint64)
+
+
+def task_text(task: Dict[str, Any]) -> str:
+    return f"{task.get('title') or ''}\n{task.get('description') or ''}"
+
+
+class MinHasher:
+    """MinHash signatures from ``num_perm`` seeded universal hash functions"""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(1, PRIME, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, PRIME, num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """uint32[num_perm], or None for a text without words"""
+        hashed = shingles(text)
+        if not len(hashed):
+            return None
+        return ((hashed[:, None] * self.a + self.b) % PRIME).min(axis=0).astype(np.uint32)
+
+    def signatures(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Signatures of many texts in one pass: (uint32[n, num_perm], has-words mask)"""
+        hashed = [shingles(text) for text in texts]
+        counts = np.array([len(h) for h in hashed])
+        signed = counts > 0
+        result = np.zeros((len(texts), self.num_perm), np.uint32)
+        if signed.any():
+            values = (np.concatenate(hashed)[:, None] * self.a + self.b) % PRIME
+            starts = np.concatenate(([0], np.cumsum(counts[signed])[:-1]))
+            result[signed] = np.minimum.reduceat(values, starts, axis=0)
+        return result, signed
+
+
+class DuplicateIndex:
+    """LSH buckets over a bounded ring of task signatures"""
+
+    def __init__(self, config: DedupConfig):
+        if config.num_perm % config.bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.config = config
+        self.rows = config.num_perm // config.bands
+        self.signatures = np.zeros((config.max_tasks, config.num_perm), np.uint32)
+        self.ids: List[Optional[str]] = [None] * config.max_tasks
+        self.customers: List[Optional[str]] = [None] * config.max_tasks
+        self.slots: Dict[str, int] = {}
+        # Per band: band hash -> slot, or list of slots sharing it
+        self.buckets: List[Dict[int, Any]] = [{} for _ in range(config.bands)]
+        self._next = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self.slots
+
+    def _band_keys(self, signature: np.ndarray) -> List[int]:
+        return [hash(signature[band * self.rows:(band + 1) * self.rows].tobytes())
+                for band in range(self.config.bands)]
+
+    def add(self, task_id: str, customer_id: Optional[str], signature: np.ndarray):
+        self.remove(task_id)
+        slot = self._next
+        self._next = (self._next + 1) % self.config.max_tasks
+        if self.ids[slot] is not None:
+            self.remove(self.ids[slot])
+            self.evicted += 1
+        self.signatures[slot] = signature
+        self.ids[slot] = task_id
+        self.customers[slot] = customer_id
+        self.slots[task_id] = slot
+        for band, key in zip(self.buckets, self._band_keys(signature)):
+            bucket = band.get(key)
+            if bucket is None:
+                band[key] = slot
+            elif isinstance(bucket, list):
+                bucket.append(slot)
+            else:
+                band[key] = [bucket, slot]
+
+    def remove(self, task_id: str):
+        slot = self.slots.pop(task_id, None)
+        if slot is None:
+            return
+        for band, key in zip(self.buckets, self._band_keys(self.signatures[slot])):
+            bucket = band.get(key)
+            if isinstance(bucket, list):
+                bucket.remove(slot)
+                if len(bucket) == 1:
+                    band[key] = bucket[0]
+            elif bucket == slot:
+                del band[key]
+        self.ids[slot] = None
+        self.customers[slot] = None
+
+    def candidates(self, signature: np.ndarray) -> Set[int]:
+        found: Set[int] = set()
+        for band, key in zip(self.buckets, self._band_keys(signature)):
+            bucket = band.get(key)
+            if isinstance(bucket, list):
+                found.update(bucket)
+            elif bucket is not None:
+                found.add(bucket)
+        return found
+
+    def matches(self, signature: np.ndarray, customer_id: Optional[str]) -> List[Tuple[str, float]]:
+        """(task id, estimated similarity) of indexed duplicates, most similar first"""
+        slots = np.fromiter(self.candidates(signature), np.int64)
+        if not len(slots):
+            return []
+        similarity = (self.signatures[slots] == signature).mean(axis=1)
+        found = []
+        for slot, score in zip(slots.tolist(), similarity.tolist()):
+            same_customer = customer_id is not None and self.customers[slot] == customer_id
+            if score >= (self.config.threshold if same_customer else self.config.cross_customer_threshold):
+                found.append((self.ids[slot], round(score, 3)))
+        return sorted(found, key=lambda match: -match[1])
+
+    def stats(self) -> Dict[str, Any]:
+        bucket_bytes = sum(sys.getsizeof(band) + sum(sys.getsizeof(b) for b in band.values() if isinstance(b, list))
+                           for band in self.buckets)
+        return {
+            "tasks": len(self.slots),
+            "max_tasks": self.config.max_tasks,
+            "evicted": self.evicted,
+            "bytes": self.signatures.nbytes + bucket_bytes + sys.getsizeof(self.slots),
+        }
+
+
+class DuplicateSync:
+    """Loads a DuplicateIndex of recent posted tasks and adds other processes' new ones"""
+
+    def __init__(self, db: Any, client: Callable[[], Any], config: Optional[DedupConfig] = None):
+        self.config = config or DedupConfig()
+        self.hasher = MinHasher(self.config.num_perm)
+        self.index = DuplicateIndex(self.config)
+        # ResilientExecutor and a getter for the current data client
+        self.db = db
+        self.client = client
+        self.ready = False
+        self.synced_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self.flagged = 0
+        self.rejected = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls, db: Any, client: Callable[[], Any]) -> Optional["DuplicateSync"]:
+        config = DedupConfig.from_env()
+        return None if config.mode == 'off' else cls(db, client, config)
+
+    def signature(self, task: Dict[str, Any]) -> Optional[np.ndarray]:
+        return self.hasher.signature(task_text(task))
+
+    def matches(self, signature: Optional[np.ndarray], customer_id: str) -> List[Tuple[str, float]]:
+        return self.index.matches(signature, customer_id) if signature is not None else []
+
+    def add(self, task: Dict[str, Any], signature: Optional[np.ndarray] = None):
+        """Index a posted task that isn't itself a duplicate"""
+        if task.get('duplicate_of') or task.get('status', 'posted') != 'posted':
+            return
+        signature = self.signature(task) if signature is None else signature
+        if signature is not None:
+            self.index.add(task['id'], task.get('customer_id'), signature)
+
+    def start(self):
+        """Load in the background (``ready`` once done), then keep adding new tasks"""
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            # See HealthProber.stop(): wait_for() can swallow a cancel before Python 3.12
+            while not self._task.done():
+                self._task.cancel()
+                await asyncio.wait({self._task}, timeout=0.1)
+            if not self._task.cancelled():
+                self._task.exception()
+            self._task = None
+
+    async def _run(self):
+        first = True
+        while True:
+            if not first:
+                await asyncio.sleep(self.config.interval_s)
+            first = False
+            try:
+                if not self.ready:
+                    await self.load()
+                else:
+                    await self.sync()
+                self.last_error = None
+            except Exception as e:
+                if self.last_error != str(e):
+                    logger.warning(f"Duplicate index sync failed: {e}")
+                self.last_error = str(e)
+
+    async def load(self):
+        """Index the newest ``max_tasks`` posted tasks"""
+        started = datetime.now(timezone.utc)
+        rows: List[Dict[str, Any]] = []
+        while len(rows) < self.config.max_tasks:
+            query = (self.client().table('tasks').select(TASK_SELECT).eq('status', 'posted')
+                     .is_('duplicate_of', 'null').order('created_at', desc=True))
+            result = await self.db.read('dedup.load', query.range(
+                len(rows), min(len(rows) + PAGE_SIZE, self.config.max_tasks) - 1))
+            page = result.data or []
+            rows.extend(page)
+            if len(page) < PAGE_SIZE:
+                break
+        fresh = DuplicateIndex(self.config)
+        await asyncio.to_thread(self._fill, fresh, rows[::-1])
+        self.index = fresh
+        self.synced_at = started
+        self.ready = True
+
+    def _fill(self, index: DuplicateIndex, rows: List[Dict[str, Any]]):
+        """Index ``rows`` (oldest first), signing them in batches"""
+        for start in range(0, len(rows), PAGE_SIZE):
+            page = rows[start:start + PAGE_SIZE]
+            signatures, signed = self.hasher.signatures([task_text(row) for row in page])
+            for row, signature, ok in zip(page, signatures, signed):
+                if ok:
+                    index.add(row['id'], row.get('customer_id'), signature)
+
+    async def sync(self):
+        """Index posted tasks created since the last sync (by any process)"""
+        started = datetime.now(timezone.utc)
+        since = (self.synced_at - timedelta(seconds=OVERLAP_S)).isoformat()
+        result = await self.db.read('dedup.created', self.client().table('tasks').select(TASK_SELECT)
+                                    .eq('status', 'posted').is_('duplicate_of', 'null').gte('created_at', since))
+        for row in result.data or []:
+            if row['id'] not in self.index:
+                self.add(row)
+        self.synced_at = started
+
+    async def backfill(self, write: Optional[Callable[[str, str], Any]] = None) -> Dict[str, Any]:
+        """Check every posted task against the ones posted before it
+
+        Walks posted tasks oldest first, a page at a time, signing each page
+        in one pass. A repeat is flagged through ``write(task_id,
+        duplicate_of)`` when given (reported only otherwise) and left out of
+        the index; the rest are indexed, and the result replaces the live
+        index.
+        """
+        index = DuplicateIndex(self.config)
+        checked, duplicates = 0, []
+        cursor: Optional[Tuple[str, str]] = None
+        while True:
+            query = self.client().table('tasks').select(TASK_SELECT).eq('status', 'posted')
+            if cursor is not None:
+                query = query.or_(f"created_at.gt.{cursor[0]},and(created_at.eq.{cursor[0]},id.gt.{cursor[1]})")
+            result = await self.db.read('dedup.backfill', query.order('created_at').order('id').limit(PAGE_SIZE))
+            page = result.data or []
+            signatures, signed = await asyncio.to_thread(self.hasher.signatures, [task_text(row) for row in page])
+            for row, signature, ok in zip(page, signatures, signed):
+                checked += 1
+                if not ok:
+                    continue
+                found = index.matches(signature, row.get('customer_id'))
+                if found:
+                    duplicates.append({"task_id": row['id'], "duplicate_of": found[0][0], "similarity": found[0][1]})
+                    if write is not None and row.get('duplicate_of') != found[0][0]:
+                        await write(row['id'], found[0][0])
+                elif not row.get('duplicate_of'):
+                    index.add(row['id'], row.get('customer_id'), signature)
+            if len(page) < PAGE_SIZE:
+                break
+            cursor = (page[-1]['created_at'], page[-1]['id'])
+        self.index = index
+        self.ready = True
+        logger.info(f"Duplicate backfill checked {checked} posted tasks, found {len(duplicates)} repeats")
+        return {"checked": checked, "duplicates": duplicates}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.index.stats(),
+            "mode": self.config.mode,
+            "ready": self.ready,
+            "flagged": self.flagged,
+            "rejected": self.rejected,
+            "synced_at": self.synced_at.isoformat() if self.synced_at else None,
+            "last_error": self.last_error,
+        }
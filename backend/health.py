@@ -0,0 +1,153 @@
+"""
+Background dependency health prober.
+
+The database is probed on an interval, off the event loop, and the result is
+cached. ``/api/live``, ``/api/ready`` and ``/api/health`` only read the cached
+snapshot, so probes from load balancers and orchestrators cost nothing and
+can't pile up behind a slow database.
+
+Readiness has hysteresis: it turns false after ``failure_threshold``
+consecutive failed *or* slow probes and turns true again only after
+``recovery_threshold`` consecutive good ones. Tunables come from the
+environment, e.g.:
+
+    SKILLHUB_HEALTH_INTERVAL_S=5 SKILLHUB_HEALTH_SLOW_MS=500 uvicorn server:app
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HealthConfig:
+    """Probe interval, timeout and readiness thresholds"""
+    interval_s: float = 5.0
+    timeout_s: float = 2.0
+    # A probe slower than this counts against readiness like a failure
+    slow_ms: float = 1000.0
+    failure_threshold: int = 3
+    recovery_threshold: int = 2
+    # Probes kept for the latency/error figures in /api/health
+    window: int = 20
+
+    @classmethod
+    def from_env(cls) -> "HealthConfig":
+        return cls(
+            interval_s=float(os.environ.get('SKILLHUB_HEALTH_INTERVAL_S', 5.0)),
+            timeout_s=float(os.environ.get('SKILLHUB_HEALTH_TIMEOUT_S', 2.0)),
+            slow_ms=float(os.environ.get('SKILLHUB_HEALTH_SLOW_MS', 1000.0)),
+            failure_threshold=int(os.environ.get('SKILLHUB_HEALTH_FAILURES', 3)),
+            recovery_threshold=int(os.environ.get('SKILLHUB_HEALTH_RECOVERIES', 2)),
+        )
+
+
+class HealthProber:
+    """Runs ``probe`` periodically in a worker thread and caches the outcome
+
+    ``probe`` is a blocking callable that raises on failure (e.g. a one-row
+    select). At most one probe runs at a time: if the previous one is still
+    stuck in its thread, the interval counts as a failure instead of starting
+    another.
+    """
+
+    def __init__(self, probe: Callable[[], Any], config: Optional[HealthConfig] = None):
+        self.probe = probe
+        self.config = config or HealthConfig()
+        self.ready = False
+        self.samples: Deque[Dict[str, Any]] = deque(maxlen=self.config.window)
+        self._bad_streak = 0
+        self._good_streak = 0
+        self._inflight: Optional[asyncio.Future] = None
+        self._task: Optional[asyncio.Task] = None
+        self._snapshot = self._build_snapshot(None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Latest cached state; never touches the database"""
+        return self._snapshot
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            # Python < 3.12's wait_for() can swallow a cancel that lands just as the
+            # probe finishes; keep cancelling until the loop is really gone
+            while not self._task.done():
+                self._task.cancel()
+                await asyncio.wait({self._task}, timeout=0.1)
+            if not self._task.cancelled():
+                self._task.exception()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self.check()
+            await asyncio.sleep(self.config.interval_s)
+
+    async def check(self) -> Dict[str, Any]:
+        """Run one probe and update the cached snapshot"""
+        started = time.perf_counter()
+        error = None
+        if self._inflight is not None and not self._inflight.done():
+            error = "previous probe still running"
+        else:
+            self._inflight = asyncio.ensure_future(asyncio.to_thread(self.probe))
+            # A probe that outlives its timeout (or a stop()) still gets its error consumed
+            self._inflight.add_done_callback(lambda f: f.cancelled() or f.exception())
+            try:
+                await asyncio.wait_for(asyncio.shield(self._inflight), self.config.timeout_s)
+            except asyncio.TimeoutError:
+                error = f"probe timed out after {self.config.timeout_s}s"
+            except Exception as e:
+                error = str(e) or type(e).__name__
+        latency_ms = (time.perf_counter() - started) * 1000
+        self._record({"ok": error is None, "latency_ms": latency_ms, "error": error,
+                      "at": datetime.now(timezone.utc)})
+        return self._snapshot
+
+    def _record(self, sample: Dict[str, Any]):
+        self.samples.append(sample)
+        good = sample["ok"] and sample["latency_ms"] <= self.config.slow_ms
+        if good:
+            self._good_streak += 1
+            self._bad_streak = 0
+        else:
+            self._bad_streak += 1
+            self._good_streak = 0
+        was_ready = self.ready
+        if not self.ready and good and (self._good_streak >= self.config.recovery_threshold
+                                        or len(self.samples) == 1):
+            # The very first good probe makes a fresh process ready
+            self.ready = True
+        elif self.ready and self._bad_streak >= self.config.failure_threshold:
+            self.ready = False
+        if was_ready != self.ready:
+            logger.log(logging.INFO if self.ready else logging.WARNING, "Readiness changed to %s (%s)",
+                       self.ready, sample["error"] or f"{sample['latency_ms']:.0f}ms probe")
+        self._snapshot = self._build_snapshot(sample)
+
+    def _build_snapshot(self, last: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        samples = list(self.samples)
+        latencies = sorted(s["latency_ms"] for s in samples)
+        return {
+            "ready": self.ready,
+            "database": "unknown" if last is None else ("connected" if last["ok"] else "disconnected"),
+            "checked_at": last["at"] if last else None,
+            "last_latency_ms": round(last["latency_ms"], 2) if last else None,
+            "last_error": last["error"] if last else None,
+            "window": {
+                "probes": len(samples),
+                "error_rate": sum(not s["ok"] for s in samples) / len(samples) if samples else 0.0,
+                "median_latency_ms": round(latencies[len(latencies) // 2], 2) if latencies else None,
+                "max_latency_ms": round(latencies[-1], 2) if latencies else None,
+            },
+        }
@@ -0,0 +1,127 @@
+"""
+Idempotency-Key support for non-idempotent POSTs.
+
+A client that retries ``POST /api/tasks`` (or an application or message)
+with the same ``Idempotency-Key`` header gets the first attempt's response
+back, marked with ``Idempotent-Replayed: true``, without another database
+write. A duplicate that arrives while the first attempt is still running
+waits for it instead of racing it.
+
+Keys are scoped to the caller and the request path, and remembered with a
+fingerprint of the body: reusing a key for a different body is a client bug
+and gets 422. Successful results and 4xx errors are replayed (a replayed
+error carries ``Idempotent-Replayed: true`` too); 5xx/transient failures
+are forgotten so the client's retry actually runs again.
+
+The store is process-local, bounded (least recently used entries are evicted
+past ``max_entries``) and entries expire after ``ttl_s``. With several
+workers a retry can land on another process; the database constraints (e.g.
+one application per tasker and task) remain the backstop there.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional, Tuple
+
+from fastapi import HTTPException
+
+MAX_KEY_LENGTH = 255
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+class IdempotencyEntry:
+    __slots__ = ("fingerprint", "future", "expires")
+
+    def __init__(self, fingerprint: str, future: asyncio.Future, expires: float):
+        self.fingerprint = fingerprint
+        self.future = future
+        self.expires = expires
+
+
+def fingerprint(payload: Any) -> str:
+    body = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """Bounded, TTL'd map of idempotency keys to (pending or finished) outcomes"""
+
+    def __init__(self, ttl_s: float = 24 * 3600, max_entries: int = 10_000):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Hashable, IdempotencyEntry]" = OrderedDict()
+        self.replayed = 0
+
+    @classmethod
+    def from_env(cls) -> "IdempotencyStore":
+        return cls(
+            ttl_s=float(os.environ.get('SKILLHUB_IDEMPOTENCY_TTL_S', 24 * 3600)),
+            max_entries=int(os.environ.get('SKILLHUB_IDEMPOTENCY_MAX_KEYS', 10_000)),
+        )
+
+    async def run(self, key: Optional[str], scope: Tuple, payload: Any,
+                  fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """``(result, replayed)``; without a key ``fn`` simply runs"""
+        if not key:
+            return await fn(), False
+        if len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Idempotency-Key longer than {MAX_KEY_LENGTH} characters")
+
+        store_key = (*scope, key)
+        digest = fingerprint(payload)
+        while True:
+            entry = self.entries.get(store_key)
+            if entry is not None and entry.expires <= time.monotonic():
+                del self.entries[store_key]
+                entry = None
+            if entry is None:
+                break
+            if entry.fingerprint != digest:
+                raise HTTPException(status_code=422,
+                                    detail="Idempotency-Key was already used with a different request body")
+            self.entries.move_to_end(store_key)
+            try:
+                # Shielded: a waiter that disconnects must not cancel the original request
+                result = await asyncio.shield(entry.future)
+            except asyncio.CancelledError:
+                if entry.future.cancelled():
+                    # The original request was abandoned; run it ourselves
+                    continue
+                raise
+            except HTTPException as e:
+                if not 400 <= e.status_code < 500:
+                    raise
+                self.replayed += 1
+                # A fresh exception per replay, marked so the client can tell it from a new rejection
+                raise HTTPException(status_code=e.status_code, detail=e.detail,
+                                    headers={**(e.headers or {}), REPLAYED_HEADER: "true"}) from None
+            self.replayed += 1
+            return result, True
+
+        future = asyncio.get_running_loop().create_future()
+        self.entries[store_key] = IdempotencyEntry(digest, future, time.monotonic() + self.ttl_s)
+        self._evict()
+        try:
+            result = await fn()
+        except BaseException as e:
+            if not (isinstance(e, HTTPException) and 400 <= e.status_code < 500):
+                # Not a final answer: let the next retry run again
+                if self.entries.get(store_key) is not None and self.entries[store_key].future is future:
+                    del self.entries[store_key]
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # Waiters (if any) consume it; don't warn when there are none
+                future.exception()
+            raise
+        future.set_result(result)
+        return result, False
+
+    def _evict(self):
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
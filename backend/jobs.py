@@ -0,0 +1,456 @@
+"""
+Durable background jobs: a SQLite-backed queue and an asyncio runner.
+
+Handlers hand slow or deferrable work to the queue instead of doing it
+inline:
+
+    job_queue.enqueue('tasks.expired_notice', {"task_id": task_id}, dedupe_key=task_id)
+
+``enqueue()`` commits the row to a local SQLite file (WAL, no fsync per
+commit) and returns, so queued work survives a restart without an external
+broker. ``start()``, called from the app's lifespan, opens the file and the
+runner, which claims due jobs of each type up to the type's concurrency limit. Handlers are coroutines run on the event loop,
+or plain functions run in a worker thread.
+
+Job types are registered with their handler and policy:
+
+  * ``concurrency``: jobs (or batches) of the type running at once
+  * ``batch_size``: > 1 makes the handler take a list of payloads; the
+    batch succeeds or is retried as a whole
+  * ``max_attempts`` and full-jitter exponential backoff between attempts;
+    jobs out of attempts stay in the table as ``failed`` for inspection
+  * ``timeout_s``: a coroutine handler still running after this is
+    cancelled and the attempt counts as failed. A thread can't be
+    interrupted, so a plain-function handler that overruns fails the attempt
+    only once it returns: until then it keeps its concurrency slot and its
+    lease, and the retry never runs beside it
+
+A claimed job holds a lease. If the process dies mid-job, the lease runs out
+and the job is queued again (the attempt still counts, so a job that keeps
+crashing the process ends up ``failed``). Several processes can share one
+queue file: claims are single UPDATE statements.
+
+Schedules enqueue a job on a cron expression (UTC, five fields: minute hour
+day-of-month month day-of-week) or every N seconds. Their next run time is
+stored too, and each run is enqueued with a dedupe key, so a restart neither
+skips a due run nor fires it twice; runs missed while stopped collapse into
+one. Finished jobs are pruned after ``retention_s``.
+
+    SKILLHUB_JOBS_DB=/var/lib/skillhub/jobs.sqlite3 uvicorn server:app
+"""
+
+import asyncio
+import inspect
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Any], Awaitable[Any]]
+
+# Seconds a claim's lease outlives the handler's timeout; only a dead process lets it run out
+LEASE_MARGIN_S = 60.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  kind TEXT NOT NULL,
+  payload TEXT,
+  status TEXT NOT NULL DEFAULT 'queued',
+  run_at REAL NOT NULL,
+  attempts INTEGER NOT NULL DEFAULT 0,
+  max_attempts INTEGER NOT NULL,
+  lease_until REAL,
+  last_error TEXT,
+  dedupe_key TEXT UNIQUE,
+  created_at REAL NOT NULL,
+  finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_due ON jobs (kind, status, run_at);
+CREATE INDEX IF NOT EXISTS jobs_lease ON jobs (status, lease_until);
+CREATE TABLE IF NOT EXISTS schedules (
+  name TEXT PRIMARY KEY,
+  next_run_at REAL NOT NULL
+);
+"""
+
+
+@dataclass
+class JobConfig:
+    path: str = 'jobs.sqlite3'
+    # Seconds between polls for due jobs (enqueue() in this process wakes the runner at once)
+    poll_interval_s: float = 1.0
+    # Seconds finished (done or failed) jobs are kept
+    retention_s: float = 7 * 24 * 3600
+    # Seconds close() waits for running jobs before cancelling them
+    shutdown_timeout_s: float = 10.0
+
+    @classmethod
+    def from_env(cls, default_path: str = 'jobs.sqlite3') -> "JobConfig":
+        return cls(
+            path=os.environ.get('SKILLHUB_JOBS_DB', default_path),
+            poll_interval_s=float(os.environ.get('SKILLHUB_JOBS_POLL_S', 1.0)),
+            retention_s=float(os.environ.get('SKILLHUB_JOBS_RETENTION_S', 7 * 24 * 3600)),
+        )
+
+
+@dataclass
+class JobType:
+    kind: str
+    handler: Handler
+    concurrency: int = 1
+    batch_size: int = 1
+    max_attempts: int = 5
+    backoff_base_s: float = 2.0
+    backoff_max_s: float = 600.0
+    timeout_s: float = 60.0
+
+    def backoff(self, attempts: int) -> float:
+        return random.uniform(0, min(self.backoff_max_s, self.backoff_base_s * 2 ** (attempts - 1)))
+
+
+# ======================================
+# SCHEDULES
+# ======================================
+
+CRON_FIELDS = (('minute', 0, 59), ('hour', 0, 23), ('day', 1, 31), ('month', 1, 12), ('weekday', 0, 7))
+
+
+class Cron:
+    """Five-field cron expression: ``*``, ``*/n``, ``a/n``, ``a-b``, ``a-b/n`` and lists; weekday 0 or 7 is Sunday"""
+
+    def __init__(self, expression: str):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+        self.expression = expression
+        fields = {}
+        for part, (name, low, high) in zip(parts, CRON_FIELDS):
+            fields[name] = self._parse(part, low, high, expression)
+        self.minutes, self.hours, self.days, self.months = (fields['minute'], fields['hour'],
+                                                            fields['day'], fields['month'])
+        self.weekdays = {d % 7 for d in fields['weekday']}
+        # Cron's rule: restricted day-of-month and day-of-week match either
+        self.any_day = parts[2] == '*'
+        self.any_weekday = parts[4] == '*'
+
+    @staticmethod
+    def _parse(part: str, low: int, high: int, expression: str) -> Set[int]:
+        values: Set[int] = set()
+        for item in part.split(','):
+            span, _, step = item.partition('/')
+            if span == '*':
+                start, end = low, high
+            elif '-' in span:
+                start, end = (int(v) for v in span.split('-', 1))
+            elif step:
+                # ``a/n``: from a to the end of the range
+                start, end = int(span), high
+            else:
+                start = end = int(span)
+            if not (low <= start <= end <= high) or (step and int(step) < 1):
+                raise ValueError(f"Cron field {item!r} out of range in {expression!r}")
+            values.update(range(start, end + 1, int(step) if step else 1))
+        return values
+
+    def _day_matches(self, t: datetime) -> bool:
+        in_days = t.day in self.days
+        in_weekdays = (t.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return in_days and in_weekdays
+        return in_days or in_weekdays
+
+    def next_after(self, after: datetime) -> datetime:
+        """First matching minute strictly after ``after`` (UTC)"""
+        t = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = t + timedelta(days=366 * 5)
+        while t < limit:
+            if t.month not in self.months:
+                t = (t.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(t):
+                t = t.replace(hour=0, minute=0) + timedelta(days=1)
+            elif t.hour not in self.hours:
+                t = t.replace(minute=0) + timedelta(hours=1)
+            elif t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+            else:
+                return t
+        raise ValueError(f"Cron expression never matches: {self.expression!r}")
+
+
+@dataclass
+class Schedule:
+    name: str
+    kind: str
+    payload: Any = None
+    cron: Optional[Cron] = None
+    every_s: Optional[float] = None
+
+    def next_after(self, ts: float) -> float:
+        if self.cron is not None:
+            return self.cron.next_after(datetime.fromtimestamp(ts, timezone.utc)).timestamp()
+        return ts + self.every_s
+
+
+# ======================================
+# QUEUE AND RUNNER
+# ======================================
+
+class JobQueue:
+    """SQLite job table plus the asyncio runner that drains it"""
+
+    def __init__(self, config: Optional[JobConfig] = None):
+        self.config = config or JobConfig()
+        self.types: Dict[str, JobType] = {}
+        self.schedules: Dict[str, Schedule] = {}
+        self.lock = threading.Lock()
+        # Opened by start(), so building the queue touches no file
+        self.conn: Optional[sqlite3.Connection] = None
+        self.running: Dict[str, int] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._wake: Optional[asyncio.Event] = None
+        self._loop_task: Optional[asyncio.Task] = None
+        self._pruned_at = 0.0
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+        self.overruns = 0
+
+    def register(self, kind: str, handler: Handler, **options) -> JobType:
+        """Register the handler (and policy, see JobType) for jobs of ``kind``"""
+        job_type = self.types[kind] = JobType(kind, handler, **options)
+        self.running.setdefault(kind, 0)
+        return job_type
+
+    def schedule(self, name: str, kind: str, cron: Optional[str] = None, every_s: Optional[float] = None,
+                 payload: Any = None) -> Schedule:
+        """Enqueue ``kind`` on a cron expression or every ``every_s`` seconds"""
+        if (cron is None) == (every_s is None):
+            raise ValueError("Pass exactly one of cron or every_s")
+        if kind not in self.types:
+            raise ValueError(f"Unknown job type: {kind}")
+        schedule = self.schedules[name] = Schedule(name, kind, payload, Cron(cron) if cron else None, every_s)
+        if self.conn is not None:
+            with self.lock:
+                self._store_schedule(schedule)
+        return schedule
+
+    def _store_schedule(self, schedule: Schedule):
+        # An existing row keeps its next run: a restart neither skips nor repeats it
+        self.conn.execute('INSERT OR IGNORE INTO schedules (name, next_run_at) VALUES (?, ?)',
+                          (schedule.name, schedule.next_after(time.time())))
+
+    def enqueue(self, kind: str, payload: Any = None, delay_s: float = 0.0,
+                dedupe_key: Optional[str] = None) -> Optional[int]:
+        """Durably queue a job; None if a job with ``dedupe_key`` already exists"""
+        job_type = self.types.get(kind)
+        if job_type is None:
+            raise ValueError(f"Unknown job type: {kind}")
+        if self.conn is None:
+            raise RuntimeError("Job queue is not started")
+        now = time.time()
+        with self.lock:
+            cursor = self.conn.execute(
+                'INSERT INTO jobs (kind, payload, run_at, max_attempts, dedupe_key, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (dedupe_key) DO NOTHING',
+                (kind, json.dumps(payload), now + delay_s, job_type.max_attempts, dedupe_key, now))
+        if not cursor.rowcount:
+            return None
+        if self._wake is not None and delay_s <= 0:
+            self._wake.set()
+        return cursor.lastrowid
+
+    # Runner
+
+    def open(self):
+        """Open the queue file and store the schedules registered so far"""
+        with self.lock:
+            if self.conn is not None:
+                return
+            self.conn = sqlite3.connect(self.config.path, check_same_thread=False, isolation_level=None)
+            self.conn.execute('PRAGMA journal_mode = WAL')
+            self.conn.execute('PRAGMA synchronous = NORMAL')
+            self.conn.execute('PRAGMA busy_timeout = 5000')
+            self.conn.executescript(SCHEMA)
+            for schedule in self.schedules.values():
+                self._store_schedule(schedule)
+
+    async def start(self):
+        self.open()
+        if self._loop_task is None:
+            self._wake = asyncio.Event()
+            self._loop_task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop claiming; give running jobs ``shutdown_timeout_s``, then cancel and requeue them"""
+        if self._loop_task is not None:
+            while not self._loop_task.done():
+                self._loop_task.cancel()
+                await asyncio.wait({self._loop_task}, timeout=0.1)
+            self._loop_task = None
+        if self._tasks:
+            await asyncio.wait(set(self._tasks), timeout=self.config.shutdown_timeout_s)
+        while self._tasks:
+            for task in list(self._tasks):
+                task.cancel()
+            await asyncio.wait(set(self._tasks), timeout=0.1)
+        self._wake = None
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.tick()
+            except Exception as e:
+                logger.error(f"Job runner tick failed: {e}")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.config.poll_interval_s)
+            except asyncio.TimeoutError:
+                pass
+
+    async def tick(self):
+        """Fire due schedules, recover expired leases and start due jobs where there is room"""
+        await asyncio.to_thread(self._housekeeping)
+        for job_type in self.types.values():
+            slots = job_type.concurrency - self.running[job_type.kind]
+            if slots <= 0:
+                continue
+            claimed = await asyncio.to_thread(self._claim, job_type, slots * job_type.batch_size)
+            for start in range(0, len(claimed), job_type.batch_size):
+                batch = claimed[start:start + job_type.batch_size]
+                self.running[job_type.kind] += 1
+                task = asyncio.create_task(self._execute(job_type, batch))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    def _housekeeping(self):
+        now = time.time()
+        with self.lock:
+            for name, next_run_at in self.conn.execute('SELECT name, next_run_at FROM schedules').fetchall():
+                schedule = self.schedules.get(name)
+                if schedule is None or next_run_at > now:
+                    continue
+                # Compare-and-set: with several processes on one file, one of them fires the run
+                advanced = self.conn.execute(
+                    'UPDATE schedules SET next_run_at = ? WHERE name = ? AND next_run_at = ?',
+                    (schedule.next_after(now), name, next_run_at)).rowcount
+                if advanced:
+                    job_type = self.types[schedule.kind]
+                    self.conn.execute(
+                        'INSERT INTO jobs (kind, payload, run_at, max_attempts, dedupe_key, created_at) '
+                        'VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (dedupe_key) DO NOTHING',
+                        (schedule.kind, json.dumps(schedule.payload), now, job_type.max_attempts,
+                         f"{name}@{int(next_run_at * 1000)}", now))
+            self.conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END, "
+                "lease_until = NULL, last_error = 'lease expired', "
+                "finished_at = CASE WHEN attempts >= max_attempts THEN ? END "
+                "WHERE status = 'running' AND lease_until < ?", (now, now))
+            if now - self._pruned_at >= 3600:
+                self.conn.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+                                  (now - self.config.retention_s,))
+                self._pruned_at = now
+
+    def _claim(self, job_type: JobType, limit: int) -> List[Tuple[int, Any, int]]:
+        now = time.time()
+        with self.lock:
+            rows = self.conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ? "
+                "WHERE id IN (SELECT id FROM jobs WHERE kind = ? AND status = 'queued' AND run_at <= ? "
+                "ORDER BY run_at, id LIMIT ?) RETURNING id, payload, attempts",
+                (now + job_type.timeout_s + LEASE_MARGIN_S, job_type.kind, now, limit)).fetchall()
+        return sorted((job_id, json.loads(payload), attempts) for job_id, payload, attempts in rows)
+
+    async def _execute(self, job_type: JobType, batch: List[Tuple[int, Any, int]]):
+        payloads = [payload for _, payload, _ in batch]
+        argument = payloads if job_type.batch_size > 1 else payloads[0]
+        thread = None
+        try:
+            if inspect.iscoroutinefunction(job_type.handler):
+                await asyncio.wait_for(job_type.handler(argument), job_type.timeout_s)
+            else:
+                thread = asyncio.ensure_future(asyncio.to_thread(job_type.handler, argument))
+                await asyncio.wait_for(asyncio.shield(thread), job_type.timeout_s)
+        except asyncio.CancelledError:
+            # Shutdown: back to the queue, and this attempt doesn't count
+            await asyncio.to_thread(self._release, batch)
+            raise
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                error = f"timed out after {job_type.timeout_s}s"
+                if thread is not None:
+                    await self._outlive(job_type, batch, thread)
+            else:
+                error = str(e) or type(e).__name__
+            await asyncio.to_thread(self._fail, job_type, batch, error)
+        else:
+            await asyncio.to_thread(self._finish, batch)
+        finally:
+            self.running[job_type.kind] -= 1
+            if self._wake is not None:
+                self._wake.set()
+
+    async def _outlive(self, job_type: JobType, batch: List[Tuple[int, Any, int]], thread: asyncio.Future):
+        """Hold the slot and renew the lease until an overrunning handler thread returns"""
+        self.overruns += 1
+        logger.warning(f"Job {job_type.kind}#{batch[0][0]} overran {job_type.timeout_s}s in its thread; "
+                       f"holding its slot until it returns")
+        while not thread.done():
+            await asyncio.wait({thread}, timeout=LEASE_MARGIN_S / 2)
+            if not thread.done():
+                await asyncio.to_thread(self._renew, batch)
+        # Its result no longer counts; the attempt already failed
+        thread.exception()
+
+    def _renew(self, batch: List[Tuple[int, Any, int]]):
+        with self.lock:
+            self.conn.executemany('UPDATE jobs SET lease_until = ? WHERE id = ?',
+                                  [(time.time() + LEASE_MARGIN_S, job_id) for job_id, _, _ in batch])
+
+    def _finish(self, batch: List[Tuple[int, Any, int]]):
+        with self.lock:
+            self.conn.executemany("UPDATE jobs SET status = 'done', lease_until = NULL, finished_at = ? "
+                                  "WHERE id = ?", [(time.time(), job_id) for job_id, _, _ in batch])
+        self.completed += len(batch)
+
+    def _fail(self, job_type: JobType, batch: List[Tuple[int, Any, int]], error: str):
+        now = time.time()
+        updates = []
+        for job_id, _, attempts in batch:
+            if attempts >= job_type.max_attempts:
+                self.failed += 1
+                logger.error(f"Job {job_type.kind}#{job_id} failed after {attempts} attempts: {error}")
+                updates.append(('failed', now, now, error, job_id))
+            else:
+                self.retried += 1
+                updates.append(('queued', now + job_type.backoff(attempts), None, error, job_id))
+        with self.lock:
+            self.conn.executemany('UPDATE jobs SET status = ?, run_at = ?, finished_at = ?, last_error = ?, '
+                                  'lease_until = NULL WHERE id = ?', updates)
+
+    def _release(self, batch: List[Tuple[int, Any, int]]):
+        with self.lock:
+            self.conn.executemany("UPDATE jobs SET status = 'queued', attempts = attempts - 1, lease_until = NULL "
+                                  "WHERE id = ?", [(job_id,) for job_id, _, _ in batch])
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            rows = [] if self.conn is None else self.conn.execute(
+                'SELECT kind, status, count(*) FROM jobs GROUP BY kind, status').fetchall()
+        counts: Dict[str, Dict[str, int]] = {kind: {} for kind in self.types}
+        for kind, status, count in rows:
+            counts.setdefault(kind, {})[status] = count
+        return {"jobs": counts, "running": dict(self.running), "completed": self.completed,
+                "retried": self.retried, "failed": self.failed, "overruns": self.overruns}
@@ -0,0 +1,287 @@
+"""
+Tasker leaderboards per category and city, kept in memory.
+
+"Top taskers in Plumbing near New York" is read from a precomputed board
+instead of sorting profiles per request. ``Leaderboards`` keeps one board per
+(category, city), and one per category over all cities, each holding its
+best ``capacity`` taskers (``2 * k`` by default) in rank order: average
+rating, then completed tasks, then review count. A read slices the first
+``limit <= k`` entries.
+
+Boards are bounded top-k structures updated incrementally: a board always
+holds exactly the best ``len(board)`` taskers of its group. A changed tasker
+goes in when it ranks above the board's last entry (or the board holds the
+whole group), pushing the last one out of a full board; otherwise it stays
+out. Each tasker's latest score is kept too, so a board that falls below
+``k`` entries after taskers dropped out is refilled from them in memory
+(rare: k of its 2k taskers have to drop below the rest first).
+
+``LeaderboardSync`` builds the boards from scratch in the background at
+startup (``ready`` afterwards) and again every ``rebuild_s``, and applies
+profiles updated since the last sync every ``interval_s``: the triggers
+keeping rating aggregates and completed-task counts touch ``updated_at``.
+``apply(row)`` takes this process's own changes at once.
+"""
+
+import asyncio
+import heapq
+import logging
+import os
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 1000
+# Seconds each delta looks back past the previous sync (commit lag, clock skew)
+OVERLAP_S = 5.0
+TASKER_SELECT = ('id, role, full_name, username, avatar_url, average_rating, total_reviews, '
+                 'total_tasks_completed, hourly_rate, skills, city, state')
+SUMMARY_FIELDS = ('id', 'full_name', 'username', 'avatar_url', 'average_rating', 'total_reviews',
+                  'total_tasks_completed', 'hourly_rate', 'city', 'state')
+# Board of a category over all cities
+ALL_CITIES = ''
+
+# (-rating, -completed, -reviews, id): ascending is best first
+Rank = Tuple[float, int, int, str]
+BoardKey = Tuple[str, str]
+
+
+def _key(value: Any) -> str:
+    return str(value or '').strip().lower()
+
+
+class _Tasker:
+    __slots__ = ('rank', 'boards', 'summary')
+
+    def __init__(self, row: Dict[str, Any]):
+        self.rank: Rank = (-float(row.get('average_rating') or 0), -int(row.get('total_tasks_completed') or 0),
+                           -int(row.get('total_reviews') or 0), row['id'])
+        city = _key(row.get('city'))
+        categories = {_key(skill) for skill in row.get('skills') or () if skill}
+        self.boards: FrozenSet[BoardKey] = frozenset(
+            [(category, ALL_CITIES) for category in categories]
+            + ([(category, city) for category in categories] if city else []))
+        self.summary = {name: row.get(name) for name in SUMMARY_FIELDS}
+
+
+class _Board:
+    __slots__ = ('ranks', 'truncated')
+
+    def __init__(self, ranks: List[Rank], truncated: bool):
+        self.ranks = ranks
+        # Members of the group were left out (they rank below the last entry)
+        self.truncated = truncated
+
+    def discard(self, rank: Rank) -> bool:
+        at = bisect_left(self.ranks, rank)
+        if at < len(self.ranks) and self.ranks[at] == rank:
+            del self.ranks[at]
+            return True
+        return False
+
+
+class Leaderboards:
+    """Top taskers per (category, city) and per category"""
+
+    def __init__(self, k: int = 20, capacity: Optional[int] = None):
+        self.k = k
+        self.capacity = max(capacity or 2 * k, k)
+        self.taskers: Dict[str, _Tasker] = {}
+        self.boards: Dict[BoardKey, _Board] = {}
+        self.refills = 0
+
+    def __len__(self) -> int:
+        return len(self.taskers)
+
+    def replace(self, rows: Iterable[Dict[str, Any]]):
+        """Build every board from scratch (rows of TASKER_SELECT)"""
+        self.taskers = {row['id']: _Tasker(row) for row in rows if row.get('role', 'tasker') == 'tasker'}
+        groups: Dict[BoardKey, List[Rank]] = {}
+        for tasker in self.taskers.values():
+            for board in tasker.boards:
+                groups.setdefault(board, []).append(tasker.rank)
+        self.boards = {board: _Board(heapq.nsmallest(self.capacity, ranks), len(ranks) > self.capacity)
+                       for board, ranks in groups.items()}
+
+    def upsert(self, row: Dict[str, Any]):
+        """Move a tasker whose profile changed; one that is no longer a tasker leaves every board"""
+        tasker = _Tasker(row) if row.get('role', 'tasker') == 'tasker' else None
+        known = self.taskers.get(row['id'])
+        if tasker is not None and known is not None and (known.rank, known.boards) == (tasker.rank, tasker.boards):
+            # Same place on the same boards (deltas see most rows more than once)
+            known.summary = tasker.summary
+            return
+        shrunk = self._remove(row['id'])
+        if tasker is not None:
+            self.taskers[row['id']] = tasker
+            for key in tasker.boards:
+                board = self.boards.get(key)
+                if board is None:
+                    board = self.boards[key] = _Board([], False)
+                if board.truncated and board.ranks and tasker.rank > board.ranks[-1]:
+                    continue
+                insort(board.ranks, tasker.rank)
+                if len(board.ranks) > self.capacity:
+                    board.ranks.pop()
+                    board.truncated = True
+        for key in shrunk:
+            board = self.boards.get(key)
+            if board is not None and board.truncated and len(board.ranks) < self.k:
+                self._refill(key)
+
+    def remove(self, tasker_id: str):
+        for key in self._remove(tasker_id):
+            board = self.boards.get(key)
+            if board is not None and board.truncated and len(board.ranks) < self.k:
+                self._refill(key)
+
+    def _remove(self, tasker_id: str) -> List[BoardKey]:
+        """Take a tasker off its boards; returns the boards it was on"""
+        tasker = self.taskers.pop(tasker_id, None)
+        if tasker is None:
+            return []
+        shrunk = []
+        for key in tasker.boards:
+            board = self.boards.get(key)
+            if board is not None and board.discard(tasker.rank):
+                shrunk.append(key)
+                if not board.ranks and not board.truncated:
+                    del self.boards[key]
+        return shrunk
+
+    def _refill(self, key: BoardKey):
+        ranks = [tasker.rank for tasker in self.taskers.values() if key in tasker.boards]
+        self.boards[key] = _Board(heapq.nsmallest(self.capacity, ranks), len(ranks) > self.capacity)
+        self.refills += 1
+
+    def top(self, category: str, city: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Best taskers of ``category`` (in ``city``), at most ``k``"""
+        board = self.boards.get((_key(category), _key(city)))
+        if board is None:
+            return []
+        limit = self.k if limit is None else max(1, min(limit, self.k))
+        return [{"rank": position, **self.taskers[rank[3]].summary}
+                for position, rank in enumerate(board.ranks[:limit], 1)]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "taskers": len(self.taskers),
+            "boards": len(self.boards),
+            "k": self.k,
+            "capacity": self.capacity,
+            "refills": self.refills,
+        }
+
+
+class LeaderboardSync:
+    """Builds Leaderboards and keeps them current with periodic deltas"""
+
+    def __init__(self, db: Any, client: Callable[[], Any], k: int = 20, interval_s: float = 10.0,
+                 rebuild_s: float = 3600.0):
+        self.k = k
+        self.boards = Leaderboards(k)
+        # ResilientExecutor and a getter for the current data client
+        self.db = db
+        self.client = client
+        self.interval_s = interval_s
+        self.rebuild_s = rebuild_s
+        self.ready = False
+        self.rebuilt_at: Optional[float] = None
+        self.synced_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self.rebuilds = 0
+        self.syncs = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls, db: Any, client: Callable[[], Any]) -> Optional["LeaderboardSync"]:
+        if os.environ.get('SKILLHUB_LEADERBOARDS', '1').lower() in ('0', 'false', 'off', 'no'):
+            return None
+        return cls(
+            db, client,
+            k=int(os.environ.get('SKILLHUB_LEADERBOARD_K', 20)),
+            interval_s=float(os.environ.get('SKILLHUB_LEADERBOARD_SYNC_S', 10.0)),
+            rebuild_s=float(os.environ.get('SKILLHUB_LEADERBOARD_REBUILD_S', 3600.0)),
+        )
+
+    def apply(self, row: Dict[str, Any]):
+        """Take a profile this process just read or wrote (needs TASKER_SELECT's fields)"""
+        self.boards.upsert(row)
+
+    def start(self):
+        """Build in the background (``ready`` once done), then keep syncing"""
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            # See HealthProber.stop(): wait_for() can swallow a cancel before Python 3.12
+            while not self._task.done():
+                self._task.cancel()
+                await asyncio.wait({self._task}, timeout=0.1)
+            if not self._task.cancelled():
+                self._task.exception()
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        first = True
+        while True:
+            if not first:
+                await asyncio.sleep(self.interval_s)
+            first = False
+            try:
+                if not self.ready or loop.time() - self.rebuilt_at >= self.rebuild_s:
+                    await self.rebuild()
+                else:
+                    await self.sync()
+                self.last_error = None
+            except Exception as e:
+                if self.last_error != str(e):
+                    logger.warning(f"Leaderboard sync failed: {e}")
+                self.last_error = str(e)
+
+    async def rebuild(self):
+        """Rank every tasker from scratch, paging by id"""
+        started = datetime.now(timezone.utc)
+        rows: List[Dict[str, Any]] = []
+        last_id = None
+        while True:
+            query = self.client().table('profiles').select(TASKER_SELECT).eq('role', 'tasker')
+            if last_id is not None:
+                query = query.gt('id', last_id)
+            result = await self.db.read('leaderboards.load', query.order('id').limit(PAGE_SIZE))
+            page = result.data or []
+            rows.extend(page)
+            if len(page) < PAGE_SIZE:
+                break
+            last_id = page[-1]['id']
+        fresh = Leaderboards(self.k)
+        await asyncio.to_thread(fresh.replace, rows)
+        self.boards = fresh
+        self.synced_at = started
+        self.rebuilt_at = asyncio.get_running_loop().time()
+        self.rebuilds += 1
+        self.ready = True
+
+    async def sync(self):
+        """Apply profiles updated since the last sync"""
+        started = datetime.now(timezone.utc)
+        since = (self.synced_at - timedelta(seconds=OVERLAP_S)).isoformat()
+        changed = await self.db.read('leaderboards.changed', self.client().table('profiles')
+                                     .select(TASKER_SELECT).gte('updated_at', since))
+        for row in changed.data or []:
+            self.boards.upsert(row)
+        self.synced_at = started
+        self.syncs += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.boards.stats(),
+            "ready": self.ready,
+            "rebuilds": self.rebuilds,
+            "syncs": self.syncs,
+            "synced_at": self.synced_at.isoformat() if self.synced_at else None,
+            "last_error": self.last_error,
+        }
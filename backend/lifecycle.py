@@ -0,0 +1,86 @@
+"""
+Process lifecycle helpers for server.py's lifespan.
+
+``InFlightMiddleware`` counts requests being served so shutdown can drain
+them, and flips ``draining`` so /api/ready starts failing as soon as
+shutdown begins (load balancers stop routing here while in-flight work
+finishes). Modules that buffer work register a flush with
+``on_shutdown``; hooks run in reverse registration order after draining.
+"""
+
+import asyncio
+import inspect
+import logging
+import time
+from typing import Any, Callable, List
+
+logger = logging.getLogger(__name__)
+
+
+class Lifecycle:
+    """In-flight request accounting, drain and shutdown hooks"""
+
+    def __init__(self):
+        self.inflight = 0
+        self._hooks: List[Callable[[], Any]] = []
+        self.reset()
+
+    def reset(self):
+        """Start a serving period (the event binds to the running loop on first wait)"""
+        self.draining = False
+        self.started_at = time.monotonic()
+        self.ready_at = None
+        self._idle = asyncio.Event()
+        if self.inflight == 0:
+            self._idle.set()
+
+    def on_shutdown(self, hook: Callable[[], Any]):
+        """Register a sync or async callable to run after in-flight requests drain"""
+        self._hooks.append(hook)
+        return hook
+
+    def enter(self):
+        self.inflight += 1
+        self._idle.clear()
+
+    def exit(self):
+        self.inflight -= 1
+        if self.inflight == 0:
+            self._idle.set()
+
+    async def drain(self, timeout_s: float) -> bool:
+        """Stop accepting work and wait for in-flight requests; False on timeout"""
+        self.draining = True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout_s)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning("Shutdown drain timed out with %d request(s) in flight", self.inflight)
+            return False
+
+    async def run_shutdown_hooks(self):
+        for hook in reversed(self._hooks):
+            try:
+                result = hook()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Shutdown hook {getattr(hook, '__name__', hook)} failed: {e}")
+
+
+class InFlightMiddleware:
+    """ASGI middleware feeding ``Lifecycle.enter``/``exit`` for HTTP requests"""
+
+    def __init__(self, app, lifecycle: Lifecycle):
+        self.app = app
+        self.lifecycle = lifecycle
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        self.lifecycle.enter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.lifecycle.exit()
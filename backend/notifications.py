@@ -0,0 +1,96 @@
+"""
+Notification fan-out and keyset pagination.
+
+Handlers call ``Notifier.notify(...)`` when something happens to another
+user (a new application, an accepted application, a message, a review). The
+call only queues the row: a ``BatchWriter`` inserts queued notifications in
+the background, many rows per statement, so the request that caused them
+never waits on the notifications table.
+
+Rows get their id here, which makes the insert safe to retry (an upsert that
+ignores duplicates). Delivery is best effort: when the queue is full or a
+write finally fails, notifications are dropped and counted.
+
+Unread counts are kept in ``notification_counters`` by statement-level
+triggers on ``notifications`` (see supabase_schema.sql), so reading a badge
+is a primary key lookup instead of a ``COUNT(*)``.
+
+Listing pages by ``(created_at, id)`` descending. The cursor is opaque to
+clients; it encodes the last row of the previous page.
+"""
+
+import base64
+import json
+import os
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+import batching
+
+TYPES = ('task', 'application', 'message', 'review', 'system')
+PREVIEW_LENGTH = 120
+
+
+class Notifier:
+    """Queues notification rows for a background, batching writer"""
+
+    def __init__(self, write_rows: batching.WriteRows, max_batch: int = 200, max_delay_s: float = 0.05,
+                 max_pending: int = 10_000):
+        self.writer = batching.BatchWriter(write_rows, max_batch, max_delay_s, max_pending=max_pending)
+
+    @classmethod
+    def from_env(cls, write_rows: batching.WriteRows) -> "Notifier":
+        return cls(
+            write_rows,
+            max_batch=int(os.environ.get('SKILLHUB_NOTIFY_BATCH_SIZE', 200)),
+            max_delay_s=float(os.environ.get('SKILLHUB_NOTIFY_BATCH_DELAY_MS', 50)) / 1000,
+            max_pending=int(os.environ.get('SKILLHUB_NOTIFY_MAX_PENDING', 10_000)),
+        )
+
+    def notify(self, user_id: Optional[str], kind: str, title: str, message: str,
+               data: Optional[Dict[str, Any]] = None) -> bool:
+        """Queue a notification for ``user_id``; False if there is no recipient or it was dropped"""
+        if not user_id:
+            return False
+        if kind not in TYPES:
+            raise ValueError(f"Unknown notification type: {kind}")
+        return self.writer.enqueue({
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "type": kind,
+            "title": title,
+            "message": preview(message),
+            "read": False,
+            "data": data,
+        })
+
+    async def close(self):
+        await self.writer.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return self.writer.stats()
+
+
+def preview(text: Optional[str]) -> str:
+    text = ' '.join((text or '').split())
+    return text if len(text) <= PREVIEW_LENGTH else text[:PREVIEW_LENGTH - 1] + '…'
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    raw = json.dumps([row['created_at'], row['id']], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """``(created_at, id)`` of the last row seen; 400 on a malformed cursor"""
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        # Both end up inside a PostgREST filter string: accept only what the columns can hold
+        uuid.UUID(row_id)
+        if not isinstance(created_at, str) or any(c in created_at for c in ',()"'):
+            raise ValueError(created_at)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return created_at, row_id
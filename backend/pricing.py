@@ -0,0 +1,341 @@
+"""
+Budget suggestions from the final prices of completed tasks.
+
+``PriceTables`` keeps one sample per completed task with a ``final_price``
+(category, size, city, price, hours, completion time) in numpy columns, and
+precomputes percentile bands of the price, the hourly rate (price / hours)
+and the hours for every group at four levels of detail:
+
+    (category, task_size, city)  ->  (category, task_size)
+                                 ->  (category, city)  ->  (category)
+
+A suggestion is one dict lookup: the most detailed group of the request
+with at least ``min_samples`` samples answers it. All groups of a level
+are computed in one vectorized pass: samples are sorted by (group, value)
+and each percentile is gathered at its interpolated position inside its
+group's run (numpy's "linear" method), so a recompute over a million
+samples is a few sorts, not a loop over groups.
+
+Only tasks completed in the last ``window_days`` count. ``PricingSync``
+loads the samples in the background at start (``ready`` afterwards) and
+every ``rebuild_s``, and in between, every ``interval_s``, applies tasks
+updated since the last sync and recomputes the tables off the event loop
+when any sample changed.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from browse_index import TASK_SIZES
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 1000
+# Seconds each delta looks back past the previous sync (commit lag, clock skew)
+OVERLAP_S = 5.0
+PERCENTILES = (10, 25, 50, 75, 90)
+LEVELS = (('category', 'task_size', 'city'), ('category', 'task_size'), ('category', 'city'), ('category',))
+TASK_SELECT = 'id, status, category_id, task_size, city, final_price, estimated_hours, completed_at, updated_at'
+
+
+def _timestamp(value: Any) -> float:
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return 0.0
+
+
+def _number(value: Any) -> float:
+    try:
+        return float(value) if value is not None else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _key(value: Any) -> str:
+    return str(value or '').strip().lower()
+
+
+def grouped_percentiles(groups: np.ndarray, values: np.ndarray,
+                        percentiles: Iterable[float] = PERCENTILES) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Percentiles of ``values`` within each group: (group ids, sample counts, [group, percentile] values)"""
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    ids, starts, counts = np.unique(groups, return_index=True, return_counts=True)
+    position = starts[:, None] + np.asarray(percentiles, float)[None, :] / 100 * (counts[:, None] - 1)
+    below = np.floor(position).astype(np.int64)
+    above = np.ceil(position).astype(np.int64)
+    return ids, counts, values[below] + (values[above] - values[below]) * (position - below)
+
+
+class PriceTables:
+    """Completed-task price samples and their precomputed percentile bands"""
+
+    COLUMNS = {'category': np.int32, 'task_size': np.int8, 'city': np.int32,
+               'price': np.float64, 'hours': np.float64, 'completed': np.float64}
+
+    def __init__(self, window_days: float = 365.0, min_samples: int = 5):
+        self.window_days = window_days
+        self.min_samples = min_samples
+        self.codes: Dict[str, Dict[str, int]] = {'category': {}, 'city': {}}
+        self.capacity = 1024
+        self.columns = {name: np.zeros(self.capacity, dtype) for name, dtype in self.COLUMNS.items()}
+        self.columns['price'][:] = np.nan
+        self.slots: Dict[str, int] = {}
+        self.free: List[int] = []
+        self.size = 0
+        # (category id, task size, city) with '' for levels without it -> band
+        self.bands: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        self.samples = 0
+        self.computed_at: Optional[float] = None
+        self.compute_ms: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def _code(self, kind: str, value: Any) -> int:
+        key = _key(value)
+        if not key:
+            return -1
+        codes = self.codes[kind]
+        code = codes.get(key)
+        if code is None:
+            code = codes[key] = len(codes)
+        return code
+
+    def upsert(self, row: Dict[str, Any]):
+        """Add or refresh a task's sample; one not completed at a price is dropped"""
+        price = _number(row.get('final_price'))
+        if row.get('status') != 'completed' or not price > 0:
+            self.remove(row['id'])
+            return
+        slot = self.slots.get(row['id'])
+        if slot is None:
+            slot = self.slots[row['id']] = self._allocate()
+        c = self.columns
+        c['category'][slot] = self._code('category', row.get('category_id'))
+        c['task_size'][slot] = TASK_SIZES.index(row['task_size']) if row.get('task_size') in TASK_SIZES else -1
+        c['city'][slot] = self._code('city', row.get('city'))
+        c['price'][slot] = price
+        c['hours'][slot] = _number(row.get('estimated_hours'))
+        c['completed'][slot] = _timestamp(row.get('completed_at') or row.get('updated_at'))
+
+    def remove(self, task_id: str):
+        slot = self.slots.pop(task_id, None)
+        if slot is not None:
+            self.columns['price'][slot] = np.nan
+            self.free.append(slot)
+
+    def _allocate(self) -> int:
+        if self.free:
+            return self.free.pop()
+        if self.size == self.capacity:
+            capacity = self.capacity * 2
+            for name, column in self.columns.items():
+                grown = np.full(capacity, np.nan) if name == 'price' else np.zeros(capacity, column.dtype)
+                grown[:self.capacity] = column
+                self.columns[name] = grown
+            self.capacity = capacity
+        self.size += 1
+        return self.size - 1
+
+    def compute(self, now: Optional[float] = None):
+        """Recompute every band from the samples in the window"""
+        started = time.perf_counter()
+        now = time.time() if now is None else now
+        c = {name: column[:self.size] for name, column in self.columns.items()}
+        live = (c['price'] > 0) & (c['category'] >= 0) & (c['completed'] >= now - self.window_days * 86400)
+        names = {
+            'category': {code: name for name, code in self.codes['category'].items()},
+            'task_size': dict(enumerate(TASK_SIZES)),
+            'city': {code: name for name, code in self.codes['city'].items()},
+        }
+        bands: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        for level in LEVELS:
+            mask = live.copy()
+            group = np.zeros(self.size, np.int64)
+            for part in level:
+                mask &= c[part] >= 0
+                group = group * (len(names[part]) + 1) + c[part]
+            hours = c['hours']
+            timed = mask & (hours > 0)
+            prices = self._bands(group[mask], c['price'][mask], PERCENTILES)
+            rates = self._bands(group[timed], c['price'][timed] / hours[timed], PERCENTILES)
+            durations = self._bands(group[timed], hours[timed], (50,))
+            for group_id, (count, price_band) in prices.items():
+                parts, rest = {}, group_id
+                for part in reversed(level):
+                    rest, parts[part] = divmod(rest, len(names[part]) + 1)
+                key = (names['category'][parts['category']], names['task_size'].get(parts.get('task_size'), ''),
+                       names['city'].get(parts.get('city'), ''))
+                bands[key] = {
+                    "samples": count,
+                    "price": price_band,
+                    "hourly_rate": rates[group_id][1] if group_id in rates else None,
+                    "estimated_hours": durations[group_id][1]["p50"] if group_id in durations else None,
+                }
+        self.bands = bands
+        self.samples = int(live.sum())
+        self.computed_at = now
+        self.compute_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    @staticmethod
+    def _bands(groups: np.ndarray, values: np.ndarray, percentiles) -> Dict[int, Tuple[int, Dict[str, float]]]:
+        """group id -> (samples, {"p10": ...})"""
+        if not len(groups):
+            return {}
+        ids, counts, found = grouped_percentiles(groups, values, percentiles)
+        labels = [f"p{p}" for p in percentiles]
+        return {group_id: (count, dict(zip(labels, row)))
+                for group_id, count, row in zip(ids.tolist(), counts.tolist(), np.round(found, 2).tolist())}
+
+    def suggest(self, category_id: str, task_size: Optional[str] = None,
+                city: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """The most detailed band with enough samples, or None"""
+        category, size, city = _key(category_id), _key(task_size), _key(city)
+        for level in LEVELS:
+            if ('task_size' in level and not size) or ('city' in level and not city):
+                continue
+            key = (category, size if 'task_size' in level else '', city if 'city' in level else '')
+            band = self.bands.get(key)
+            if band is not None and band["samples"] >= self.min_samples:
+                return {"basis": list(level), **band}
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "samples": self.samples,
+            "tracked": len(self.slots),
+            "bands": len(self.bands),
+            "compute_ms": self.compute_ms,
+        }
+
+
+class PricingSync:
+    """Loads PriceTables and keeps them current with periodic deltas"""
+
+    def __init__(self, db: Any, client: Callable[[], Any], window_days: float = 365.0, min_samples: int = 5,
+                 interval_s: float = 60.0, rebuild_s: float = 86400.0):
+        self.window_days = window_days
+        self.min_samples = min_samples
+        self.tables = PriceTables(window_days, min_samples)
+        # ResilientExecutor and a getter for the current data client
+        self.db = db
+        self.client = client
+        self.interval_s = interval_s
+        self.rebuild_s = rebuild_s
+        self.ready = False
+        self.rebuilt_at: Optional[float] = None
+        self.synced_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self.rebuilds = 0
+        self.syncs = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls, db: Any, client: Callable[[], Any]) -> Optional["PricingSync"]:
+        if os.environ.get('SKILLHUB_PRICING', '1').lower() in ('0', 'false', 'off', 'no'):
+            return None
+        return cls(
+            db, client,
+            window_days=float(os.environ.get('SKILLHUB_PRICING_WINDOW_DAYS', 365)),
+            min_samples=int(os.environ.get('SKILLHUB_PRICING_MIN_SAMPLES', 5)),
+            interval_s=float(os.environ.get('SKILLHUB_PRICING_SYNC_S', 60.0)),
+            rebuild_s=float(os.environ.get('SKILLHUB_PRICING_REBUILD_S', 86400.0)),
+        )
+
+    def start(self):
+        """Load in the background (``ready`` once done), then keep syncing"""
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            # See HealthProber.stop(): wait_for() can swallow a cancel before Python 3.12
+            while not self._task.done():
+                self._task.cancel()
+                await asyncio.wait({self._task}, timeout=0.1)
+            if not self._task.cancelled():
+                self._task.exception()
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        first = True
+        while True:
+            if not first:
+                await asyncio.sleep(self.interval_s)
+            first = False
+            try:
+                if not self.ready or loop.time() - self.rebuilt_at >= self.rebuild_s:
+                    await self.rebuild()
+                else:
+                    await self.sync()
+                self.last_error = None
+            except Exception as e:
+                if self.last_error != str(e):
+                    logger.warning(f"Pricing tables sync failed: {e}")
+                self.last_error = str(e)
+
+    async def rebuild(self):
+        """Reload every task completed within the window, paging by id"""
+        started = datetime.now(timezone.utc)
+        since = (started - timedelta(days=self.window_days)).isoformat()
+        rows: List[Dict[str, Any]] = []
+        last_id = None
+        while True:
+            query = (self.client().table('tasks').select(TASK_SELECT)
+                     .eq('status', 'completed').gte('updated_at', since))
+            if last_id is not None:
+                query = query.gt('id', last_id)
+            result = await self.db.read('pricing.load', query.order('id').limit(PAGE_SIZE))
+            page = result.data or []
+            rows.extend(page)
+            if len(page) < PAGE_SIZE:
+                break
+            last_id = page[-1]['id']
+        fresh = PriceTables(self.window_days, self.min_samples)
+        await asyncio.to_thread(self._fill, fresh, rows)
+        self.tables = fresh
+        self.synced_at = started
+        self.rebuilt_at = asyncio.get_running_loop().time()
+        self.rebuilds += 1
+        self.ready = True
+
+    @staticmethod
+    def _fill(tables: PriceTables, rows: List[Dict[str, Any]]):
+        for row in rows:
+            tables.upsert(row)
+        tables.compute()
+
+    async def sync(self):
+        """Apply tasks updated since the last sync; recompute when any sample changed"""
+        started = datetime.now(timezone.utc)
+        since = (self.synced_at - timedelta(seconds=OVERLAP_S)).isoformat()
+        changed = await self.db.read('pricing.changed', self.client().table('tasks').select(TASK_SELECT)
+                                     .gte('updated_at', since))
+        touched = False
+        for row in changed.data or []:
+            if row.get('status') == 'completed' or row['id'] in self.tables.slots:
+                self.tables.upsert(row)
+                touched = True
+        if touched:
+            # Samples only change here, so they hold still while the thread computes
+            await asyncio.to_thread(self.tables.compute)
+        self.synced_at = started
+        self.syncs += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.tables.stats(),
+            "ready": self.ready,
+            "rebuilds": self.rebuilds,
+            "syncs": self.syncs,
+            "synced_at": self.synced_at.isoformat() if self.synced_at else None,
+            "last_error": self.last_error,
+        }
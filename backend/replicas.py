@@ -0,0 +1,304 @@
+"""
+Read-replica routing with read-your-writes.
+
+Queries are still built on the primary clients; ``ResilientExecutor.read``
+asks the ``ReplicaRouter`` where to run each one. A read goes to a replica
+(round robin over the usable ones) only when:
+
+  * it belongs to a GET/HEAD request: reads done while handling a write, and
+    background reads (browse sync, batching), stay on the primary;
+  * the caller hasn't written recently: a write request pins its user to the
+    primary from the moment it starts until ``pin_s`` after it finishes;
+  * the replica answered its last lag probe and was at most ``max_lag_s``
+    behind.
+
+A replica that fails a read with a transient error is taken out until its
+next good probe, and that read is repeated on the primary, so replica trouble
+never reaches callers. Lag is probed in the background through the schema's
+``replication_lag_seconds()`` with the service role.
+
+Replicas are PostgREST endpoints accepting the primary's keys (Supabase read
+replicas, or a PostgREST in front of a streaming standby):
+
+    SKILLHUB_READ_REPLICA_URLS=https://ref-rr-us-east-1-abcde.supabase.co uvicorn server:app
+
+With the stand-in (``SKILLHUB_DATA_BACKEND=standin``), STANDIN_REPLICAS=N
+adds N replica clients over the same database (always in sync) to exercise
+the routing. Pins live in this process; with several workers, a user whose
+next request reaches another worker reads with at most ``max_lag_s`` of lag.
+"""
+
+import asyncio
+import copy
+import logging
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import resilience
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = frozenset(('GET', 'HEAD'))
+# Expired pins are swept once the table grows past this
+PIN_SWEEP_MIN = 1024
+
+
+@dataclass
+class ReplicaConfig:
+    urls: List[str] = field(default_factory=list)
+    # Replicas further behind than this are not read from
+    max_lag_s: float = 2.0
+    # Read-your-writes window after a write request (never shorter than
+    # max_lag_s + probe_interval_s: lag may grow between two probes)
+    pin_s: float = 5.0
+    probe_interval_s: float = 2.0
+    probe_timeout_s: float = 1.0
+
+    @classmethod
+    def from_env(cls) -> "ReplicaConfig":
+        urls = os.environ.get('SKILLHUB_READ_REPLICA_URLS', '')
+        return cls(
+            urls=[url.strip() for url in urls.split(',') if url.strip()],
+            max_lag_s=float(os.environ.get('SKILLHUB_REPLICA_MAX_LAG_S', 2.0)),
+            pin_s=float(os.environ.get('SKILLHUB_READ_YOUR_WRITES_S', 5.0)),
+            probe_interval_s=float(os.environ.get('SKILLHUB_REPLICA_PROBE_INTERVAL_S', 2.0)),
+            probe_timeout_s=float(os.environ.get('SKILLHUB_REPLICA_PROBE_TIMEOUT_S', 1.0)),
+        )
+
+
+class RequestRoute:
+    """Per-request routing state, shared between the middleware and handlers"""
+
+    __slots__ = ("method", "user_id")
+
+    def __init__(self, method: str):
+        self.method = method
+        self.user_id: Optional[str] = None
+
+
+_route: ContextVar[Optional[RequestRoute]] = ContextVar('skillhub_read_route', default=None)
+
+
+def rebind(query: Any, client: Any) -> Any:
+    """``query`` as sent to ``client`` instead of the client it was built on"""
+    bind = getattr(client, 'bind', None)
+    if bind is not None:
+        # The stand-in client
+        return bind(query)
+    bound = copy.copy(query)
+    # postgrest builders carry their own headers (keys, auth); only the endpoint changes
+    bound.session = client.postgrest.session
+    return bound
+
+
+class Replica:
+    """One replica client with its latest lag probe"""
+
+    def __init__(self, name: str, client: Any):
+        self.name = name
+        self.client = client
+        self.ok = False
+        self.lag_s: Optional[float] = None
+        self.error: Optional[str] = None
+        self.checked_at: Optional[datetime] = None
+        self.reads = 0
+        self.failures = 0
+
+    def usable(self, max_lag_s: float) -> bool:
+        return self.ok and self.lag_s is not None and self.lag_s <= max_lag_s
+
+    def failed(self, error: BaseException):
+        self.ok = False
+        self.failures += 1
+        self.error = str(error) or type(error).__name__
+
+    def summary(self) -> Dict[str, Any]:
+        return {"name": self.name, "ok": self.ok, "lag_s": self.lag_s, "error": self.error,
+                "checked_at": self.checked_at, "reads": self.reads, "failures": self.failures}
+
+
+class ReplicaRouter:
+    """Chooses primary or replica per read; probes replica lag in the background"""
+
+    def __init__(self, config: Optional[ReplicaConfig] = None):
+        self.config = config or ReplicaConfig()
+        self.pin_s = max(self.config.pin_s, self.config.max_lag_s + self.config.probe_interval_s)
+        self.replicas: List[Replica] = []
+        self.admin_client: Any = None
+        self._pins: Dict[str, float] = {}
+        self._sweep_at = PIN_SWEEP_MIN
+        self._next = 0
+        self._task: Optional[asyncio.Task] = None
+        self.replica_reads = 0
+        self.pinned_reads = 0
+        self.fallback_reads = 0
+
+    def connect(self, admin_client: Any, replica_clients: Dict[str, Any]):
+        """Replica clients by name; ``admin_client`` builds the (service role) lag probes"""
+        self.admin_client = admin_client
+        self.replicas = [Replica(name, client) for name, client in replica_clients.items()]
+
+    def disconnect(self) -> List[Any]:
+        """Forget the replicas; returns their clients for the caller to close"""
+        clients = [replica.client for replica in self.replicas]
+        self.replicas = []
+        return clients
+
+    # Requests and pins
+
+    def bind_user(self, user_id: str):
+        """Attach the authenticated user to the current request's routing"""
+        route = _route.get()
+        if route is None:
+            return
+        route.user_id = user_id
+        if route.method not in SAFE_METHODS:
+            self.pin(user_id)
+
+    def pin(self, user_id: str):
+        now = time.monotonic()
+        self._pins[user_id] = now + self.pin_s
+        if len(self._pins) > self._sweep_at:
+            self._pins = {user: until for user, until in self._pins.items() if until > now}
+            self._sweep_at = max(PIN_SWEEP_MIN, 2 * len(self._pins))
+
+    def pinned(self, user_id: Optional[str]) -> bool:
+        until = self._pins.get(user_id) if user_id else None
+        return until is not None and until > time.monotonic()
+
+    # Routing
+
+    def may_use_replica(self) -> bool:
+        """Whether reads in the current context may run on a replica (e.g. for single-flight keys)"""
+        route = _route.get()
+        return (bool(self.replicas) and route is not None and route.method in SAFE_METHODS
+                and not self.pinned(route.user_id))
+
+    def choose(self) -> Optional[Replica]:
+        """The replica for a read in the current context, or None for the primary"""
+        if not self.replicas:
+            return None
+        route = _route.get()
+        if route is None or route.method not in SAFE_METHODS:
+            return None
+        if self.pinned(route.user_id):
+            self.pinned_reads += 1
+            return None
+        usable = [replica for replica in self.replicas if replica.usable(self.config.max_lag_s)]
+        if not usable:
+            self.fallback_reads += 1
+            return None
+        self._next = (self._next + 1) % len(usable)
+        return usable[self._next]
+
+    def reader(self, query: Any) -> Callable[[], Any]:
+        """Blocking callable running ``query`` where it should go"""
+        replica = self.choose()
+        if replica is None:
+            return query.execute
+        bound = rebind(query, replica.client)
+
+        def run():
+            try:
+                result = bound.execute()
+            except Exception as e:
+                if not resilience.is_transient(e):
+                    raise
+                logger.warning(f"Read replica {replica.name} failed, reading from the primary: {e}")
+                replica.failed(e)
+                self.fallback_reads += 1
+                return query.execute()
+            replica.reads += 1
+            self.replica_reads += 1
+            return result
+        return run
+
+    # Lag monitoring
+
+    async def start(self):
+        if self.replicas and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            # Same dance as HealthProber.stop(): wait_for() may swallow a cancel on 3.11
+            while not self._task.done():
+                self._task.cancel()
+                await asyncio.wait({self._task}, timeout=0.1)
+            if not self._task.cancelled():
+                self._task.exception()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self.check()
+            await asyncio.sleep(self.config.probe_interval_s)
+
+    async def check(self):
+        """Probe every replica's lag once"""
+        await asyncio.gather(*(self._probe(replica) for replica in self.replicas))
+
+    async def _probe(self, replica: Replica):
+        was_usable = replica.usable(self.config.max_lag_s)
+        query = rebind(self.admin_client.rpc('replication_lag_seconds'), replica.client)
+        probe = asyncio.ensure_future(asyncio.to_thread(query.execute))
+        # A probe that outlives its timeout still gets its error consumed
+        probe.add_done_callback(lambda f: f.cancelled() or f.exception())
+        try:
+            result = await asyncio.wait_for(asyncio.shield(probe), self.config.probe_timeout_s)
+            lag_s = result.data[0]['lag_s'] if result.data else None
+            replica.lag_s = float(lag_s) if lag_s is not None else None
+            replica.ok = True
+            replica.error = None if replica.lag_s is not None else "nothing replayed yet"
+        except asyncio.TimeoutError:
+            replica.ok = False
+            replica.error = f"lag probe timed out after {self.config.probe_timeout_s}s"
+        except Exception as e:
+            replica.ok = False
+            replica.error = str(e) or type(e).__name__
+        replica.checked_at = datetime.now(timezone.utc)
+        usable = replica.usable(self.config.max_lag_s)
+        if usable != was_usable:
+            reason = replica.error or f"lag {replica.lag_s:.2f}s, limit {self.config.max_lag_s}s"
+            logger.log(logging.INFO if usable else logging.WARNING, "Read replica %s %s (%s)", replica.name,
+                       "back in rotation" if usable else "out of rotation", reason)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "replicas": [replica.summary() for replica in self.replicas],
+            "max_lag_s": self.config.max_lag_s,
+            "pin_s": self.pin_s,
+            "pinned_users": sum(until > time.monotonic() for until in self._pins.values()),
+            "replica_reads": self.replica_reads,
+            "pinned_reads": self.pinned_reads,
+            "fallback_reads": self.fallback_reads,
+        }
+
+
+class ReadRoutingMiddleware:
+    """ASGI middleware giving each HTTP request its routing state
+
+    A write request's user is pinned again when it finishes, so the window
+    covers writes that land late in the request (e.g. through a batcher).
+    """
+
+    def __init__(self, app, router: ReplicaRouter):
+        self.app = app
+        self.router = router
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        route = RequestRoute(scope['method'])
+        token = _route.set(route)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _route.reset(token)
+            if route.user_id is not None and route.method not in SAFE_METHODS:
+                self.router.pin(route.user_id)
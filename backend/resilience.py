@@ -0,0 +1,303 @@
+"""
+Resilience layer around PostgREST calls.
+
+server.py awaits every query through ``ResilientExecutor``:
+
+    result = await db.read('tasks.get', supabase.table('tasks').select('*').eq('id', task_id))
+    result = await db.write('tasks.create', supabase.table('tasks').insert(task_data))
+
+Each call runs the builder's blocking ``execute()`` in a worker thread with a
+deadline (the whole budget, across attempts). Reads are idempotent and are
+retried on transient failures with full-jitter exponential backoff, and can
+optionally be hedged: if the first attempt is still running after the
+operation's recent p95, a second one is started and the first to succeed
+wins. Writes are never hedged and only retried when the caller marks them
+idempotent (an update setting absolute values, never an insert).
+
+A circuit breaker counts transient failures (timeouts, connection errors,
+5xx/connection-class PostgREST codes; not 404s or constraint violations).
+After ``breaker_failures`` in a row it opens and calls fail fast for
+``breaker_cooldown_s``; then one trial call is let through (half-open) and
+its outcome closes or re-opens the breaker.
+
+Failures surface as ``DataUnavailable`` (an HTTPException: 503, or 504 on a
+deadline), which handlers already re-raise unchanged. Per-operation
+counters and latency percentiles are exposed by ``metrics()``.
+
+When a ``replicas.ReplicaRouter`` is attached, reads may run on a read
+replica instead (see replicas.py); writes always go to the primary.
+
+Worker threads can't be interrupted; a call abandoned at its deadline keeps
+its thread until the HTTP client's own timeout (SKILLHUB_DB_TIMEOUT_S).
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Optional
+
+import httpx
+from fastapi import HTTPException
+from postgrest.exceptions import APIError
+
+logger = logging.getLogger(__name__)
+
+# PostgREST/Postgres codes worth retrying: connection loss, serialization
+# failures, deadlocks, overload, statement timeouts (plus class 08)
+TRANSIENT_CODES = {'PGRST000', 'PGRST001', 'PGRST002', 'PGRST503',
+                   '40001', '40P01', '53300', '57014', '57P01', '57P03'}
+LATENCY_SAMPLES = 256
+
+
+class DataUnavailable(HTTPException):
+    """The database could not serve the call in time (503/504)"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: Optional[int] = None):
+        headers = {"Retry-After": str(retry_after)} if retry_after else None
+        super().__init__(status_code=status_code, detail=detail, headers=headers)
+
+
+def is_transient(error: BaseException) -> bool:
+    if isinstance(error, (httpx.TransportError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    if isinstance(error, APIError):
+        code = str(error.code or '')
+        # Gateway errors arrive without a JSON body; postgrest puts the HTTP status in code
+        return code.startswith('08') or code in TRANSIENT_CODES or code in ('502', '503', '504')
+    return False
+
+
+@dataclass
+class ResilienceConfig:
+    read_deadline_s: float = 3.0
+    write_deadline_s: float = 5.0
+    read_retries: int = 2
+    backoff_base_s: float = 0.05
+    hedge_reads: bool = False
+    # Hedge no earlier than this, and only once an operation has enough samples
+    hedge_min_delay_s: float = 0.01
+    hedge_min_samples: int = 20
+    # At most this share of reads may be hedged
+    hedge_budget: float = 0.1
+    breaker_failures: int = 5
+    breaker_cooldown_s: float = 5.0
+
+    @classmethod
+    def from_env(cls) -> "ResilienceConfig":
+        return cls(
+            read_deadline_s=float(os.environ.get('SKILLHUB_READ_DEADLINE_S', 3.0)),
+            write_deadline_s=float(os.environ.get('SKILLHUB_WRITE_DEADLINE_S', 5.0)),
+            read_retries=int(os.environ.get('SKILLHUB_READ_RETRIES', 2)),
+            hedge_reads=os.environ.get('SKILLHUB_HEDGE_READS', '').lower() in ('1', 'true', 'yes'),
+            breaker_failures=int(os.environ.get('SKILLHUB_BREAKER_FAILURES', 5)),
+            breaker_cooldown_s=float(os.environ.get('SKILLHUB_BREAKER_COOLDOWN_S', 5.0)),
+        )
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half-open -> closed"""
+
+    def __init__(self, failures: int, cooldown_s: float):
+        self.failures = failures
+        self.cooldown_s = cooldown_s
+        self.state = "closed"
+        self.consecutive = 0
+        self.opened_at = 0.0
+        self.trial_running = False
+        self.opened = 0
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown_s:
+            self.state = "half_open"
+        if self.state == "half_open" and not self.trial_running:
+            self.trial_running = True
+            return True
+        return False
+
+    def retry_after(self) -> int:
+        return max(1, round(self.cooldown_s - (time.monotonic() - self.opened_at)))
+
+    def success(self):
+        self.consecutive = 0
+        self.trial_running = False
+        if self.state != "closed":
+            logger.info("Circuit breaker closed")
+            self.state = "closed"
+
+    def abandon(self):
+        """The half-open trial ended without a verdict (cancelled): let the next call try"""
+        self.trial_running = False
+
+    def failure(self):
+        self.consecutive += 1
+        self.trial_running = False
+        if self.state == "half_open" or (self.state == "closed" and self.consecutive >= self.failures):
+            if self.state == "closed":
+                logger.warning(f"Circuit breaker opened after {self.consecutive} consecutive failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self.opened += 1
+
+
+class OperationStats:
+    """Counters and recent latencies for one named operation"""
+
+    __slots__ = ("calls", "failures", "retries", "timeouts", "rejected", "hedges", "hedge_wins",
+                 "latencies", "_p95", "_p95_at")
+
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self._p95 = None
+        self._p95_at = 0
+
+    def observe(self, seconds: float):
+        self.latencies.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        samples = sorted(self.latencies)
+        return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+    def p95(self) -> Optional[float]:
+        # Re-sorting on every hedge decision is wasteful; refresh every 16 samples
+        if self._p95 is None or self.calls - self._p95_at >= 16:
+            self._p95 = self.percentile(95)
+            self._p95_at = self.calls
+        return self._p95
+
+    def summary(self) -> Dict[str, Any]:
+        result = {name: getattr(self, name) for name in
+                  ("calls", "failures", "retries", "timeouts", "rejected", "hedges", "hedge_wins")}
+        for pct in (50, 95, 99):
+            value = self.percentile(pct)
+            result[f"p{pct}_ms"] = round(value * 1000, 2) if value is not None else None
+        return result
+
+
+class ResilientExecutor:
+    """Deadlines, retries, hedging and circuit breaking for query builders"""
+
+    def __init__(self, config: Optional[ResilienceConfig] = None, router: Any = None):
+        self.config = config or ResilienceConfig()
+        # Optional replicas.ReplicaRouter choosing where reads run
+        self.router = router
+        self.breaker = CircuitBreaker(self.config.breaker_failures, self.config.breaker_cooldown_s)
+        self.operations: Dict[str, OperationStats] = {}
+        self.reads = 0
+        self.hedged_reads = 0
+
+    async def read(self, operation: str, query: Any, deadline_s: Optional[float] = None) -> Any:
+        """Execute an idempotent query: retried and optionally hedged"""
+        fn = self.router.reader(query) if self.router is not None else query.execute
+        return await self.call(operation, fn, deadline_s or self.config.read_deadline_s,
+                               retries=self.config.read_retries, hedge=self.config.hedge_reads)
+
+    async def write(self, operation: str, query: Any, deadline_s: Optional[float] = None,
+                    idempotent: bool = False) -> Any:
+        """Execute a write; only ``idempotent`` ones (e.g. updates to absolute values) are retried"""
+        return await self.call(operation, query.execute, deadline_s or self.config.write_deadline_s,
+                               retries=self.config.read_retries if idempotent else 0)
+
+    async def call(self, operation: str, fn: Callable[[], Any], deadline_s: float,
+                   retries: int = 0, hedge: bool = False) -> Any:
+        stats = self.operations.get(operation)
+        if stats is None:
+            stats = self.operations[operation] = OperationStats()
+        stats.calls += 1
+        deadline = time.monotonic() + deadline_s
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                stats.rejected += 1
+                raise DataUnavailable(503, "Database temporarily unavailable", self.breaker.retry_after())
+            # allow() let this call through as the half-open trial
+            trial = self.breaker.state == "half_open"
+            started = time.monotonic()
+            try:
+                remaining = deadline - started
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                if hedge:
+                    result = await asyncio.wait_for(self._hedged(fn, stats), remaining)
+                else:
+                    result = await asyncio.wait_for(asyncio.to_thread(fn), remaining)
+            except Exception as e:
+                if not is_transient(e):
+                    # The database answered (404, constraint violation, ...): it is healthy
+                    self.breaker.success()
+                    raise
+                self.breaker.failure()
+                timed_out = isinstance(e, asyncio.TimeoutError)
+                stats.timeouts += timed_out
+                backoff = random.uniform(0, self.config.backoff_base_s * (2 ** attempt))
+                if attempt < retries and time.monotonic() + backoff < deadline and not timed_out:
+                    attempt += 1
+                    stats.retries += 1
+                    await asyncio.sleep(backoff)
+                    continue
+                stats.failures += 1
+                if timed_out:
+                    raise DataUnavailable(504, f"Database call '{operation}' exceeded its {deadline_s}s deadline")
+                raise DataUnavailable(503, f"Database temporarily unavailable: {e}", 1) from e
+            except BaseException:
+                # Cancelled (client gone, losing hedge, shutdown): no verdict on the database,
+                # but a trial left marked running would keep the breaker from ever closing
+                if trial:
+                    self.breaker.abandon()
+                raise
+            self.breaker.success()
+            stats.observe(time.monotonic() - started)
+            return result
+
+    async def _hedged(self, fn: Callable[[], Any], stats: OperationStats) -> Any:
+        """Start a backup attempt if the first is slower than the operation's p95"""
+        self.reads += 1
+        primary = asyncio.ensure_future(asyncio.to_thread(fn))
+        p95 = stats.p95() if len(stats.latencies) >= self.config.hedge_min_samples else None
+        if p95 is None or self.hedged_reads >= self.config.hedge_budget * self.reads:
+            return await primary
+        done, _ = await asyncio.wait({primary}, timeout=max(p95, self.config.hedge_min_delay_s))
+        if done:
+            return primary.result()
+
+        self.hedged_reads += 1
+        stats.hedges += 1
+        backup = asyncio.ensure_future(asyncio.to_thread(fn))
+        pending = {primary, backup}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    if attempt.exception() is None:
+                        stats.hedge_wins += attempt is backup
+                        return attempt.result()
+                    error = attempt.exception()
+            raise error
+        finally:
+            for attempt in pending:
+                # The losing thread runs to completion; make sure its outcome is consumed
+                attempt.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "breaker": {"state": self.breaker.state, "consecutive_failures": self.breaker.consecutive,
+                        "times_opened": self.breaker.opened},
+            "hedged_reads": self.hedged_reads,
+            "read_routing": self.router.stats() if self.router is not None else None,
+            "operations": {name: stats.summary() for name, stats in sorted(self.operations.items())},
+        }
@@ -1,16 +1,38 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, status
+from fastapi import FastAPI, APIRouter, Depends, Header, HTTPException, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 import os
+import asyncio
 import logging
+import math
+import time
+from contextlib import asynccontextmanager
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
 from typing import List, Optional, Dict, Any
 import uuid
-from datetime import datetime
-from supabase import create_client, Client
+from datetime import date, datetime, timedelta, timezone
 import jwt
+import admission
+import availability
+import batching
+import browse_index
+import changefeed
+import dedup
+import health
+import idempotency
+import jobs
+import leaderboards
+import lifecycle
+import notifications
+import pricing
+import replicas
+import resilience
+import singleflight
+import tracing
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -19,13 +41,135 @@ load_dotenv(ROOT_DIR / '.env')
 SUPABASE_URL = os.environ.get('SUPABASE_URL')
 SUPABASE_ANON_KEY = os.environ.get('SUPABASE_ANON_KEY')
 SUPABASE_SERVICE_ROLE_KEY = os.environ.get('SUPABASE_SERVICE_ROLE_KEY')
+# Optional: when set, bearer tokens are verified as Supabase access tokens (HS256)
+SUPABASE_JWT_SECRET = os.environ.get('SUPABASE_JWT_SECRET')
 
-if not all([SUPABASE_URL, SUPABASE_ANON_KEY, SUPABASE_SERVICE_ROLE_KEY]):
-    raise ValueError("Missing Supabase configuration")
+# "supabase" (default) or "standin" for the local latency-injecting stand-in
+DATA_BACKEND = os.environ.get('SKILLHUB_DATA_BACKEND', 'supabase')
+# Seconds before a PostgREST call is abandoned (supabase-py defaults to 120)
+DB_TIMEOUT_S = float(os.environ.get('SKILLHUB_DB_TIMEOUT_S', 10))
+# Seconds shutdown waits for in-flight requests before closing clients
+DRAIN_TIMEOUT_S = float(os.environ.get('SKILLHUB_DRAIN_TIMEOUT_S', 15))
+# Seconds the active category catalog is served from memory
+CATALOG_TTL_S = float(os.environ.get('SKILLHUB_CATALOG_TTL_S', 300))
+# Posted tasks still without a tasker this many days after their date are closed
+TASK_EXPIRY_GRACE_DAYS = int(os.environ.get('SKILLHUB_TASK_EXPIRY_GRACE_DAYS', 1))
+TASK_EXPIRY_CRON = os.environ.get('SKILLHUB_TASK_EXPIRY_CRON', '*/15 * * * *')
+# Free taskers tried, best rated first, when a booking doesn't name one
+BOOKING_ASSIGN_ATTEMPTS = int(os.environ.get('SKILLHUB_BOOKING_ASSIGN_ATTEMPTS', 5))
 
-# Initialize Supabase clients
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
-supabase_admin: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+# Created by init_clients() when the app starts (see lifespan)
+supabase = None
+supabase_admin = None
+
+def init_clients():
+    """Create the data clients once; raises ValueError on missing configuration"""
+    global supabase, supabase_admin
+    if supabase is not None:
+        return supabase
+
+    if DATA_BACKEND == 'standin':
+        import standin
+
+        # Both clients share one in-memory database
+        supabase = standin.create_client()
+        supabase_admin = supabase
+        read_router.connect(supabase_admin, {
+            f"standin-{i}": standin.create_client(database=supabase.database)
+            for i in range(1, int(os.environ.get('STANDIN_REPLICAS', 0)) + 1)
+        })
+    else:
+        if not all([SUPABASE_URL, SUPABASE_ANON_KEY, SUPABASE_SERVICE_ROLE_KEY]):
+            raise ValueError("Missing Supabase configuration")
+
+        # Imported here so stand-in runs and tooling skip its import cost.
+        # Each client keeps one pooled HTTP/2 session to PostgREST.
+        from supabase import create_client, ClientOptions
+        supabase = create_client(SUPABASE_URL, SUPABASE_ANON_KEY,
+                                 ClientOptions(postgrest_client_timeout=DB_TIMEOUT_S))
+        supabase_admin = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY,
+                                       ClientOptions(postgrest_client_timeout=DB_TIMEOUT_S))
+        # Queries are built on the clients above and sent to a replica's endpoint as is
+        read_router.connect(supabase_admin, {
+            url: create_client(url, SUPABASE_ANON_KEY, ClientOptions(postgrest_client_timeout=DB_TIMEOUT_S))
+            for url in read_router.config.urls
+        })
+    return supabase
+
+def close_clients():
+    """Close the clients' HTTP sessions (the stand-in holds none)"""
+    global supabase, supabase_admin
+    replica_clients = read_router.disconnect()
+    if DATA_BACKEND == 'standin':
+        return
+    for client in (supabase, supabase_admin, *replica_clients):
+        if client is not None:
+            client.postgrest.aclose()
+    supabase = supabase_admin = None
+
+app_lifecycle = lifecycle.Lifecycle()
+
+# Safe reads on read replicas (SKILLHUB_READ_REPLICA_URLS), with read-your-writes pinning
+read_router = replicas.ReplicaRouter(replicas.ReplicaConfig.from_env())
+
+# Deadlines, read retries, optional hedging and circuit breaking for every query
+db = resilience.ResilientExecutor(resilience.ResilienceConfig.from_env(), router=read_router)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create clients, warm connections and caches; drain and flush on shutdown"""
+    app_lifecycle.reset()
+    init_clients()
+
+    # The first probe opens the PostgREST connection and seeds readiness
+    await health_prober.check()
+    # Replicas join the rotation once a lag probe has answered
+    await read_router.check()
+    try:
+        await load_categories()
+    except Exception as e:
+        logger.warning(f"Category catalog warm-up failed: {e}")
+    warm_jwt()
+    await health_prober.start()
+    await read_router.start()
+    if browse_sync:
+        browse_sync.start()
+    if availability_sync:
+        availability_sync.start()
+    if leaderboard_sync:
+        leaderboard_sync.start()
+    if pricing_sync:
+        pricing_sync.start()
+    if duplicate_sync:
+        duplicate_sync.start()
+    job_queue.schedule('expire-stale-tasks', 'tasks.expire', cron=TASK_EXPIRY_CRON)
+    job_queue.schedule('prune-sync-tombstones', 'sync.prune_tombstones', cron=SYNC_PRUNE_CRON)
+    await job_queue.start()
+    if duplicate_sync and DEDUP_BACKFILL:
+        # Once per label, whichever process gets there first
+        job_queue.enqueue('tasks.dedupe_backfill', {"flag": DEDUP_BACKFILL_FLAG},
+                          dedupe_key=f"dedupe-backfill:{DEDUP_BACKFILL}")
+
+    app_lifecycle.ready_at = time.monotonic()
+    logger.info(f"Startup completed in {(app_lifecycle.ready_at - app_lifecycle.started_at) * 1000:.0f}ms")
+    try:
+        yield
+    finally:
+        await app_lifecycle.drain(DRAIN_TIMEOUT_S)
+        await health_prober.stop()
+        await read_router.stop()
+        if browse_sync:
+            await browse_sync.stop()
+        if availability_sync:
+            await availability_sync.stop()
+        if leaderboard_sync:
+            await leaderboard_sync.stop()
+        if pricing_sync:
+            await pricing_sync.stop()
+        if duplicate_sync:
+            await duplicate_sync.stop()
+        await app_lifecycle.run_shutdown_hooks()
+        close_clients()
 
 security = HTTPBearer()
 
@@ -33,7 +177,8 @@ security = HTTPBearer()
 app = FastAPI(
     title="SkillHub API",
     description="API for the SkillHub service marketplace",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Create a router with the /api prefix
@@ -66,13 +211,19 @@ class BookingStatus(str):
     COMPLETED = "completed"
     CANCELLED = "cancelled"
 
+BOOKING_STATUSES = (BookingStatus.PENDING, BookingStatus.CONFIRMED, BookingStatus.IN_PROGRESS,
+                    BookingStatus.COMPLETED, BookingStatus.CANCELLED)
+
 class Booking(BaseModel):
     id: str
     customer_id: str
-    technician_id: Optional[str] = None
+    tasker_id: str
+    task_id: Optional[str] = None
+    category_id: Optional[str] = None
     service_type: str
     description: Optional[str] = None
-    scheduled_at: Optional[datetime] = None
+    starts_at: datetime
+    ends_at: datetime
     status: str = BookingStatus.PENDING
     created_at: datetime
     updated_at: datetime
@@ -81,14 +232,40 @@ class Booking(BaseModel):
 class CreateBooking(BaseModel):
     service_type: str
     description: Optional[str] = None
+    # Start of the slot (required; naive times are UTC)
     scheduled_at: Optional[datetime] = None
     location: Optional[Dict[str, Any]] = None
+    # Without a tasker_id, the best-rated tasker of category_id free for the slot is booked
+    tasker_id: Optional[str] = None
+    category_id: Optional[str] = None
+    task_id: Optional[str] = None
+    duration_minutes: int = Field(60, gt=0, le=24 * 60)
+
+# Authentication
+def decode_access_token(token: str) -> dict:
+    """Verify a Supabase access token and map its claims to the current user"""
+    claims = jwt.decode(
+        token,
+        SUPABASE_JWT_SECRET,
+        algorithms=["HS256"],
+        audience="authenticated",
+    )
+    metadata = claims.get("user_metadata") or {}
+    return {
+        "id": claims["sub"],
+        "email": claims.get("email"),
+        "role": metadata.get("role", "customer")
+    }
+
+def warm_jwt():
+    """Check the JWT secret and warm PyJWT's HMAC path with one round trip"""
+    if SUPABASE_JWT_SECRET:
+        token = jwt.encode({"sub": "warmup", "aud": "authenticated"}, SUPABASE_JWT_SECRET, algorithm="HS256")
+        decode_access_token(token)
 
 # Authentication dependency
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
-        # For now, we'll use a simple token validation
-        # In production, you'd validate the JWT token properly
         token = credentials.credentials
         
         # Simple validation - in production, decode and validate JWT
@@ -97,41 +274,119 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid token"
             )
-            
-        # For demo purposes, extract user ID from token
-        # In production, decode JWT and extract user info
-        return {
-            "id": "demo-user-id",
-            "email": "demo@example.com",
-            "role": "customer"
-        }
+        
+        if SUPABASE_JWT_SECRET:
+            user = decode_access_token(token)
+        else:
+            # For demo purposes, extract user ID from token
+            # Without a JWT secret configured every token maps to the demo user
+            user = {
+                "id": "demo-user-id",
+                "email": "demo@example.com",
+                "role": "customer"
+            }
         
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token"
         )
+    # Writers read from the primary for a while (read-your-writes)
+    read_router.bind_user(user["id"])
+    return user
+
+# Admission control
+# Cheap endpoints probed by load balancers are never limited or queued
+UNMETERED_PATHS = {'/api/', '/api/live', '/api/ready', '/api/health', '/api/metrics'}
+
+rate_limiter = admission.RateLimiter.from_env()
+concurrency_limiter = admission.ConcurrencyLimiter.from_env()
+optional_security = HTTPBearer(auto_error=False)
+
+def rate_limit_identity(request: Request, credentials: Optional[HTTPAuthorizationCredentials]) -> str:
+    """Bucket key for the caller: verified user, demo token, or client address"""
+    if credentials and credentials.credentials:
+        if not SUPABASE_JWT_SECRET:
+            return f"token:{credentials.credentials}"
+        try:
+            return f"user:{decode_access_token(credentials.credentials)['id']}"
+        except Exception:
+            pass
+    return f"addr:{request.client.host if request.client else 'unknown'}"
+
+async def enforce_rate_limit(request: Request,
+                             credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)):
+    """Per-user, per-route token buckets; 429 with Retry-After when exhausted"""
+    route = request.scope.get('route')
+    if rate_limiter is None or route is None or request.url.path in UNMETERED_PATHS:
+        return
+    retry_after = rate_limiter.check(rate_limit_identity(request, credentials), f"{request.method} {route.path}")
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
 
 # Routes
 @api_router.get("/")
 async def root():
     return {"message": "SkillHub API", "version": "1.0.0"}
 
+def probe_database():
+    """Cheapest query that proves the database answers"""
+    supabase.table('profiles').select('id').limit(1).execute()
+
+health_prober = health.HealthProber(probe_database, health.HealthConfig.from_env())
+
+@api_router.get("/live")
+async def liveness():
+    """Liveness: the process and its event loop are responsive"""
+    return {"status": "alive"}
+
+@api_router.get("/ready")
+async def readiness():
+    """Readiness from the cached database probe"""
+    snapshot = health_prober.snapshot()
+    if app_lifecycle.draining:
+        state = "draining"
+    else:
+        state = "ready" if snapshot["ready"] else "not_ready"
+    return JSONResponse(
+        status_code=200 if state == "ready" else 503,
+        content=jsonable_encoder({"status": state, **snapshot}),
+    )
+
 @api_router.get("/health")
 async def health_check():
-    try:
-        # Test Supabase connection
-        response = supabase.table('profiles').select('id').limit(1).execute()
-        supabase_status = "connected"
-    except:
-        supabase_status = "disconnected"
-    
+    snapshot = health_prober.snapshot()
     return {
-        "status": "healthy",
+        "status": "healthy" if snapshot["ready"] else "degraded",
         "timestamp": datetime.utcnow(),
         "services": {
-            "supabase": supabase_status
-        }
+            "supabase": snapshot["database"]
+        },
+        "probe": snapshot
+    }
+
+@api_router.get("/metrics")
+async def get_metrics():
+    """Data-layer, coalescing, admission, batching, notification, index and job counters for this process"""
+    return {
+        "database": db.metrics(),
+        "single_flight": read_flights.stats(),
+        "admission": {
+            **concurrency_limiter.stats(),
+            "rate_limited": rate_limiter.rejected if rate_limiter else 0
+        },
+        "message_batching": message_batcher.stats() if message_batcher else None,
+        "notifications": notifier.stats(),
+        "browse_index": browse_sync.stats() if browse_sync else None,
+        "availability_index": availability_sync.stats() if availability_sync else None,
+        "leaderboards": leaderboard_sync.stats() if leaderboard_sync else None,
+        "pricing": pricing_sync.stats() if pricing_sync else None,
+        "duplicates": duplicate_sync.stats() if duplicate_sync else None,
+        "jobs": job_queue.stats()
     }
 
 @api_router.post("/setup-database")
@@ -162,13 +417,15 @@ async def setup_database():
           total_tasks_completed integer DEFAULT 0,
           average_rating decimal(3,2) DEFAULT 0,
           total_reviews integer DEFAULT 0,
+          rating_sum bigint DEFAULT 0 NOT NULL,
+          rating_histogram integer[] DEFAULT '{0,0,0,0,0}' NOT NULL,
           created_at timestamp with time zone DEFAULT timezone('utc'::text, now()) NOT NULL,
           updated_at timestamp with time zone DEFAULT timezone('utc'::text, now()) NOT NULL
         );
         """
         
         # Execute using service role
-        result = supabase_admin.rpc('exec_sql', {'sql': profiles_sql}).execute()
+        result = await db.write('setup.exec_sql', supabase_admin.rpc('exec_sql', {'sql': profiles_sql}))
         
         return {"message": "Database setup completed", "result": result.data}
     except Exception as e:
@@ -262,105 +519,523 @@ async def get_service_categories():
     ]
     return categories
 
+# Identical concurrent reads of a hot task or profile share one database call
+read_flights = singleflight.SingleFlight()
+
+async def fetch_profile(user_id: str) -> Optional[dict]:
+    """Public profile row (shared by concurrent readers)"""
+    response = await db.read('profiles.get', supabase.table('profiles').select('*').eq('id', user_id))
+    return response.data[0] if response.data else None
+
 @api_router.get("/profiles/{user_id}")
 async def get_profile(user_id: str):
     try:
-        response = supabase.table('profiles').select('*').eq('id', user_id).execute()
-        if response.data:
-            return response.data[0]
+        profile = await read_flights.do(('profile', user_id.lower(), read_router.may_use_replica()),
+                                        lambda: fetch_profile(user_id))
+        if profile:
+            return profile
         else:
             raise HTTPException(status_code=404, detail="Profile not found")
     except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/profiles/{user_id}/reviews")
+async def get_profile_reviews(user_id: str, limit: int = 20, cursor: Optional[str] = None,
+                              rating: Optional[int] = None):
+    """Reviews a user received, newest first; pass ``next_cursor`` back for the next page"""
+    try:
+        limit = max(1, min(limit, 100))
+        query = (supabase.table('reviews')
+                 .select('id, task_id, rating, comment, photos, created_at, '
+                         'reviewer:profiles!reviewer_id (full_name, username, avatar_url)')
+                 .eq('reviewee_id', user_id))
+        if rating is not None:
+            if not 1 <= rating <= 5:
+                raise HTTPException(status_code=400, detail="Rating must be from 1 to 5")
+            query = query.eq('rating', rating)
+        if cursor:
+            # Keyset on idx_reviews_reviewee_page: cost per page doesn't grow with the review count
+            created_at, last_id = notifications.decode_cursor(cursor)
+            query = query.or_(f"created_at.lt.{created_at},and(created_at.eq.{created_at},id.lt.{last_id})")
+
+        result = await db.read('reviews.list', query.order('created_at', desc=True)
+                               .order('id', desc=True).limit(limit + 1))
+        rows = result.data or []
+
+        return {
+            "reviews": rows[:limit],
+            "next_cursor": notifications.encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        }
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/profiles/{user_id}/rating-distribution")
+async def get_rating_distribution(user_id: str):
+    """Rating summary from the profile's running aggregates (no scan of its reviews)"""
+    try:
+        result = await db.read('profiles.rating', supabase.table('profiles')
+                               .select('id, total_reviews, rating_sum, rating_histogram').eq('id', user_id))
+        if not result.data:
+            raise HTTPException(status_code=404, detail="Profile not found")
+
+        profile = result.data[0]
+        count = profile.get('total_reviews') or 0
+        histogram = profile.get('rating_histogram') or [0] * 5
+        return {
+            "user_id": profile['id'],
+            "total_reviews": count,
+            "average_rating": round(profile['rating_sum'] / count, 2) if count else None,
+            "distribution": {str(stars): histogram[stars - 1] for stars in range(1, 6)},
+            "percentages": {str(stars): round(100 * histogram[stars - 1] / count, 1) if count else 0.0
+                            for stars in range(1, 6)}
+        }
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Top taskers per category and city, served from memory (SKILLHUB_LEADERBOARDS)
+leaderboard_sync = leaderboards.LeaderboardSync.from_env(db, lambda: supabase)
+
+async def refresh_leaderboards(tasker_id: Optional[str]):
+    """Re-rank a tasker whose aggregates a trigger just changed (the next delta does it otherwise)"""
+    if leaderboard_sync is None or not tasker_id:
+        return
+    try:
+        result = await db.read('leaderboards.tasker', supabase.table('profiles')
+                               .select(leaderboards.TASKER_SELECT).eq('id', tasker_id))
+        for row in result.data or []:
+            leaderboard_sync.apply(row)
+    except Exception as e:
+        logger.warning(f"Leaderboard refresh for {tasker_id} failed: {e}")
+
+@api_router.get("/leaderboards")
+async def get_leaderboard(category_id: str, city: Optional[str] = None, limit: int = 10):
+    """Best-ranked taskers of a category, in a city or overall"""
+    if leaderboard_sync is None or not leaderboard_sync.ready:
+        raise resilience.DataUnavailable(503, "Leaderboards are not built yet", 1)
+    try:
+        return leaderboard_sync.boards.top(await category_name(category_id), city, limit)
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Bookings: the schema's bookings_no_overlap constraint rejects double bookings
+# (23P01); availability search is served from an in-memory interval index
+# (SKILLHUB_AVAILABILITY_INDEX)
+availability_sync = availability.AvailabilitySync.from_env(db, lambda: supabase)
+
+async def category_name(category_id: str) -> str:
+    """Name of an active category (taskers list category names as skills)"""
+    for category in await load_categories():
+        if str(category['id']) == category_id:
+            return category['name']
+    raise HTTPException(status_code=404, detail="Category not found")
+
+def utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+@api_router.get("/availability")
+async def get_availability(
+    category_id: str,
+    starts_at: datetime,
+    ends_at: datetime,
+    city: Optional[str] = None,
+    state: Optional[str] = None,
+    limit: int = 20,
+    current_user: dict = Depends(get_current_user)
+):
+    """Taskers of a category free over [starts_at, ends_at), best rated first"""
+    if availability_sync is None or not availability_sync.ready:
+        raise resilience.DataUnavailable(503, "Availability index is not loaded yet", 1)
+    if ends_at <= starts_at:
+        raise HTTPException(status_code=400, detail="ends_at must be after starts_at")
+    try:
+        category = await category_name(category_id)
+        return availability_sync.index.free(
+            category, availability.epoch(starts_at), availability.epoch(ends_at),
+            city=city, state=state, limit=max(1, min(limit, 200)))
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.get("/bookings")
-async def get_bookings(current_user: dict = Depends(get_current_user)):
+async def get_bookings(status: Optional[str] = None, limit: int = 50,
+                       current_user: dict = Depends(get_current_user)):
+    """The current user's bookings, as customer or tasker, latest first"""
     try:
-        # For demo, return empty list
-        # In production, query Supabase based on user role
-        return []
+        user_id = current_user["id"]
+        query = supabase.table('bookings').select('*').or_(f"customer_id.eq.{user_id},tasker_id.eq.{user_id}")
+        if status:
+            query = query.eq('status', status)
+        result = await db.read('bookings.list',
+                               query.order('starts_at', desc=True).limit(max(1, min(limit, 200))))
+        return result.data or []
     except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.post("/bookings")
-async def create_booking(booking: CreateBooking, current_user: dict = Depends(get_current_user)):
+async def create_booking(booking: CreateBooking, response: Response, current_user: dict = Depends(get_current_user),
+                         idempotency_key: Optional[str] = Header(None)):
+    """Book a tasker's time slot"""
+    return await run_idempotent(response, idempotency_key, current_user, "/api/bookings",
+                                booking.model_dump(mode='json'), lambda: insert_booking(booking, current_user))
+
+async def insert_booking(booking: CreateBooking, current_user: dict):
+    """Insert a booking for the named tasker, or the first free candidate of the category"""
     try:
-        # For demo, return a mock booking
-        # In production, create booking in Supabase
-        new_booking = {
-            "id": str(uuid.uuid4()),
+        if booking.scheduled_at is None:
+            raise HTTPException(status_code=400, detail="scheduled_at is required")
+        starts_at = utc(booking.scheduled_at)
+        ends_at = starts_at + timedelta(minutes=booking.duration_minutes)
+        if starts_at <= datetime.now(timezone.utc):
+            raise HTTPException(status_code=400, detail="scheduled_at must be in the future")
+        if ends_at <= starts_at:
+            raise HTTPException(status_code=400, detail="duration_minutes must be positive")
+
+        if booking.tasker_id:
+            if booking.tasker_id == current_user["id"]:
+                raise HTTPException(status_code=400, detail="Cannot book yourself")
+            profile = await db.read('bookings.tasker', supabase.table('profiles').select('id, role')
+                                    .eq('id', booking.tasker_id))
+            if not profile.data or profile.data[0].get('role') != 'tasker':
+                raise HTTPException(status_code=400, detail="tasker_id is not a tasker")
+            candidates = [booking.tasker_id]
+        elif booking.category_id:
+            if availability_sync is None or not availability_sync.ready:
+                raise resilience.DataUnavailable(503, "Availability index is not loaded yet", 1)
+            location = booking.location or {}
+            free = availability_sync.index.free(
+                await category_name(booking.category_id),
+                availability.epoch(starts_at), availability.epoch(ends_at),
+                city=location.get('city'), state=location.get('state'),
+                limit=BOOKING_ASSIGN_ATTEMPTS, exclude=[current_user["id"]])
+            candidates = [tasker['id'] for tasker in free]
+        else:
+            raise HTTPException(status_code=400, detail="tasker_id or category_id is required")
+
+        row = {
             "customer_id": current_user["id"],
+            "task_id": booking.task_id,
+            "category_id": booking.category_id,
             "service_type": booking.service_type,
             "description": booking.description,
-            "scheduled_at": booking.scheduled_at,
+            "starts_at": starts_at.isoformat(),
+            "ends_at": ends_at.isoformat(),
             "status": BookingStatus.PENDING,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow(),
             "location": booking.location
         }
-        return new_booking
+        for tasker_id in candidates:
+            try:
+                result = await db.write('bookings.create',
+                                        supabase.table('bookings').insert({**row, "tasker_id": tasker_id}))
+            except Exception as e:
+                # bookings_no_overlap: the slot was taken since the index last saw it
+                if getattr(e, 'code', None) == '23P01':
+                    continue
+                raise
+            if not result.data:
+                raise HTTPException(status_code=500, detail="Failed to create booking")
+            created = result.data[0]
+            if availability_sync:
+                availability_sync.apply_booking(created)
+            notifier.notify(tasker_id, 'task', "New booking",
+                            f"{booking.service_type} on {starts_at:%b %d at %H:%M} UTC",
+                            {"booking_id": created['id']})
+            return created
+
+        raise HTTPException(status_code=409, detail="No tasker is free at that time"
+                            if not booking.tasker_id else "The tasker is already booked at that time")
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.put("/bookings/{booking_id}")
+async def update_booking(booking_id: str, update_data: dict, current_user: dict = Depends(get_current_user)):
+    """Move a booking through its statuses; cancelling frees the slot"""
+    try:
+        new_status = update_data.get('status')
+        if new_status not in BOOKING_STATUSES:
+            raise HTTPException(status_code=400, detail=f"status must be one of {', '.join(BOOKING_STATUSES)}")
+
+        booking_result = await db.read('bookings.get', supabase.table('bookings')
+                                       .select('customer_id, tasker_id, service_type, status').eq('id', booking_id))
+        if not booking_result.data:
+            raise HTTPException(status_code=404, detail="Booking not found")
+
+        booking = booking_result.data[0]
+        user_id = current_user["id"]
+        if user_id not in (booking['customer_id'], booking['tasker_id']):
+            raise HTTPException(status_code=403, detail="Not authorized to update this booking")
+        if booking['status'] == BookingStatus.CANCELLED and new_status != BookingStatus.CANCELLED:
+            # Its slot may be someone else's by now
+            raise HTTPException(status_code=400, detail="Cancelled bookings can't be reopened")
+
+        result = await db.write('bookings.update', supabase.table('bookings').update({
+            'status': new_status,
+            'updated_at': datetime.utcnow().isoformat()
+        }).eq('id', booking_id), idempotent=True)
+
+        if result.data:
+            if availability_sync:
+                availability_sync.apply_booking(result.data[0])
+            if new_status != booking['status']:
+                other = booking['tasker_id'] if user_id == booking['customer_id'] else booking['customer_id']
+                notifier.notify(other, 'task', "Booking updated",
+                                f"{booking['service_type']} is now {new_status.replace('_', ' ')}",
+                                {"booking_id": booking_id})
+            return result.data[0]
+        else:
+            raise HTTPException(status_code=500, detail="Failed to update booking")
     except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
         raise HTTPException(status_code=500, detail=str(e))
 
 # ======================================
 # TASKRABBIT-STYLE API ENDPOINTS
 # ======================================
 
+# Retried POSTs carrying the same Idempotency-Key get the first response back
+idempotency_store = idempotency.IdempotencyStore.from_env()
+
+async def run_idempotent(response: Response, key: Optional[str], current_user: dict, path: str,
+                         payload: dict, create):
+    """Run ``create`` once per (user, path, Idempotency-Key)"""
+    result, replayed = await idempotency_store.run(key, (current_user["id"], path), payload, create)
+    if replayed:
+        response.headers[idempotency.REPLAYED_HEADER] = "true"
+    return result
+
+# Notification fan-out: handlers queue rows, a background writer batches the inserts
+async def write_notification_rows(rows: List[dict]) -> List[dict]:
+    """Insert queued notifications in one statement (ids are preassigned, so retries are safe)"""
+    # Service role: the rows belong to other users, and RLS has no insert policy for them
+    await db.write('notifications.create', supabase_admin.table('notifications').upsert(
+        rows, ignore_duplicates=True, returning='minimal', default_to_null=False), idempotent=True)
+    return rows
+
+notifier = notifications.Notifier.from_env(write_notification_rows)
+app_lifecycle.on_shutdown(notifier.close)
+
+# Durable background jobs (SQLite queue next to the server unless SKILLHUB_JOBS_DB is set);
+# the lifespan opens the file and adds the schedules
+job_queue = jobs.JobQueue(jobs.JobConfig.from_env(str(ROOT_DIR / 'jobs.sqlite3')))
+# Registered after the notifier, so shutdown stops the jobs before it flushes
+app_lifecycle.on_shutdown(job_queue.close)
+
+async def expire_stale_tasks(_payload):
+    """Close posted tasks whose date passed TASK_EXPIRY_GRACE_DAYS ago; notices follow as jobs"""
+    cutoff = (datetime.now(timezone.utc).date() - timedelta(days=TASK_EXPIRY_GRACE_DAYS)).isoformat()
+    result = await db.write('tasks.expire', supabase_admin.table('tasks').update({
+        'status': 'cancelled',
+        'updated_at': datetime.utcnow().isoformat()
+    }).eq('status', 'posted').lt('task_date', cutoff), idempotent=True)
+    for task in result.data or []:
+        job_queue.enqueue('tasks.expired_notice',
+                          {"task_id": task['id'], "customer_id": task['customer_id'], "title": task.get('title')},
+                          dedupe_key=f"expired:{task['id']}")
+        if browse_sync:
+            browse_sync.touch(task['id'])
+    if result.data:
+        logger.info(f"Expired {len(result.data)} posted tasks dated before {cutoff}")
+
+async def send_expired_notices(notices: List[dict]):
+    """One notification insert per batch; ids derive from the task, so a retried batch adds nothing twice"""
+    await write_notification_rows([{
+        "id": str(uuid.uuid5(uuid.NAMESPACE_URL, f"skillhub:task-expired:{notice['task_id']}")),
+        "user_id": notice['customer_id'],
+        "type": 'task',
+        "title": "Task expired",
+        "message": notifications.preview(
+            f"\"{notice.get('title') or 'Your task'}\" passed its date without a tasker and was closed"),
+        "read": False,
+        "data": {"task_id": notice['task_id']},
+    } for notice in notices])
+
+job_queue.register('tasks.expire', expire_stale_tasks, max_attempts=3, timeout_s=120)
+job_queue.register('tasks.expired_notice', send_expired_notices, batch_size=100, concurrency=2)
+
 # Task Management
+def attach_application_counts(tasks: List[dict], applications: List[dict]) -> None:
+    """Set applications_count on each task from its task_applications rows"""
+    app_counts = {}
+    for app in applications:
+        app_counts[app['task_id']] = app_counts.get(app['task_id'], 0) + 1
+    
+    for task in tasks:
+        task['applications_count'] = app_counts.get(task['id'], 0)
+
+# Task list rows: the task with its category and both participants' profiles
+TASK_LIST_SELECT = """
+    *,
+    task_categories (name, slug, icon, color),
+    customer_profile:profiles!customer_id (full_name, username, avatar_url, average_rating, total_reviews),
+    tasker_profile:profiles!tasker_id (full_name, username, avatar_url, average_rating, total_reviews)
+"""
+
+# In-memory columnar index of posted tasks for /api/tasks/browse (SKILLHUB_BROWSE_INDEX)
+browse_sync = browse_index.BrowseIndexSync.from_env(db, lambda: supabase, TASK_LIST_SELECT)
+
+def is_located(q: browse_index.BrowseQuery) -> bool:
+    return q.sort == 'nearest' or q.radius_km is not None
+
+def task_list_query(client, q: browse_index.BrowseQuery, select: str = TASK_LIST_SELECT):
+    """Tasks matching the browse filters of ``q``, in its sort order
+
+    Located queries read tasks_nearby(), which applies the radius and orders
+    by distance in the database; the other filters, sorts and the page apply
+    on top as for the table.
+    """
+    if is_located(q):
+        query = client.rpc('tasks_nearby', {
+            'p_latitude': q.latitude,
+            'p_longitude': q.longitude,
+            'p_radius_km': q.radius_km,
+        }).select(select)
+    else:
+        query = client.table('tasks').select(select)
+    return apply_task_filters(query, q)
+
+def apply_task_filters(query, q: browse_index.BrowseQuery):
+    """Push the browse filters and sort of ``q`` (but the radius, see task_list_query) down to PostgREST"""
+    if q.category_id:
+        query = query.eq('category_id', q.category_id)
+    # Budget ranges overlap the requested one (generated budget_floor/budget_ceiling)
+    if q.budget_min is not None:
+        query = query.gte('budget_ceiling', q.budget_min)
+    if q.budget_max is not None:
+        query = query.lte('budget_floor', q.budget_max)
+    if q.urgency:
+        query = query.in_('urgency', q.urgency)
+    if q.task_size:
+        query = query.in_('task_size', q.task_size)
+    if q.date_from is not None:
+        query = query.gte('task_date', q.date_from.isoformat())
+    if q.date_to is not None:
+        query = query.lte('task_date', q.date_to.isoformat())
+    if q.flexible_date is not None:
+        query = query.eq('flexible_date', q.flexible_date)
+    if q.city:
+        query = query.eq('city', q.city)
+    if q.state:
+        query = query.eq('state', q.state)
+
+    if q.sort == 'nearest':
+        # tasks_nearby() returns its rows nearest first
+        return query
+    if q.sort == 'budget':
+        query = query.order('budget_ceiling', desc=True)
+    elif q.sort == 'soonest':
+        query = query.order('task_date')
+    return query.order('created_at', desc=True).order('id', desc=True)
+
+def apply_role_filter(query, user: dict):
+    """Customers see their own tasks, taskers unassigned ones and their own"""
+    user_role = user.get("role", "customer")
+    if user_role == "customer":
+        query = query.eq('customer_id', user["id"])
+    elif user_role == "tasker":
+        query = query.or_(f"tasker_id.is.null,tasker_id.eq.{user['id']}")
+        # Flagged reposts stay out of the feed
+        query = query.is_('duplicate_of', 'null')
+    return query
+
+def attach_distances(tasks: List[dict], q: browse_index.BrowseQuery):
+    """Set distance_km on each task of a located query"""
+    for task in tasks:
+        task['distance_km'] = round(browse_index.distance_km(q.latitude, q.longitude,
+                                                             float(task['latitude']), float(task['longitude'])), 2)
+
 @api_router.get("/tasks")
 async def get_tasks(
     category_id: Optional[str] = None,
     status: Optional[str] = None,
+    budget_min: Optional[float] = None,
+    budget_max: Optional[float] = None,
+    urgency: Optional[str] = None,
+    task_size: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    flexible_date: Optional[bool] = None,
+    city: Optional[str] = None,
+    state: Optional[str] = None,
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+    radius_km: Optional[float] = None,
+    sort: str = 'newest',
+    limit: Optional[int] = None,
+    offset: int = 0,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get tasks based on user role and filters"""
+    """Get tasks based on user role and filters
+
+    ``urgency`` and ``task_size`` take comma-separated values. Without
+    ``limit`` every matching task is returned (up to 200 otherwise).
+    ``sort=nearest`` and ``radius_km`` need ``latitude``/``longitude``;
+    nearest looks within ``radius_km`` (default 50 km) and adds
+    ``distance_km`` to each task.
+    """
     try:
-        query = supabase.table('tasks').select("""
-            *,
-            task_categories (name, slug, icon, color),
-            customer_profile:profiles!customer_id (full_name, username, avatar_url, average_rating, total_reviews),
-            tasker_profile:profiles!tasker_id (full_name, username, avatar_url, average_rating, total_reviews)
-        """)
-        
-        # Filter by category if specified
-        if category_id:
-            query = query.eq('category_id', category_id)
+        try:
+            browse = browse_index.BrowseQuery(
+                category_id=category_id, budget_min=budget_min, budget_max=budget_max,
+                urgency=browse_index.split_values(urgency), task_size=browse_index.split_values(task_size),
+                date_from=date_from, date_to=date_to, flexible_date=flexible_date, city=city, state=state,
+                latitude=latitude, longitude=longitude, radius_km=radius_km,
+                sort=sort, limit=limit or 1, offset=offset
+            ).validate()
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        query = task_list_query(supabase, browse)
             
         # Filter by status if specified
         if status:
             query = query.eq('status', status)
         
-        # Apply role-based filtering
-        user_role = current_user.get("role", "customer")
-        if user_role == "customer":
-            query = query.eq('customer_id', current_user["id"])
-        elif user_role == "tasker":
-            # Taskers see unassigned tasks or tasks assigned to them
-            query = query.or_(f"tasker_id.is.null,tasker_id.eq.{current_user['id']}")
+        query = apply_role_filter(query, current_user)
+        if limit is not None:
+            query = query.range(browse.offset, browse.offset + browse.limit - 1)
+        elif browse.offset:
+            query = query.offset(browse.offset)
         
-        result = query.order('created_at', {'ascending': False}).execute()
+        result = await db.read('tasks.list', query)
+        tasks = result.data or []
+        if is_located(browse):
+            attach_distances(tasks, browse)
         
-        if result.data:
+        if tasks:
             # Get application counts for each task
-            task_ids = [task['id'] for task in result.data]
-            if task_ids:
-                app_result = supabase.table('task_applications').select('task_id').in_('task_id', task_ids).execute()
-                app_counts = {}
-                if app_result.data:
-                    for app in app_result.data:
-                        app_counts[app['task_id']] = app_counts.get(app['task_id'], 0) + 1
-                
-                # Add application counts
-                for task in result.data:
-                    task['applications_count'] = app_counts.get(task['id'], 0)
+            task_ids = [task['id'] for task in tasks]
+            app_result = await db.read('applications.counts',
+                                       supabase.table('task_applications').select('task_id').in_('task_id', task_ids))
+            attach_application_counts(tasks, app_result.data or [])
         
-        return result.data or []
+        return tasks
     except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.post("/tasks")
-async def create_task(task_data: dict, current_user: dict = Depends(get_current_user)):
+async def create_task(task_data: dict, response: Response, current_user: dict = Depends(get_current_user),
+                      idempotency_key: Optional[str] = Header(None)):
     """Create a new task"""
+    return await run_idempotent(response, idempotency_key, current_user, "/api/tasks", task_data,
+                                lambda: insert_task(task_data, current_user))
+
+async def insert_task(task_data: dict, current_user: dict):
+    """Insert a task owned by the current customer"""
     try:
         # Ensure user is a customer
         if current_user.get("role") != "customer":
@@ -368,41 +1043,177 @@ async def create_task(task_data: dict, current_user: dict = Depends(get_current_
         
         task_data["customer_id"] = current_user["id"]
         task_data["status"] = "posted"
+        task_data.pop("duplicate_of", None)
+        
+        signature = duplicate_sync.signature(task_data) if duplicate_sync and duplicate_sync.ready else None
+        original = await find_duplicate(signature, current_user["id"])
+        if original is not None:
+            if duplicate_sync.config.mode == 'reject':
+                duplicate_sync.rejected += 1
+                raise HTTPException(status_code=409, detail=f"This task repeats open task {original}")
+            task_data["duplicate_of"] = original
+            duplicate_sync.flagged += 1
         
-        result = supabase.table('tasks').insert(task_data).select().execute()
+        result = await db.write('tasks.create', supabase.table('tasks').insert(task_data))
         
         if result.data:
+            if browse_sync:
+                browse_sync.touch(result.data[0]['id'])
+            if signature is not None:
+                duplicate_sync.add(result.data[0], signature)
             return result.data[0]
         else:
             raise HTTPException(status_code=500, detail="Failed to create task")
             
     except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
         raise HTTPException(status_code=500, detail=str(e))
 
+# MinHash/LSH index of recent open tasks for near-duplicate checks on create (SKILLHUB_DEDUP_MODE)
+duplicate_sync = dedup.DuplicateSync.from_env(db, lambda: supabase)
+# Label of a one-off backfill over every posted task (SKILLHUB_DEDUP_BACKFILL); a new label runs it again
+DEDUP_BACKFILL = os.environ.get('SKILLHUB_DEDUP_BACKFILL', '')
+# Backfill sets duplicate_of on the repeats it finds; off, it only logs them
+DEDUP_BACKFILL_FLAG = os.environ.get('SKILLHUB_DEDUP_BACKFILL_FLAG', '1').lower() not in ('0', 'false', 'off', 'no')
+
+async def find_duplicate(signature, customer_id: str) -> Optional[str]:
+    """Id of the most similar indexed task that is still open, if the signature repeats one"""
+    if signature is None:
+        return None
+    matches = duplicate_sync.matches(signature, customer_id)
+    if not matches:
+        return None
+    # The index trails assignments and cancellations: only an open original counts
+    result = await db.read('tasks.duplicate_check', supabase.table('tasks').select('id')
+                           .in_('id', [task_id for task_id, _ in matches]).eq('status', 'posted'))
+    open_ids = {row['id'] for row in result.data or []}
+    for task_id, _ in matches:
+        if task_id in open_ids:
+            return task_id
+        duplicate_sync.index.remove(task_id)
+    return None
+
+async def flag_duplicate(task_id: str, original_id: str):
+    await db.write('tasks.flag_duplicate', supabase_admin.table('tasks').update({
+        'duplicate_of': original_id,
+        'updated_at': datetime.utcnow().isoformat()
+    }).eq('id', task_id), idempotent=True)
+    if browse_sync:
+        browse_sync.touch(task_id)
+
+async def backfill_duplicates(payload):
+    """Check every posted task against earlier ones (the batch counterpart of the create check)"""
+    if duplicate_sync is None:
+        return
+    await duplicate_sync.backfill(flag_duplicate if (payload or {}).get('flag', True) else None)
+
+job_queue.register('tasks.dedupe_backfill', backfill_duplicates, max_attempts=1, timeout_s=3600)
+
+# Budget bands from completed tasks' final prices, served from memory (SKILLHUB_PRICING)
+pricing_sync = pricing.PricingSync.from_env(db, lambda: supabase)
+
+@api_router.get("/pricing/suggest")
+async def suggest_budget(category: str, task_size: Optional[str] = None, city: Optional[str] = None):
+    """Percentile bands of what similar tasks sold for, and a budget range to suggest"""
+    if pricing_sync is None or not pricing_sync.ready:
+        raise resilience.DataUnavailable(503, "Pricing tables are not loaded yet", 1)
+    if task_size is not None and task_size not in browse_index.TASK_SIZES:
+        raise HTTPException(status_code=400, detail=f"task_size must be one of {', '.join(browse_index.TASK_SIZES)}")
+    try:
+        # A category id, slug or name
+        category_id = next((str(c['id']) for c in await load_categories()
+                            if category in (str(c['id']), c.get('slug'), c.get('name'))), category)
+        band = pricing_sync.tables.suggest(category_id, task_size, city)
+        if band is None:
+            raise HTTPException(status_code=404, detail="Not enough completed tasks to suggest a budget")
+        return {
+            "category_id": category_id,
+            "task_size": task_size,
+            "city": city,
+            **band,
+            "suggested_budget": {"budget_min": band["price"]["p25"], "budget_max": band["price"]["p75"]}
+        }
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/tasks/browse")
+async def browse_tasks(
+    category_id: Optional[str] = None,
+    budget_min: Optional[float] = None,
+    budget_max: Optional[float] = None,
+    urgency: Optional[str] = None,
+    task_size: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    flexible_date: Optional[bool] = None,
+    city: Optional[str] = None,
+    state: Optional[str] = None,
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+    radius_km: Optional[float] = None,
+    sort: str = 'newest',
+    limit: int = 50,
+    offset: int = 0,
+    current_user: dict = Depends(get_current_user)
+):
+    """Posted tasks matching the filters, served from the in-memory browse index"""
+    if browse_sync is None or not browse_sync.ready:
+        raise resilience.DataUnavailable(503, "Task browse index is not loaded yet", 1)
+    try:
+        query = browse_index.BrowseQuery(
+            category_id=category_id, budget_min=budget_min, budget_max=budget_max,
+            urgency=browse_index.split_values(urgency), task_size=browse_index.split_values(task_size),
+            date_from=date_from, date_to=date_to, flexible_date=flexible_date, city=city, state=state,
+            latitude=latitude, longitude=longitude, radius_km=radius_km,
+            sort=sort, limit=limit, offset=offset
+        ).validate()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    index = browse_sync.index
+    rows, total = index.query(query)
+    # Rows are stored serialized: skip response-model validation and re-encoding
+    return Response(index.render(rows), media_type="application/json", headers={"X-Total-Count": str(total)})
+
+async def fetch_task_detail(task_id: str):
+    """Task row with embeds and its applications (shared by concurrent readers)"""
+    result = await db.read('tasks.get', supabase.table('tasks').select("""
+        *,
+        task_categories (name, slug, icon, color),
+        customer_profile:profiles!customer_id (full_name, username, avatar_url, average_rating, total_reviews),
+        tasker_profile:profiles!tasker_id (full_name, username, avatar_url, average_rating, total_reviews)
+    """).eq('id', task_id))
+    
+    if not result.data:
+        return None
+    
+    # Get applications for this task
+    app_result = await db.read('applications.for_task', supabase.table('task_applications').select("""
+        *,
+        tasker_profile:profiles!tasker_id (full_name, username, avatar_url, average_rating, total_reviews, hourly_rate, bio, skills)
+    """).eq('task_id', task_id))
+    
+    return result.data[0], app_result.data or []
+
 @api_router.get("/tasks/{task_id}")
 async def get_task(task_id: str, current_user: dict = Depends(get_current_user)):
     """Get a specific task with detailed information"""
     try:
-        result = supabase.table('tasks').select("""
-            *,
-            task_categories (name, slug, icon, color),
-            customer_profile:profiles!customer_id (full_name, username, avatar_url, average_rating, total_reviews),
-            tasker_profile:profiles!tasker_id (full_name, username, avatar_url, average_rating, total_reviews)
-        """).eq('id', task_id).execute()
+        detail = await read_flights.do(('task', task_id.lower(), read_router.may_use_replica()),
+                                       lambda: fetch_task_detail(task_id))
         
-        if not result.data:
+        if detail is None:
             raise HTTPException(status_code=404, detail="Task not found")
             
-        task = result.data[0]
-        
-        # Get applications for this task
-        app_result = supabase.table('task_applications').select("""
-            *,
-            tasker_profile:profiles!tasker_id (full_name, username, avatar_url, average_rating, total_reviews, hourly_rate, bio, skills)
-        """).eq('task_id', task_id).execute()
+        row, applications = detail
         
-        task['applications'] = app_result.data or []
-        task['applications_count'] = len(task['applications'])
+        # The fetched rows are shared with concurrent callers: build a new dict
+        task = dict(row)
+        task['applications'] = list(applications)
+        task['applications_count'] = len(applications)
         
         return task
     except Exception as e:
@@ -415,7 +1226,8 @@ async def update_task(task_id: str, update_data: dict, current_user: dict = Depe
     """Update a task"""
     try:
         # Check if user owns the task or is assigned to it
-        task_result = supabase.table('tasks').select('customer_id, tasker_id').eq('id', task_id).execute()
+        task_result = await db.read('tasks.participants',
+                                    supabase.table('tasks').select('customer_id, tasker_id').eq('id', task_id))
         
         if not task_result.data:
             raise HTTPException(status_code=404, detail="Task not found")
@@ -427,10 +1239,19 @@ async def update_task(task_id: str, update_data: dict, current_user: dict = Depe
             raise HTTPException(status_code=403, detail="Not authorized to update this task")
         
         update_data["updated_at"] = datetime.utcnow().isoformat()
+        if update_data.get('status') == 'completed':
+            # Dates the task's final_price for budget suggestions
+            update_data.setdefault('completed_at', update_data["updated_at"])
         
-        result = supabase.table('tasks').update(update_data).eq('id', task_id).select().execute()
+        result = await db.write('tasks.update', supabase.table('tasks').update(update_data).eq('id', task_id),
+                                idempotent=True)
         
         if result.data:
+            if browse_sync:
+                browse_sync.touch(task_id)
+            if update_data.get('status') == 'completed':
+                # update_stats_on_task_completion counted it for the tasker
+                await refresh_leaderboards(result.data[0].get('tasker_id'))
             return result.data[0]
         else:
             raise HTTPException(status_code=500, detail="Failed to update task")
@@ -446,7 +1267,7 @@ async def get_task_applications(task_id: str, current_user: dict = Depends(get_c
     """Get applications for a specific task"""
     try:
         # Check if user owns the task
-        task_result = supabase.table('tasks').select('customer_id').eq('id', task_id).execute()
+        task_result = await db.read('tasks.owner', supabase.table('tasks').select('customer_id').eq('id', task_id))
         
         if not task_result.data:
             raise HTTPException(status_code=404, detail="Task not found")
@@ -454,10 +1275,10 @@ async def get_task_applications(task_id: str, current_user: dict = Depends(get_c
         if task_result.data[0]['customer_id'] != current_user["id"]:
             raise HTTPException(status_code=403, detail="Not authorized to view applications")
         
-        result = supabase.table('task_applications').select("""
+        result = await db.read('applications.for_task', supabase.table('task_applications').select("""
             *,
             tasker_profile:profiles!tasker_id (full_name, username, avatar_url, average_rating, total_reviews, hourly_rate, bio, skills)
-        """).eq('task_id', task_id).execute()
+        """).eq('task_id', task_id))
         
         return result.data or []
     except Exception as e:
@@ -466,15 +1287,23 @@ async def get_task_applications(task_id: str, current_user: dict = Depends(get_c
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.post("/tasks/{task_id}/applications")
-async def apply_to_task(task_id: str, application_data: dict, current_user: dict = Depends(get_current_user)):
+async def apply_to_task(task_id: str, application_data: dict, response: Response,
+                        current_user: dict = Depends(get_current_user),
+                        idempotency_key: Optional[str] = Header(None)):
     """Apply to a task"""
+    return await run_idempotent(response, idempotency_key, current_user, f"/api/tasks/{task_id}/applications",
+                                application_data, lambda: insert_application(task_id, application_data, current_user))
+
+async def insert_application(task_id: str, application_data: dict, current_user: dict):
+    """Insert a pending application by the current tasker"""
     try:
         # Ensure user is a tasker
         if current_user.get("role") != "tasker":
             raise HTTPException(status_code=403, detail="Only taskers can apply to tasks")
         
         # Check if task exists and is available
-        task_result = supabase.table('tasks').select('status, customer_id').eq('id', task_id).execute()
+        task_result = await db.read('tasks.status',
+                                    supabase.table('tasks').select('status, customer_id, title').eq('id', task_id))
         
         if not task_result.data:
             raise HTTPException(status_code=404, detail="Task not found")
@@ -490,9 +1319,15 @@ async def apply_to_task(task_id: str, application_data: dict, current_user: dict
         application_data["tasker_id"] = current_user["id"]
         application_data["status"] = "pending"
         
-        result = supabase.table('task_applications').insert(application_data).select().execute()
+        result = await db.write('applications.create',
+                                supabase.table('task_applications').insert(application_data))
         
         if result.data:
+            if browse_sync:
+                browse_sync.touch(task_id)
+            notifier.notify(task['customer_id'], 'application', "New application",
+                            f"A tasker applied to \"{task.get('title') or 'your task'}\"",
+                            {"task_id": task_id, "application_id": result.data[0]['id']})
             return result.data[0]
         else:
             raise HTTPException(status_code=500, detail="Failed to create application")
@@ -500,6 +1335,9 @@ async def apply_to_task(task_id: str, application_data: dict, current_user: dict
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
+        # UNIQUE (task_id, tasker_id): a retried or repeated application
+        if getattr(e, 'code', None) == '23505':
+            raise HTTPException(status_code=409, detail="You have already applied to this task")
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.put("/applications/{application_id}")
@@ -507,10 +1345,10 @@ async def update_application(application_id: str, update_data: dict, current_use
     """Update an application status (accept/reject)"""
     try:
         # Get application details
-        app_result = supabase.table('task_applications').select("""
+        app_result = await db.read('applications.get', supabase.table('task_applications').select("""
             *,
-            task:tasks!task_id (customer_id, tasker_id)
-        """).eq('id', application_id).execute()
+            task:tasks!task_id (customer_id, tasker_id, title)
+        """).eq('id', application_id))
         
         if not app_result.data:
             raise HTTPException(status_code=404, detail="Application not found")
@@ -525,17 +1363,26 @@ async def update_application(application_id: str, update_data: dict, current_use
         # If accepting an application, assign the tasker to the task
         if update_data.get('status') == 'accepted' and application['task']['customer_id'] == user_id:
             # Update task to assign tasker
-            supabase.table('tasks').update({
+            await db.write('tasks.assign', supabase.table('tasks').update({
                 'tasker_id': application['tasker_id'],
                 'status': 'assigned',
                 'updated_at': datetime.utcnow().isoformat()
-            }).eq('id', application['task_id']).execute()
+            }).eq('id', application['task_id']), idempotent=True)
+            if browse_sync:
+                browse_sync.touch(application['task_id'])
         
         update_data["updated_at"] = datetime.utcnow().isoformat()
         
-        result = supabase.table('task_applications').update(update_data).eq('id', application_id).select().execute()
+        result = await db.write('applications.update',
+                                supabase.table('task_applications').update(update_data).eq('id', application_id),
+                                idempotent=True)
         
         if result.data:
+            if (update_data.get('status') == 'accepted' and application['status'] != 'accepted'
+                    and application['task']['customer_id'] == user_id):
+                notifier.notify(application['tasker_id'], 'application', "Application accepted",
+                                f"You were hired for \"{application['task'].get('title') or 'a task'}\"",
+                                {"task_id": application['task_id'], "application_id": application_id})
             return result.data[0]
         else:
             raise HTTPException(status_code=500, detail="Failed to update application")
@@ -551,7 +1398,8 @@ async def get_task_messages(task_id: str, current_user: dict = Depends(get_curre
     """Get messages for a specific task"""
     try:
         # Check if user has access to this task
-        task_result = supabase.table('tasks').select('customer_id, tasker_id').eq('id', task_id).execute()
+        task_result = await db.read('tasks.participants',
+                                    supabase.table('tasks').select('customer_id, tasker_id').eq('id', task_id))
         
         if not task_result.data:
             raise HTTPException(status_code=404, detail="Task not found")
@@ -562,15 +1410,15 @@ async def get_task_messages(task_id: str, current_user: dict = Depends(get_curre
         if task['customer_id'] != user_id and task.get('tasker_id') != user_id:
             raise HTTPException(status_code=403, detail="Not authorized to view messages")
         
-        result = supabase.table('messages').select("""
+        result = await db.read('messages.for_task', supabase.table('messages').select("""
             *,
             sender_profile:profiles!sender_id (full_name, username, avatar_url)
-        """).eq('task_id', task_id).order('created_at').execute()
+        """).eq('task_id', task_id).order('created_at'))
         
         # Mark messages as read
-        supabase.table('messages').update({
+        await db.write('messages.mark_read', supabase.table('messages').update({
             'read_at': datetime.utcnow().isoformat()
-        }).eq('task_id', task_id).eq('receiver_id', user_id).is_('read_at', 'null').execute()
+        }).eq('task_id', task_id).eq('receiver_id', user_id).is_('read_at', 'null'), idempotent=True)
         
         return result.data or []
     except Exception as e:
@@ -578,12 +1426,48 @@ async def get_task_messages(task_id: str, current_user: dict = Depends(get_curre
             raise e
         raise HTTPException(status_code=500, detail=str(e))
 
+async def write_message_rows(rows: List[dict]) -> List[dict]:
+    """Insert messages with one multi-row statement; returns them with sender profiles, in order"""
+    # now() is per transaction, so rows of one insert would tie on created_at; stamp them in order
+    stamp = datetime.now(timezone.utc)
+    for offset, row in enumerate(rows):
+        row.setdefault("created_at", (stamp + timedelta(microseconds=offset)).isoformat())
+    # Rows may carry different optional keys: let omitted ones take their column defaults
+    result = await db.write('messages.create_batch',
+                            supabase.table('messages').insert(rows, default_to_null=False))
+    ids = [row['id'] for row in result.data]
+    try:
+        embedded = await db.read('messages.get_batch', supabase.table('messages').select("""
+            *,
+            sender_profile:profiles!sender_id (full_name, username, avatar_url)
+        """).in_('id', ids))
+    except Exception as e:
+        # The messages are stored: answer without sender profiles rather than fail
+        # (a failed batch would make its senders retry and post them twice)
+        logger.warning(f"Sender profiles of {len(ids)} new messages not loaded: {e}")
+        return result.data
+    by_id = {message['id']: message for message in embedded.data}
+    return [by_id.get(row['id'], row) for row in result.data]
+
+# Optional micro-batching of message inserts (SKILLHUB_MESSAGE_BATCHING)
+message_batcher = batching.BatchWriter.from_env(write_message_rows)
+if message_batcher:
+    app_lifecycle.on_shutdown(message_batcher.close)
+
 @api_router.post("/tasks/{task_id}/messages")
-async def send_message(task_id: str, message_data: dict, current_user: dict = Depends(get_current_user)):
+async def send_message(task_id: str, message_data: dict, response: Response,
+                       current_user: dict = Depends(get_current_user),
+                       idempotency_key: Optional[str] = Header(None)):
     """Send a message for a specific task"""
+    return await run_idempotent(response, idempotency_key, current_user, f"/api/tasks/{task_id}/messages",
+                                message_data, lambda: insert_message(task_id, message_data, current_user))
+
+async def insert_message(task_id: str, message_data: dict, current_user: dict):
+    """Insert a message from the current user to the other task participant"""
     try:
         # Check if user has access to this task
-        task_result = supabase.table('tasks').select('customer_id, tasker_id').eq('id', task_id).execute()
+        task_result = await db.read('tasks.participants',
+                                    supabase.table('tasks').select('customer_id, tasker_id').eq('id', task_id))
         
         if not task_result.data:
             raise HTTPException(status_code=404, detail="Task not found")
@@ -607,16 +1491,151 @@ async def send_message(task_id: str, message_data: dict, current_user: dict = De
             "message_type": message_data.get("message_type", "text")
         })
         
-        result = supabase.table('messages').insert(message_data).select("""
-            *,
-            sender_profile:profiles!sender_id (full_name, username, avatar_url)
-        """).execute()
+        if message_batcher:
+            message = await message_batcher.submit(message_data)
+        else:
+            result = await db.write('messages.create', supabase.table('messages').insert(message_data))
+            if not result.data:
+                raise HTTPException(status_code=500, detail="Failed to send message")
+            # Inserts can't embed, so re-read the row with the sender profile
+            embedded = await db.read('messages.get', supabase.table('messages').select("""
+                *,
+                sender_profile:profiles!sender_id (full_name, username, avatar_url)
+            """).eq('id', result.data[0]['id']))
+            message = embedded.data[0] if embedded.data else result.data[0]
+
+        notifier.notify(receiver_id, 'message', "New message", message.get('content'),
+                        {"task_id": task_id, "message_id": message['id']})
+        return message
+            
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/me/unread")
+async def get_unread_message_counts(current_user: dict = Depends(get_current_user)):
+    """Unread messages per task for the current user, without marking anything read"""
+    try:
+        # One grouped scan of the unread-only partial index; service role, as the function takes any user id
+        result = await db.read('messages.unread_counts', supabase_admin.rpc('unread_message_counts', {
+            'p_user_id': current_user["id"]
+        }))
+        tasks = {row['task_id']: row['unread'] for row in result.data or []}
+        return {"total": sum(tasks.values()), "tasks": tasks}
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Reviews
+@api_router.post("/tasks/{task_id}/reviews")
+async def create_review(task_id: str, review_data: dict, current_user: dict = Depends(get_current_user)):
+    """Review the other participant of a completed task"""
+    try:
+        rating = review_data.get("rating")
+        if not isinstance(rating, int) or isinstance(rating, bool) or not 1 <= rating <= 5:
+            raise HTTPException(status_code=400, detail="Rating must be an integer from 1 to 5")
+
+        task_result = await db.read('tasks.review_target', supabase.table('tasks')
+                                    .select('customer_id, tasker_id, status, title').eq('id', task_id))
+        
+        if not task_result.data:
+            raise HTTPException(status_code=404, detail="Task not found")
+            
+        task = task_result.data[0]
+        user_id = current_user["id"]
+        
+        if task['customer_id'] != user_id and task.get('tasker_id') != user_id:
+            raise HTTPException(status_code=403, detail="Not authorized to review this task")
+        if task['status'] != 'completed':
+            raise HTTPException(status_code=400, detail="Only completed tasks can be reviewed")
+        
+        reviewee_id = task['tasker_id'] if task['customer_id'] == user_id else task['customer_id']
+        review = {
+            "task_id": task_id,
+            "reviewer_id": user_id,
+            "reviewee_id": reviewee_id,
+            "rating": rating,
+            "comment": review_data.get("comment"),
+            "photos": review_data.get("photos")
+        }
+        
+        result = await db.write('reviews.create', supabase.table('reviews').insert(review))
         
         if result.data:
+            if reviewee_id == task['tasker_id']:
+                # The rating aggregates triggers re-rated the tasker
+                await refresh_leaderboards(reviewee_id)
+            notifier.notify(reviewee_id, 'review', "New review",
+                            f"You got {rating} star{'s' if rating != 1 else ''} for \"{task.get('title') or 'a task'}\"",
+                            {"task_id": task_id, "review_id": result.data[0]['id']})
             return result.data[0]
         else:
-            raise HTTPException(status_code=500, detail="Failed to send message")
+            raise HTTPException(status_code=500, detail="Failed to create review")
             
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
+        # UNIQUE (task_id, reviewer_id)
+        if getattr(e, 'code', None) == '23505':
+            raise HTTPException(status_code=409, detail="You have already reviewed this task")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Notifications
+# Read with the service role: the server has no per-user RLS context
+@api_router.get("/notifications")
+async def get_notifications(
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    unread_only: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    """Current user's notifications, newest first; pass ``next_cursor`` back for the next page"""
+    try:
+        limit = max(1, min(limit, 100))
+        query = supabase_admin.table('notifications').select('*').eq('user_id', current_user["id"])
+        if unread_only:
+            query = query.eq('read', False)
+        if cursor:
+            # Keyset: rows strictly after the last one seen in (created_at, id) DESC order
+            created_at, last_id = notifications.decode_cursor(cursor)
+            query = query.or_(f"created_at.lt.{created_at},and(created_at.eq.{created_at},id.lt.{last_id})")
+        
+        # One extra row tells whether there is a next page
+        result = await db.read('notifications.list', query.order('created_at', desc=True)
+                               .order('id', desc=True).limit(limit + 1))
+        rows = result.data or []
+        
+        return {
+            "notifications": rows[:limit],
+            "next_cursor": notifications.encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        }
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/notifications/unread-count")
+async def get_unread_notification_count(current_user: dict = Depends(get_current_user)):
+    """Unread notifications of the current user, from the trigger-maintained counter"""
+    try:
+        result = await db.read('notifications.unread', supabase_admin.table('notification_counters')
+                               .select('unread').eq('user_id', current_user["id"]))
+        return {"unread": result.data[0]['unread'] if result.data else 0}
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.post("/notifications/read-all")
+async def mark_all_notifications_read(current_user: dict = Depends(get_current_user)):
+    """Mark every unread notification of the current user read, in one statement"""
+    try:
+        await db.write('notifications.read_all', supabase_admin.table('notifications')
+                       .update({'read': True}, returning='minimal')
+                       .eq('user_id', current_user["id"]).eq('read', False), idempotent=True)
+        return {"success": True, "unread": 0}
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
@@ -627,7 +1646,8 @@ async def send_message(task_id: str, message_data: dict, current_user: dict = De
 async def get_current_profile(current_user: dict = Depends(get_current_user)):
     """Get current user's profile"""
     try:
-        result = supabase.table('profiles').select('*').eq('id', current_user["id"]).execute()
+        result = await db.read('profiles.me',
+                               supabase.table('profiles').select('*').eq('id', current_user["id"]))
         
         if result.data:
             return result.data[0]
@@ -644,27 +1664,128 @@ async def update_profile(profile_data: dict, current_user: dict = Depends(get_cu
     try:
         profile_data["updated_at"] = datetime.utcnow().isoformat()
         
-        result = supabase.table('profiles').update(profile_data).eq('id', current_user["id"]).select().execute()
+        result = await db.write('profiles.update',
+                                supabase.table('profiles').update(profile_data).eq('id', current_user["id"]),
+                                idempotent=True)
         
         if result.data:
+            if availability_sync:
+                availability_sync.apply_tasker(result.data[0])
+            if leaderboard_sync:
+                leaderboard_sync.apply(result.data[0])
             return result.data[0]
         else:
             raise HTTPException(status_code=500, detail="Failed to update profile")
     except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
         raise HTTPException(status_code=500, detail=str(e))
 
 # Task Categories
+catalog_cache: Dict[str, Any] = {"categories": None, "expires": 0.0}
+
+async def load_categories() -> List[dict]:
+    """Active task categories, cached for CATALOG_TTL_S"""
+    now = time.monotonic()
+    if catalog_cache["categories"] is None or now >= catalog_cache["expires"]:
+        result = await db.read('categories.list',
+                               supabase.table('task_categories').select('*').eq('is_active', True).order('sort_order'))
+        catalog_cache["categories"] = result.data or []
+        catalog_cache["expires"] = now + CATALOG_TTL_S
+    return catalog_cache["categories"]
+
 @api_router.get("/categories")
 async def get_categories():
     """Get all active task categories"""
     try:
-        result = supabase.table('task_categories').select('*').eq('is_active', True).order('sort_order').execute()
-        return result.data or []
+        return await load_categories()
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Offline sync: what changed for the caller since a token (change_log, see backend/changefeed.py)
+sync_config = changefeed.SyncConfig.from_env()
+SYNC_PRUNE_CRON = os.environ.get('SKILLHUB_SYNC_PRUNE_CRON', '17 3 * * *')
+# Log entity -> (table, select); rows come back in the shape of the matching list endpoints
+SYNC_SOURCES = {
+    'task': ('tasks', TASK_LIST_SELECT),
+    'application': ('task_applications', """
+        *,
+        tasker_profile:profiles!tasker_id (full_name, username, avatar_url, average_rating, total_reviews, hourly_rate, bio, skills)
+    """),
+    'message': ('messages', """
+        *,
+        sender_profile:profiles!sender_id (full_name, username, avatar_url)
+    """),
+    'category': ('task_categories', '*'),
+    'profile': ('profiles', '*'),
+}
+
+async def fetch_synced(entity: str, ids: List[str]) -> List[dict]:
+    """Current rows of one entity named by the log (the log already limits them to the caller's)"""
+    table, select = SYNC_SOURCES[entity]
+    query = supabase_admin.table(table).select(select).in_('id', ids)
+    if entity == 'category':
+        # A deactivated category comes back as a tombstone
+        query = query.eq('is_active', True)
+    result = await db.read(f'sync.{entity}', query)
+    rows = result.data or []
+    if entity == 'task' and rows:
+        app_result = await db.read('applications.counts', supabase_admin.table('task_applications')
+                                   .select('task_id').in_('task_id', [row['id'] for row in rows]))
+        attach_application_counts(rows, app_result.data or [])
+    return rows
+
+@api_router.get("/sync")
+async def sync_changes(since: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    """Tasks, applications, messages, categories and own profile changed since a sync token
+
+    Without ``since``, everything the caller can see. Changed rows come per
+    entity, deletions as ids under ``deleted``; pass ``token`` back as
+    ``since`` next time, at once while ``more`` is set. ``reset`` means the
+    token was too old to resume from: replace the local copy with this sync.
+    """
+    try:
+        after, issued, reset = changefeed.start(since, sync_config)
+        result = await db.read('sync.log', supabase_admin.rpc('sync_log', {
+            'p_audience': [current_user["id"], changefeed.NIL_AUDIENCE],
+            'p_after_xact': after[0],
+            'p_after_seq': after[1],
+            'p_limit': sync_config.page_size,
+        }))
+        log = result.data or []
+        changed, deleted = changefeed.changed_ids(log)
+        fetched = await asyncio.gather(*(fetch_synced(entity, ids) for entity, ids in changed.items()))
+        body = changefeed.assemble(changed, deleted, dict(zip(changed, fetched)))
+        token, more = changefeed.next_token(log, after, issued, len(log) >= sync_config.page_size)
+        return {"token": token, "more": more, "reset": reset, **body}
     except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
         raise HTTPException(status_code=500, detail=str(e))
 
+async def prune_sync_tombstones(_payload):
+    """Drop tombstones older than tokens are honoured for (older tokens resync from scratch)"""
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=sync_config.tombstone_days)).isoformat()
+    await db.write('sync.prune', supabase_admin.table('change_log').delete(returning='minimal')
+                   .eq('deleted', True).lt('changed_at', cutoff), idempotent=True)
+
+job_queue.register('sync.prune_tombstones', prune_sync_tombstones, max_attempts=3, timeout_s=300)
+
 # Include the router in the main app
-app.include_router(api_router)
+app.include_router(api_router, dependencies=[Depends(enforce_rate_limit)])
+
+# Sanitized request traces for perf/replay.py (enabled by SKILLHUB_TRACE_FILE)
+trace_writer = tracing.install(app)
+if trace_writer:
+    app_lifecycle.on_shutdown(trace_writer.close)
+
+# Per-request read routing state (primary or replica, read-your-writes pins)
+app.add_middleware(replicas.ReadRoutingMiddleware, router=read_router)
+
+# Bounded concurrency with early shedding for database-bound requests
+app.add_middleware(admission.AdmissionMiddleware, limiter=concurrency_limiter, exempt=UNMETERED_PATHS)
 
 app.add_middleware(
     CORSMiddleware,
@@ -672,8 +1793,12 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Idempotent-Replayed", "Retry-After", "X-Total-Count"],
 )
 
+# Outermost: counts every request so shutdown can drain them
+app.add_middleware(lifecycle.InFlightMiddleware, lifecycle=app_lifecycle)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -0,0 +1,48 @@
+"""
+Single-flight coalescing of identical concurrent reads.
+
+When many requests ask for the same row at once (a task going viral), only
+the first one runs the query; the others await its result.
+
+Keys must capture everything that changes what the database returns. The
+server queries with its own key (no per-user RLS context), so a task or
+profile read returns the same rows for every caller and authorization stays
+with each caller's dependencies. A read that runs under a caller's token
+would have to put that user into the key.
+
+Results are shared objects: callers copy before adding per-response fields.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """At most one in-flight call per key; concurrent callers share its outcome"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.executed = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Await ``fn()`` unless an identical call is in flight, then share its result"""
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self._calls[key] = future
+            future.add_done_callback(lambda f: self._forget(key, f))
+            self.executed += 1
+        else:
+            self.shared += 1
+        # A caller that disconnects must not cancel the call the others wait on
+        return await asyncio.shield(future)
+
+    def _forget(self, key: Hashable, future: asyncio.Future):
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        if not future.cancelled():
+            future.exception()
+
+    def stats(self) -> Dict[str, int]:
+        return {"executed": self.executed, "shared": self.shared, "in_flight": len(self._calls)}
@@ -0,0 +1,1119 @@
+"""
+Local stand-in for Supabase/PostgREST.
+
+Implements the subset of the supabase-py query builder that server.py uses
+(select with embeds, eq/neq/gt/gte/lt/lte/like/ilike/is_/in_/or_, order,
+limit/range, insert/update/delete returning rows, rpc) on top of an in-memory
+SQLite database whose tables are read from supabase_schema.sql. Schema
+triggers and functions the backend depends on are mirrored in
+``SCHEMA_TRIGGERS``, ``SCHEMA_FUNCTIONS`` and, for functions returning table
+rows that the request filters and embeds, ``SCHEMA_TABLE_FUNCTIONS``.
+
+Every call can be slowed down or failed on purpose so performance work can be
+measured reproducibly without a Supabase project:
+
+    SKILLHUB_DATA_BACKEND=standin STANDIN_LATENCY_MS=8 STANDIN_JITTER_MS=4 \\
+        STANDIN_ERROR_RATE=0.01 uvicorn server:app
+
+Like the real client, ``execute()`` is synchronous and blocks the calling
+thread for the injected latency.
+"""
+
+import ast
+import copy
+import json
+import math
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from postgrest import APIResponse
+from postgrest.exceptions import APIError
+
+SCHEMA_PATH = Path(__file__).resolve().parent.parent / 'supabase_schema.sql'
+
+
+@dataclass
+class StandinConfig:
+    """Per-call latency, jitter and error injection"""
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    seed: Optional[int] = None
+    # Per-table latency overrides, e.g. {"messages": 25.0}
+    table_latency_ms: Dict[str, float] = field(default_factory=dict)
+
+    @classmethod
+    def from_env(cls) -> "StandinConfig":
+        seed = os.environ.get('STANDIN_SEED')
+        return cls(
+            latency_ms=float(os.environ.get('STANDIN_LATENCY_MS', 0)),
+            jitter_ms=float(os.environ.get('STANDIN_JITTER_MS', 0)),
+            error_rate=float(os.environ.get('STANDIN_ERROR_RATE', 0)),
+            seed=int(seed) if seed is not None else None,
+        )
+
+
+# ======================================
+# SCHEMA
+# ======================================
+
+@dataclass
+class Column:
+    name: str
+    kind: str  # text | num | int | bool | json | ts | serial
+    default: Any = None
+    references: Optional[str] = None
+    unique: bool = False
+    not_null: bool = False
+    # Expression of a ``GENERATED ALWAYS AS (...) STORED`` column
+    generated: Optional[str] = None
+
+
+@dataclass
+class Table:
+    name: str
+    columns: Dict[str, Column]
+    primary_key: List[str]
+    unique: List[Tuple[str, ...]]
+
+
+_TABLE_RE = re.compile(r"CREATE TABLE IF NOT EXISTS public\.(\w+) \((.*?)\n\);", re.S)
+_INSERT_RE = re.compile(r"INSERT INTO public\.(\w+) \(([^)]*)\) VALUES\n(.*?)\n(?:ON CONFLICT[^;]*)?;", re.S)
+_DEFAULT_NOW = object()
+_DEFAULT_UUID = object()
+
+
+def _column_kind(type_sql: str) -> str:
+    type_sql = type_sql.lower()
+    if type_sql.endswith('[]') or type_sql.startswith('jsonb'):
+        return 'json'
+    if 'serial' in type_sql:
+        return 'serial'
+    if type_sql.startswith(('integer', 'bigint', 'smallint')):
+        return 'int'
+    if type_sql.startswith(('decimal', 'numeric', 'real', 'double')):
+        return 'num'
+    if type_sql.startswith('boolean'):
+        return 'bool'
+    if type_sql.startswith('timestamp'):
+        return 'ts'
+    return 'text'
+
+
+def _parse_default(expr: Optional[str], kind: str) -> Any:
+    if expr is None:
+        return None
+    expr = expr.strip()
+    if 'uuid' in expr:
+        return _DEFAULT_UUID
+    if 'now()' in expr:
+        return _DEFAULT_NOW
+    if expr in ('true', 'false'):
+        return expr == 'true'
+    if expr.startswith("'"):
+        value = expr.split("'")[1]
+        return json.loads(value.replace('{', '[').replace('}', ']')) if kind == 'json' else value
+    try:
+        return int(expr) if kind in ('int', 'serial') else float(expr)
+    except ValueError:
+        return None
+
+
+def _split_top_level(text: str, sep: str = ',') -> List[str]:
+    """Split on ``sep`` outside parentheses and quotes"""
+    parts, depth, quoted, current = [], 0, None, []
+    for char in text:
+        if char in '"\'' and quoted in (None, char):
+            quoted = None if quoted else char
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        if char == sep and depth == 0 and not quoted:
+            parts.append(''.join(current))
+            current = []
+        else:
+            current.append(char)
+    parts.append(''.join(current))
+    return [p.strip() for p in parts if p.strip()]
+
+
+def parse_schema(sql: str) -> Dict[str, Table]:
+    """Extract public tables, columns, defaults, FKs and unique keys"""
+    tables = {}
+    for name, body in _TABLE_RE.findall(sql):
+        body = '\n'.join(line.split('--')[0] for line in body.splitlines())
+        columns, primary_key, unique = {}, [], []
+        for item in _split_top_level(body):
+            upper = item.upper()
+            if upper.startswith('UNIQUE'):
+                unique.append(tuple(c.strip() for c in item[item.index('(') + 1:item.rindex(')')].split(',')))
+                continue
+            if upper.startswith('PRIMARY KEY'):
+                primary_key = [c.strip() for c in item[item.index('(') + 1:item.rindex(')')].split(',')]
+                continue
+            if upper.startswith(('CHECK', 'CONSTRAINT', 'EXCLUDE', 'FOREIGN KEY')):
+                continue
+            col_name, rest = item.split(None, 1)
+            type_sql = re.split(r'\s+(?:DEFAULT|REFERENCES|CHECK|NOT|UNIQUE|PRIMARY|NULL|GENERATED)\b', rest, 1)[0]
+            kind = _column_kind(type_sql)
+            default = re.search(r"DEFAULT\s+((?:timezone\(.*?\)\)|'[^']*'|[\w.()-]+))", rest)
+            reference = re.search(r"REFERENCES\s+public\.(\w+)", rest)
+            generated = re.search(r"GENERATED ALWAYS AS \((.*)\) STORED", rest)
+            columns[col_name] = Column(
+                name=col_name,
+                kind=kind,
+                default=_parse_default(default.group(1) if default else None, kind),
+                references=reference.group(1) if reference else None,
+                unique=' UNIQUE' in f" {rest.upper()}",
+                not_null='NOT NULL' in rest.upper() or 'PRIMARY KEY' in rest.upper(),
+                generated=generated.group(1) if generated else None,
+            )
+            if 'PRIMARY KEY' in rest.upper():
+                primary_key = [col_name]
+        tables[name] = Table(name, columns, primary_key, unique)
+    return tables
+
+
+def parse_seed_rows(sql: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Rows from the schema's plain ``INSERT ... VALUES`` seed statements"""
+    seeds: Dict[str, List[Dict[str, Any]]] = {}
+    for table, columns, values in _INSERT_RE.findall(sql):
+        names = [c.strip() for c in columns.split(',')]
+        for row in ast.literal_eval(f"[{values}]"):
+            seeds.setdefault(table, []).append(dict(zip(names, row)))
+    return seeds
+
+
+def _q(name: str) -> str:
+    return f'"{name}"'
+
+
+def _columns_sql(names) -> str:
+    return ', '.join(_q(n) for n in names)
+
+
+def _marks(count: int) -> str:
+    return ', '.join('?' for _ in range(count))
+
+
+def _utcnow() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec='microseconds')
+
+
+def _normalize_ts(value: Any) -> Any:
+    """Store timestamps in one UTC ISO format so text ordering matches time ordering"""
+    if isinstance(value, datetime):
+        parsed = value
+    elif isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return value
+    else:
+        return value
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat(timespec='microseconds')
+
+
+# ======================================
+# SCHEMA MIRRORS
+# ======================================
+
+# SQLite versions of the supabase_schema.sql triggers the backend relies on
+# (its plpgsql isn't parsed). SQLite triggers are per row; where the schema's
+# are per statement the end state matches. Each is created only when all of
+# its tables exist.
+_NOW_SQL = "strftime('%Y-%m-%dT%H:%M:%f000+00:00', 'now')"
+
+
+def _adjust_rating_sql(row: str, sign: str) -> str:
+    """Add (``+``) or take away (``-``) one review's rating in its reviewee's aggregates"""
+    bucket = f"'$[' || ({row}.\"rating\" - 1) || ']'"
+    return f'''UPDATE "profiles" SET
+            "rating_sum" = "rating_sum" {sign} {row}."rating",
+            "total_reviews" = "total_reviews" {sign} 1,
+            "rating_histogram" = json_set("rating_histogram", {bucket},
+                                          json_extract("rating_histogram", {bucket}) {sign} 1),
+            "average_rating" = CASE WHEN "total_reviews" {sign} 1 > 0
+              THEN round(("rating_sum" {sign} {row}."rating") * 1.0 / ("total_reviews" {sign} 1), 2) ELSE 0 END,
+            "updated_at" = {_NOW_SQL}
+          WHERE "id" = {row}."reviewee_id";'''
+
+
+# Timestamps are stored as UTC ISO text, so text comparison orders them
+_BOOKING_OVERLAP_SQL = '''SELECT RAISE(ABORT, 'conflicting key value violates exclusion constraint "bookings_no_overlap"')
+          WHERE EXISTS (SELECT 1 FROM "bookings" WHERE "tasker_id" = NEW."tasker_id" AND "id" IS NOT NEW."id"
+                        AND "status" IS NOT 'cancelled'
+                        AND "starts_at" < NEW."ends_at" AND NEW."starts_at" < "ends_at");'''
+
+
+def _record_change_sql(entity: str, entity_id: str, deleted: str, audience: str) -> str:
+    """record_change(): move (audience, entity, id) to the head of change_log for each user
+    ``audience`` (a SELECT of one "audience" column) yields. Delete and insert, so
+    AUTOINCREMENT hands out a fresh seq. Every write commits at once, so the next
+    ``xact`` up stands in for the writing transaction's id."""
+    return f'''DELETE FROM "change_log" WHERE "entity" = '{entity}' AND "entity_id" = {entity_id}
+            AND "audience" IN (SELECT "audience" FROM ({audience}));
+          INSERT INTO "change_log" ("audience", "entity", "entity_id", "deleted", "changed_at", "xact")
+          SELECT DISTINCT "audience", '{entity}', {entity_id}, {deleted}, {_NOW_SQL},
+            (SELECT coalesce(max("xact"), 0) + 1 FROM "change_log")
+          FROM ({audience}) WHERE "audience" IS NOT NULL;'''
+
+
+def _task_audience(row: str) -> str:
+    return (f'SELECT {row}."customer_id" AS "audience" UNION SELECT {row}."tasker_id" '
+            f'UNION SELECT "tasker_id" FROM "task_applications" WHERE "task_id" = {row}."id"')
+
+
+_APPLICATION_AUDIENCE = ('SELECT {row}."tasker_id" AS "audience" '
+                         'UNION SELECT "customer_id" FROM "tasks" WHERE "id" = {row}."task_id"')
+_MESSAGE_AUDIENCE = 'SELECT {row}."sender_id" AS "audience" UNION SELECT {row}."receiver_id"'
+_EVERYONE = "SELECT '00000000-0000-0000-0000-000000000000' AS \"audience\""
+
+
+def _change_log_triggers(table: str, entity: str, audience: str, deletes: bool = True) -> List[Tuple[Tuple[str, ...], str]]:
+    """log_<entity>_change: one row trigger per write kind (SQLite triggers take one event)"""
+    events = [('insert', 'NEW', '0'), ('update', 'NEW', '0')] + ([('delete', 'OLD', '1')] if deletes else [])
+    return [((table, 'change_log'), f'''
+        CREATE TRIGGER log_{entity}_change_on_{event} AFTER {event.upper()} ON "{table}"
+        BEGIN
+          {_record_change_sql(entity, f'{row}."id"', deleted, audience.format(row=row))}
+        END''') for event, row, deleted in events]
+
+
+SCHEMA_TRIGGERS: List[Tuple[Tuple[str, ...], str]] = [
+    (('notifications', 'notification_counters'), f'''
+        CREATE TRIGGER notification_counters_on_insert AFTER INSERT ON "notifications"
+        WHEN NEW."read" = 0
+        BEGIN
+          INSERT INTO "notification_counters" ("user_id", "unread", "updated_at")
+          VALUES (NEW."user_id", 1, {_NOW_SQL})
+          ON CONFLICT ("user_id") DO UPDATE SET "unread" = "unread" + 1, "updated_at" = excluded."updated_at";
+        END'''),
+    (('notifications', 'notification_counters'), f'''
+        CREATE TRIGGER notification_counters_on_update AFTER UPDATE ON "notifications"
+        WHEN (OLD."read" = 0) IS NOT (NEW."read" = 0) OR OLD."user_id" IS NOT NEW."user_id"
+        BEGIN
+          UPDATE "notification_counters" SET "unread" = max("unread" - 1, 0), "updated_at" = {_NOW_SQL}
+          WHERE "user_id" = OLD."user_id" AND OLD."read" = 0;
+          INSERT INTO "notification_counters" ("user_id", "unread", "updated_at")
+          SELECT NEW."user_id", 1, {_NOW_SQL} WHERE NEW."read" = 0
+          ON CONFLICT ("user_id") DO UPDATE SET "unread" = "unread" + 1, "updated_at" = excluded."updated_at";
+        END'''),
+    (('notifications', 'notification_counters'), f'''
+        CREATE TRIGGER notification_counters_on_delete AFTER DELETE ON "notifications"
+        WHEN OLD."read" = 0
+        BEGIN
+          UPDATE "notification_counters" SET "unread" = max("unread" - 1, 0), "updated_at" = {_NOW_SQL}
+          WHERE "user_id" = OLD."user_id";
+        END'''),
+    (('reviews', 'profiles'), f'''
+        CREATE TRIGGER rating_aggregates_on_insert AFTER INSERT ON "reviews"
+        BEGIN
+          {_adjust_rating_sql('NEW', '+')}
+        END'''),
+    (('reviews', 'profiles'), f'''
+        CREATE TRIGGER rating_aggregates_on_update AFTER UPDATE OF "rating", "reviewee_id" ON "reviews"
+        WHEN OLD."rating" IS NOT NEW."rating" OR OLD."reviewee_id" IS NOT NEW."reviewee_id"
+        BEGIN
+          {_adjust_rating_sql('OLD', '-')}
+          {_adjust_rating_sql('NEW', '+')}
+        END'''),
+    (('reviews', 'profiles'), f'''
+        CREATE TRIGGER rating_aggregates_on_delete AFTER DELETE ON "reviews"
+        BEGIN
+          {_adjust_rating_sql('OLD', '-')}
+        END'''),
+    (('tasks', 'profiles'), f'''
+        CREATE TRIGGER update_stats_on_task_completion AFTER UPDATE OF "status" ON "tasks"
+        WHEN NEW."status" = 'completed' AND OLD."status" IS NOT 'completed'
+        BEGIN
+          UPDATE "profiles" SET "total_tasks_completed" = "total_tasks_completed" + 1, "updated_at" = {_NOW_SQL}
+          WHERE "id" = NEW."tasker_id";
+        END'''),
+    # bookings_no_overlap: SQLite has no exclusion constraints. Writes hold the
+    # database lock, so the check and the write are atomic as in Postgres.
+    (('bookings',), f'''
+        CREATE TRIGGER bookings_no_overlap_on_insert BEFORE INSERT ON "bookings"
+        WHEN NEW."status" IS NOT 'cancelled'
+        BEGIN
+          {_BOOKING_OVERLAP_SQL}
+        END'''),
+    (('bookings',), f'''
+        CREATE TRIGGER bookings_no_overlap_on_update
+        BEFORE UPDATE OF "tasker_id", "starts_at", "ends_at", "status" ON "bookings"
+        WHEN NEW."status" IS NOT 'cancelled'
+        BEGIN
+          {_BOOKING_OVERLAP_SQL}
+        END'''),
+    # Change log (GET /api/sync). Task deletes log BEFORE DELETE, while the
+    # applications naming the applicants are still there.
+    (('tasks', 'task_applications', 'change_log'), f'''
+        CREATE TRIGGER log_task_change_on_insert AFTER INSERT ON "tasks"
+        BEGIN
+          {_record_change_sql('task', 'NEW."id"', '0', _task_audience('NEW'))}
+        END'''),
+    (('tasks', 'task_applications', 'change_log'), f'''
+        CREATE TRIGGER log_task_change_on_update AFTER UPDATE ON "tasks"
+        BEGIN
+          {_record_change_sql('task', 'NEW."id"', '0', _task_audience('NEW'))}
+          {_record_change_sql('task', 'NEW."id"', '1', 'SELECT OLD."customer_id" AS "audience" UNION SELECT OLD."tasker_id" '
+                              'EXCEPT SELECT * FROM (' + _task_audience('NEW') + ')')}
+        END'''),
+    (('tasks', 'task_applications', 'change_log'), f'''
+        CREATE TRIGGER log_task_change_on_delete BEFORE DELETE ON "tasks"
+        BEGIN
+          {_record_change_sql('task', 'OLD."id"', '1', _task_audience('OLD'))}
+        END'''),
+    (('task_applications', 'tasks', 'change_log'), f'''
+        CREATE TRIGGER log_application_task_on_insert AFTER INSERT ON "task_applications"
+        BEGIN
+          {_record_change_sql('task', 'NEW."task_id"', '0', 'SELECT NEW."tasker_id" AS "audience"')}
+        END'''),
+    *_change_log_triggers('task_applications', 'application', _APPLICATION_AUDIENCE),
+    *_change_log_triggers('messages', 'message', _MESSAGE_AUDIENCE),
+    *_change_log_triggers('task_categories', 'category', _EVERYONE),
+    *_change_log_triggers('profiles', 'profile', 'SELECT {row}."id" AS "audience"', deletes=False),
+]
+
+
+def _unread_message_counts(db: "StandinDatabase", p_user_id: str) -> List[Dict[str, Any]]:
+    rows = db.conn.execute(
+        'SELECT "task_id", count(*) FROM "messages" WHERE "receiver_id" = ? AND "read_at" IS NULL '
+        'GROUP BY "task_id"', (p_user_id,)).fetchall()
+    return [{"task_id": task_id, "unread": unread} for task_id, unread in rows]
+
+
+def _sync_log(db: "StandinDatabase", p_audience: List[str], p_after_xact: int, p_after_seq: int,
+              p_limit: int) -> List[Dict[str, Any]]:
+    marks = ', '.join('?' for _ in p_audience)
+    rows = db.conn.execute(
+        f'SELECT "seq", "entity", "entity_id", "deleted", "changed_at", "xact" FROM "change_log" '
+        f'WHERE "audience" IN ({marks}) AND ("xact", "seq") > (?, ?) ORDER BY "xact", "seq" LIMIT ?',
+        (*p_audience, p_after_xact, p_after_seq, p_limit)).fetchall()
+    # No transaction is ever left open, so every row is settled
+    return [{"seq": seq, "entity": entity, "entity_id": entity_id, "deleted": bool(deleted),
+             "changed_at": changed_at, "xact": xact, "settled": True}
+            for seq, entity, entity_id, deleted, changed_at, xact in rows]
+
+
+# Python versions of the schema's SQL functions, callable through rpc()
+SCHEMA_FUNCTIONS: Dict[str, Callable[..., Any]] = {
+    'unread_message_counts': _unread_message_counts,
+    'sync_log': _sync_log,
+    # A stand-in database is its own primary
+    'replication_lag_seconds': lambda db: [{"lag_s": 0.0}],
+}
+
+
+def _distance_km(lat1: Optional[float], lng1: Optional[float], lat2: Optional[float],
+                 lng2: Optional[float]) -> Optional[float]:
+    """Great-circle distance, NULL without coordinates (SQL function ``distance_km``)"""
+    if None in (lat1, lng1, lat2, lng2):
+        return None
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(min(1.0, a)))
+
+
+def _tasks_nearby(p_latitude: float, p_longitude: float, p_radius_km: float) -> Tuple[str, List[Any], str]:
+    distance = f'distance_km({float(p_latitude)!r}, {float(p_longitude)!r}, "latitude", "longitude")'
+    return f'{distance} <= ?', [float(p_radius_km)], f'{distance} ASC, "created_at" DESC, "id" DESC'
+
+
+# Set-returning schema functions: name -> (table, fn(**params) -> (condition,
+# its parameters, ORDER BY)). rpc() returns a select on the table, so request
+# filters, embeds, order and paging apply to the function's rows.
+SCHEMA_TABLE_FUNCTIONS: Dict[str, Tuple[str, Callable[..., Tuple[str, List[Any], str]]]] = {
+    'tasks_nearby': ('tasks', _tasks_nearby),
+}
+
+
+# ======================================
+# DATABASE
+# ======================================
+
+class StandinDatabase:
+    """SQLite-backed tables shared by every stand-in client"""
+
+    def __init__(self, schema_sql: Optional[str] = None, seed: bool = True):
+        schema_sql = schema_sql if schema_sql is not None else SCHEMA_PATH.read_text()
+        self.tables = parse_schema(schema_sql)
+        self.functions: Dict[str, Callable[..., Any]] = dict(SCHEMA_FUNCTIONS)
+        self.table_functions = dict(SCHEMA_TABLE_FUNCTIONS)
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(':memory:', check_same_thread=False)
+        self.conn.execute('PRAGMA case_sensitive_like = ON')
+        self.conn.create_function('distance_km', 4, _distance_km, deterministic=True)
+        for table in self.tables.values():
+            self.conn.execute(self._ddl(table))
+        for required, ddl in SCHEMA_TRIGGERS:
+            if all(name in self.tables for name in required):
+                self.conn.execute(ddl)
+        if seed:
+            for table, rows in parse_seed_rows(schema_sql).items():
+                if table in self.tables:
+                    self.insert_rows(table, rows)
+
+    @staticmethod
+    def _ddl(table: Table) -> str:
+        parts = []
+        for column in table.columns.values():
+            if column.kind == 'serial' and table.primary_key == [column.name]:
+                parts.append(f'"{column.name}" INTEGER PRIMARY KEY AUTOINCREMENT')
+                continue
+            affinity = {'num': 'REAL', 'int': 'INTEGER', 'bool': 'INTEGER', 'serial': 'INTEGER'}.get(column.kind, 'TEXT')
+            parts.append(f'"{column.name}" {affinity}' + (' UNIQUE' if column.unique else '')
+                         + (f' GENERATED ALWAYS AS ({column.generated}) STORED' if column.generated else ''))
+        if table.primary_key and not any(
+                c.kind == 'serial' and table.primary_key == [c.name] for c in table.columns.values()):
+            parts.append('PRIMARY KEY (' + ', '.join(f'"{c}"' for c in table.primary_key) + ')')
+        for unique in table.unique:
+            parts.append('UNIQUE (' + ', '.join(f'"{c}"' for c in unique) + ')')
+        return f'CREATE TABLE "{table.name}" ({", ".join(parts)})'
+
+    def table(self, name: str) -> Table:
+        try:
+            return self.tables[name]
+        except KeyError:
+            raise APIError({"message": f'relation "public.{name}" does not exist', "code": "42P01"})
+
+    def column(self, table: Table, name: str) -> Column:
+        try:
+            return table.columns[name]
+        except KeyError:
+            raise APIError({
+                "message": f"column {table.name}.{name} does not exist",
+                "code": "42703",
+            })
+
+    # Encoding between JSON values and SQLite storage
+    @staticmethod
+    def encode(column: Column, value: Any) -> Any:
+        if value is None:
+            return None
+        if column.kind == 'json':
+            return json.dumps(value)
+        if column.kind == 'bool':
+            if isinstance(value, str):
+                return 1 if value.lower() == 'true' else 0
+            return 1 if value else 0
+        if column.kind == 'ts':
+            return _normalize_ts(value)
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return value
+
+    @staticmethod
+    def decode(column: Column, value: Any) -> Any:
+        if value is None:
+            return None
+        if column.kind == 'json':
+            return json.loads(value)
+        if column.kind == 'bool':
+            return bool(value)
+        return value
+
+    def decode_row(self, table: Table, names: List[str], values: Tuple) -> Dict[str, Any]:
+        return {name: self.decode(table.columns[name], value) for name, value in zip(names, values)}
+
+    def writable(self, table: Table, name: str) -> Column:
+        column = self.column(table, name)
+        if column.generated:
+            raise APIError({
+                "message": f'column "{name}" can only be updated to DEFAULT',
+                "code": "428C9",
+            })
+        return column
+
+    def with_defaults(self, table: Table, row: Dict[str, Any]) -> Dict[str, Any]:
+        for name in row:
+            self.writable(table, name)
+        full = {}
+        for column in table.columns.values():
+            if column.name in row:
+                full[column.name] = row[column.name]
+            elif column.kind == 'serial' or column.generated:
+                continue
+            elif column.default is _DEFAULT_UUID:
+                full[column.name] = str(uuid.uuid4())
+            elif column.default is _DEFAULT_NOW:
+                full[column.name] = _utcnow()
+            else:
+                full[column.name] = column.default
+        return full
+
+    def insert_rows(self, table_name: str, rows: List[Dict[str, Any]], upsert: bool = False,
+                    on_conflict: str = '', ignore_duplicates: bool = False) -> List[Dict[str, Any]]:
+        """Insert rows (filling schema defaults) and return them as stored
+
+        An upsert updates conflicting rows, or leaves them alone with
+        ``ignore_duplicates`` (ON CONFLICT DO NOTHING); either way only
+        rows inserted or updated are returned.
+        """
+        table = self.table(table_name)
+        inserted = []
+        with self.lock:
+            try:
+                for row in rows:
+                    full = self.with_defaults(table, row)
+                    names = list(full)
+                    sql = f'INSERT INTO {_q(table.name)} ({_columns_sql(names)}) VALUES ({_marks(len(names))})'
+                    if upsert:
+                        target = [c.strip() for c in on_conflict.split(',') if c.strip()] or table.primary_key
+                        updates = [] if ignore_duplicates else [n for n in names if n not in target and n in row]
+                        sql += f' ON CONFLICT ({_columns_sql(target)}) '
+                        sql += ('DO UPDATE SET ' + ', '.join(f'{_q(n)} = excluded.{_q(n)}' for n in updates)
+                                if updates else 'DO NOTHING')
+                    sql += f' RETURNING {_columns_sql(table.columns)}'
+                    values = [self.encode(table.columns[n], full[n]) for n in names]
+                    stored = self.conn.execute(sql, values).fetchone()
+                    if stored is not None:
+                        inserted.append(self.decode_row(table, list(table.columns), stored))
+                self.conn.commit()
+            except sqlite3.IntegrityError as e:
+                self.conn.rollback()
+                raise _integrity_error(table, e)
+        return inserted
+
+    def register_function(self, name: str, fn: Callable[..., Any]):
+        """Expose ``fn(database, **params)`` through ``client.rpc(name, params)``"""
+        self.functions[name] = fn
+
+    def load_fixtures(self, path: str):
+        """Replace table contents with ``{"table": [rows, ...]}`` JSON fixtures"""
+        with open(path) as f:
+            fixtures = json.load(f)
+        with self.lock:
+            for table in fixtures:
+                self.conn.execute(f'DELETE FROM {_q(self.table(table).name)}')
+            for table, rows in fixtures.items():
+                self.insert_rows(table, rows)
+
+
+def _integrity_error(table: Table, error: sqlite3.IntegrityError) -> APIError:
+    message = str(error)
+    if 'UNIQUE' in message:
+        return APIError({
+            "message": f'duplicate key value violates unique constraint on "{table.name}"',
+            "code": "23505",
+            "details": message,
+        })
+    if 'exclusion constraint' in message:
+        return APIError({"message": message, "code": "23P01", "details": message})
+    return APIError({"message": message, "code": "23502", "details": message})
+
+
+# ======================================
+# FILTERS
+# ======================================
+
+_OPERATORS = {
+    'eq': '=', 'neq': '!=', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<=',
+    'like': 'LIKE', 'ilike': 'LIKE',
+}
+
+
+def _compile_condition(db: StandinDatabase, table: Table, column_name: str, operator: str,
+                       value: Any) -> Tuple[str, List[Any]]:
+    negate = False
+    if operator.startswith('not.'):
+        negate, operator = True, operator[4:]
+    column = db.column(table, column_name)
+    ref = f'"{column.name}"'
+    if operator == 'is':
+        text = str(value).lower() if value is not None else 'null'
+        sql = f'{ref} IS NULL' if text == 'null' else f'{ref} = ?'
+        params = [] if text == 'null' else [1 if text == 'true' else 0]
+    elif operator == 'in':
+        if isinstance(value, str):
+            value = _split_top_level(value.strip('()'))
+            value = [v.strip('"') for v in value]
+        values = [db.encode(column, v) for v in value]
+        sql = f'{ref} IN ({_marks(len(values))})' if values else '0'
+        params = values
+    elif operator in _OPERATORS:
+        if operator in ('like', 'ilike') and isinstance(value, str):
+            value = value.replace('*', '%')
+        if operator == 'ilike':
+            sql, params = f'LOWER({ref}) LIKE LOWER(?)', [value]
+        else:
+            sql, params = f'{ref} {_OPERATORS[operator]} ?', [db.encode(column, value)]
+    else:
+        raise APIError({"message": f"unsupported operator {operator!r}", "code": "PGRST100"})
+    return (f'NOT ({sql})' if negate else sql), params
+
+
+def _compile_logic(db: StandinDatabase, table: Table, expression: str, joiner: str) -> Tuple[str, List[Any]]:
+    """Compile PostgREST ``or``/``and`` filter strings, e.g. ``a.is.null,b.eq.1``"""
+    clauses, params = [], []
+    for term in _split_top_level(expression):
+        negate = term.startswith('not.')
+        if negate:
+            term = term[4:]
+        if term.startswith(('and(', 'or(')):
+            inner_joiner = 'AND' if term.startswith('and(') else 'OR'
+            sql, sub_params = _compile_logic(db, table, term[term.index('(') + 1:-1], inner_joiner)
+        else:
+            column, _, rest = term.partition('.')
+            operator, _, value = rest.partition('.')
+            if operator == 'not':
+                operator, _, value = value.partition('.')
+                operator = f'not.{operator}'
+            sql, sub_params = _compile_condition(db, table, column, operator, value.strip('"'))
+        clauses.append(f'NOT ({sql})' if negate else f'({sql})')
+        params.extend(sub_params)
+    return f' {joiner} '.join(clauses) or '1', params
+
+
+# ======================================
+# SELECT / EMBEDS
+# ======================================
+
+@dataclass
+class Embed:
+    alias: str
+    table: str
+    hint: Optional[str]
+    select: "SelectSpec"
+
+
+@dataclass
+class SelectSpec:
+    columns: List[Tuple[str, str]]  # (output name, column)
+    star: bool
+    embeds: List[Embed]
+
+
+def parse_select(text: str) -> SelectSpec:
+    """Parse a PostgREST select string such as ``*, owner:profiles!owner_id (name)``"""
+    columns, embeds, star = [], [], False
+    for item in _split_top_level(' '.join(text.split())):
+        if item == '*':
+            star = True
+        elif '(' in item:
+            head, inner = item.split('(', 1)
+            head = head.strip()
+            alias, _, target = head.rpartition(':')
+            target, _, hint = target.partition('!')
+            embeds.append(Embed(alias or target, target, hint or None, parse_select(inner.rsplit(')', 1)[0])))
+        else:
+            alias, _, column = item.rpartition(':')
+            columns.append((alias or column, column))
+    return SelectSpec(columns, star, embeds)
+
+
+class _Query:
+    """Shared state of a table request: filters, ordering and paging"""
+
+    def __init__(self, client: "StandinClient", table: str):
+        self.client = client
+        self.db = client.database
+        self.table_name = table
+        self.where: List[Tuple[str, List[Any]]] = []
+        self.order_by: List[str] = []
+        # ORDER BY of a table function's rows, used when the request gives none
+        self.default_order: Optional[str] = None
+        self.limit_value: Optional[int] = None
+        self.offset_value: int = 0
+
+    def compile_where(self, table: Table) -> Tuple[str, List[Any]]:
+        if not self.where:
+            return '1', []
+        params = [p for _, ps in self.where for p in ps]
+        return ' AND '.join(f'({sql})' for sql, _ in self.where), params
+
+
+class _Builder:
+    """Base builder: ``execute()`` with latency/error injection"""
+
+    def __init__(self, query: _Query):
+        self._query = query
+
+    def execute(self) -> APIResponse:
+        client = self._query.client
+        client.inject(self._query.table_name)
+        data, count = self._run()
+        return APIResponse(data=data, count=count)
+
+    def _run(self) -> Tuple[Any, Optional[int]]:
+        raise NotImplementedError
+
+
+class StandinFilterBuilder(_Builder):
+    """Filter methods mirroring postgrest-py's filter builder"""
+
+    def _add(self, column: str, operator: str, value: Any):
+        table = self._query.db.table(self._query.table_name)
+        self._query.where.append(_compile_condition(self._query.db, table, column, operator, value))
+        return self
+
+    def eq(self, column: str, value: Any):
+        return self._add(column, 'eq', value)
+
+    def neq(self, column: str, value: Any):
+        return self._add(column, 'neq', value)
+
+    def gt(self, column: str, value: Any):
+        return self._add(column, 'gt', value)
+
+    def gte(self, column: str, value: Any):
+        return self._add(column, 'gte', value)
+
+    def lt(self, column: str, value: Any):
+        return self._add(column, 'lt', value)
+
+    def lte(self, column: str, value: Any):
+        return self._add(column, 'lte', value)
+
+    def like(self, column: str, pattern: str):
+        return self._add(column, 'like', pattern)
+
+    def ilike(self, column: str, pattern: str):
+        return self._add(column, 'ilike', pattern)
+
+    def is_(self, column: str, value: Any):
+        return self._add(column, 'is', value)
+
+    def in_(self, column: str, values):
+        return self._add(column, 'in', list(values))
+
+    def filter(self, column: str, operator: str, criteria: Any):
+        return self._add(column, operator, criteria)
+
+    def match(self, query: Dict[str, Any]):
+        for column, value in query.items():
+            self.eq(column, value)
+        return self
+
+    def or_(self, filters: str, reference_table: Optional[str] = None):
+        table = self._query.db.table(self._query.table_name)
+        self._query.where.append(_compile_logic(self._query.db, table, filters, 'OR'))
+        return self
+
+    def _matching_rowids(self, table: Table) -> List[int]:
+        where, params = self._query.compile_where(table)
+        return [r[0] for r in self._query.db.conn.execute(
+            f'SELECT rowid FROM "{table.name}" WHERE {where}', params)]
+
+    def _rows_by_rowid(self, table: Table, rowids: List[int]) -> List[Dict[str, Any]]:
+        if not rowids:
+            return []
+        names = list(table.columns)
+        cols = ', '.join(f'"{n}"' for n in names)
+        rows = self._query.db.conn.execute(
+            f'SELECT {cols} FROM "{table.name}" WHERE rowid IN ({_marks(len(rowids))}) ORDER BY rowid',
+            rowids)
+        return [self._query.db.decode_row(table, names, row) for row in rows]
+
+
+class StandinSelectBuilder(StandinFilterBuilder):
+    def __init__(self, query: _Query, spec: SelectSpec, count: Optional[str]):
+        super().__init__(query)
+        self._spec = spec
+        self._count = count
+        self._single = False
+
+    def order(self, column: str, *, desc: bool = False, nullsfirst: bool = False,
+              foreign_table: Optional[str] = None):
+        table = self._query.db.table(self._query.table_name)
+        self._query.db.column(table, column)
+        # Match Postgres defaults: ASC puts NULLs last, DESC puts them first
+        nulls = 'FIRST' if nullsfirst or desc else 'LAST'
+        self._query.order_by.append(f'"{column}" {"DESC" if desc else "ASC"} NULLS {nulls}')
+        return self
+
+    def limit(self, size: int, *, foreign_table: Optional[str] = None):
+        self._query.limit_value = size
+        return self
+
+    def offset(self, size: int):
+        self._query.offset_value = size
+        return self
+
+    def range(self, start: int, end: int, foreign_table: Optional[str] = None):
+        self._query.offset_value = start
+        self._query.limit_value = end - start + 1
+        return self
+
+    def single(self):
+        self._single = True
+        return self
+
+    def _run(self) -> Tuple[Any, Optional[int]]:
+        db = self._query.db
+        table = db.table(self._query.table_name)
+        with db.lock:
+            where, params = self._query.compile_where(table)
+            names = list(table.columns)
+            sql = f'SELECT {_columns_sql(names)} FROM {_q(table.name)} WHERE {where}'
+            order_by = self._query.order_by or ([self._query.default_order] if self._query.default_order else [])
+            if order_by:
+                sql += ' ORDER BY ' + ', '.join(order_by)
+            if self._query.limit_value is not None or self._query.offset_value:
+                sql += ' LIMIT ? OFFSET ?'
+                limit = self._query.limit_value if self._query.limit_value is not None else -1
+                params = params + [limit, self._query.offset_value]
+            rows = [db.decode_row(table, names, r) for r in db.conn.execute(sql, params)]
+            count = None
+            if self._count:
+                count_where, count_params = self._query.compile_where(table)
+                count = db.conn.execute(
+                    f'SELECT COUNT(*) FROM "{table.name}" WHERE {count_where}', count_params).fetchone()[0]
+            data = _shape(db, table, rows, self._spec)
+        if self._single:
+            if len(data) != 1:
+                raise APIError({"message": "JSON object requested, multiple (or no) rows returned",
+                                "code": "PGRST116"})
+            return data[0], count
+        return data, count
+
+
+class StandinTableRpcBuilder(StandinSelectBuilder):
+    """rpc() of a set-returning function: a select on its table's rows"""
+
+    def select(self, *columns: str):
+        self._spec = parse_select(','.join(columns) or '*')
+        return self
+
+
+def _shape(db: StandinDatabase, table: Table, rows: List[Dict[str, Any]], spec: SelectSpec) -> List[Dict[str, Any]]:
+    """Project selected columns and resolve embedded resources"""
+    embedded = [_resolve_embed(db, table, rows, embed) for embed in spec.embeds]
+    shaped = []
+    for index, row in enumerate(rows):
+        out = dict(row) if spec.star else {}
+        for alias, column in spec.columns:
+            db.column(table, column)
+            out[alias] = row[column]
+        for embed, values in zip(spec.embeds, embedded):
+            out[embed.alias] = values[index]
+        shaped.append(out)
+    return shaped
+
+
+def _resolve_embed(db: StandinDatabase, table: Table, rows: List[Dict[str, Any]], embed: Embed) -> List[Any]:
+    """Fetch an embedded resource for every parent row with one batched query"""
+    target = db.table(embed.table)
+    fk = None
+    if embed.hint and embed.hint in table.columns:
+        fk = embed.hint
+    else:
+        candidates = [c.name for c in table.columns.values() if c.references == target.name]
+        if len(candidates) == 1:
+            fk = candidates[0]
+    if fk is not None:
+        # Many-to-one: parent.fk -> target.id
+        keys = sorted({row[fk] for row in rows if row.get(fk) is not None})
+        related = _fetch_by(db, target, 'id', keys, embed.select)
+        by_id = {r['__key']: r for r in related}
+        return [_strip_key(by_id.get(row.get(fk))) for row in rows]
+
+    back = [c.name for c in target.columns.values() if c.references == table.name
+            and (embed.hint is None or c.name == embed.hint)]
+    if len(back) != 1:
+        raise APIError({
+            "message": f"Could not find a relationship between '{table.name}' and '{target.name}'",
+            "code": "PGRST200",
+        })
+    # One-to-many: target.fk -> parent.id
+    keys = sorted({row['id'] for row in rows})
+    related = _fetch_by(db, target, back[0], keys, embed.select)
+    grouped: Dict[Any, List[Dict[str, Any]]] = {}
+    for r in related:
+        grouped.setdefault(r['__key'], []).append(_strip_key(r))
+    return [grouped.get(row['id'], []) for row in rows]
+
+
+def _fetch_by(db: StandinDatabase, table: Table, key: str, values: List[Any], spec: SelectSpec) -> List[Dict[str, Any]]:
+    if not values:
+        return []
+    names = list(table.columns)
+    rows = [db.decode_row(table, names, r) for r in db.conn.execute(
+        f'SELECT {_columns_sql(names)} FROM {_q(table.name)} '
+        f'WHERE {_q(key)} IN ({_marks(len(values))}) ORDER BY rowid', values)]
+    shaped = _shape(db, table, rows, spec)
+    for row, out in zip(rows, shaped):
+        out['__key'] = row[key]
+    return shaped
+
+
+def _strip_key(row: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if row is None:
+        return None
+    return {k: v for k, v in row.items() if k != '__key'}
+
+
+class StandinInsertBuilder(_Builder):
+    def __init__(self, query: _Query, rows: List[Dict[str, Any]], upsert: bool, on_conflict: str, returning: str,
+                 ignore_duplicates: bool = False):
+        super().__init__(query)
+        self._rows = rows
+        self._upsert = upsert
+        self._on_conflict = on_conflict
+        self._returning = returning
+        self._ignore_duplicates = ignore_duplicates
+
+    def _run(self) -> Tuple[Any, Optional[int]]:
+        inserted = self._query.db.insert_rows(self._query.table_name, self._rows, self._upsert, self._on_conflict,
+                                              self._ignore_duplicates)
+        return (inserted if self._returning == 'representation' else []), None
+
+
+class StandinUpdateBuilder(StandinFilterBuilder):
+    def __init__(self, query: _Query, values: Dict[str, Any]):
+        super().__init__(query)
+        self._values = values
+
+    def _run(self) -> Tuple[Any, Optional[int]]:
+        db = self._query.db
+        table = db.table(self._query.table_name)
+        columns = [db.writable(table, name) for name in self._values]
+        with db.lock:
+            rowids = self._matching_rowids(table)
+            if rowids and columns:
+                assignments = ', '.join(f'"{c.name}" = ?' for c in columns)
+                values = [db.encode(c, self._values[c.name]) for c in columns]
+                try:
+                    db.conn.execute(
+                        f'UPDATE "{table.name}" SET {assignments} WHERE rowid IN ({_marks(len(rowids))})',
+                        values + rowids)
+                    db.conn.commit()
+                except sqlite3.IntegrityError as e:
+                    db.conn.rollback()
+                    raise _integrity_error(table, e)
+            return self._rows_by_rowid(table, rowids), None
+
+
+class StandinDeleteBuilder(StandinFilterBuilder):
+    def _run(self) -> Tuple[Any, Optional[int]]:
+        db = self._query.db
+        table = db.table(self._query.table_name)
+        with db.lock:
+            rowids = self._matching_rowids(table)
+            rows = self._rows_by_rowid(table, rowids)
+            if rowids:
+                db.conn.execute(f'DELETE FROM "{table.name}" WHERE rowid IN ({_marks(len(rowids))})',
+                                rowids)
+                db.conn.commit()
+            return rows, None
+
+
+class StandinRequestBuilder:
+    """``client.table(name)``"""
+
+    def __init__(self, client: "StandinClient", table: str):
+        self._client = client
+        self._table = table
+
+    def select(self, *columns: str, count: Optional[str] = None, head: Optional[bool] = None):
+        spec = parse_select(','.join(columns) if columns else '*')
+        return StandinSelectBuilder(_Query(self._client, self._table), spec, count)
+
+    def insert(self, json: Any, *, count: Optional[str] = None, returning: str = 'representation',
+               upsert: bool = False, default_to_null: bool = True):
+        rows = json if isinstance(json, list) else [json]
+        return StandinInsertBuilder(_Query(self._client, self._table), rows, upsert, '', _returning(returning))
+
+    def upsert(self, json: Any, *, count: Optional[str] = None, returning: str = 'representation',
+               ignore_duplicates: bool = False, on_conflict: str = '', default_to_null: bool = True):
+        rows = json if isinstance(json, list) else [json]
+        return StandinInsertBuilder(_Query(self._client, self._table), rows, True, on_conflict,
+                                    _returning(returning), ignore_duplicates)
+
+    def update(self, json: Dict[str, Any], *, count: Optional[str] = None, returning: str = 'representation'):
+        return StandinUpdateBuilder(_Query(self._client, self._table), json)
+
+    def delete(self, *, count: Optional[str] = None, returning: str = 'representation'):
+        return StandinDeleteBuilder(_Query(self._client, self._table))
+
+
+def _returning(value: Any) -> str:
+    return getattr(value, 'value', value)
+
+
+class StandinRpcBuilder(_Builder):
+    def __init__(self, query: _Query, params: Dict[str, Any]):
+        super().__init__(query)
+        self._params = params
+
+    def _run(self) -> Tuple[Any, Optional[int]]:
+        db = self._query.db
+        fn = db.functions.get(self._query.table_name)
+        if fn is None:
+            raise APIError({
+                "message": f"Could not find the function public.{self._query.table_name}",
+                "code": "PGRST202",
+            })
+        with db.lock:
+            return fn(db, **self._params), None
+
+
+class StandinClient:
+    """Drop-in for ``supabase.Client`` backed by a StandinDatabase"""
+
+    def __init__(self, database: Optional[StandinDatabase] = None, config: Optional[StandinConfig] = None):
+        self.database = database or StandinDatabase()
+        self.config = config or StandinConfig()
+        self._rng = random.Random(self.config.seed)
+        self._rng_lock = threading.Lock()
+        self.calls = 0
+
+    def table(self, table_name: str) -> StandinRequestBuilder:
+        return StandinRequestBuilder(self, table_name)
+
+    from_ = table
+
+    def rpc(self, fn: str, params: Optional[Dict[str, Any]] = None) -> _Builder:
+        if fn in self.database.table_functions:
+            table, rows = self.database.table_functions[fn]
+            query = _Query(self, table)
+            condition, condition_params, query.default_order = rows(**(params or {}))
+            query.where.append((condition, condition_params))
+            return StandinTableRpcBuilder(query, parse_select('*'), None)
+        return StandinRpcBuilder(_Query(self, fn), params or {})
+
+    def bind(self, builder: Any) -> Any:
+        """A copy of ``builder`` (built on any stand-in client) that runs against this one"""
+        bound = copy.copy(builder)
+        bound._query = copy.copy(builder._query)
+        bound._query.client = self
+        bound._query.db = self.database
+        return bound
+
+    def inject(self, target: str):
+        """Apply the configured latency, jitter and failure rate to one call"""
+        config = self.config
+        with self._rng_lock:
+            self.calls += 1
+            delay = config.table_latency_ms.get(target, config.latency_ms)
+            if config.jitter_ms:
+                delay += self._rng.uniform(0, config.jitter_ms)
+            fail = config.error_rate and self._rng.random() < config.error_rate
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+        if fail:
+            raise APIError({"message": "Injected stand-in failure", "code": "PGRST503",
+                            "hint": "STANDIN_ERROR_RATE"})
+
+
+def create_client(config: Optional[StandinConfig] = None,
+                  database: Optional[StandinDatabase] = None) -> StandinClient:
+    """Create a stand-in client, optionally loading ``STANDIN_FIXTURES``"""
+    if database is None:
+        database = StandinDatabase()
+        fixtures = os.environ.get('STANDIN_FIXTURES')
+        if fixtures:
+            database.load_fixtures(fixtures)
+    return StandinClient(database, config or StandinConfig.from_env())
@@ -0,0 +1,197 @@
+"""
+Sanitized request trace capture.
+
+When ``SKILLHUB_TRACE_FILE`` is set, server.py records one JSON line per API
+request: arrival offset, method, route template, path/query parameters,
+request body *shape*, response status, duration and the caller's (hashed)
+identity and role. perf/replay.py re-issues a trace against a candidate
+build.
+
+Nothing identifying is written. Ids (UUIDs, user ids) are replaced by a keyed
+hash that is stable within one capture, so hot keys and per-user sequences
+survive while the real values do not. Free-text values become ``str:<len>``
+and only enum-like fields (status, urgency, ...) keep their value.
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import queue
+import random
+import re
+import secrets
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import jwt
+
+UUID_RE = re.compile(r'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$')
+# Fields whose values are small enums and are needed to replay the request faithfully
+ENUM_FIELDS = {'status', 'role', 'task_size', 'urgency', 'message_type', 'verification_status', 'type'}
+ID_FIELDS_SUFFIX = '_id'
+MAX_BODY_BYTES = 64 * 1024
+
+
+class TraceWriter:
+    """Appends trace records from a background thread so requests never wait on disk"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: "queue.SimpleQueue[Optional[str]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, record: Dict[str, Any]):
+        self._queue.put(json.dumps(record, separators=(',', ':')))
+
+    def _run(self):
+        with open(self.path, 'a', buffering=1 << 16) as f:
+            while True:
+                line = self._queue.get()
+                if line is None:
+                    break
+                f.write(line + '\n')
+                if self._queue.empty():
+                    f.flush()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+class Sanitizer:
+    """Keyed hashing of identifiers plus shape extraction for bodies"""
+
+    def __init__(self, key: Optional[bytes] = None):
+        self._key = key or secrets.token_bytes(32)
+
+    def hash_id(self, value: Any) -> str:
+        digest = hmac.new(self._key, str(value).encode(), hashlib.sha256).hexdigest()
+        return f"h:{digest[:16]}"
+
+    def value(self, key: str, value: Any) -> Any:
+        if isinstance(value, str):
+            if UUID_RE.match(value) or key == 'id' or key.endswith(ID_FIELDS_SUFFIX):
+                return self.hash_id(value)
+            if key in ENUM_FIELDS and len(value) <= 32:
+                return value
+            return f"str:{len(value)}"
+        return self.shape(value, key)
+
+    def shape(self, value: Any, key: str = '') -> Any:
+        if isinstance(value, dict):
+            return {k: self.value(k, v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.value(key, v) for v in value[:3]] + ([f"len:{len(value)}"] if len(value) > 3 else [])
+        if isinstance(value, bool) or value is None:
+            return value
+        if isinstance(value, (int, float)):
+            return "num"
+        if isinstance(value, str):
+            return self.value(key, value)
+        return type(value).__name__
+
+
+def _identity(headers: Dict[bytes, bytes]) -> Dict[str, Optional[str]]:
+    """Best-effort caller identity from the bearer token (signature not checked)"""
+    auth = headers.get(b'authorization', b'').decode('latin-1')
+    if not auth.lower().startswith('bearer '):
+        return {"user": None, "role": None}
+    token = auth[7:].strip()
+    try:
+        claims = jwt.decode(token, options={"verify_signature": False})
+    except jwt.PyJWTError:
+        return {"user": "demo", "role": "customer"}
+    metadata = claims.get("user_metadata") or {}
+    return {"user": claims.get("sub"), "role": metadata.get("role", "customer")}
+
+
+class TraceCaptureMiddleware:
+    """ASGI middleware recording sanitized traces of ``/api`` requests"""
+
+    def __init__(self, app, writer: TraceWriter, sample_rate: float = 1.0, sanitizer: Optional[Sanitizer] = None):
+        self.app = app
+        self.writer = writer
+        self.sample_rate = sample_rate
+        self.sanitizer = sanitizer or Sanitizer()
+        self.started = time.monotonic()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not scope['path'].startswith('/api') or (
+                self.sample_rate < 1.0 and random.random() >= self.sample_rate):
+            await self.app(scope, receive, send)
+            return
+
+        arrived = time.monotonic()
+        body = bytearray()
+        response: Dict[str, Any] = {"status": 0, "body": bytearray(), "json": False}
+
+        async def tee_receive():
+            message = await receive()
+            if message['type'] == 'http.request' and len(body) < MAX_BODY_BYTES:
+                body.extend(message.get('body', b''))
+            return message
+
+        async def tee_send(message):
+            if message['type'] == 'http.response.start':
+                response["status"] = message['status']
+                response["json"] = any(k == b'content-type' and v.startswith(b'application/json')
+                                       for k, v in message.get('headers', []))
+            elif message['type'] == 'http.response.body' and scope['method'] == 'POST' and response["json"] \
+                    and len(response["body"]) < MAX_BODY_BYTES:
+                response["body"].extend(message.get('body', b''))
+            await send(message)
+
+        try:
+            await self.app(scope, tee_receive, tee_send)
+        finally:
+            self._record(scope, arrived, bytes(body), response)
+
+    def _record(self, scope, arrived: float, body: bytes, response: Dict[str, Any]):
+        sanitize = self.sanitizer
+        route = scope.get('route')
+        headers = dict(scope.get('headers') or [])
+        identity = _identity(headers)
+        query = {}
+        for pair in scope.get('query_string', b'').decode('latin-1').split('&'):
+            if pair:
+                key, _, value = pair.partition('=')
+                query[key] = sanitize.value(key, value)
+        record = {
+            "t": round(arrived - self.started, 6),
+            "method": scope['method'],
+            "route": getattr(route, 'path', None) or scope['path'],
+            "path_params": {k: sanitize.hash_id(v) for k, v in (scope.get('path_params') or {}).items()},
+            "query": query,
+            "body": None,
+            "status": response["status"],
+            "duration_ms": round((time.monotonic() - arrived) * 1000, 3),
+            "user": sanitize.hash_id(identity["user"]) if identity["user"] else None,
+            "role": identity["role"],
+        }
+        if body:
+            try:
+                record["body"] = sanitize.shape(json.loads(body))
+            except ValueError:
+                record["body"] = f"bytes:{len(body)}"
+        if response["body"]:
+            try:
+                created = json.loads(bytes(response["body"]))
+                if isinstance(created, dict) and 'id' in created:
+                    record["result_id"] = sanitize.hash_id(created['id'])
+            except ValueError:
+                pass
+        self.writer.write(record)
+
+
+def install(app) -> Optional[TraceWriter]:
+    """Enable capture from ``SKILLHUB_TRACE_FILE`` / ``SKILLHUB_TRACE_SAMPLE``"""
+    path = os.environ.get('SKILLHUB_TRACE_FILE')
+    if not path:
+        return None
+    writer = TraceWriter(path)
+    app.add_middleware(TraceCaptureMiddleware, writer=writer,
+                       sample_rate=float(os.environ.get('SKILLHUB_TRACE_SAMPLE', 1.0)))
+    return writer
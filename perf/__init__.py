@@ -0,0 +1,20 @@
+"""
+SkillHub performance tooling.
+
+Load generation, synthetic data and benchmark helpers used to measure the
+backend in ``backend/``. Modules are run as scripts, e.g.::
+
+    python -m perf.loadgen --help
+"""
+
+from pathlib import Path
+import sys
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+BACKEND_DIR = ROOT_DIR / 'backend'
+
+
+def use_backend_path():
+    """Make the backend modules (``server``, ...) importable from perf tools"""
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.insert(0, str(BACKEND_DIR))
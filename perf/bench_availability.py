@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+SkillHub Availability Search Benchmark
+Times "which taskers of category Y are free from 2 to 5pm on day X" against
+the in-memory interval index (``backend/availability.py``) and against a
+vectorized scan over every booking (numpy masks over start/end columns, the
+best case for an approach without a per-tasker index).
+
+Examples:
+    # 50k taskers with 20 bookings each over the next 30 days, 500 queries
+    python -m perf.bench_availability --taskers 50000 --bookings 20 --queries 500
+
+Taskers have one to three of the ten seeded categories, spread over twenty
+cities; bookings are one to four hours within working hours, never
+overlapping per tasker. Queries ask for a random category, day and
+three-hour window, half of them within one city, and take the first
+``--limit`` free taskers by rating. Every query checks that both paths
+return the same taskers.
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from perf import use_backend_path
+
+CATEGORIES = ('Mounting & Installation', 'Furniture Assembly', 'Moving Help', 'Cleaning', 'Delivery',
+              'Handyman', 'Electrical', 'Plumbing', 'Painting', 'Yard Work')
+CITIES = tuple(f"City {i}" for i in range(20))
+DAY_START_H, DAY_END_H = 8, 20
+HOUR = 3600.0
+
+
+def percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+def summary(samples: List[float]) -> Dict[str, Any]:
+    return {"mean_ms": round(sum(samples) / len(samples) * 1000, 4),
+            "p50_ms": round(percentile(samples, 50) * 1000, 4),
+            "p99_ms": round(percentile(samples, 99) * 1000, 4)}
+
+
+def generate(taskers: int, bookings: int, days: int, start: datetime,
+             rng: random.Random) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Tasker profile rows and their non-overlapping booking rows"""
+    profiles, rows = [], []
+    for _ in range(taskers):
+        tasker_id = str(uuid.uuid4())
+        profiles.append({
+            "id": tasker_id, "role": "tasker", "full_name": "Bench tasker", "available": rng.random() < 0.9,
+            "average_rating": round(rng.uniform(3.0, 5.0), 2), "city": rng.choice(CITIES), "state": "ST",
+            "skills": rng.sample(CATEGORIES, rng.randint(1, 3)),
+        })
+        # Distinct days, then at most a few slots a day: sorted and disjoint
+        taken: Dict[int, float] = {}
+        for _ in range(bookings):
+            day = rng.randrange(days)
+            begin = max(taken.get(day, DAY_START_H), DAY_START_H + rng.randrange(0, 10))
+            hours = rng.randint(1, 4)
+            if begin + hours > DAY_END_H:
+                continue
+            taken[day] = begin + hours + rng.randint(0, 2)
+            starts = start + timedelta(days=day, hours=begin)
+            rows.append({"id": str(uuid.uuid4()), "tasker_id": tasker_id, "status": "confirmed",
+                         "starts_at": starts.isoformat(), "ends_at": (starts + timedelta(hours=hours)).isoformat()})
+    return profiles, rows
+
+
+class BookingScan:
+    """Free taskers by masking every booking's interval, then walking taskers by rating"""
+
+    def __init__(self, profiles: List[Dict[str, Any]], rows: List[Dict[str, Any]], epoch):
+        self.ids = [p["id"] for p in profiles]
+        code = {tasker_id: i for i, tasker_id in enumerate(self.ids)}
+        self.tasker = np.array([code[r["tasker_id"]] for r in rows], dtype=np.int32)
+        self.starts = np.array([epoch(r["starts_at"]) for r in rows])
+        self.ends = np.array([epoch(r["ends_at"]) for r in rows])
+        self.profiles = profiles
+        self.by_category = {c: sorted((i for i, p in enumerate(profiles) if c in p["skills"]),
+                                      key=lambda i: (-profiles[i]["average_rating"], self.ids[i]))
+                            for c in CATEGORIES}
+
+    def free(self, category: str, starts: float, ends: float, city: Optional[str], limit: int) -> List[str]:
+        busy = np.zeros(len(self.ids), dtype=bool)
+        busy[self.tasker[(self.starts < ends) & (self.ends > starts)]] = True
+        found = []
+        for i in self.by_category[category]:
+            profile = self.profiles[i]
+            if busy[i] or not profile["available"] or (city and profile["city"] != city):
+                continue
+            found.append(self.ids[i])
+            if len(found) >= limit:
+                break
+        return found
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--taskers", type=int, default=50_000)
+    parser.add_argument("--bookings", type=int, default=20, help="Bookings generated per tasker")
+    parser.add_argument("--days", type=int, default=30, help="Days the bookings spread over")
+    parser.add_argument("--queries", type=int, default=500, help="Timed availability queries per path")
+    parser.add_argument("--limit", type=int, default=20, help="Free taskers each query asks for")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--report", default=None, help="Write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    use_backend_path()
+    import availability
+
+    rng = random.Random(args.seed)
+    start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    profiles, rows = generate(args.taskers, args.bookings, args.days, start, rng)
+    print(f"{len(profiles)} taskers, {len(rows)} bookings")
+
+    started = time.perf_counter()
+    index = availability.AvailabilityIndex()
+    index.replace(profiles, rows)
+    build_s = time.perf_counter() - started
+    scan = BookingScan(profiles, rows, availability.epoch)
+
+    queries = []
+    for _ in range(args.queries):
+        starts = availability.epoch(start + timedelta(days=rng.randrange(args.days), hours=rng.randint(8, 17)))
+        queries.append((rng.choice(CATEGORIES), starts, starts + 3 * HOUR,
+                        rng.choice(CITIES) if rng.random() < 0.5 else None))
+
+    samples: Dict[str, List[float]] = {"interval index": [], "booking scan": []}
+    mismatches = 0
+    for category, starts, ends, city in queries:
+        began = time.perf_counter()
+        indexed = [t["id"] for t in index.free(category, starts, ends, city=city, limit=args.limit)]
+        samples["interval index"].append(time.perf_counter() - began)
+        began = time.perf_counter()
+        scanned = scan.free(category, starts, ends, city, args.limit)
+        samples["booking scan"].append(time.perf_counter() - began)
+        mismatches += indexed != scanned
+
+    results = {name: summary(times) for name, times in samples.items()}
+    print(f"index build: {build_s:.2f}s")
+    print(f"{'path':<16} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for name, result in results.items():
+        print(f"{name:<16} {result['mean_ms']:>9.4f} {result['p50_ms']:>9.4f} {result['p99_ms']:>9.4f}")
+    speedup = results["booking scan"]["mean_ms"] / results["interval index"]["mean_ms"]
+    print(f"interval index is {speedup:.1f}x faster")
+    if mismatches:
+        print(f"{mismatches} queries where the index and the scan disagree")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"config": vars(args), "bookings": len(rows), "build_s": round(build_s, 3),
+                       "results": results}, f, indent=2)
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
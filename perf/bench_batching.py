@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+SkillHub Message Batching Benchmark
+Compares message inserts per second through ``insert_message`` with and
+without the micro-batching writer (backend/batching.py), on the local data
+stand-in with injected per-call latency.
+
+Examples:
+    # 200 concurrent senders over 100 task chats, 5ms per database call
+    python -m perf.bench_batching --senders 200 --messages 2000 --latency-ms 5
+
+    # Sweep batch sizes and latency budgets
+    python -m perf.bench_batching --batch-size 10 50 100 --delay-ms 2 5
+
+Both paths run the handler's own reads and writes through the resilience
+layer's worker threads, so the unbatched path pays one insert and one
+re-read per message while a batch pays one of each for all its rows. Every
+run checks that each task's messages were stored in the order they were
+sent.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from perf import use_backend_path
+
+
+def load_server(latency_ms: float, jitter_ms: float):
+    os.environ["SKILLHUB_DATA_BACKEND"] = "standin"
+    os.environ["STANDIN_LATENCY_MS"] = str(latency_ms)
+    os.environ["STANDIN_JITTER_MS"] = str(jitter_ms)
+    use_backend_path()
+    import server
+    return server
+
+
+def seed(server, tasks: int) -> List[Dict[str, str]]:
+    """A customer and a tasker per task; returns the task participants"""
+    database = server.init_clients().database
+    category_id = str(uuid.uuid4())
+    database.insert_rows("task_categories", [{"id": category_id, "name": "Bench", "slug": "bench"}], upsert=True)
+    profiles, rows, chats = [], [], []
+    for i in range(tasks):
+        customer_id, tasker_id, task_id = str(uuid.uuid4()), str(uuid.uuid4()), str(uuid.uuid4())
+        for user_id, role in ((customer_id, "customer"), (tasker_id, "tasker")):
+            profiles.append({"id": user_id, "email": f"{user_id[:8]}@bench.local", "full_name": f"Bench {role}",
+                             "username": f"{role}_{user_id[:8]}", "role": role})
+        rows.append({"id": task_id, "customer_id": customer_id, "tasker_id": tasker_id, "category_id": category_id,
+                     "title": f"Bench task {i}", "description": "Chat throughput benchmark",
+                     "address": "1 Main St", "city": "New York", "state": "NY", "zip_code": "10001",
+                     "status": "assigned"})
+        chats.append({"task_id": task_id, "customer_id": customer_id, "tasker_id": tasker_id})
+    database.insert_rows("profiles", profiles, upsert=True)
+    database.insert_rows("tasks", rows, upsert=True)
+    return chats
+
+
+async def send_all(server, chats: List[Dict[str, str]], messages: int, senders: int) -> Dict[str, Any]:
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(messages):
+        queue.put_nowait(i)
+    # One sender per chat at a time keeps each chat's send order well defined
+    chat_locks = [asyncio.Lock() for _ in chats]
+    errors = 0
+
+    async def sender():
+        nonlocal errors
+        while not queue.empty():
+            i = queue.get_nowait()
+            chat = chats[i % len(chats)]
+            user = {"id": chat["customer_id"] if i % 2 else chat["tasker_id"]}
+            async with chat_locks[i % len(chats)]:
+                try:
+                    await server.insert_message(chat["task_id"], {"content": f"message {i:08d}"}, user)
+                except Exception:
+                    errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(sender() for _ in range(senders)))
+    elapsed = time.perf_counter() - started
+    return {"messages": messages, "errors": errors, "seconds": round(elapsed, 3),
+            "inserts_per_s": round((messages - errors) / elapsed, 1)}
+
+
+def check_order(server, chats: List[Dict[str, str]]) -> int:
+    """Number of chats whose stored order differs from the send order"""
+    database = server.supabase.database
+    out_of_order = 0
+    for chat in chats:
+        rows = database.conn.execute(
+            'SELECT content FROM "messages" WHERE task_id = ? ORDER BY created_at, rowid',
+            (chat["task_id"],)).fetchall()
+        contents = [row[0] for row in rows]
+        out_of_order += contents != sorted(contents)
+    return out_of_order
+
+
+def run_case(server, chats: List[Dict[str, str]], args, batch_size: Optional[int],
+             delay_ms: Optional[float]) -> Dict[str, Any]:
+    import batching
+    server.message_batcher = (batching.BatchWriter(server.write_message_rows, batch_size, delay_ms / 1000)
+                              if batch_size else None)
+    with server.supabase.database.lock:
+        server.supabase.database.conn.execute('DELETE FROM "messages"')
+    result = asyncio.run(send_all(server, chats, args.messages, args.senders))
+    result["out_of_order_chats"] = check_order(server, chats)
+    if server.message_batcher:
+        result.update(mean_batch=server.message_batcher.stats()["mean_batch"])
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--senders", type=int, default=200, help="Concurrent senders")
+    parser.add_argument("--tasks", type=int, default=100, help="Task chats the messages are spread over")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Injected latency per database call")
+    parser.add_argument("--jitter-ms", type=float, default=1.0)
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[50])
+    parser.add_argument("--delay-ms", type=float, nargs="+", default=[5.0], help="Batching latency budget")
+    parser.add_argument("--report", default=None, help="Write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    server = load_server(args.latency_ms, args.jitter_ms)
+    chats = seed(server, args.tasks)
+    cases = [("unbatched", None, None)] + [
+        (f"batch={size} delay={delay:g}ms", size, delay) for size in args.batch_size for delay in args.delay_ms]
+    results = {}
+    print(f"{'path':<26} {'inserts/s':>10} {'seconds':>8} {'errors':>7} {'mean batch':>11} {'misordered':>11}")
+    for name, size, delay in cases:
+        result = results[name] = run_case(server, chats, args, size, delay)
+        mean_batch = result.get("mean_batch")
+        print(f"{name:<26} {result['inserts_per_s']:>10.1f} {result['seconds']:>8.2f} {result['errors']:>7} "
+              f"{mean_batch if mean_batch is not None else '-':>11} {result['out_of_order_chats']:>11}")
+
+    baseline = results["unbatched"]["inserts_per_s"]
+    for name, result in results.items():
+        if name != "unbatched" and baseline:
+            print(f"{name}: {result['inserts_per_s'] / baseline:.1f}x the unbatched path")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+    return 1 if any(r["errors"] or r["out_of_order_chats"] for r in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+SkillHub Rating Aggregation Benchmark
+Compares the cost of a review insert under the old ``update_profile_stats``
+trigger (AVG/COUNT over all of the reviewee's reviews) with the incremental
+rating aggregates, and the rating-distribution read from the precomputed
+histogram with a GROUP BY over the reviews, on the local data stand-in.
+
+Examples:
+    # One tasker with 10k, then 50k existing reviews; time 500 more of each
+    python -m perf.bench_ratings --reviews 10000 50000 --inserts 500
+
+The stand-in mirrors both triggers in SQLite with ``idx_reviews_reviewee``,
+so the recompute reads an index range per insert just as Postgres would.
+Reviews are seeded before either trigger exists and the aggregates are
+backfilled, so only the timed inserts pay for a trigger. Every run checks
+that the incremental aggregates match a full recompute.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from perf import use_backend_path
+
+# The pre-aggregate trigger, as supabase_schema.sql had it
+RECOMPUTE_TRIGGER = '''
+    CREATE TRIGGER update_stats_on_review AFTER INSERT ON "reviews"
+    BEGIN
+      UPDATE "profiles" SET
+        "average_rating" = (SELECT round(avg("rating"), 2) FROM "reviews" WHERE "reviewee_id" = NEW."reviewee_id"),
+        "total_reviews" = (SELECT count(*) FROM "reviews" WHERE "reviewee_id" = NEW."reviewee_id")
+      WHERE "id" = NEW."reviewee_id";
+    END'''
+INCREMENTAL_TRIGGERS = ('rating_aggregates_on_insert', 'rating_aggregates_on_update', 'rating_aggregates_on_delete')
+
+
+def load_server():
+    os.environ["SKILLHUB_DATA_BACKEND"] = "standin"
+    use_backend_path()
+    import server
+    return server
+
+
+def percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+def summary(samples: List[float]) -> Dict[str, Any]:
+    return {"mean_ms": round(sum(samples) / len(samples) * 1000, 4),
+            "p50_ms": round(percentile(samples, 50) * 1000, 4),
+            "p99_ms": round(percentile(samples, 99) * 1000, 4)}
+
+
+def reset(database):
+    """Empty tables and drop both kinds of review trigger"""
+    with database.lock:
+        conn = database.conn
+        for table in ("reviews", "tasks", "profiles"):
+            conn.execute(f'DELETE FROM "{table}"')
+        for name in ("update_stats_on_review",) + INCREMENTAL_TRIGGERS:
+            conn.execute(f'DROP TRIGGER IF EXISTS {name}')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_reviews_reviewee ON "reviews" ("reviewee_id")')
+        conn.commit()
+
+
+def install(database, incremental: bool):
+    import standin
+    with database.lock:
+        if incremental:
+            for tables, sql in standin.SCHEMA_TRIGGERS:
+                if 'reviews' in tables:
+                    database.conn.execute(sql)
+        else:
+            database.conn.execute(RECOMPUTE_TRIGGER)
+        database.conn.commit()
+
+
+def seed(database, reviews: int, rng: random.Random) -> Dict[str, Any]:
+    """One tasker with ``reviews`` reviews from one customer, aggregates backfilled"""
+    tasker_id, customer_id = str(uuid.uuid4()), str(uuid.uuid4())
+    database.insert_rows("profiles", [
+        {"id": tasker_id, "email": "tasker@bench.local", "full_name": "Bench tasker",
+         "username": "bench_tasker", "role": "tasker"},
+        {"id": customer_id, "email": "customer@bench.local", "full_name": "Bench customer",
+         "username": "bench_customer", "role": "customer"},
+    ])
+    ratings = [rng.choice((1, 2, 3, 4, 4, 5, 5, 5)) for _ in range(reviews)]
+    database.insert_rows("reviews", [
+        {"task_id": str(uuid.uuid4()), "reviewer_id": customer_id, "reviewee_id": tasker_id, "rating": rating}
+        for rating in ratings])
+    histogram = [ratings.count(stars) for stars in range(1, 6)]
+    with database.lock:
+        # What the schema's backfill does for reviews written before the triggers
+        database.conn.execute(
+            'UPDATE "profiles" SET "rating_sum" = ?, "total_reviews" = ?, "rating_histogram" = ?, '
+            '"average_rating" = ? WHERE "id" = ?',
+            (sum(ratings), reviews, json.dumps(histogram), round(sum(ratings) / reviews, 2), tasker_id))
+        database.conn.commit()
+    return {"tasker_id": tasker_id, "customer_id": customer_id}
+
+
+def time_inserts(database, people: Dict[str, Any], inserts: int, rng: random.Random) -> List[float]:
+    samples = []
+    for _ in range(inserts):
+        row = {"task_id": str(uuid.uuid4()), "reviewer_id": people["customer_id"],
+               "reviewee_id": people["tasker_id"], "rating": rng.randint(1, 5)}
+        started = time.perf_counter()
+        database.insert_rows("reviews", [row])
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def time_distribution_reads(server, tasker_id: str, reads: int) -> Dict[str, List[float]]:
+    database = server.supabase.database
+    precomputed, grouped = [], []
+    for _ in range(reads):
+        started = time.perf_counter()
+        asyncio.run(server.get_rating_distribution(tasker_id))
+        precomputed.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        with database.lock:
+            database.conn.execute('SELECT "rating", count(*) FROM "reviews" WHERE "reviewee_id" = ? '
+                                  'GROUP BY "rating"', (tasker_id,)).fetchall()
+        grouped.append(time.perf_counter() - started)
+    return {"precomputed": precomputed, "group_by": grouped}
+
+
+def check_aggregates(database, tasker_id: str) -> bool:
+    """The running aggregates equal a recompute over the reviews"""
+    with database.lock:
+        stored = database.conn.execute(
+            'SELECT "rating_sum", "total_reviews", "rating_histogram" FROM "profiles" WHERE "id" = ?',
+            (tasker_id,)).fetchone()
+        rows = dict(database.conn.execute(
+            'SELECT "rating", count(*) FROM "reviews" WHERE "reviewee_id" = ? GROUP BY "rating"',
+            (tasker_id,)).fetchall())
+    expected = (sum(r * n for r, n in rows.items()), sum(rows.values()), [rows.get(r, 0) for r in range(1, 6)])
+    return (stored[0], stored[1], json.loads(stored[2])) == expected
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reviews", type=int, nargs="+", default=[10_000, 50_000],
+                        help="Existing reviews of the tasker")
+    parser.add_argument("--inserts", type=int, default=500, help="Timed review inserts per case")
+    parser.add_argument("--reads", type=int, default=200, help="Timed rating-distribution reads per case")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--report", default=None, help="Write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    server = load_server()
+    database = server.init_clients().database
+    results: Dict[str, Any] = {}
+    mismatches = 0
+    print(f"{'case':<34} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for reviews in args.reviews:
+        for incremental in (False, True):
+            rng = random.Random(args.seed)
+            reset(database)
+            people = seed(database, reviews, rng)
+            install(database, incremental)
+            name = f"insert {'incremental' if incremental else 'recompute'} @{reviews}"
+            result = results[name] = summary(time_inserts(database, people, args.inserts, rng))
+            print(f"{name:<34} {result['mean_ms']:>9.4f} {result['p50_ms']:>9.4f} {result['p99_ms']:>9.4f}")
+        mismatches += not check_aggregates(database, people["tasker_id"])
+        for path, samples in time_distribution_reads(server, people["tasker_id"], args.reads).items():
+            name = f"distribution {path} @{reviews}"
+            result = results[name] = summary(samples)
+            print(f"{name:<34} {result['mean_ms']:>9.4f} {result['p50_ms']:>9.4f} {result['p99_ms']:>9.4f}")
+
+    for reviews in args.reviews:
+        recompute = results[f"insert recompute @{reviews}"]["mean_ms"]
+        incremental = results[f"insert incremental @{reviews}"]["mean_ms"]
+        print(f"@{reviews} reviews: incremental insert is {recompute / incremental:.1f}x faster")
+    if mismatches:
+        print(f"{mismatches} case(s) with aggregates that don't match a recompute")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
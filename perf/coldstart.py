@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+SkillHub Cold Start Measurement
+Spawns ``uvicorn server:app`` repeatedly and measures the time from process
+spawn to the first successful response, to keep autoscaled workers fast to
+come up.
+
+Examples:
+    # Hermetic, on the local data stand-in; fail if the median exceeds 1.5s
+    python -m perf.coldstart --standin --runs 5 --max-ms 1500
+
+    # Against the configured Supabase project (backend/.env)
+    python -m perf.coldstart --runs 3 --path /api/ready
+
+Each run reports three milestones:
+    listening   the port accepts connections (import + lifespan done)
+    live        GET /api/live returns 200
+    first_ok    GET --path (default /api/categories) returns 200
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from perf import BACKEND_DIR
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_once(path: str, env: Dict[str, str], timeout: float) -> Dict[str, Optional[float]]:
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    milestones: Dict[str, Optional[float]] = {"listening": None, "live": None, "first_ok": None}
+    try:
+        with httpx.Client(base_url=base, timeout=1.0) as client:
+            deadline = started + timeout
+            while time.perf_counter() < deadline and milestones["first_ok"] is None:
+                if process.poll() is not None:
+                    raise RuntimeError(f"server exited during startup:\n{process.stderr.read().decode()[-2000:]}")
+                try:
+                    if milestones["listening"] is None:
+                        with socket.create_connection(("127.0.0.1", port), timeout=0.05):
+                            milestones["listening"] = _ms(started)
+                    if milestones["live"] is None and client.get("/api/live").status_code == 200:
+                        milestones["live"] = _ms(started)
+                    if milestones["live"] is not None and client.get(path).status_code == 200:
+                        milestones["first_ok"] = _ms(started)
+                        break
+                except (OSError, httpx.HTTPError):
+                    pass
+                time.sleep(0.005)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return milestones
+
+
+def _ms(started: float) -> float:
+    return (time.perf_counter() - started) * 1000
+
+
+def summarize(runs: List[Dict[str, Optional[float]]]) -> Dict[str, Any]:
+    summary = {}
+    for milestone in ("listening", "live", "first_ok"):
+        values = [run[milestone] for run in runs if run[milestone] is not None]
+        summary[milestone] = {
+            "median": statistics.median(values) if values else None,
+            "max": max(values) if values else None,
+            "failures": len(runs) - len(values),
+        }
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/api/categories", help="Request that must succeed")
+    parser.add_argument("--standin", action="store_true", help="Run the server on the local data stand-in")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Give up on a run after this many seconds")
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail if median first_ok exceeds this")
+    parser.add_argument("--report", default=None, help="Write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ)
+    if args.standin:
+        env["SKILLHUB_DATA_BACKEND"] = "standin"
+    runs = []
+    for i in range(args.runs):
+        run = measure_once(args.path, env, args.timeout)
+        runs.append(run)
+        print(f"run {i + 1}: " + "  ".join(
+            f"{name}={value:.0f}ms" if value is not None else f"{name}=timeout" for name, value in run.items()))
+
+    summary = summarize(runs)
+    print("\nmilestone       median       max  failures")
+    for name, row in summary.items():
+        median = f"{row['median']:.0f}ms" if row["median"] is not None else "-"
+        worst = f"{row['max']:.0f}ms" if row["max"] is not None else "-"
+        print(f"{name:<12} {median:>9} {worst:>9} {row['failures']:>9}")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"runs": runs, "summary": summary}, f, indent=2)
+
+    first_ok = summary["first_ok"]
+    if first_ok["failures"]:
+        print(f"\n{first_ok['failures']} run(s) never got a successful {args.path}")
+        return 1
+    if args.max_ms is not None and first_ok["median"] > args.max_ms:
+        print(f"\nCold start regression: median {first_ok['median']:.0f}ms > {args.max_ms:.0f}ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,551 @@
+#!/usr/bin/env python3
+"""
+SkillHub Synthetic Data Generator
+Fills the marketplace tables from supabase_schema.sql with realistic,
+correlated rows for scale testing. The output is deterministic for a given
+seed and scale.
+
+    python -m perf.datagen --scale large --seed 42 --out /tmp/skillhub-data
+    psql "$DATABASE_URL" -f /tmp/skillhub-data/load.sql
+
+    # Or stream straight into Postgres with COPY (needs psycopg 3)
+    python -m perf.datagen --scale medium --dsn postgresql://localhost/skillhub
+
+    # Small JSON fixtures for the local data stand-in (STANDIN_FIXTURES)
+    python -m perf.datagen --scale small --format fixtures --out /tmp/fixtures
+
+Shape of the data:
+  * category popularity follows a Zipf distribution
+  * profiles and tasks are clustered around weighted US cities
+  * taskers apply within their city, weighted by a Pareto activity score, so
+    application counts per task and per tasker are heavy tailed
+  * message counts per assigned task are log-normal
+  * profile stats (average_rating, total_reviews, rating_sum,
+    rating_histogram, total_tasks_completed) agree with the generated reviews
+    and completed tasks, and notification_counters with the notifications
+
+The ``large`` preset produces roughly 10M rows. Tables are written as
+PostgreSQL COPY text files; load.sql truncates the generated tables and bulk
+loads them with triggers disabled.
+"""
+
+import argparse
+import bisect
+import json
+import math
+import random
+import sys
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from perf import ROOT_DIR, use_backend_path
+
+try:
+    import psycopg
+except ImportError:  # optional, only needed for --dsn
+    psycopg = None
+
+# (city, state, zip prefix, latitude, longitude, weight)
+CITIES = [
+    ("New York", "NY", "100", 40.7128, -74.0060, 20.0),
+    ("Los Angeles", "CA", "900", 34.0522, -118.2437, 12.0),
+    ("Chicago", "IL", "606", 41.8781, -87.6298, 8.0),
+    ("Houston", "TX", "770", 29.7604, -95.3698, 6.5),
+    ("Phoenix", "AZ", "850", 33.4484, -112.0740, 4.5),
+    ("Philadelphia", "PA", "191", 39.9526, -75.1652, 4.5),
+    ("San Antonio", "TX", "782", 29.4241, -98.4936, 4.0),
+    ("San Diego", "CA", "921", 32.7157, -117.1611, 4.0),
+    ("Dallas", "TX", "752", 32.7767, -96.7970, 4.0),
+    ("Austin", "TX", "787", 30.2672, -97.7431, 3.5),
+    ("San Francisco", "CA", "941", 37.7749, -122.4194, 3.5),
+    ("Seattle", "WA", "981", 47.6062, -122.3321, 3.0),
+    ("Denver", "CO", "802", 39.7392, -104.9903, 3.0),
+    ("Boston", "MA", "021", 42.3601, -71.0589, 3.0),
+    ("Atlanta", "GA", "303", 33.7490, -84.3880, 3.0),
+    ("Miami", "FL", "331", 25.7617, -80.1918, 3.0),
+    ("Portland", "OR", "972", 45.5152, -122.6784, 2.0),
+    ("Nashville", "TN", "372", 36.1627, -86.7816, 2.0),
+    ("Minneapolis", "MN", "554", 44.9778, -93.2650, 2.0),
+    ("Pittsburgh", "PA", "152", 40.4406, -79.9959, 1.5),
+]
+
+TASK_STATUSES = ["posted", "assigned", "in_progress", "completed", "cancelled"]
+TASK_SIZES = [("small", 1.5, 60.0), ("medium", 3.0, 140.0), ("large", 6.0, 320.0)]
+URGENCIES = ["flexible", "within_week", "urgent"]
+RATINGS = [5, 4, 3, 2, 1]
+RATING_WEIGHTS = [60, 25, 8, 4, 3]
+FIRST_NAMES = ["Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie", "Avery", "Quinn",
+               "Maria", "James", "Priya", "Wei", "Fatima", "Diego", "Olga", "Kwame", "Hana", "Luca"]
+LAST_NAMES = ["Smith", "Garcia", "Chen", "Patel", "Johnson", "Kim", "Nguyen", "Brown", "Lopez", "Khan",
+              "Davis", "Martinez", "Okafor", "Rossi", "Ivanova", "Cohen", "Silva", "Tanaka", "Murphy", "Ali"]
+MESSAGE_LINES = [
+    "Hi! I can help with this.", "What time works best for you?", "I'll bring my own tools.",
+    "Running about 10 minutes late.", "Is parking available nearby?", "Done, please take a look.",
+    "Thanks so much!", "Can you send a photo of the area?", "Tomorrow morning works for me.",
+]
+
+# Columns written per table, in COPY order
+COLUMNS = {
+    "auth_users": ("id", "email"),
+    "task_categories": ("id", "name", "slug", "description", "icon", "color", "is_active", "sort_order",
+                        "created_at"),
+    "profiles": ("id", "email", "full_name", "username", "role", "hourly_rate", "bio", "skills", "available",
+                 "verification_status", "city", "state", "zip_code", "latitude", "longitude",
+                 "total_tasks_completed", "average_rating", "total_reviews", "rating_sum", "rating_histogram",
+                 "created_at", "updated_at"),
+    "tasks": ("id", "customer_id", "tasker_id", "category_id", "title", "description", "address", "city",
+              "state", "zip_code", "latitude", "longitude", "task_date", "flexible_date", "estimated_hours",
+              "budget_min", "budget_max", "final_price", "task_size", "status", "urgency", "created_at",
+              "updated_at", "completed_at"),
+    "task_applications": ("id", "task_id", "tasker_id", "message", "proposed_price", "estimated_time", "status",
+                          "created_at", "updated_at"),
+    "messages": ("id", "task_id", "sender_id", "receiver_id", "content", "message_type", "read_at",
+                 "created_at"),
+    "reviews": ("id", "task_id", "reviewer_id", "reviewee_id", "rating", "comment", "created_at"),
+    "notifications": ("id", "user_id", "title", "message", "type", "read", "created_at", "data"),
+}
+# Load order respects foreign keys
+LOAD_ORDER = ["auth_users", "task_categories", "profiles", "tasks", "task_applications", "messages",
+              "reviews", "notifications"]
+TABLE_NAMES = {"auth_users": "auth.users"}
+# Rows the bulk load's skipped triggers would have maintained
+DERIVED_SQL = [
+    "INSERT INTO public.notification_counters (user_id, unread) "
+    "SELECT user_id, count(*) FILTER (WHERE NOT read) FROM public.notifications GROUP BY user_id",
+]
+
+
+@dataclass(frozen=True)
+class Scale:
+    customers: int
+    taskers: int
+    tasks: int
+    mean_applications: float = 2.5
+    mean_messages: float = 6.0
+
+
+SCALES = {
+    "tiny": Scale(customers=40, taskers=20, tasks=150),
+    "small": Scale(customers=2_000, taskers=600, tasks=10_000),
+    "medium": Scale(customers=40_000, taskers=10_000, tasks=200_000),
+    # ~0.8M tasks, ~1.7M applications, ~3.2M messages, ~0.6M reviews, ~3.4M notifications:
+    # ~10M rows in total
+    "large": Scale(customers=150_000, taskers=40_000, tasks=780_000),
+}
+
+
+# ======================================
+# HELPERS
+# ======================================
+
+def make_uuid(rng: random.Random) -> str:
+    """Random (version 4 shaped) UUID drawn from ``rng`` so output is reproducible"""
+    h = f"{rng.getrandbits(128):032x}"
+    return f"{h[:8]}-{h[8:12]}-4{h[13:16]}-a{h[17:20]}-{h[20:32]}"
+
+
+def zipf_weights(n: int, s: float = 1.1) -> List[float]:
+    return [1.0 / (rank ** s) for rank in range(1, n + 1)]
+
+
+class WeightedChoice:
+    """O(log n) sampling from a fixed weighted population"""
+
+    __slots__ = ("items", "cumulative", "total")
+
+    def __init__(self, items: Sequence[Any], weights: Sequence[float]):
+        self.items = items
+        self.cumulative = []
+        total = 0.0
+        for weight in weights:
+            total += weight
+            self.cumulative.append(total)
+        self.total = total
+
+    def __bool__(self) -> bool:
+        return bool(self.items)
+
+    def pick(self, rng: random.Random) -> Any:
+        return self.items[bisect.bisect_right(self.cumulative, rng.random() * self.total)]
+
+
+def _ts(value: datetime) -> str:
+    return value.isoformat(sep=" ")
+
+
+def _copy_escape(value: str) -> str:
+    if "\\" in value or "\t" in value or "\n" in value or "\r" in value:
+        return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+    return value
+
+
+def _copy_value(value: Any) -> str:
+    """Encode one value in PostgreSQL COPY text format"""
+    kind = type(value)
+    if kind is str:
+        return _copy_escape(value)
+    if value is None:
+        return "\\N"
+    if kind is bool:
+        return "t" if value else "f"
+    if kind is int or kind is float:
+        return repr(value)
+    if kind is list or kind is tuple:
+        value = "{" + ",".join('"' + str(v).replace("\\", "\\\\").replace('"', '\\"') + '"' for v in value) + "}"
+    elif kind is dict:
+        value = json.dumps(value, separators=(",", ":"))
+    else:
+        value = str(value)
+    return _copy_escape(value)
+
+
+def load_categories() -> List[Dict[str, Any]]:
+    """Categories from the schema's seed INSERT, with ids derived from the slug"""
+    use_backend_path()
+    from standin import parse_seed_rows
+    rows = parse_seed_rows((ROOT_DIR / "supabase_schema.sql").read_text())["task_categories"]
+    for row in rows:
+        row["id"] = str(uuid.uuid5(uuid.NAMESPACE_URL, f"skillhub:category:{row['slug']}"))
+        row["is_active"] = True
+    return rows
+
+
+# ======================================
+# WRITERS
+# ======================================
+
+class CopyWriter:
+    """Streams each table to ``<table>.tsv`` in COPY text format"""
+
+    def __init__(self, out_dir: Path):
+        self.out_dir = out_dir
+        out_dir.mkdir(parents=True, exist_ok=True)
+        self.files = {table: open(out_dir / f"{table}.tsv", "w", encoding="utf-8", newline="\n")
+                      for table in COLUMNS}
+        self.counts = {table: 0 for table in COLUMNS}
+
+    def write(self, table: str, row: Tuple):
+        self.files[table].write("\t".join(map(_copy_value, row)) + "\n")
+        self.counts[table] += 1
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        with open(self.out_dir / "load.sql", "w") as f:
+            f.write(load_script(self.out_dir))
+
+
+class FixtureWriter:
+    """Collects rows as stand-in fixtures (``{"table": [row, ...]}``)"""
+
+    def __init__(self, out_dir: Path):
+        self.out_dir = out_dir
+        out_dir.mkdir(parents=True, exist_ok=True)
+        self.tables: Dict[str, List[Dict[str, Any]]] = {t: [] for t in COLUMNS if t != "auth_users"}
+        self.counts = {table: 0 for table in COLUMNS}
+
+    def write(self, table: str, row: Tuple):
+        self.counts[table] += 1
+        if table in self.tables:
+            self.tables[table].append(dict(zip(COLUMNS[table], row)))
+
+    def close(self):
+        with open(self.out_dir / "fixtures.json", "w") as f:
+            json.dump(self.tables, f, default=str)
+
+
+def load_script(out_dir: Path) -> str:
+    """psql script that bulk loads the generated files"""
+    lines = [
+        "-- Generated by perf/datagen.py. Replaces the contents of every generated table.",
+        "\\set ON_ERROR_STOP on",
+        "BEGIN;",
+        "-- Skip FK and stats triggers during the bulk load; the files are consistent",
+        "SET LOCAL session_replication_role = replica;",
+        "TRUNCATE " + ", ".join(f"public.{t}" for t in LOAD_ORDER if t != "auth_users") + " CASCADE;",
+        "DELETE FROM auth.users;",
+    ]
+    for table in LOAD_ORDER:
+        name = TABLE_NAMES.get(table, f"public.{table}")
+        path = (out_dir / f"{table}.tsv").resolve()
+        lines.append(f"\\copy {name} ({', '.join(COLUMNS[table])}) FROM '{path}'")
+    lines += [f"{sql};" for sql in DERIVED_SQL]
+    lines += ["COMMIT;", "ANALYZE;", ""]
+    return "\n".join(lines)
+
+
+def copy_into_postgres(dsn: str, out_dir: Path):
+    """Bulk load generated files through psycopg's COPY FROM STDIN"""
+    if psycopg is None:
+        raise SystemExit("--dsn requires psycopg (pip install 'psycopg[binary]')")
+    with psycopg.connect(dsn) as conn:
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL session_replication_role = replica")
+            cur.execute("TRUNCATE " + ", ".join(f"public.{t}" for t in LOAD_ORDER if t != "auth_users")
+                        + " CASCADE")
+            cur.execute("DELETE FROM auth.users")
+            for table in LOAD_ORDER:
+                name = TABLE_NAMES.get(table, f"public.{table}")
+                with cur.copy(f"COPY {name} ({', '.join(COLUMNS[table])}) FROM STDIN") as copy:
+                    with open(out_dir / f"{table}.tsv", "rb") as f:
+                        while chunk := f.read(1 << 20):
+                            copy.write(chunk)
+            for sql in DERIVED_SQL:
+                cur.execute(sql)
+        conn.commit()
+        conn.autocommit = True
+        conn.execute("ANALYZE")
+
+
+# ======================================
+# GENERATOR
+# ======================================
+
+class DataGenerator:
+    def __init__(self, scale: Scale, seed: int, now: Optional[datetime] = None):
+        self.scale = scale
+        self.seed = seed
+        # A fixed clock keeps the output identical between runs
+        self.now = now or datetime(2025, 6, 1, tzinfo=timezone.utc)
+        self.categories = load_categories()
+        self.category_pick = WeightedChoice(list(range(len(self.categories))),
+                                            zipf_weights(len(self.categories)))
+        self.city_pick = WeightedChoice(list(range(len(CITIES))), [c[5] for c in CITIES])
+
+    def _rng(self, stream: str) -> random.Random:
+        return random.Random(f"{self.seed}:{stream}")
+
+    def _point(self, rng: random.Random, city: int) -> Tuple[float, float]:
+        _, _, _, lat, lng, _ = CITIES[city]
+        return round(rng.gauss(lat, 0.08), 6), round(rng.gauss(lng, 0.10), 6)
+
+    def generate(self, writer) -> Dict[str, int]:
+        scale = self.scale
+        for category in self.categories:
+            row = dict(category, created_at=_ts(self.now - timedelta(days=400)))
+            writer.write("task_categories", tuple(row.get(c) for c in COLUMNS["task_categories"]))
+
+        # Profiles are written last (their stats depend on reviews) but their
+        # identity, role and location are needed up front.
+        rng = self._rng("profiles")
+        total = scale.customers + scale.taskers
+        ids = [make_uuid(rng) for _ in range(total)]
+        cities = [self.city_pick.pick(rng) for _ in range(total)]
+        roles = ["customer"] * scale.customers + ["tasker"] * scale.taskers
+        joined = [self.now - timedelta(days=rng.uniform(30, 730)) for _ in range(total)]
+
+        tasker_skills: Dict[int, List[int]] = {}
+        by_city: Dict[int, List[int]] = {}
+        activity: Dict[int, float] = {}
+        for index in range(scale.customers, total):
+            skills = {self.category_pick.pick(rng) for _ in range(rng.randint(1, 3))}
+            tasker_skills[index] = sorted(skills)
+            activity[index] = rng.paretovariate(1.3)
+            by_city.setdefault(cities[index], []).append(index)
+        city_taskers = {city: WeightedChoice(members, [activity[m] for m in members])
+                        for city, members in by_city.items()}
+        customers_by_city: Dict[int, List[int]] = {}
+        for index in range(scale.customers):
+            customers_by_city.setdefault(cities[index], []).append(index)
+
+        rating_sum = [0] * total
+        rating_count = [0] * total
+        rating_histogram = [[0] * 5 for _ in range(total)]
+        completed = [0] * total
+
+        rng = self._rng("tasks")
+        for _ in range(scale.tasks):
+            self._task(rng, writer, ids, cities, customers_by_city, city_taskers,
+                       rating_sum, rating_count, rating_histogram, completed)
+
+        rng = self._rng("profile-rows")
+        for index in range(total):
+            self._profile(rng, writer, index, ids[index], roles[index], cities[index], joined[index],
+                          tasker_skills.get(index), rating_sum[index], rating_count[index],
+                          rating_histogram[index], completed[index])
+        writer.close()
+        return writer.counts
+
+    def _profile(self, rng, writer, index, profile_id, role, city, joined, skills, r_sum, r_count, r_histogram,
+                 done):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        name, state, zip_prefix = CITIES[city][0], CITIES[city][1], CITIES[city][2]
+        lat, lng = self._point(rng, city)
+        username = f"{first.lower()}{last.lower()}{index}"
+        email = f"{username}@example.test"
+        tasker = role == "tasker"
+        average = round(r_sum / r_count, 2) if r_count else 0
+        writer.write("auth_users", (profile_id, email))
+        writer.write("profiles", (
+            profile_id, email, f"{first} {last}", username, role,
+            round(rng.uniform(25, 120), 2) if tasker else None,
+            f"{first} has been helping neighbors in {name} for years." if tasker else None,
+            [self.categories[s]["name"] for s in skills] if tasker else None,
+            rng.random() < 0.8 if tasker else True,
+            rng.choices(["verified", "pending", "rejected"], [70, 25, 5])[0] if tasker else "pending",
+            name, state, f"{zip_prefix}{rng.randint(0, 99):02d}", lat, lng,
+            done, average, r_count, r_sum, r_histogram, _ts(joined), _ts(joined),
+        ))
+
+    def _task(self, rng, writer, ids, cities, customers_by_city, city_taskers,
+              rating_sum, rating_count, rating_histogram, completed):
+        city = self.city_pick.pick(rng)
+        customers = customers_by_city.get(city)
+        customer = rng.choice(customers) if customers else rng.randrange(self.scale.customers)
+        category = self.category_pick.pick(rng)
+        size, hours, price = rng.choices(TASK_SIZES, [35, 45, 20])[0]
+        age_days = rng.uniform(0, 365)
+        created = self.now - timedelta(days=age_days)
+        # Recent tasks are mostly still open, old ones mostly finished
+        if age_days < 14:
+            status = rng.choices(TASK_STATUSES, [65, 15, 10, 5, 5])[0]
+        else:
+            status = rng.choices(TASK_STATUSES, [8, 4, 3, 70, 15])[0]
+        budget_min = round(price * rng.uniform(0.6, 1.0), 2)
+        budget_max = round(budget_min * rng.uniform(1.2, 1.8), 2)
+        estimated = round(hours * rng.uniform(0.7, 1.4), 2)
+        task_id = make_uuid(rng)
+        task_day = (created + timedelta(days=rng.uniform(1, 21))).date()
+
+        # Heavy-tailed applicant count, limited to taskers in the same city
+        pool = city_taskers.get(city)
+        applicants: List[int] = []
+        if pool:
+            wanted = min(int(rng.paretovariate(1.6) * self.scale.mean_applications * 0.4), 60,
+                         len(pool.items))
+            if status not in ("posted", "cancelled"):
+                wanted = max(wanted, 1)
+            seen = set()
+            for _ in range(wanted * 3):
+                if len(applicants) >= wanted:
+                    break
+                tasker = pool.pick(rng)
+                if tasker not in seen:
+                    seen.add(tasker)
+                    applicants.append(tasker)
+
+        assigned = applicants[0] if applicants and status not in ("posted", "cancelled") else None
+        if assigned is None and status not in ("posted", "cancelled"):
+            status = "posted"
+        final_price = round(rng.uniform(budget_min, budget_max), 2) if status == "completed" else None
+        completed_at = created + timedelta(days=rng.uniform(1, 25)) if status == "completed" else None
+        updated = completed_at or created + timedelta(hours=rng.uniform(0, 72))
+        lat, lng = self._point(rng, city)
+        name, state, zip_prefix = CITIES[city][0], CITIES[city][1], CITIES[city][2]
+        cat = self.categories[category]
+
+        writer.write("tasks", (
+            task_id, ids[customer], ids[assigned] if assigned is not None else None, cat["id"],
+            f"{cat['name']} help needed", f"Looking for help with {cat['description'].lower()}.",
+            f"{rng.randint(1, 9999)} Main St", name, state, f"{zip_prefix}{rng.randint(0, 99):02d}", lat, lng,
+            task_day.isoformat(), rng.random() < 0.3, estimated, budget_min, budget_max, final_price, size,
+            status, rng.choices(URGENCIES, [55, 30, 15])[0], _ts(created), _ts(updated),
+            _ts(completed_at) if completed_at else None,
+        ))
+
+        for tasker in applicants:
+            applied = created + timedelta(minutes=rng.expovariate(1 / 240))
+            if assigned is None:
+                app_status = "pending" if status == "posted" else "rejected"
+            else:
+                app_status = "accepted" if tasker == assigned else "rejected"
+            writer.write("task_applications", (
+                make_uuid(rng), task_id, ids[tasker], "I'd be happy to help with this task.",
+                round(rng.uniform(budget_min, budget_max), 2), estimated, app_status, _ts(applied), _ts(applied),
+            ))
+            writer.write("notifications", (
+                make_uuid(rng), ids[customer], "New application", f"A tasker applied to {cat['name']}",
+                "application", age_days > 3, _ts(applied), {"task_id": task_id},
+            ))
+
+        if assigned is None:
+            return
+        writer.write("notifications", (
+            make_uuid(rng), ids[assigned], "Application accepted", "You've been hired!", "task",
+            age_days > 3, _ts(created + timedelta(hours=6)), {"task_id": task_id},
+        ))
+
+        # Log-normal conversation length
+        mu = math.log(self.scale.mean_messages) - 0.5
+        count = min(int(rng.lognormvariate(mu, 1.0)), 400)
+        sent = created + timedelta(hours=6)
+        for n in range(count):
+            sent += timedelta(minutes=rng.expovariate(1 / 90))
+            sender, receiver = (customer, assigned) if n % 2 == 0 else (assigned, customer)
+            read_at = _ts(sent + timedelta(minutes=rng.expovariate(1 / 30))) if age_days > 2 or n < count - 2 else None
+            writer.write("messages", (
+                make_uuid(rng), task_id, ids[sender], ids[receiver], rng.choice(MESSAGE_LINES), "text",
+                read_at, _ts(sent),
+            ))
+        if count:
+            writer.write("notifications", (
+                make_uuid(rng), ids[customer], "New message", "You have a new message", "message",
+                age_days > 2, _ts(sent), {"task_id": task_id},
+            ))
+
+        if status != "completed":
+            return
+        completed[assigned] += 1
+        reviews = [(customer, assigned, 0.7), (assigned, customer, 0.4)]
+        for reviewer, reviewee, probability in reviews:
+            if rng.random() >= probability:
+                continue
+            rating = rng.choices(RATINGS, RATING_WEIGHTS)[0]
+            rating_sum[reviewee] += rating
+            rating_count[reviewee] += 1
+            rating_histogram[reviewee][rating - 1] += 1
+            reviewed = completed_at + timedelta(hours=rng.uniform(1, 96))
+            writer.write("reviews", (
+                make_uuid(rng), task_id, ids[reviewer], ids[reviewee], rating,
+                "Great work, would hire again." if rating >= 4 else "Could have gone better.", _ts(reviewed),
+            ))
+            writer.write("notifications", (
+                make_uuid(rng), ids[reviewee], "New review", f"You received a {rating}-star review", "review",
+                True, _ts(reviewed), {"task_id": task_id},
+            ))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--customers", type=int, help="Override the preset's customer count")
+    parser.add_argument("--taskers", type=int, help="Override the preset's tasker count")
+    parser.add_argument("--tasks", type=int, help="Override the preset's task count")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="skillhub-data", help="Output directory")
+    parser.add_argument("--format", choices=["copy", "fixtures"], default="copy")
+    parser.add_argument("--dsn", help="Also COPY the generated files into this Postgres database")
+    args = parser.parse_args(argv)
+
+    preset = SCALES[args.scale]
+    scale = Scale(
+        customers=args.customers or preset.customers,
+        taskers=args.taskers or preset.taskers,
+        tasks=args.tasks if args.tasks is not None else preset.tasks,
+    )
+    out_dir = Path(args.out)
+    writer = FixtureWriter(out_dir) if args.format == "fixtures" else CopyWriter(out_dir)
+
+    started = time.perf_counter()
+    counts = DataGenerator(scale, args.seed).generate(writer)
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    for table in LOAD_ORDER:
+        print(f"{table:<20} {counts[table]:>12,}")
+    print(f"{'total':<20} {total:>12,}  ({elapsed:.1f}s, {total / elapsed:,.0f} rows/s) -> {out_dir}")
+
+    if args.dsn:
+        if args.format != "copy":
+            parser.error("--dsn needs --format copy")
+        started = time.perf_counter()
+        copy_into_postgres(args.dsn, out_dir)
+        print(f"Loaded into Postgres in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,628 @@
+#!/usr/bin/env python3
+"""
+SkillHub Load Generation Suite
+Drives concurrent, realistic traffic mixes against the SkillHub API and
+reports throughput plus p50/p95/p99 latency per endpoint.
+
+Examples:
+    # Against a running server, with distinct customer/tasker identities
+    python -m perf.loadgen --base-url http://localhost:8001 \\
+        --users 50 --ramp-up 10 --duration 60 --jwt-secret "$SUPABASE_JWT_SECRET"
+
+    # Hermetic: in-process app on the local data stand-in, 5ms +/- 2ms per call
+    python -m perf.loadgen --standin --users 20 --duration 30
+
+    # Fail the run (exit code 1) on latency or error regressions
+    python -m perf.loadgen --max-p95 '*=300' --max-p99 'GET /api/tasks=800' \\
+        --max-error-rate 0.01 --report load_report.json
+
+Virtual users are split into customers and taskers. Without a JWT secret the
+server maps every token to the demo customer, so only the read-only
+scenarios (browse, detail) are run.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import secrets
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+import jwt
+
+from perf import ROOT_DIR, use_backend_path
+
+DEFAULT_MIX = {"browse": 50, "detail": 25, "chat": 15, "apply": 10}
+READ_ONLY_SCENARIOS = ("browse", "detail")
+PERCENTILES = (50, 95, 99)
+
+
+def get_backend_url() -> str:
+    """Read the backend URL from frontend/.env, falling back to a local server"""
+    try:
+        with open(ROOT_DIR / 'frontend' / '.env', 'r') as f:
+            for line in f:
+                if line.startswith('EXPO_PUBLIC_BACKEND_URL='):
+                    return line.split('=', 1)[1].strip()
+    except OSError:
+        pass
+    return "http://localhost:8001"
+
+
+def percentile(sorted_samples: List[float], pct: float) -> float:
+    """Percentile of already sorted samples, linearly interpolated"""
+    if not sorted_samples:
+        return 0.0
+    rank = (len(sorted_samples) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(sorted_samples) - 1)
+    return sorted_samples[low] + (sorted_samples[high] - sorted_samples[low]) * (rank - low)
+
+
+def mint_token(secret: str, user_id: str, role: str, ttl: int = 3600) -> str:
+    """Mint a Supabase-shaped access token for a virtual user"""
+    now = int(time.time())
+    claims = {
+        "sub": user_id,
+        "aud": "authenticated",
+        "role": "authenticated",
+        "email": f"{role}-{user_id[:8]}@loadtest.local",
+        "user_metadata": {"role": role},
+        "iat": now,
+        "exp": now + ttl,
+    }
+    return jwt.encode(claims, secret, algorithm="HS256")
+
+
+# ======================================
+# STATS
+# ======================================
+
+class EndpointStats:
+    """Latency samples and status codes for one endpoint"""
+
+    __slots__ = ("latencies", "statuses", "errors")
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.statuses: Dict[int, int] = {}
+        self.errors = 0
+
+    def record(self, latency_ms: float, status_code: int):
+        self.latencies.append(latency_ms)
+        self.statuses[status_code] = self.statuses.get(status_code, 0) + 1
+        # Status 0 marks a transport failure (timeout, connection reset, ...)
+        if status_code == 0 or status_code >= 400:
+            self.errors += 1
+
+    def summary(self, duration_s: float) -> Dict[str, Any]:
+        samples = sorted(self.latencies)
+        count = len(samples)
+        result = {
+            "count": count,
+            "rps": count / duration_s if duration_s else 0.0,
+            "error_rate": self.errors / count if count else 0.0,
+            "mean": sum(samples) / count if count else 0.0,
+            "max": samples[-1] if samples else 0.0,
+            "statuses": {str(code): n for code, n in sorted(self.statuses.items())},
+        }
+        for pct in PERCENTILES:
+            result[f"p{pct}"] = percentile(samples, pct)
+        return result
+
+
+class LatencyRecorder:
+    """Collects per-endpoint samples for a whole run"""
+
+    def __init__(self):
+        self.endpoints: Dict[str, EndpointStats] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def record(self, endpoint: str, latency_ms: float, status_code: int):
+        stats = self.endpoints.get(endpoint)
+        if stats is None:
+            stats = self.endpoints[endpoint] = EndpointStats()
+        stats.record(latency_ms, status_code)
+
+    def summary(self) -> Dict[str, Any]:
+        duration = (self.finished_at or time.monotonic()) - (self.started_at or time.monotonic())
+        overall = EndpointStats()
+        for stats in self.endpoints.values():
+            overall.latencies.extend(stats.latencies)
+            overall.errors += stats.errors
+            for code, n in stats.statuses.items():
+                overall.statuses[code] = overall.statuses.get(code, 0) + n
+        return {
+            "duration_s": duration,
+            "overall": overall.summary(duration),
+            "endpoints": {
+                name: stats.summary(duration)
+                for name, stats in sorted(self.endpoints.items())
+            },
+        }
+
+
+# ======================================
+# VIRTUAL USERS AND SHARED STATE
+# ======================================
+
+@dataclass
+class VirtualUser:
+    index: int
+    user_id: str
+    role: str
+    token: str
+    rng: random.Random
+
+
+@dataclass
+class Conversation:
+    task_id: str
+    customer: VirtualUser
+    tasker: VirtualUser
+
+
+@dataclass
+class SharedState:
+    """Ids discovered during the run, shared between virtual users"""
+    users: List[VirtualUser]
+    category_ids: List[str] = field(default_factory=list)
+    task_ids: List[str] = field(default_factory=list)
+    conversations: List[Conversation] = field(default_factory=list)
+    max_known: int = 1000
+
+    def remember_tasks(self, ids: List[str]):
+        known = set(self.task_ids)
+        self.task_ids.extend(i for i in ids if i not in known)
+        del self.task_ids[:-self.max_known]
+
+    def remember_conversation(self, conversation: Conversation):
+        self.conversations.append(conversation)
+        del self.conversations[:-self.max_known]
+
+    def pick_user(self, role: str, rng: random.Random) -> Optional[VirtualUser]:
+        candidates = [u for u in self.users if u.role == role]
+        return rng.choice(candidates) if candidates else None
+
+
+def build_identities(count: int, tasker_ratio: float, seed: int) -> List[Tuple[str, str]]:
+    """Deterministic (user_id, role) pairs for the virtual users"""
+    rng = random.Random(seed)
+    taskers = round(count * tasker_ratio)
+    return [
+        (str(uuid.UUID(int=rng.getrandbits(128), version=4)), "tasker" if i < taskers else "customer")
+        for i in range(count)
+    ]
+
+
+def build_users(config: "LoadConfig") -> List[VirtualUser]:
+    users = []
+    identities = build_identities(config.users, config.tasker_ratio, config.seed)
+    for index, (user_id, role) in enumerate(identities):
+        if config.jwt_secret:
+            token = mint_token(config.jwt_secret, user_id, role)
+        else:
+            # Static tokens all resolve to the server's demo customer
+            user_id, role, token = "demo-user-id", "customer", config.token
+        users.append(VirtualUser(index, user_id, role, token, random.Random(config.seed + index)))
+    return users
+
+
+# ======================================
+# SCENARIOS
+# ======================================
+
+class LoadSession:
+    """Issues requests on behalf of virtual users and records their latency"""
+
+    def __init__(self, client: httpx.AsyncClient, recorder: LatencyRecorder, deadline: float):
+        self.client = client
+        self.recorder = recorder
+        self.deadline = deadline
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.deadline
+
+    async def request(self, user: VirtualUser, method: str, route: str, path: str,
+                      **kwargs) -> Optional[httpx.Response]:
+        """Send a request; ``route`` is the template used to group samples"""
+        headers = {"Authorization": f"Bearer {user.token}"}
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, headers=headers, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.record(f"{method} {route}", (time.perf_counter() - start) * 1000, 0)
+            return None
+        self.recorder.record(f"{method} {route}", (time.perf_counter() - start) * 1000,
+                             response.status_code)
+        return response
+
+
+def _json(response: Optional[httpx.Response]) -> Any:
+    if response is None or response.status_code >= 400:
+        return None
+    try:
+        return response.json()
+    except ValueError:
+        return None
+
+
+def _task_payload(rng: random.Random, state: SharedState) -> Dict[str, Any]:
+    return {
+        "title": f"Load test task {rng.randrange(1_000_000)}",
+        "description": "Mount a 55 inch TV on drywall, mount already purchased.",
+        "category_id": rng.choice(state.category_ids) if state.category_ids else None,
+        "address": "123 Main St",
+        "city": "New York",
+        "state": "NY",
+        "zip_code": "10001",
+        "task_size": rng.choice(["small", "medium", "large"]),
+        "urgency": rng.choice(["flexible", "within_week", "urgent"]),
+        "budget_min": 50,
+        "budget_max": 150,
+    }
+
+
+async def scenario_browse(session: LoadSession, user: VirtualUser, state: SharedState):
+    """Tasker/customer landing: task feed plus categories"""
+    tasks = _json(await session.request(user, "GET", "/api/tasks", "/api/tasks"))
+    if isinstance(tasks, list):
+        state.remember_tasks([t["id"] for t in tasks if "id" in t])
+    await session.request(user, "GET", "/api/categories", "/api/categories")
+
+
+async def scenario_detail(session: LoadSession, user: VirtualUser, state: SharedState):
+    """Open a task detail screen"""
+    if not state.task_ids:
+        return await scenario_browse(session, user, state)
+    task_id = user.rng.choice(state.task_ids)
+    await session.request(user, "GET", "/api/tasks/{task_id}", f"/api/tasks/{task_id}")
+
+
+async def scenario_chat(session: LoadSession, user: VirtualUser, state: SharedState):
+    """One side sends a message, the other side loads the thread"""
+    if not state.conversations:
+        return await scenario_apply(session, user, state)
+    conversation = user.rng.choice(state.conversations)
+    sender, receiver = conversation.customer, conversation.tasker
+    if user.rng.random() < 0.5:
+        sender, receiver = receiver, sender
+    path = f"/api/tasks/{conversation.task_id}/messages"
+    await session.request(sender, "POST", "/api/tasks/{task_id}/messages", path,
+                          json={"content": "Are you still available tomorrow?"})
+    await session.request(receiver, "GET", "/api/tasks/{task_id}/messages", path)
+
+
+async def scenario_apply(session: LoadSession, user: VirtualUser, state: SharedState):
+    """Customer posts a task, a tasker applies and the customer accepts"""
+    customer = user if user.role == "customer" else state.pick_user("customer", user.rng)
+    tasker = user if user.role == "tasker" else state.pick_user("tasker", user.rng)
+    if customer is None or tasker is None:
+        return await scenario_browse(session, user, state)
+
+    task = _json(await session.request(customer, "POST", "/api/tasks", "/api/tasks",
+                                       json=_task_payload(user.rng, state)))
+    if not task or session.expired():
+        return
+    task_id = task["id"]
+    state.remember_tasks([task_id])
+
+    application = _json(await session.request(
+        tasker, "POST", "/api/tasks/{task_id}/applications", f"/api/tasks/{task_id}/applications",
+        json={"message": "I can do this today.", "proposed_price": 120}))
+    if not application or session.expired():
+        return
+
+    await session.request(customer, "GET", "/api/tasks/{task_id}/applications",
+                          f"/api/tasks/{task_id}/applications")
+    accepted = _json(await session.request(
+        customer, "PUT", "/api/applications/{application_id}",
+        f"/api/applications/{application['id']}", json={"status": "accepted"}))
+    if accepted:
+        state.remember_conversation(Conversation(task_id, customer, tasker))
+
+
+SCENARIOS: Dict[str, Callable] = {
+    "browse": scenario_browse,
+    "detail": scenario_detail,
+    "chat": scenario_chat,
+    "apply": scenario_apply,
+}
+
+
+# ======================================
+# RUNNER
+# ======================================
+
+@dataclass
+class LoadConfig:
+    base_url: str = "http://localhost:8001"
+    users: int = 20
+    ramp_up: float = 5.0
+    duration: float = 30.0
+    think_time: Tuple[float, float] = (0.5, 2.0)
+    mix: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_MIX))
+    tasker_ratio: float = 0.5
+    jwt_secret: Optional[str] = None
+    token: str = "demo-token"
+    timeout: float = 10.0
+    seed: int = 1
+
+
+async def _prime(client: httpx.AsyncClient, users: List[VirtualUser], state: SharedState):
+    """Discover categories and existing tasks before measuring"""
+    browser = next((u for u in users if u.role == "tasker"), users[0])
+    headers = {"Authorization": f"Bearer {browser.token}"}
+    try:
+        categories = (await client.get("/api/categories")).json()
+        if isinstance(categories, list):
+            state.category_ids = [c["id"] for c in categories if "id" in c]
+        tasks = (await client.get("/api/tasks", headers=headers)).json()
+        if isinstance(tasks, list):
+            state.remember_tasks([t["id"] for t in tasks if "id" in t])
+    except (httpx.HTTPError, ValueError):
+        pass
+
+
+async def _run_user(session: LoadSession, user: VirtualUser, state: SharedState,
+                    config: LoadConfig, start_delay: float):
+    names = list(config.mix)
+    weights = [config.mix[name] for name in names]
+    await asyncio.sleep(start_delay)
+    while not session.expired():
+        scenario = user.rng.choices(names, weights)[0]
+        await SCENARIOS[scenario](session, user, state)
+        think = user.rng.uniform(*config.think_time)
+        await asyncio.sleep(max(0.0, min(think, session.deadline - time.monotonic())))
+
+
+async def run_load(config: LoadConfig, transport: Optional[httpx.AsyncBaseTransport] = None) -> Dict[str, Any]:
+    """Run the configured load and return the summary report"""
+    users = build_users(config)
+    mix = dict(config.mix)
+    if not config.jwt_secret:
+        mix = {name: weight for name, weight in mix.items() if name in READ_ONLY_SCENARIOS}
+    config.mix = {name: weight for name, weight in mix.items() if weight > 0}
+    if not config.mix:
+        raise ValueError("Scenario mix is empty")
+
+    state = SharedState(users=users)
+    recorder = LatencyRecorder()
+    limits = httpx.Limits(max_connections=config.users, max_keepalive_connections=config.users)
+    async with httpx.AsyncClient(base_url=config.base_url, transport=transport, limits=limits,
+                                 timeout=config.timeout) as client:
+        await _prime(client, users, state)
+
+        recorder.started_at = time.monotonic()
+        session = LoadSession(client, recorder, recorder.started_at + config.duration)
+        step = config.ramp_up / config.users if config.users else 0.0
+        await asyncio.gather(*(
+            _run_user(session, user, state, config, user.index * step) for user in users
+        ))
+        recorder.finished_at = time.monotonic()
+
+    report = recorder.summary()
+    report["config"] = {
+        "base_url": config.base_url,
+        "users": config.users,
+        "ramp_up": config.ramp_up,
+        "duration": config.duration,
+        "think_time": list(config.think_time),
+        "mix": config.mix,
+    }
+    return report
+
+
+# ======================================
+# THRESHOLDS AND REPORTING
+# ======================================
+
+def parse_thresholds(values: List[str]) -> Dict[str, float]:
+    """Parse ``ENDPOINT=MS`` pairs; ``*`` applies to every endpoint"""
+    thresholds = {}
+    for value in values or []:
+        endpoint, _, limit = value.rpartition("=")
+        if not endpoint:
+            raise argparse.ArgumentTypeError(f"Expected ENDPOINT=MS, got {value!r}")
+        thresholds[endpoint.strip()] = float(limit)
+    return thresholds
+
+
+def check_thresholds(report: Dict[str, Any], latency: Dict[str, Dict[str, float]],
+                     max_error_rate: Optional[float] = None) -> List[str]:
+    """Return a human readable list of SLO violations"""
+    violations = []
+    endpoints = report["endpoints"]
+    for metric, limits in latency.items():
+        for name, stats in endpoints.items():
+            limit = limits.get(name, limits.get("*"))
+            if limit is not None and stats[metric] > limit:
+                violations.append(f"{name}: {metric} {stats[metric]:.1f}ms > {limit:.1f}ms")
+        for name in limits:
+            if name != "*" and name not in endpoints:
+                violations.append(f"{name}: no samples recorded")
+    if max_error_rate is not None:
+        for name, stats in endpoints.items():
+            if stats["error_rate"] > max_error_rate:
+                violations.append(f"{name}: error rate {stats['error_rate']:.2%} > {max_error_rate:.2%}")
+    return violations
+
+
+def print_report(report: Dict[str, Any]):
+    overall = report["overall"]
+    print(f"Duration: {report['duration_s']:.1f}s  Requests: {overall['count']}  "
+          f"RPS: {overall['rps']:.1f}  Errors: {overall['error_rate']:.2%}")
+    header = f"{'Endpoint':<42} {'Count':>7} {'RPS':>7} {'Err%':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'Max':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, stats in list(report["endpoints"].items()) + [("ALL", overall)]:
+        print(f"{name:<42} {stats['count']:>7} {stats['rps']:>7.1f} {stats['error_rate'] * 100:>5.1f}% "
+              f"{stats['p50']:>8.1f} {stats['p95']:>8.1f} {stats['p99']:>8.1f} {stats['max']:>8.1f}")
+
+
+class LifespanTransport(httpx.ASGITransport):
+    """ASGI transport that runs the app's lifespan while the client is open
+
+    Startup (client creation, warm-up, background probes) and shutdown
+    (drain, flush) then happen on the event loop the load runs on, like under
+    uvicorn.
+    """
+
+    def __init__(self, app, **kwargs):
+        super().__init__(app=app, **kwargs)
+        self._lifespan = None
+
+    async def __aenter__(self):
+        self._lifespan = self.app.router.lifespan_context(self.app)
+        await self._lifespan.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self._lifespan is not None:
+            await self._lifespan.__aexit__(*exc_info)
+            self._lifespan = None
+        await super().__aexit__(*exc_info)
+
+
+def in_process_transport(config: LoadConfig, standin: Optional[Dict[str, float]] = None) -> httpx.AsyncBaseTransport:
+    """Drive the FastAPI app in this process instead of over the network
+
+    With ``standin`` set the app runs on the local data stand-in (see
+    backend/standin.py) using the given latency/jitter/error settings, and a
+    profile is seeded for every virtual user.
+    """
+    import os
+    if standin is not None:
+        os.environ["SKILLHUB_DATA_BACKEND"] = "standin"
+        os.environ["STANDIN_LATENCY_MS"] = str(standin.get("latency_ms", 0))
+        os.environ["STANDIN_JITTER_MS"] = str(standin.get("jitter_ms", 0))
+        os.environ["STANDIN_ERROR_RATE"] = str(standin.get("error_rate", 0))
+        os.environ["STANDIN_SEED"] = str(config.seed)
+    if config.jwt_secret:
+        os.environ["SUPABASE_JWT_SECRET"] = config.jwt_secret
+    use_backend_path()
+    import server
+    if standin is not None:
+        seed_standin_profiles(server.init_clients().database, config)
+    return LifespanTransport(app=server.app)
+
+
+def seed_standin_profiles(database, config: LoadConfig):
+    """Create a profile row for each virtual user in a stand-in database"""
+    rows = []
+    for user_id, role in build_identities(config.users, config.tasker_ratio, config.seed):
+        short = user_id[:8]
+        rows.append({
+            "id": user_id,
+            "email": f"{role}-{short}@loadtest.local",
+            "full_name": f"Load {role.title()} {short}",
+            "username": f"{role}_{short}",
+            "role": role,
+            "city": "New York",
+            "state": "NY",
+        })
+    database.insert_rows("profiles", rows, upsert=True)
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"Unknown scenario {name!r}, choose from {sorted(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=None, help="Server to load (default: frontend/.env backend URL)")
+    parser.add_argument("--in-process", action="store_true", help="Drive backend/server.py in-process via ASGI")
+    parser.add_argument("--standin", action="store_true",
+                        help="In-process against the local data stand-in (no Supabase needed)")
+    parser.add_argument("--standin-latency-ms", type=float, default=5.0, help="Stand-in per-call latency")
+    parser.add_argument("--standin-jitter-ms", type=float, default=2.0, help="Stand-in per-call jitter")
+    parser.add_argument("--standin-error-rate", type=float, default=0.0, help="Stand-in injected failure rate")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="Seconds to start all users")
+    parser.add_argument("--duration", type=float, default=30.0, help="Total run time in seconds")
+    parser.add_argument("--think-time", type=float, nargs=2, default=(0.5, 2.0), metavar=("MIN", "MAX"),
+                        help="Pause between scenario iterations, in seconds")
+    parser.add_argument("--mix", type=parse_mix, default=dict(DEFAULT_MIX),
+                        help="Scenario weights, e.g. browse=50,detail=25,chat=15,apply=10")
+    parser.add_argument("--tasker-ratio", type=float, default=0.5, help="Share of users acting as taskers")
+    parser.add_argument("--jwt-secret", default=None, help="Sign per-user tokens (server SUPABASE_JWT_SECRET)")
+    parser.add_argument("--token", default="demo-token", help="Static bearer token when no JWT secret is given")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-p50", action="append", default=[], metavar="ENDPOINT=MS")
+    parser.add_argument("--max-p95", action="append", default=[], metavar="ENDPOINT=MS")
+    parser.add_argument("--max-p99", action="append", default=[], metavar="ENDPOINT=MS")
+    parser.add_argument("--max-error-rate", type=float, default=None, help="Fail above this error fraction")
+    parser.add_argument("--report", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args(argv)
+    if args.standin:
+        args.in_process = True
+        # A hermetic run mints its own identities
+        args.jwt_secret = args.jwt_secret or secrets.token_hex(32)
+
+    config = LoadConfig(
+        base_url=args.base_url or ("http://skillhub.local" if args.in_process else get_backend_url()),
+        users=args.users,
+        ramp_up=args.ramp_up,
+        duration=args.duration,
+        think_time=tuple(args.think_time),
+        mix=args.mix,
+        tasker_ratio=args.tasker_ratio,
+        jwt_secret=args.jwt_secret,
+        token=args.token,
+        timeout=args.timeout,
+        seed=args.seed,
+    )
+    if not config.jwt_secret:
+        print("No --jwt-secret: all users share the demo identity, running browse/detail only")
+    transport = None
+    if args.in_process:
+        standin = None
+        if args.standin:
+            standin = {
+                "latency_ms": args.standin_latency_ms,
+                "jitter_ms": args.standin_jitter_ms,
+                "error_rate": args.standin_error_rate,
+            }
+        transport = in_process_transport(config, standin)
+
+    # The in-process server logs every request at INFO through httpx
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    report = asyncio.run(run_load(config, transport))
+    print_report(report)
+
+    latency = {
+        "p50": parse_thresholds(args.max_p50),
+        "p95": parse_thresholds(args.max_p95),
+        "p99": parse_thresholds(args.max_p99),
+    }
+    violations = check_thresholds(report, {k: v for k, v in latency.items() if v}, args.max_error_rate)
+    report["violations"] = violations
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if violations:
+        print("\nSLO VIOLATIONS:")
+        for violation in violations:
+            print(f"  • {violation}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+SkillHub Hot-Path Microbenchmarks
+Times the per-request CPU work in backend/server.py and gates on regressions
+against a stored JSON baseline.
+
+    # Record a baseline (e.g. on main)
+    python -m perf.microbench --save perf/baselines/main.json
+
+    # Compare the working tree against it; exits 1 on a significant slowdown
+    python -m perf.microbench --compare perf/baselines/main.json
+
+Each benchmark is calibrated so one sample takes at least --min-time, then
+--repeat samples are collected with the garbage collector disabled. A
+benchmark counts as a regression only when its median is more than
+--threshold slower *and* a two-sided Mann-Whitney U test over the raw samples
+rejects "same distribution" at --alpha. This keeps scheduler noise from
+failing CI, while still catching real slowdowns.
+"""
+
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from perf import ROOT_DIR, use_backend_path
+
+BENCHMARKS: Dict[str, Callable[[], Callable[[], Any]]] = {}
+
+
+def benchmark(name: str):
+    """Register a benchmark factory; it returns the zero-argument callable to time"""
+    def register(factory: Callable[[], Callable[[], Any]]):
+        BENCHMARKS[name] = factory
+        return factory
+    return register
+
+
+def load_server():
+    """Import server.py on the local data stand-in (no Supabase project needed)"""
+    os.environ.setdefault("SKILLHUB_DATA_BACKEND", "standin")
+    use_backend_path()
+    import server
+    return server
+
+
+# ======================================
+# FIXTURES
+# ======================================
+
+def _profile(i: int) -> Dict[str, Any]:
+    return {
+        "full_name": f"Tasker Number {i}",
+        "username": f"tasker_{i}",
+        "avatar_url": f"https://cdn.example.test/avatars/{i}.png",
+        "average_rating": 4.5 + (i % 5) / 10,
+        "total_reviews": 10 + i,
+    }
+
+
+def task_rows(count: int = 200) -> List[Dict[str, Any]]:
+    """Rows shaped like get_tasks results, with embedded category and profiles"""
+    rows = []
+    for i in range(count):
+        rows.append({
+            "id": f"00000000-0000-4000-a000-{i:012d}",
+            "customer_id": f"10000000-0000-4000-a000-{i % 50:012d}",
+            "tasker_id": f"20000000-0000-4000-a000-{i % 30:012d}" if i % 3 else None,
+            "category_id": f"30000000-0000-4000-a000-{i % 10:012d}",
+            "title": f"Mount TV and shelves #{i}",
+            "description": "Need help mounting a 65 inch TV above the fireplace. Mount already purchased.",
+            "address": f"{100 + i} Main St", "city": "New York", "state": "NY", "zip_code": "10001",
+            "latitude": 40.7128 + i / 1e4, "longitude": -74.006 - i / 1e4,
+            "task_date": "2025-06-01", "task_time": None, "flexible_date": bool(i % 2),
+            "estimated_hours": 2.5, "budget_min": 75.0, "budget_max": 120.0, "final_price": None,
+            "task_size": "medium", "status": "posted", "urgency": "within_week",
+            "task_details": {"floor": 2, "elevator": True}, "special_instructions": None,
+            "photos": [f"https://cdn.example.test/tasks/{i}/1.jpg"],
+            "created_at": "2025-05-20T10:00:00.000000+00:00", "updated_at": "2025-05-20T10:00:00.000000+00:00",
+            "completed_at": None,
+            "task_categories": {"name": "Mounting & Installation", "slug": "mounting",
+                                "icon": "construct", "color": "#FF6B35"},
+            "customer_profile": _profile(i),
+            "tasker_profile": _profile(i + 1000) if i % 3 else None,
+        })
+    return rows
+
+
+def application_rows(tasks: List[Dict[str, Any]], per_task: int = 3) -> List[Dict[str, Any]]:
+    return [{"task_id": task["id"]} for n, task in enumerate(tasks) for _ in range(n % (per_task * 2))]
+
+
+# ======================================
+# BENCHMARKS
+# ======================================
+
+@benchmark("get_tasks.application_counts[200 tasks]")
+def bench_application_counts():
+    server = load_server()
+    tasks = task_rows(200)
+    applications = application_rows(tasks)
+    return lambda: server.attach_application_counts(tasks, applications)
+
+
+@benchmark("encode.task_list[200 tasks]")
+def bench_encode_task_list():
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    load_server()
+    tasks = task_rows(200)
+    # What FastAPI does for a handler returning a plain list of dicts
+    return lambda: JSONResponse(jsonable_encoder(tasks)).body
+
+
+@benchmark("encode.task_detail")
+def bench_encode_task_detail():
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    load_server()
+    task = dict(task_rows(1)[0])
+    task["applications"] = [dict(_profile(i), id=str(i), status="pending") for i in range(8)]
+    return lambda: JSONResponse(jsonable_encoder(task)).body
+
+
+_browse_index = None
+
+
+def browse_index_100k():
+    """OpenTaskIndex over 100k open tasks, built once and shared by the browse benchmarks"""
+    global _browse_index
+    if _browse_index is None:
+        import random
+        load_server()
+        import browse_index
+        rng = random.Random(100_000)
+        template = task_rows(1)[0]
+        categories = [f"10000000-0000-4000-a000-{i:012d}" for i in range(20)]
+        index = browse_index.OpenTaskIndex()
+        index.replace(({
+            **template,
+            "id": f"00000000-0000-4000-b000-{i:012d}",
+            "category_id": rng.choice(categories),
+            "budget_min": (low := rng.choice((20.0, 50.0, 100.0))),
+            "budget_max": low + rng.choice((0.0, 50.0, 200.0)),
+            "urgency": rng.choice(browse_index.URGENCIES),
+            "task_size": rng.choice(browse_index.TASK_SIZES),
+            "latitude": 40.0 + rng.random(), "longitude": -74.5 + rng.random(),
+            "created_at": f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}T00:00:00.{i % 1_000_000:06d}+00:00",
+        } for i in range(100_000)), {})
+        _browse_index = (index, categories)
+    return _browse_index
+
+
+def _browse(**filters):
+    index, categories = browse_index_100k()
+    import browse_index
+    if filters.pop("category", False):
+        filters["category_id"] = categories[0]
+    query = browse_index.BrowseQuery(**filters).validate()
+    return lambda: index.render(index.query(query)[0])
+
+
+@benchmark("browse_index.query[100k, newest]")
+def bench_browse_newest():
+    return _browse()
+
+
+@benchmark("browse_index.query[100k, category+budget]")
+def bench_browse_category_budget():
+    return _browse(category=True, budget_min=60, budget_max=150)
+
+
+@benchmark("browse_index.query[100k, urgency+size by budget]")
+def bench_browse_budget_sort():
+    return _browse(urgency=["urgent"], task_size=["small", "medium"], sort="budget")
+
+
+@benchmark("browse_index.query[100k, nearest within 20km]")
+def bench_browse_nearest():
+    return _browse(latitude=40.5, longitude=-74.0, radius_km=20, sort="nearest")
+
+
+def _drive(coro):
+    """Run a coroutine that never suspends, without an event loop"""
+    try:
+        coro.send(None)
+    except StopIteration as done:
+        return done.value
+    raise RuntimeError("coroutine suspended")
+
+
+@benchmark("auth.get_current_user[demo token]")
+def bench_current_user_demo():
+    from fastapi.security import HTTPAuthorizationCredentials
+    server = load_server()
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials="demo-token")
+
+    def run():
+        secret, server.SUPABASE_JWT_SECRET = server.SUPABASE_JWT_SECRET, None
+        try:
+            return _drive(server.get_current_user(credentials))
+        finally:
+            server.SUPABASE_JWT_SECRET = secret
+    return run
+
+
+@benchmark("auth.get_current_user[jwt]")
+def bench_current_user_jwt():
+    from fastapi.security import HTTPAuthorizationCredentials
+    from perf.loadgen import mint_token
+    server = load_server()
+    secret = "microbench-secret-" + "x" * 32
+    token = mint_token(secret, "5c3f1b6e-2a47-4d7c-9a51-3b8f0e6d2c19", "tasker")
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+    def run():
+        previous, server.SUPABASE_JWT_SECRET = server.SUPABASE_JWT_SECRET, secret
+        try:
+            return _drive(server.get_current_user(credentials))
+        finally:
+            server.SUPABASE_JWT_SECRET = previous
+    return run
+
+
+@benchmark("validate.CreateBooking[dict]")
+def bench_create_booking_dict():
+    server = load_server()
+    payload = {
+        "service_type": "Plumbing",
+        "description": "Fix leaky kitchen faucet",
+        "scheduled_at": "2025-06-01T14:00:00Z",
+        "location": {"address": "123 Main St", "city": "New York", "lat": 40.71, "lng": -74.0},
+    }
+    return lambda: server.CreateBooking.model_validate(payload)
+
+
+@benchmark("validate.CreateBooking[json]")
+def bench_create_booking_json():
+    server = load_server()
+    body = json.dumps({
+        "service_type": "Plumbing",
+        "description": "Fix leaky kitchen faucet",
+        "scheduled_at": "2025-06-01T14:00:00Z",
+        "location": {"address": "123 Main St", "city": "New York", "lat": 40.71, "lng": -74.0},
+    })
+    return lambda: server.CreateBooking.model_validate_json(body)
+
+
+# ======================================
+# RUNNER
+# ======================================
+
+def calibrate(fn: Callable[[], Any], min_time: float) -> int:
+    """Smallest power-of-ten-ish loop count whose run takes at least ``min_time``"""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        if time.perf_counter() - start >= min_time or loops >= 10_000_000:
+            return loops
+        loops *= 2 if loops < 8 else 5
+
+
+def measure(fn: Callable[[], Any], repeat: int, min_time: float) -> List[float]:
+    """Per-call time in nanoseconds for each of ``repeat`` samples"""
+    loops = calibrate(fn, min_time)
+    samples = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter_ns()
+            for _ in range(loops):
+                fn()
+            samples.append((time.perf_counter_ns() - start) / loops)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return samples
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    quartiles = statistics.quantiles(samples, n=4) if len(samples) > 1 else [samples[0]] * 3
+    return {
+        "median_ns": statistics.median(samples),
+        "iqr_ns": quartiles[2] - quartiles[0],
+        "min_ns": min(samples),
+        "samples_ns": samples,
+    }
+
+
+def mann_whitney_p(a: List[float], b: List[float]) -> float:
+    """Two-sided Mann-Whitney U p-value (normal approximation, tie corrected)"""
+    n1, n2 = len(a), len(b)
+    if not n1 or not n2:
+        return 1.0
+    combined = sorted([(v, 0) for v in a] + [(v, 1) for v in b])
+    ranks = [0.0] * len(combined)
+    tie_term = 0.0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        ties = j - i + 1
+        tie_term += ties ** 3 - ties
+        i = j + 1
+    rank_a = sum(r for r, (_, group) in zip(ranks, combined) if group == 0)
+    u = rank_a - n1 * (n1 + 1) / 2
+    mean = n1 * n2 / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (abs(u - mean) - 0.5) / math.sqrt(variance)
+    return math.erfc(max(z, 0.0) / math.sqrt(2))
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(pattern: Optional[str], repeat: int, min_time: float) -> Dict[str, Any]:
+    results = {}
+    for name, factory in BENCHMARKS.items():
+        if pattern and not re.search(pattern, name):
+            continue
+        fn = factory()
+        fn()  # warm caches and lazy imports
+        results[name] = summarize(measure(fn, repeat, min_time))
+        print(f"{name:<45} {format_ns(results[name]['median_ns']):>10}  "
+              f"± {format_ns(results[name]['iqr_ns'] / 2)}")
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "repeat": repeat,
+            "min_time": min_time,
+        },
+        "benchmarks": results,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float,
+            alpha: float) -> Tuple[List[str], List[Tuple]]:
+    """Return (regressions, table rows) for benchmarks present in both runs"""
+    regressions, rows = [], []
+    for name, now in current["benchmarks"].items():
+        before = baseline["benchmarks"].get(name)
+        if before is None:
+            rows.append((name, None, now["median_ns"], None, None, "new"))
+            continue
+        ratio = now["median_ns"] / before["median_ns"]
+        p = mann_whitney_p(before["samples_ns"], now["samples_ns"])
+        verdict = "same"
+        if p < alpha and ratio > 1 + threshold:
+            verdict = "SLOWER"
+            regressions.append(f"{name}: {ratio - 1:+.1%} (p={p:.4f})")
+        elif p < alpha and ratio < 1 - threshold:
+            verdict = "faster"
+        rows.append((name, before["median_ns"], now["median_ns"], ratio, p, verdict))
+    return regressions, rows
+
+
+def format_ns(ns: float) -> str:
+    for unit, scale in (("s", 1e9), ("ms", 1e6), ("us", 1e3)):
+        if ns >= scale:
+            return f"{ns / scale:.2f}{unit}"
+    return f"{ns:.0f}ns"
+
+
+def print_comparison(baseline: Dict[str, Any], rows: List[Tuple]):
+    print(f"\nBaseline: {baseline['meta'].get('commit') or '?'} ({baseline['meta'].get('created_at', '?')})")
+    print(f"{'Benchmark':<45} {'Baseline':>10} {'Current':>10} {'Delta':>8} {'p':>8}  Verdict")
+    for name, before, now, ratio, p, verdict in rows:
+        print(f"{name:<45} {format_ns(before) if before else '-':>10} {format_ns(now):>10} "
+              f"{(ratio - 1) * 100 if ratio else 0:>+7.1f}% {p if p is not None else 1:>8.4f}  {verdict}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", help="Only run benchmarks whose name matches this regex")
+    parser.add_argument("--repeat", type=int, default=20, help="Samples per benchmark")
+    parser.add_argument("--min-time", type=float, default=0.02, help="Minimum seconds per sample")
+    parser.add_argument("--save", help="Write results to this JSON baseline file")
+    parser.add_argument("--compare", help="Compare against this JSON baseline file")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Median slowdown that counts (0.10 = 10%%)")
+    parser.add_argument("--alpha", type=float, default=0.01, help="Significance level for the U test")
+    parser.add_argument("--list", action="store_true", help="List benchmarks and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+
+    results = run_benchmarks(args.filter, args.repeat, args.min_time)
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions, rows = compare(baseline, results, args.threshold, args.alpha)
+        print_comparison(baseline, rows)
+        if regressions:
+            print("\nREGRESSIONS:")
+            for regression in regressions:
+                print(f"  • {regression}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
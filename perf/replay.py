@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+SkillHub Trace Replay
+Re-issues a sanitized request trace (captured with SKILLHUB_TRACE_FILE, see
+backend/tracing.py) against a candidate build and prints a side-by-side
+latency/error comparison per route.
+
+Examples:
+    # Capture from a running server (10% of requests)
+    SKILLHUB_TRACE_FILE=trace.jsonl SKILLHUB_TRACE_SAMPLE=0.1 uvicorn server:app
+
+    # Hermetic: replay at 2x the recorded rate, in-process on the local stand-in
+    python -m perf.replay trace.jsonl --standin --speed 2
+
+    # Against a separately started stand-in server
+    python -m perf.replay trace.jsonl --fixtures-out world.json --jwt-secret s3cret --prepare-only
+    SKILLHUB_DATA_BACKEND=standin STANDIN_FIXTURES=world.json SUPABASE_JWT_SECRET=s3cret uvicorn server:app
+    python -m perf.replay trace.jsonl --base-url http://localhost:8001 --jwt-secret s3cret
+
+Traces carry hashed ids only, so the replayer rebuilds a consistent world:
+every hashed user becomes a profile with the recorded role, and every task or
+application the trace references without creating it is pre-seeded, owned by
+the first customer (and tasker) seen using it. Ids created during the capture
+(``result_id``) are mapped to the ids the candidate returns.
+
+Replay is open-loop but causal: a request waits for earlier writes (POST/PUT)
+touching the same task or application to finish, so speeding a trace up
+doesn't turn "accept, then message" into "message, then accept".
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import secrets
+import sys
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Set
+
+import httpx
+
+from perf import use_backend_path
+from perf.loadgen import EndpointStats, LifespanTransport, mint_token
+
+TRACE_NAMESPACE = uuid.UUID("5b0e6a52-3f0c-4c8e-9a51-7d7e2f6c1b9e")
+# Numeric body fields default to 1; these need realistic magnitudes
+NUMERIC_DEFAULTS = {"budget_min": 50, "budget_max": 150, "proposed_rate": 40, "hourly_rate": 35,
+                    "estimated_hours": 2, "latitude": 40.71, "longitude": -74.0}
+# How long a request waits for an earlier write it depends on
+DEPENDENCY_TIMEOUT_S = 30.0
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+def load_trace(path: str) -> List[Dict[str, Any]]:
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    records.sort(key=lambda r: r["t"])
+    return records
+
+
+def route_key(record: Dict[str, Any]) -> str:
+    return f"{record['method']} {record['route']}"
+
+
+def causal_keys(records: List[Dict[str, Any]]) -> List[Set[str]]:
+    """Hashed entity ids each request touches; an application also touches its task"""
+    parent: Dict[str, str] = {}
+    keys = []
+    for record in records:
+        params = record.get("path_params") or {}
+        touched = set(params.values())
+        touched.update(parent[h] for h in list(touched) if h in parent)
+        if record.get("result_id") and params.get("task_id"):
+            parent[record["result_id"]] = params["task_id"]
+        if record.get("result_id"):
+            touched.add(record["result_id"])
+        keys.append(touched)
+    return keys
+
+
+def stable_id(hashed: str) -> str:
+    """Deterministic real id for a hashed id from the trace"""
+    return str(uuid.uuid5(TRACE_NAMESPACE, hashed))
+
+
+def _is_hash(value: Any) -> bool:
+    return isinstance(value, str) and value.startswith("h:")
+
+
+class World:
+    """Users and pre-existing rows a trace needs to replay meaningfully"""
+
+    def __init__(self, records: List[Dict[str, Any]]):
+        self.roles: Dict[str, str] = {}
+        self.created: Set[str] = {r["result_id"] for r in records if r.get("result_id")}
+        self.tasks: Dict[str, Dict[str, Optional[str]]] = {}
+        self.applications: Dict[str, Dict[str, Optional[str]]] = {}
+        self.profiles: Set[str] = set()
+
+        for record in records:
+            user, role = record.get("user"), record.get("role")
+            if user and user not in self.roles:
+                self.roles[user] = role or "customer"
+        for record in records:
+            self._observe(record)
+
+    def _observe(self, record: Dict[str, Any]):
+        params = record.get("path_params") or {}
+        user, role = record.get("user"), self.roles.get(record.get("user"))
+        task_hash = params.get("task_id")
+        if task_hash and task_hash not in self.created:
+            task = self.tasks.setdefault(task_hash, {"customer": None, "tasker": None})
+            if role == "customer" and task["customer"] is None:
+                task["customer"] = user
+            # Only an assigned tasker can read or post messages
+            if role == "tasker" and task["tasker"] is None and record["route"].endswith("/messages"):
+                task["tasker"] = user
+        application_hash = params.get("application_id")
+        if application_hash and application_hash not in self.created:
+            application = self.applications.setdefault(application_hash, {"customer": None, "tasker": None})
+            if role in application and application[role] is None:
+                application[role] = user
+        if params.get("user_id"):
+            self.profiles.add(params["user_id"])
+
+    def fixtures(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Stand-in fixtures (``{"table": [row, ...]}``) for the world"""
+        customers = [u for u, r in self.roles.items() if r == "customer"]
+        taskers = [u for u, r in self.roles.items() if r == "tasker"]
+        fallback_customer = customers[0] if customers else "h:replay-customer"
+        fallback_tasker = taskers[0] if taskers else "h:replay-tasker"
+
+        users = dict(self.roles)
+        users.setdefault(fallback_customer, "customer")
+        users.setdefault(fallback_tasker, "tasker")
+        for hashed in self.profiles:
+            users.setdefault(hashed, "tasker")
+
+        tasks, applications = [], []
+        for hashed, owners in self.tasks.items():
+            tasks.append(self._task_row(hashed, owners["customer"] or fallback_customer, owners["tasker"]))
+        for hashed, owners in self.applications.items():
+            task_hash = f"{hashed}:task"
+            tasks.append(self._task_row(task_hash, owners["customer"] or fallback_customer, None))
+            applications.append({
+                "id": stable_id(hashed),
+                "task_id": stable_id(task_hash),
+                "tasker_id": stable_id(owners["tasker"] or fallback_tasker),
+                "message": "Replay application",
+                "status": "pending",
+            })
+
+        profiles = []
+        for hashed, role in users.items():
+            short = hashed[2:10]
+            profiles.append({
+                "id": stable_id(hashed),
+                "email": f"{role}-{short}@replay.local",
+                "full_name": f"Replay {role.title()} {short}",
+                "username": f"replay_{short}",
+                "role": role,
+                "city": "New York",
+                "state": "NY",
+            })
+        return {"profiles": profiles, "tasks": tasks, "task_applications": applications}
+
+    @staticmethod
+    def _task_row(hashed: str, customer: str, tasker: Optional[str]) -> Dict[str, Any]:
+        return {
+            "id": stable_id(hashed),
+            "customer_id": stable_id(customer),
+            "tasker_id": stable_id(tasker) if tasker else None,
+            "title": "Replay task",
+            "description": "Pre-existing task referenced by the trace",
+            "address": "1 Replay St",
+            "city": "New York",
+            "state": "NY",
+            "budget_min": 50,
+            "budget_max": 150,
+            "status": "assigned" if tasker else "posted",
+        }
+
+
+class IdMap:
+    """Hashed trace ids -> ids on the candidate, filled in as creates complete"""
+
+    def __init__(self, world: World, categories: List[str]):
+        self.created = world.created
+        self.categories = categories
+        self.resolved: Dict[str, str] = {}
+        self.events: Dict[str, asyncio.Event] = {h: asyncio.Event() for h in world.created}
+
+    async def resolve(self, hashed: str, key: str = "") -> Optional[str]:
+        if key == "category_id" and self.categories:
+            return self.categories[int(hashed[2:], 16) % len(self.categories)]
+        if hashed not in self.created:
+            return stable_id(hashed)
+        try:
+            await asyncio.wait_for(self.events[hashed].wait(), DEPENDENCY_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            return None
+        return self.resolved.get(hashed)
+
+    def complete(self, hashed: str, real_id: Optional[str]):
+        if real_id:
+            self.resolved[hashed] = real_id
+        self.events[hashed].set()
+
+
+async def synthesize(value: Any, ids: IdMap, key: str = "") -> Any:
+    """Rebuild a concrete value from its recorded shape"""
+    if isinstance(value, dict):
+        return {k: await synthesize(v, ids, k) for k, v in value.items()}
+    if isinstance(value, list):
+        return [await synthesize(v, ids, key) for v in value if not (isinstance(v, str) and v.startswith("len:"))]
+    if _is_hash(value):
+        return await ids.resolve(value, key)
+    if isinstance(value, str) and value.startswith("str:"):
+        return "x" * int(value[4:])
+    if value == "num":
+        return NUMERIC_DEFAULTS.get(key, 1)
+    return value
+
+
+class Replayer:
+    """Open-loop replay: each request fires at its (scaled) recorded offset"""
+
+    def __init__(self, client: httpx.AsyncClient, ids: IdMap, tokens: Dict[str, str], speed: float):
+        self.client = client
+        self.ids = ids
+        self.tokens = tokens
+        self.speed = speed
+        self.stats: Dict[str, EndpointStats] = {}
+        self.mismatches: Dict[str, int] = {}
+        self.lag_ms: List[float] = []
+
+    async def run(self, records: List[Dict[str, Any]]) -> float:
+        started = time.perf_counter()
+        tasks = []
+        last_write: Dict[str, asyncio.Task] = {}
+        for record, keys in zip(records, causal_keys(records)):
+            due = started + record["t"] / self.speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.lag_ms.append(max(0.0, (time.perf_counter() - due) * 1000))
+            after = {last_write[k] for k in keys if k in last_write}
+            task = asyncio.create_task(self.issue(record, after))
+            if record["method"] in WRITE_METHODS:
+                last_write.update((k, task) for k in keys)
+            tasks.append(task)
+        await asyncio.gather(*tasks)
+        return time.perf_counter() - started
+
+    async def issue(self, record: Dict[str, Any], after: Set[asyncio.Task] = frozenset()):
+        key = route_key(record)
+        status_code, real_id = 0, None
+        try:
+            if after:
+                await asyncio.wait(after, timeout=DEPENDENCY_TIMEOUT_S)
+            path = record["route"]
+            for name, hashed in (record.get("path_params") or {}).items():
+                path = path.replace("{" + name + "}", str(await self.ids.resolve(hashed, name)))
+            params = await synthesize(record.get("query") or {}, self.ids)
+            body = await synthesize(record["body"], self.ids) if isinstance(record.get("body"), dict) else None
+            headers = {}
+            if record.get("user"):
+                headers["Authorization"] = f"Bearer {self.tokens[record['user']]}"
+
+            start = time.perf_counter()
+            try:
+                response = await self.client.request(record["method"], path, params=params, json=body,
+                                                     headers=headers)
+                status_code = response.status_code
+            except httpx.HTTPError:
+                response = None
+            latency_ms = (time.perf_counter() - start) * 1000
+            self.stats.setdefault(key, EndpointStats()).record(latency_ms, status_code)
+            if status_code != record["status"]:
+                self.mismatches[key] = self.mismatches.get(key, 0) + 1
+            if response is not None and record.get("result_id") and status_code < 400:
+                try:
+                    real_id = response.json().get("id")
+                except (ValueError, AttributeError):
+                    pass
+        finally:
+            if record.get("result_id"):
+                self.ids.complete(record["result_id"], real_id)
+
+
+def recorded_stats(records: List[Dict[str, Any]]) -> Dict[str, EndpointStats]:
+    stats: Dict[str, EndpointStats] = {}
+    for record in records:
+        stats.setdefault(route_key(record), EndpointStats()).record(record["duration_ms"], record["status"])
+    return stats
+
+
+def compare(records: List[Dict[str, Any]], replayer: Replayer, duration_s: float) -> Dict[str, Any]:
+    recorded_span = (records[-1]["t"] - records[0]["t"]) if records else 0.0
+    baseline = recorded_stats(records)
+    routes = {}
+    for key in sorted(set(baseline) | set(replayer.stats)):
+        routes[key] = {
+            "recorded": baseline.get(key, EndpointStats()).summary(recorded_span),
+            "replay": replayer.stats.get(key, EndpointStats()).summary(duration_s),
+            "status_mismatches": replayer.mismatches.get(key, 0),
+        }
+    lags = sorted(replayer.lag_ms)
+    return {
+        "requests": len(records),
+        "speed": replayer.speed,
+        "recorded_span_s": recorded_span,
+        "replay_duration_s": duration_s,
+        "max_schedule_lag_ms": lags[-1] if lags else 0.0,
+        "routes": routes,
+    }
+
+
+def print_comparison(report: Dict[str, Any], left: str = "recorded"):
+    print(f"\nReplayed {report['requests']} requests at {report['speed']}x in "
+          f"{report['replay_duration_s']:.1f}s (recorded span {report['recorded_span_s']:.1f}s, "
+          f"max schedule lag {report['max_schedule_lag_ms']:.1f}ms)\n")
+    header = (f"{'route':<40} {'count':>11} {'p50 ms':>15} {'p95 ms':>15} {'p99 ms':>15} "
+              f"{'err %':>11} {'mismatch':>8}")
+    print(header)
+    print("-" * len(header))
+    for key, row in report["routes"].items():
+        a, b = row[left], row["replay"]
+        cells = [f"{a['count']:>5}/{b['count']:<5}"]
+        for pct in ("p50", "p95", "p99"):
+            cells.append(f"{a[pct]:>7.1f}/{b[pct]:<7.1f}")
+        cells.append(f"{a['error_rate'] * 100:>5.1f}/{b['error_rate'] * 100:<5.1f}")
+        print(f"{key:<40} {cells[0]:>11} {cells[1]:>15} {cells[2]:>15} {cells[3]:>15} "
+              f"{cells[4]:>11} {row['status_mismatches']:>8}")
+    print(f"\n(each cell is {left} / replay)")
+
+
+async def fetch_categories(client: httpx.AsyncClient) -> List[str]:
+    try:
+        response = await client.get("/api/categories")
+        return sorted(c["id"] for c in response.json())
+    except (httpx.HTTPError, ValueError, KeyError, TypeError):
+        return []
+
+
+async def replay(records: List[Dict[str, Any]], world: World, base_url: str, tokens: Dict[str, str],
+                 speed: float, timeout: float, transport: Optional[httpx.AsyncBaseTransport] = None):
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=100)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits,
+                                 transport=transport) as client:
+        ids = IdMap(world, await fetch_categories(client))
+        replayer = Replayer(client, ids, tokens, speed)
+        duration = await replayer.run(records)
+    return compare(records, replayer, duration)
+
+
+def in_process_transport(fixtures: Dict[str, List[Dict[str, Any]]], jwt_secret: str,
+                         standin: Dict[str, float]) -> httpx.AsyncBaseTransport:
+    """The FastAPI app in this process on a stand-in seeded with the trace's world"""
+    import os
+    os.environ["SKILLHUB_DATA_BACKEND"] = "standin"
+    os.environ["STANDIN_LATENCY_MS"] = str(standin["latency_ms"])
+    os.environ["STANDIN_JITTER_MS"] = str(standin["jitter_ms"])
+    os.environ["STANDIN_ERROR_RATE"] = str(standin["error_rate"])
+    os.environ["SUPABASE_JWT_SECRET"] = jwt_secret
+    # Never capture the replay itself
+    os.environ.pop("SKILLHUB_TRACE_FILE", None)
+    use_backend_path()
+    import server
+    database = server.init_clients().database
+    for table, rows in fixtures.items():
+        database.insert_rows(table, rows, upsert=True)
+    return LifespanTransport(app=server.app)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trace", help="JSONL trace written by SKILLHUB_TRACE_FILE")
+    parser.add_argument("--base-url", default=None, help="Candidate server (default: in-process stand-in)")
+    parser.add_argument("--standin", action="store_true", help="Replay in-process on the local data stand-in")
+    parser.add_argument("--standin-latency-ms", type=float, default=5.0, help="Stand-in per-call latency")
+    parser.add_argument("--standin-jitter-ms", type=float, default=2.0, help="Stand-in per-call jitter")
+    parser.add_argument("--standin-error-rate", type=float, default=0.0, help="Stand-in injected failure rate")
+    parser.add_argument("--speed", type=float, default=1.0, help="Rate multiplier (2 = twice the recorded rate)")
+    parser.add_argument("--jwt-secret", default=None, help="Sign per-user tokens (server SUPABASE_JWT_SECRET)")
+    parser.add_argument("--fixtures-out", default=None, help="Write the world as STANDIN_FIXTURES JSON")
+    parser.add_argument("--prepare-only", action="store_true", help="Only build the world, do not replay")
+    parser.add_argument("--baseline", default=None,
+                        help="Compare against a previous replay report instead of the recorded timings")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Per-request timeout in seconds")
+    parser.add_argument("--report", default=None, help="Write the JSON comparison to this file")
+    args = parser.parse_args(argv)
+    if args.speed <= 0:
+        parser.error("--speed must be positive")
+
+    records = load_trace(args.trace)
+    world = World(records)
+    fixtures = world.fixtures()
+    if args.fixtures_out:
+        with open(args.fixtures_out, "w") as f:
+            json.dump(fixtures, f)
+        print(f"Wrote {sum(len(rows) for rows in fixtures.values())} fixture rows to {args.fixtures_out}")
+    if args.prepare_only:
+        return 0
+    if not records:
+        print("Trace is empty")
+        return 1
+
+    in_process = args.standin or not args.base_url
+    jwt_secret = args.jwt_secret or (secrets.token_hex(32) if in_process else None)
+    if not jwt_secret:
+        parser.error("--jwt-secret is required against --base-url (the candidate's SUPABASE_JWT_SECRET)")
+    tokens = {hashed: mint_token(jwt_secret, stable_id(hashed), role, ttl=24 * 3600)
+              for hashed, role in world.roles.items()}
+
+    transport = None
+    if in_process:
+        transport = in_process_transport(fixtures, jwt_secret, {
+            "latency_ms": args.standin_latency_ms,
+            "jitter_ms": args.standin_jitter_ms,
+            "error_rate": args.standin_error_rate,
+        })
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    report = asyncio.run(replay(records, world, args.base_url or "http://skillhub.local", tokens,
+                                args.speed, args.timeout, transport))
+
+    left = "recorded"
+    if args.baseline:
+        with open(args.baseline) as f:
+            previous = json.load(f)["routes"]
+        for key, row in report["routes"].items():
+            row["baseline"] = previous.get(key, {}).get("replay", EndpointStats().summary(0))
+        left = "baseline"
+    print_comparison(report, left)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,6 +5,8 @@
 
 -- Enable required extensions
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+-- Equality on uuid inside the bookings exclusion constraint's GiST index
+CREATE EXTENSION IF NOT EXISTS btree_gist;
 
 -- ======================================
 -- 1. PROFILES TABLE
@@ -37,6 +39,9 @@ CREATE TABLE IF NOT EXISTS public.profiles (
   total_tasks_completed integer DEFAULT 0,
   average_rating decimal(3,2) DEFAULT 0,
   total_reviews integer DEFAULT 0,
+  -- Running aggregates of reviews received, kept by maintain_rating_aggregates()
+  rating_sum bigint DEFAULT 0 NOT NULL,
+  rating_histogram integer[] DEFAULT '{0,0,0,0,0}' NOT NULL,
   
   created_at timestamp with time zone DEFAULT timezone('utc'::text, now()) NOT NULL,
   updated_at timestamp with time zone DEFAULT timezone('utc'::text, now()) NOT NULL
@@ -102,11 +107,17 @@ CREATE TABLE IF NOT EXISTS public.tasks (
   budget_min decimal(10,2),
   budget_max decimal(10,2),
   final_price decimal(10,2),
+  -- Budget range with either end standing in for a missing other end, for
+  -- range filters and the budget sort (no budget: floor NULL, ceiling 0)
+  budget_floor decimal(10,2) GENERATED ALWAYS AS (coalesce(budget_min, budget_max)) STORED,
+  budget_ceiling decimal(10,2) GENERATED ALWAYS AS (coalesce(budget_max, budget_min, 0)) STORED,
   task_size text CHECK (task_size IN ('small', 'medium', 'large')) DEFAULT 'medium',
   
   -- Status
   status text CHECK (status IN ('posted', 'assigned', 'in_progress', 'completed', 'cancelled')) DEFAULT 'posted',
   urgency text CHECK (urgency IN ('flexible', 'within_week', 'urgent')) DEFAULT 'flexible',
+  -- Earlier open task this one repeats (near-duplicate detection); kept out of the tasker feed
+  duplicate_of uuid REFERENCES public.tasks(id) ON DELETE SET NULL,
   
   -- Additional details
   task_details jsonb,
@@ -189,6 +200,65 @@ CREATE TABLE IF NOT EXISTS public.notifications (
   data jsonb
 );
 
+-- ======================================
+-- 8. NOTIFICATION COUNTERS TABLE
+-- ======================================
+-- Unread notifications per user, maintained by triggers on notifications
+CREATE TABLE IF NOT EXISTS public.notification_counters (
+  user_id uuid REFERENCES public.profiles(id) ON DELETE CASCADE PRIMARY KEY,
+  unread integer NOT NULL DEFAULT 0,
+  updated_at timestamp with time zone DEFAULT timezone('utc'::text, now()) NOT NULL
+);
+
+-- ======================================
+-- 9. BOOKINGS TABLE
+-- ======================================
+-- A tasker's time slots. The exclusion constraint rejects a booking that
+-- overlaps another live one of the same tasker (SQLSTATE 23P01), so
+-- concurrent requests can't double-book whoever commits second.
+CREATE TABLE IF NOT EXISTS public.bookings (
+  id uuid DEFAULT uuid_generate_v4() PRIMARY KEY,
+  customer_id uuid REFERENCES public.profiles(id) ON DELETE CASCADE NOT NULL,
+  tasker_id uuid REFERENCES public.profiles(id) ON DELETE CASCADE NOT NULL,
+  task_id uuid REFERENCES public.tasks(id) ON DELETE SET NULL,
+  category_id uuid REFERENCES public.task_categories(id),
+  service_type text NOT NULL,
+  description text,
+  starts_at timestamp with time zone NOT NULL,
+  ends_at timestamp with time zone NOT NULL,
+  status text CHECK (status IN ('pending', 'confirmed', 'in_progress', 'completed', 'cancelled')) DEFAULT 'pending' NOT NULL,
+  location jsonb,
+  created_at timestamp with time zone DEFAULT timezone('utc'::text, now()) NOT NULL,
+  updated_at timestamp with time zone DEFAULT timezone('utc'::text, now()) NOT NULL,
+  CHECK (ends_at > starts_at),
+  CONSTRAINT bookings_no_overlap EXCLUDE USING gist (
+    tasker_id WITH =,
+    tstzrange(starts_at, ends_at) WITH &&
+  ) WHERE (status <> 'cancelled')
+);
+
+-- ======================================
+-- 10. CHANGE LOG TABLE
+-- ======================================
+-- What changed for whom, for GET /api/sync (backend/changefeed.py). Triggers
+-- below add a row per user who can see a changed task, application, message
+-- or profile (the nil uuid for categories, which everyone syncs). A later
+-- change to the same row moves its entry to a new seq instead of adding one,
+-- and a delete, or a user losing sight of a task, leaves a tombstone. The
+-- feed is ordered by the writing transaction (xact), then seq: see sync_log().
+CREATE TABLE IF NOT EXISTS public.change_log (
+  seq bigserial PRIMARY KEY,
+  audience uuid NOT NULL,
+  entity text CHECK (entity IN ('task', 'application', 'message', 'category', 'profile')) NOT NULL,
+  entity_id uuid NOT NULL,
+  deleted boolean DEFAULT false NOT NULL,
+  changed_at timestamp with time zone DEFAULT timezone('utc'::text, now()) NOT NULL,
+  xact bigint DEFAULT (pg_current_xact_id()::text::bigint) NOT NULL,
+  UNIQUE(audience, entity, entity_id)
+);
+ALTER TABLE public.change_log ADD COLUMN IF NOT EXISTS xact bigint
+  DEFAULT (pg_current_xact_id()::text::bigint) NOT NULL;
+
 -- ======================================
 -- ROW LEVEL SECURITY POLICIES
 -- ======================================
@@ -201,6 +271,10 @@ ALTER TABLE public.task_applications ENABLE ROW LEVEL SECURITY;
 ALTER TABLE public.reviews ENABLE ROW LEVEL SECURITY;
 ALTER TABLE public.messages ENABLE ROW LEVEL SECURITY;
 ALTER TABLE public.notifications ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.notification_counters ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.bookings ENABLE ROW LEVEL SECURITY;
+-- No policies: read by the API with the service role, filtered to the caller
+ALTER TABLE public.change_log ENABLE ROW LEVEL SECURITY;
 
 -- Profiles policies
 CREATE POLICY "Public profiles are viewable by everyone" ON public.profiles
@@ -287,6 +361,19 @@ CREATE POLICY "Users can view their own notifications" ON public.notifications
 CREATE POLICY "Users can update their own notifications" ON public.notifications
   FOR UPDATE USING (auth.uid() = user_id);
 
+CREATE POLICY "Users can view their own notification counters" ON public.notification_counters
+  FOR SELECT USING (auth.uid() = user_id);
+
+-- Bookings policies
+CREATE POLICY "Booking participants can view bookings" ON public.bookings
+  FOR SELECT USING (auth.uid() = customer_id OR auth.uid() = tasker_id);
+
+CREATE POLICY "Customers can create bookings" ON public.bookings
+  FOR INSERT WITH CHECK (auth.uid() = customer_id);
+
+CREATE POLICY "Booking participants can update bookings" ON public.bookings
+  FOR UPDATE USING (auth.uid() = customer_id OR auth.uid() = tasker_id);
+
 -- ======================================
 -- FUNCTIONS AND TRIGGERS
 -- ======================================
@@ -319,23 +406,6 @@ CREATE TRIGGER on_auth_user_created
 CREATE OR REPLACE FUNCTION public.update_profile_stats()
 RETURNS trigger AS $$
 BEGIN
-  -- Update tasker stats when a review is added
-  IF TG_TABLE_NAME = 'reviews' THEN
-    UPDATE public.profiles SET
-      average_rating = (
-        SELECT AVG(rating)::decimal(3,2) 
-        FROM public.reviews 
-        WHERE reviewee_id = NEW.reviewee_id
-      ),
-      total_reviews = (
-        SELECT COUNT(*) 
-        FROM public.reviews 
-        WHERE reviewee_id = NEW.reviewee_id
-      ),
-      updated_at = now()
-    WHERE id = NEW.reviewee_id;
-  END IF;
-  
   -- Update completed tasks count when task is completed
   IF TG_TABLE_NAME = 'tasks' AND NEW.status = 'completed' AND OLD.status != 'completed' THEN
     UPDATE public.profiles SET
@@ -353,14 +423,81 @@ DROP TRIGGER IF EXISTS update_stats_on_review ON public.reviews;
 DROP TRIGGER IF EXISTS update_stats_on_task_completion ON public.tasks;
 
 -- Create triggers for stats updates
-CREATE TRIGGER update_stats_on_review
-  AFTER INSERT ON public.reviews
-  FOR EACH ROW EXECUTE FUNCTION public.update_profile_stats();
-
 CREATE TRIGGER update_stats_on_task_completion
   AFTER UPDATE ON public.tasks
   FOR EACH ROW EXECUTE FUNCTION public.update_profile_stats();
 
+-- Rating aggregates. Each review adds or removes its rating from the
+-- reviewee's running sum, count and histogram, so a write costs the same for
+-- a tasker with 10 reviews as for one with 100k (no AVG/COUNT over all of
+-- them). The profile row lock serializes concurrent reviews of one tasker.
+ALTER TABLE public.profiles ADD COLUMN IF NOT EXISTS rating_sum bigint DEFAULT 0 NOT NULL;
+ALTER TABLE public.profiles ADD COLUMN IF NOT EXISTS rating_histogram integer[] DEFAULT '{0,0,0,0,0}' NOT NULL;
+
+CREATE OR REPLACE FUNCTION public.adjust_rating_aggregates(p_reviewee_id uuid, p_rating integer, p_change integer)
+RETURNS void AS $$
+  -- Right-hand sides see the row before the update
+  UPDATE public.profiles SET
+    rating_sum = rating_sum + p_rating * p_change,
+    total_reviews = total_reviews + p_change,
+    rating_histogram[p_rating] = rating_histogram[p_rating] + p_change,
+    average_rating = CASE WHEN total_reviews + p_change > 0
+      THEN round((rating_sum + p_rating * p_change)::numeric / (total_reviews + p_change), 2)
+      ELSE 0 END,
+    updated_at = now()
+  WHERE id = p_reviewee_id;
+$$ LANGUAGE sql SECURITY DEFINER SET search_path = public;
+
+REVOKE EXECUTE ON FUNCTION public.adjust_rating_aggregates(uuid, integer, integer) FROM PUBLIC, anon, authenticated;
+
+CREATE OR REPLACE FUNCTION public.maintain_rating_aggregates()
+RETURNS trigger AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM public.adjust_rating_aggregates(OLD.reviewee_id, OLD.rating, -1);
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM public.adjust_rating_aggregates(NEW.reviewee_id, NEW.rating, 1);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+DROP TRIGGER IF EXISTS rating_aggregates_on_insert ON public.reviews;
+DROP TRIGGER IF EXISTS rating_aggregates_on_update ON public.reviews;
+DROP TRIGGER IF EXISTS rating_aggregates_on_delete ON public.reviews;
+
+CREATE TRIGGER rating_aggregates_on_insert
+  AFTER INSERT ON public.reviews
+  FOR EACH ROW EXECUTE FUNCTION public.maintain_rating_aggregates();
+
+CREATE TRIGGER rating_aggregates_on_update
+  AFTER UPDATE OF rating, reviewee_id ON public.reviews
+  FOR EACH ROW WHEN (OLD.rating IS DISTINCT FROM NEW.rating OR OLD.reviewee_id IS DISTINCT FROM NEW.reviewee_id)
+  EXECUTE FUNCTION public.maintain_rating_aggregates();
+
+CREATE TRIGGER rating_aggregates_on_delete
+  AFTER DELETE ON public.reviews
+  FOR EACH ROW EXECUTE FUNCTION public.maintain_rating_aggregates();
+
+-- Aggregates for reviews that existed before the triggers
+UPDATE public.profiles p SET
+  rating_sum = r.rating_sum,
+  total_reviews = r.total_reviews,
+  rating_histogram = r.rating_histogram,
+  average_rating = round(r.rating_sum::numeric / r.total_reviews, 2)
+FROM (
+  SELECT reviewee_id,
+         sum(rating) AS rating_sum,
+         count(*) AS total_reviews,
+         ARRAY[count(*) FILTER (WHERE rating = 1), count(*) FILTER (WHERE rating = 2),
+               count(*) FILTER (WHERE rating = 3), count(*) FILTER (WHERE rating = 4),
+               count(*) FILTER (WHERE rating = 5)]::integer[] AS rating_histogram
+  FROM public.reviews
+  GROUP BY reviewee_id
+) r
+WHERE p.id = r.reviewee_id;
+
 -- Function to update updated_at timestamp
 CREATE OR REPLACE FUNCTION public.update_updated_at_column()
 RETURNS TRIGGER AS $$
@@ -380,6 +517,245 @@ CREATE TRIGGER update_tasks_updated_at BEFORE UPDATE ON public.tasks
 CREATE TRIGGER update_task_applications_updated_at BEFORE UPDATE ON public.task_applications 
     FOR EACH ROW EXECUTE FUNCTION public.update_updated_at_column();
 
+-- Keep notification_counters.unread in step with notifications. Statement-level
+-- triggers with transition tables: a batch insert or a mark-all-read touches
+-- each user's counter once, however many rows it writes.
+CREATE OR REPLACE FUNCTION public.maintain_notification_counters()
+RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    INSERT INTO public.notification_counters AS c (user_id, unread)
+    SELECT user_id, count(*) FROM new_rows WHERE read = false GROUP BY user_id
+    ON CONFLICT (user_id) DO UPDATE SET unread = c.unread + excluded.unread, updated_at = now();
+  ELSIF TG_OP = 'UPDATE' THEN
+    UPDATE public.notification_counters c SET
+      unread = greatest(c.unread + d.change, 0),
+      updated_at = now()
+    FROM (
+      SELECT user_id, sum(change) AS change FROM (
+        SELECT user_id, 1 AS change FROM new_rows WHERE read = false
+        UNION ALL
+        SELECT user_id, -1 AS change FROM old_rows WHERE read = false
+      ) changes
+      GROUP BY user_id
+      HAVING sum(change) <> 0
+    ) d
+    WHERE c.user_id = d.user_id;
+  ELSE
+    UPDATE public.notification_counters c SET
+      unread = greatest(c.unread - d.removed, 0),
+      updated_at = now()
+    FROM (SELECT user_id, count(*) AS removed FROM old_rows WHERE read = false GROUP BY user_id) d
+    WHERE c.user_id = d.user_id;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+DROP TRIGGER IF EXISTS notification_counters_on_insert ON public.notifications;
+DROP TRIGGER IF EXISTS notification_counters_on_update ON public.notifications;
+DROP TRIGGER IF EXISTS notification_counters_on_delete ON public.notifications;
+
+CREATE TRIGGER notification_counters_on_insert
+  AFTER INSERT ON public.notifications
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION public.maintain_notification_counters();
+
+CREATE TRIGGER notification_counters_on_update
+  AFTER UPDATE ON public.notifications
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION public.maintain_notification_counters();
+
+CREATE TRIGGER notification_counters_on_delete
+  AFTER DELETE ON public.notifications
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION public.maintain_notification_counters();
+
+-- Counters for notifications that existed before the triggers
+INSERT INTO public.notification_counters AS c (user_id, unread)
+SELECT user_id, count(*) FILTER (WHERE read = false) FROM public.notifications GROUP BY user_id
+ON CONFLICT (user_id) DO UPDATE SET unread = excluded.unread, updated_at = now();
+
+-- Unread messages per task for one receiver (GET /api/me/unread). Reads only
+-- idx_messages_unread, whose size is the number of unread messages, not the
+-- user's history. Callable by the service role only: it takes any user id.
+CREATE OR REPLACE FUNCTION public.unread_message_counts(p_user_id uuid)
+RETURNS TABLE (task_id uuid, unread bigint) AS $$
+  SELECT m.task_id, count(*) AS unread
+  FROM public.messages m
+  WHERE m.receiver_id = p_user_id AND m.read_at IS NULL
+  GROUP BY m.task_id;
+$$ LANGUAGE sql STABLE SECURITY DEFINER SET search_path = public;
+
+REVOKE EXECUTE ON FUNCTION public.unread_message_counts(uuid) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.unread_message_counts(uuid) TO service_role;
+
+-- Replication lag in seconds, probed by the API's read routing (backend/replicas.py).
+-- 0 on the primary and on a streaming standby that has replayed all it received
+-- (an idle primary is not lag); otherwise the age of the last replayed
+-- transaction, or NULL when nothing has been replayed yet. One row, as
+-- postgrest-py only takes lists.
+CREATE OR REPLACE FUNCTION public.replication_lag_seconds()
+RETURNS TABLE (lag_s double precision) AS $$
+  SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()
+         AND EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN 0
+    ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())
+  END::double precision AS lag_s;
+$$ LANGUAGE sql STABLE SECURITY DEFINER SET search_path = public;
+
+REVOKE EXECUTE ON FUNCTION public.replication_lag_seconds() FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.replication_lag_seconds() TO service_role;
+
+-- Change log for GET /api/sync. record_change() moves (audience, entity, id)
+-- to the head of the log for each user in p_audience (NULLs skipped).
+CREATE OR REPLACE FUNCTION public.record_change(p_entity text, p_entity_id uuid, p_deleted boolean,
+                                                p_audience uuid[])
+RETURNS void AS $$
+  INSERT INTO public.change_log (audience, entity, entity_id, deleted)
+  SELECT DISTINCT a, p_entity, p_entity_id, p_deleted FROM unnest(p_audience) AS a WHERE a IS NOT NULL
+  ON CONFLICT (audience, entity, entity_id) DO UPDATE SET
+    seq = nextval(pg_get_serial_sequence('public.change_log', 'seq')),
+    deleted = excluded.deleted,
+    changed_at = excluded.changed_at,
+    xact = excluded.xact;
+$$ LANGUAGE sql SECURITY DEFINER SET search_path = public;
+
+-- One page of the change log of p_audience past (p_after_xact, p_after_seq),
+-- in feed order. A transaction's rows appear when it commits, which can be
+-- long after it took its seq (and after now(), its start time), so neither
+-- orders the feed safely. Transaction ids below the snapshot's xmin belong
+-- to transactions that have all finished: no row can still appear before a
+-- settled one, and sync tokens stop at the first unsettled row. Rows and
+-- horizon come from one statement, so from one snapshot.
+CREATE OR REPLACE FUNCTION public.sync_log(p_audience uuid[], p_after_xact bigint, p_after_seq bigint,
+                                           p_limit integer)
+RETURNS TABLE (seq bigint, entity text, entity_id uuid, deleted boolean, changed_at timestamp with time zone,
+               xact bigint, settled boolean) AS $$
+  SELECT l.seq, l.entity, l.entity_id, l.deleted, l.changed_at, l.xact,
+         l.xact < pg_snapshot_xmin(pg_current_snapshot())::text::bigint
+  FROM public.change_log l
+  WHERE l.audience = ANY (p_audience) AND (l.xact, l.seq) > (p_after_xact, p_after_seq)
+  ORDER BY l.xact, l.seq
+  LIMIT p_limit;
+$$ LANGUAGE sql STABLE SECURITY DEFINER SET search_path = public;
+
+REVOKE EXECUTE ON FUNCTION public.sync_log(uuid[], bigint, bigint, integer) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.sync_log(uuid[], bigint, bigint, integer) TO service_role;
+
+-- Tasks: the customer, the assigned tasker and every applicant. BEFORE
+-- DELETE, so the applications are still there to name the applicants.
+CREATE OR REPLACE FUNCTION public.log_task_change()
+RETURNS trigger AS $$
+DECLARE
+  t public.tasks;
+  audience uuid[];
+BEGIN
+  IF TG_OP = 'DELETE' THEN t := OLD; ELSE t := NEW; END IF;
+  audience := ARRAY[t.customer_id, t.tasker_id]
+    || ARRAY(SELECT a.tasker_id FROM public.task_applications a WHERE a.task_id = t.id);
+  PERFORM public.record_change('task', t.id, TG_OP = 'DELETE', audience);
+  IF TG_OP = 'UPDATE' THEN
+    -- A customer or tasker who lost sight of the task drops it
+    PERFORM public.record_change('task', t.id, true, ARRAY(
+      SELECT unnest(ARRAY[OLD.customer_id, OLD.tasker_id]) EXCEPT SELECT unnest(audience)));
+  END IF;
+  RETURN COALESCE(NEW, OLD);
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Applications: the applicant and the task's customer. Applying also puts
+-- the task in the applicant's feed.
+CREATE OR REPLACE FUNCTION public.log_application_change()
+RETURNS trigger AS $$
+DECLARE
+  a public.task_applications;
+BEGIN
+  IF TG_OP = 'DELETE' THEN a := OLD; ELSE a := NEW; END IF;
+  PERFORM public.record_change('application', a.id, TG_OP = 'DELETE',
+    ARRAY[a.tasker_id, (SELECT t.customer_id FROM public.tasks t WHERE t.id = a.task_id)]);
+  IF TG_OP = 'INSERT' THEN
+    PERFORM public.record_change('task', a.task_id, false, ARRAY[a.tasker_id]);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE OR REPLACE FUNCTION public.log_message_change()
+RETURNS trigger AS $$
+DECLARE
+  m public.messages;
+BEGIN
+  IF TG_OP = 'DELETE' THEN m := OLD; ELSE m := NEW; END IF;
+  PERFORM public.record_change('message', m.id, TG_OP = 'DELETE', ARRAY[m.sender_id, m.receiver_id]);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE OR REPLACE FUNCTION public.log_category_change()
+RETURNS trigger AS $$
+BEGIN
+  PERFORM public.record_change('category', COALESCE(NEW.id, OLD.id), TG_OP = 'DELETE',
+                               ARRAY['00000000-0000-0000-0000-000000000000'::uuid]);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Profiles: only the user's own (stats updates touch it too)
+CREATE OR REPLACE FUNCTION public.log_profile_change()
+RETURNS trigger AS $$
+BEGIN
+  PERFORM public.record_change('profile', NEW.id, false, ARRAY[NEW.id]);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+REVOKE EXECUTE ON FUNCTION public.record_change(text, uuid, boolean, uuid[]) FROM PUBLIC, anon, authenticated;
+
+DROP TRIGGER IF EXISTS log_task_change ON public.tasks;
+DROP TRIGGER IF EXISTS log_task_delete ON public.tasks;
+DROP TRIGGER IF EXISTS log_application_change ON public.task_applications;
+DROP TRIGGER IF EXISTS log_message_change ON public.messages;
+DROP TRIGGER IF EXISTS log_category_change ON public.task_categories;
+DROP TRIGGER IF EXISTS log_profile_change ON public.profiles;
+
+CREATE TRIGGER log_task_change AFTER INSERT OR UPDATE ON public.tasks
+  FOR EACH ROW EXECUTE FUNCTION public.log_task_change();
+CREATE TRIGGER log_task_delete BEFORE DELETE ON public.tasks
+  FOR EACH ROW EXECUTE FUNCTION public.log_task_change();
+CREATE TRIGGER log_application_change AFTER INSERT OR UPDATE OR DELETE ON public.task_applications
+  FOR EACH ROW EXECUTE FUNCTION public.log_application_change();
+CREATE TRIGGER log_message_change AFTER INSERT OR UPDATE OR DELETE ON public.messages
+  FOR EACH ROW EXECUTE FUNCTION public.log_message_change();
+CREATE TRIGGER log_category_change AFTER INSERT OR UPDATE OR DELETE ON public.task_categories
+  FOR EACH ROW EXECUTE FUNCTION public.log_category_change();
+CREATE TRIGGER log_profile_change AFTER INSERT OR UPDATE ON public.profiles
+  FOR EACH ROW EXECUTE FUNCTION public.log_profile_change();
+
+-- Entries for rows that existed before the triggers
+INSERT INTO public.change_log (audience, entity, entity_id)
+SELECT DISTINCT audience, 'task', id FROM (
+  SELECT id, customer_id AS audience FROM public.tasks
+  UNION ALL SELECT id, tasker_id FROM public.tasks WHERE tasker_id IS NOT NULL
+  UNION ALL SELECT task_id, tasker_id FROM public.task_applications
+) t
+UNION ALL
+SELECT DISTINCT audience, 'application', id FROM (
+  SELECT a.id, a.tasker_id AS audience FROM public.task_applications a
+  UNION ALL SELECT a.id, t.customer_id FROM public.task_applications a JOIN public.tasks t ON t.id = a.task_id
+) a
+UNION ALL
+SELECT DISTINCT audience, 'message', id FROM (
+  SELECT id, sender_id AS audience FROM public.messages
+  UNION ALL SELECT id, receiver_id FROM public.messages
+) m
+UNION ALL
+SELECT '00000000-0000-0000-0000-000000000000'::uuid, 'category', id FROM public.task_categories
+UNION ALL
+SELECT id, 'profile', id FROM public.profiles
+ON CONFLICT (audience, entity, entity_id) DO NOTHING;
+
 -- ======================================
 -- INDEXES FOR PERFORMANCE
 -- ======================================
@@ -400,6 +776,64 @@ CREATE INDEX IF NOT EXISTS idx_tasks_customer ON public.tasks(customer_id);
 CREATE INDEX IF NOT EXISTS idx_tasks_tasker ON public.tasks(tasker_id);
 CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON public.tasks(created_at);
 
+-- Browse and job-board queries (GET /api/tasks filters and sorts). Partial on
+-- status = 'posted': open tasks are a small, hot slice of the table, and each
+-- index returns rows already in the requested order so LIMIT stops early.
+-- Low-cardinality filters (urgency, task_size, flexible_date) are applied to
+-- the rows these indexes return.
+ALTER TABLE public.tasks ADD COLUMN IF NOT EXISTS budget_floor decimal(10,2)
+  GENERATED ALWAYS AS (coalesce(budget_min, budget_max)) STORED;
+ALTER TABLE public.tasks ADD COLUMN IF NOT EXISTS budget_ceiling decimal(10,2)
+  GENERATED ALWAYS AS (coalesce(budget_max, budget_min, 0)) STORED;
+-- sort=newest, and any filter without a better index
+CREATE INDEX IF NOT EXISTS idx_tasks_posted_newest ON public.tasks(created_at DESC, id DESC)
+  WHERE status = 'posted';
+-- category_id=... sort=newest
+CREATE INDEX IF NOT EXISTS idx_tasks_posted_category ON public.tasks(category_id, created_at DESC, id DESC)
+  WHERE status = 'posted';
+-- state=... [city=...] sort=newest
+CREATE INDEX IF NOT EXISTS idx_tasks_posted_place ON public.tasks(state, city, created_at DESC, id DESC)
+  WHERE status = 'posted';
+-- sort=soonest, date_from/date_to
+CREATE INDEX IF NOT EXISTS idx_tasks_posted_soonest ON public.tasks(task_date, created_at DESC, id DESC)
+  WHERE status = 'posted';
+-- sort=budget, budget_min
+CREATE INDEX IF NOT EXISTS idx_tasks_posted_budget ON public.tasks(budget_ceiling DESC, created_at DESC, id DESC)
+  WHERE status = 'posted';
+-- latitude/longitude/radius_km bounding box
+CREATE INDEX IF NOT EXISTS idx_tasks_posted_coords ON public.tasks(latitude, longitude)
+  WHERE status = 'posted' AND latitude IS NOT NULL;
+
+-- Tasks within p_radius_km of a point, nearest first (GET /api/tasks with
+-- sort=nearest or radius_km, via rpc). PostgREST applies the request's
+-- filters, order and page to the result, so every task in the radius is
+-- ranked and offsets page through all of them. The bounding box lets
+-- idx_tasks_posted_coords narrow the scan before the exact distance.
+-- SECURITY INVOKER: the caller's row level security applies.
+CREATE OR REPLACE FUNCTION public.tasks_nearby(p_latitude double precision, p_longitude double precision,
+                                               p_radius_km double precision)
+RETURNS SETOF public.tasks AS $$
+  SELECT t.*
+  FROM public.tasks t,
+    LATERAL (SELECT degrees(p_radius_km / 6371.0) AS dlat) lat_box,
+    LATERAL (SELECT lat_box.dlat / greatest(cos(radians(least(abs(p_latitude) + lat_box.dlat, 90))), 1e-6)
+             AS dlng) lng_box,
+    LATERAL (SELECT 2 * 6371.0 * asin(sqrt(least(1.0,
+               sin(radians(t.latitude - p_latitude) / 2) ^ 2
+               + cos(radians(p_latitude)) * cos(radians(t.latitude))
+                 * sin(radians(t.longitude - p_longitude) / 2) ^ 2))) AS km) distance
+  WHERE t.latitude BETWEEN p_latitude - lat_box.dlat AND p_latitude + lat_box.dlat
+    AND (abs(p_longitude) + lng_box.dlng >= 180
+         OR t.longitude BETWEEN p_longitude - lng_box.dlng AND p_longitude + lng_box.dlng)
+    AND distance.km <= p_radius_km
+  ORDER BY distance.km, t.created_at DESC, t.id DESC;
+$$ LANGUAGE sql STABLE;
+-- A customer's own tasks, newest first
+CREATE INDEX IF NOT EXISTS idx_tasks_customer_created ON public.tasks(customer_id, created_at DESC, id DESC);
+-- Near-duplicate detection (backend/dedup.py): flagged reposts point at the original
+ALTER TABLE public.tasks ADD COLUMN IF NOT EXISTS duplicate_of uuid REFERENCES public.tasks(id) ON DELETE SET NULL;
+CREATE INDEX IF NOT EXISTS idx_tasks_duplicate_of ON public.tasks(duplicate_of) WHERE duplicate_of IS NOT NULL;
+
 -- Task applications indexes
 CREATE INDEX IF NOT EXISTS idx_applications_task ON public.task_applications(task_id);
 CREATE INDEX IF NOT EXISTS idx_applications_tasker ON public.task_applications(tasker_id);
@@ -409,16 +843,37 @@ CREATE INDEX IF NOT EXISTS idx_applications_status ON public.task_applications(s
 CREATE INDEX IF NOT EXISTS idx_messages_task ON public.messages(task_id);
 CREATE INDEX IF NOT EXISTS idx_messages_participants ON public.messages(sender_id, receiver_id);
 CREATE INDEX IF NOT EXISTS idx_messages_created_at ON public.messages(created_at);
+-- A task's conversation in order (GET /api/tasks/{id}/messages): no sort step
+CREATE INDEX IF NOT EXISTS idx_messages_task_created ON public.messages(task_id, created_at);
+-- Unread badges: only unread rows are indexed, so it stays small and hot
+CREATE INDEX IF NOT EXISTS idx_messages_unread ON public.messages(receiver_id, task_id) WHERE read_at IS NULL;
 
 -- Reviews indexes
 CREATE INDEX IF NOT EXISTS idx_reviews_reviewee ON public.reviews(reviewee_id);
 CREATE INDEX IF NOT EXISTS idx_reviews_task ON public.reviews(task_id);
 CREATE INDEX IF NOT EXISTS idx_reviews_created_at ON public.reviews(created_at);
+-- Keyset pagination of a profile's reviews, newest first
+CREATE INDEX IF NOT EXISTS idx_reviews_reviewee_page ON public.reviews(reviewee_id, created_at DESC, id DESC);
 
 -- Notifications indexes
 CREATE INDEX IF NOT EXISTS idx_notifications_user ON public.notifications(user_id);
 CREATE INDEX IF NOT EXISTS idx_notifications_read ON public.notifications(user_id, read);
 CREATE INDEX IF NOT EXISTS idx_notifications_created_at ON public.notifications(created_at);
+-- Keyset pagination of a user's notifications, newest first
+CREATE INDEX IF NOT EXISTS idx_notifications_user_page ON public.notifications(user_id, created_at DESC, id DESC);
+
+-- Bookings indexes (bookings_no_overlap's GiST index serves per-tasker slot lookups)
+-- A customer's bookings, latest first
+CREATE INDEX IF NOT EXISTS idx_bookings_customer ON public.bookings(customer_id, starts_at DESC);
+CREATE INDEX IF NOT EXISTS idx_bookings_tasker ON public.bookings(tasker_id, starts_at DESC);
+-- Availability index deltas (backend/availability.py)
+CREATE INDEX IF NOT EXISTS idx_bookings_updated_at ON public.bookings(updated_at);
+
+-- Change log: a user's changes past a sync token (GET /api/sync) are one range
+DROP INDEX IF EXISTS public.idx_change_log_audience_seq;
+CREATE INDEX IF NOT EXISTS idx_change_log_audience_xact ON public.change_log(audience, xact, seq);
+-- Tombstone pruning
+CREATE INDEX IF NOT EXISTS idx_change_log_tombstones ON public.change_log(changed_at) WHERE deleted;
 
 -- ======================================
 -- SAMPLE DATA (Optional - for testing)
@@ -457,7 +912,7 @@ FROM public.task_categories WHERE slug = 'mounting' LIMIT 1;
 DO $$
 BEGIN
     RAISE NOTICE 'TaskRabbit-style database schema created successfully!';
-    RAISE NOTICE 'Tables created: profiles, task_categories, tasks, task_applications, reviews, messages, notifications';
+    RAISE NOTICE 'Tables created: profiles, task_categories, tasks, task_applications, reviews, messages, notifications, notification_counters';
     RAISE NOTICE 'RLS policies enabled for all tables';
     RAISE NOTICE 'Triggers and functions created for auto-profile creation and stats updates';
     RAISE NOTICE 'Indexes created for optimal performance';
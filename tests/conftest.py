@@ -0,0 +1,20 @@
+"""
+Shared fixtures. ``server`` imports backend/server.py against the SQLite
+stand-in (its configuration is read at import, so the environment is set
+first). Its stand-in database lives as long as the test session: tests
+create their own rows and check only those.
+"""
+
+import os
+
+import pytest
+
+from perf import use_backend_path
+
+
+@pytest.fixture(scope="session")
+def server():
+    os.environ["SKILLHUB_DATA_BACKEND"] = "standin"
+    use_backend_path()
+    import server as module
+    return module
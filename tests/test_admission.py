@@ -0,0 +1,141 @@
+"""
+Admission control tests: token buckets, per-route rate limits and the
+concurrency limiter's queueing and shedding.
+"""
+
+import asyncio
+
+import pytest
+
+from perf import use_backend_path
+
+use_backend_path()
+
+import admission  # noqa: E402
+
+
+def test_token_bucket_allows_a_burst_then_refills_at_the_rate():
+    bucket = admission.TokenBucket(rate=2.0, burst=3.0, now=0.0)
+    assert [bucket.take(0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.take(0.0) == pytest.approx(0.5)
+    # Half a second later one token is back, and no more
+    assert bucket.take(0.5) == 0.0
+    assert bucket.take(0.5) > 0
+    # Never refills past the burst
+    bucket.take(100.0)
+    assert sum(bucket.take(100.0) == 0.0 for _ in range(5)) == 2
+
+
+def test_parse_limits():
+    limits = admission.parse_limits("*=20/40, GET /api/tasks/{task_id}/messages=2/10,POST /api/tasks=1")
+    assert limits == {"*": (20.0, 40.0), "GET /api/tasks/{task_id}/messages": (2.0, 10.0),
+                      "POST /api/tasks": (1.0, 1.0)}
+
+
+def test_rate_limiter_keys_buckets_by_caller_and_route():
+    limiter = admission.RateLimiter(admission.parse_limits("*=1/2,POST /api/tasks=1/1"))
+    assert limiter.check("alice", "POST /api/tasks") == 0
+    assert limiter.check("alice", "POST /api/tasks") > 0
+    # Another caller, or another route of the same caller, has its own bucket
+    assert limiter.check("bob", "POST /api/tasks") == 0
+    assert limiter.check("alice", "GET /api/tasks") == 0
+    assert limiter.rejected == 1
+
+
+def test_rate_limiter_without_a_matching_limit_admits_everything():
+    limiter = admission.RateLimiter(admission.parse_limits("POST /api/tasks=1/1"))
+    assert all(limiter.check("alice", "GET /api/tasks") == 0 for _ in range(100))
+
+
+def test_rate_limiter_evicts_least_recently_used_buckets():
+    limiter = admission.RateLimiter(admission.parse_limits("*=1/1"), max_keys=2)
+    for caller in ("a", "b", "c"):
+        limiter.check(caller, "GET /api/tasks")
+    assert [key[0] for key in limiter.buckets] == ["b", "c"]
+
+
+def test_rate_limits_are_opt_in(monkeypatch):
+    monkeypatch.delenv("SKILLHUB_RATE_LIMITS", raising=False)
+    assert admission.RateLimiter.from_env() is None
+    monkeypatch.setenv("SKILLHUB_RATE_LIMITS", "recommended")
+    assert admission.RateLimiter.from_env().limits == admission.parse_limits(admission.RECOMMENDED_RATE_LIMITS)
+    monkeypatch.setenv("SKILLHUB_RATE_LIMITS", "*=5/5")
+    assert admission.RateLimiter.from_env().limits == {"*": (5.0, 5.0)}
+
+
+def test_concurrency_limiter_queues_in_order_and_hands_slots_over():
+    async def scenario():
+        limiter = admission.ConcurrencyLimiter(max_concurrent=1, max_queue=4, max_wait_s=5.0)
+        assert await limiter.acquire() is None
+        admitted = []
+
+        async def request(name):
+            assert await limiter.acquire() is None
+            admitted.append(name)
+
+        waiters = [asyncio.ensure_future(request(name)) for name in "abc"]
+        await asyncio.sleep(0)
+        assert limiter.stats()["queued"] == 3
+        for _ in range(3):
+            limiter.release(0.01)
+            await asyncio.sleep(0)
+        await asyncio.gather(*waiters)
+        assert admitted == ["a", "b", "c"]
+        assert limiter.active == 1
+        limiter.release(0.01)
+        assert limiter.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_concurrency_limiter_sheds_when_the_queue_is_full():
+    async def scenario():
+        limiter = admission.ConcurrencyLimiter(max_concurrent=1, max_queue=1, max_wait_s=5.0)
+        assert await limiter.acquire() is None
+        queued = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        retry_after = await limiter.acquire()
+        assert retry_after is not None and retry_after >= 1
+        assert limiter.shed == 1
+        limiter.release(0.01)
+        assert await queued is None
+
+    asyncio.run(scenario())
+
+
+def test_concurrency_limiter_sheds_a_wait_predicted_past_max_wait():
+    async def scenario():
+        limiter = admission.ConcurrencyLimiter(max_concurrent=1, max_queue=100, max_wait_s=0.5)
+        limiter.service_s = 1.0
+        assert await limiter.acquire() is None
+        assert await limiter.acquire() is not None
+
+    asyncio.run(scenario())
+
+
+def test_concurrency_limiter_times_out_a_queued_request():
+    async def scenario():
+        limiter = admission.ConcurrencyLimiter(max_concurrent=1, max_queue=4, max_wait_s=0.05)
+        limiter.service_s = 0.001
+        assert await limiter.acquire() is None
+        assert await limiter.acquire() is not None
+        assert limiter.stats()["queued"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_a_cancelled_waiter_does_not_leak_its_slot():
+    async def scenario():
+        limiter = admission.ConcurrencyLimiter(max_concurrent=1, max_queue=4, max_wait_s=5.0)
+        assert await limiter.acquire() is None
+        cancelled = asyncio.ensure_future(limiter.acquire())
+        waiting = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        limiter.release(0.01)
+        assert await waiting is None
+        limiter.release(0.01)
+        assert limiter.active == 0 and not limiter.waiters
+
+    asyncio.run(scenario())
@@ -0,0 +1,129 @@
+"""
+Availability tests: AvailabilityIndex.free against a brute-force overlap
+check over random bookings, its filters and upkeep, and the checks
+POST /api/bookings makes before inserting.
+"""
+
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+
+from perf import use_backend_path
+
+use_backend_path()
+
+import availability  # noqa: E402
+
+HOUR = 3600.0
+START = datetime(2026, 6, 1, tzinfo=timezone.utc).timestamp()
+AUTH = {"Authorization": "Bearer x"}
+
+
+def tasker(tasker_id, rating, skills=("Cleaning",), city="Austin", state="TX", **fields):
+    return {"id": tasker_id, "average_rating": rating, "skills": list(skills), "city": city, "state": state,
+            "role": "tasker", **fields}
+
+
+def booking(booking_id, tasker_id, starts, ends, status="confirmed"):
+    return {"id": booking_id, "tasker_id": tasker_id, "status": status,
+            "starts_at": datetime.fromtimestamp(starts, timezone.utc).isoformat(),
+            "ends_at": datetime.fromtimestamp(ends, timezone.utc).isoformat()}
+
+
+def ids(found):
+    return [row["id"] for row in found]
+
+
+def test_free_matches_a_brute_force_overlap_check():
+    rng = random.Random(46)
+    taskers = [tasker(f"t{i}", round(rng.uniform(1, 5), 1), skills=rng.sample(["Cleaning", "Moving", "Yard"], 2))
+               for i in range(40)]
+    bookings = []
+    for row in taskers:
+        # Back to back, never overlapping, like bookings_no_overlap allows
+        at = START + rng.randrange(0, 48) * HOUR
+        for n in range(rng.randrange(0, 8)):
+            length = rng.randrange(1, 4) * HOUR
+            bookings.append(booking(f"{row['id']}-{n}", row["id"], at, at + length))
+            at += length + rng.randrange(0, 3) * HOUR
+    index = availability.AvailabilityIndex()
+    index.replace(taskers, bookings)
+    ranked = sorted(taskers, key=lambda row: (-row["average_rating"], row["id"]))
+    for _ in range(300):
+        category = rng.choice(["cleaning", "Moving", "YARD"])
+        starts = START + rng.randrange(0, 96) * HOUR / 2
+        ends = starts + rng.randrange(1, 8) * HOUR / 2
+        limit = rng.choice([1, 5, 100])
+        expected = [row["id"] for row in ranked if category.lower() in {s.lower() for s in row["skills"]}
+                    and not any(b["tasker_id"] == row["id"] and availability.epoch(b["starts_at"]) < ends
+                                and availability.epoch(b["ends_at"]) > starts for b in bookings)]
+        assert ids(index.free(category, starts, ends, limit=limit)) == expected[:limit]
+
+
+def test_touching_slots_are_free():
+    index = availability.AvailabilityIndex()
+    index.replace([tasker("a", 5)], [booking("b1", "a", START + HOUR, START + 2 * HOUR)])
+    assert ids(index.free("cleaning", START, START + HOUR)) == ["a"]
+    assert ids(index.free("cleaning", START + 2 * HOUR, START + 3 * HOUR)) == ["a"]
+    assert index.free("cleaning", START + 1.5 * HOUR, START + 1.6 * HOUR) == []
+    assert index.free("cleaning", START, START + 3 * HOUR) == []
+
+
+def test_free_filters_by_place_availability_and_exclusions():
+    index = availability.AvailabilityIndex()
+    index.replace([tasker("a", 5), tasker("b", 4, city="Dallas"), tasker("c", 3, available=False),
+                   tasker("d", 2, state="CO"), {"id": "e", "role": "customer", "skills": ["Cleaning"]}], [])
+    assert ids(index.free("Cleaning", START, START + HOUR)) == ["a", "b", "d"]
+    assert ids(index.free("Cleaning", START, START + HOUR, city=" austin ")) == ["a", "d"]
+    assert ids(index.free("Cleaning", START, START + HOUR, state="tx")) == ["a", "b"]
+    assert ids(index.free("Cleaning", START, START + HOUR, exclude=["a"])) == ["b", "d"]
+    assert index.free("Plumbing", START, START + HOUR) == []
+    assert set(index.free("Cleaning", START, START + HOUR)[0]) == set(availability.SUMMARY_FIELDS)
+
+
+def test_upserts_keep_free_current():
+    index = availability.AvailabilityIndex()
+    index.replace([tasker("a", 5), tasker("b", 4)], [booking("b1", "a", START, START + HOUR)])
+    slot = (START, START + HOUR)
+    assert ids(index.free("cleaning", *slot)) == ["b"]
+    # Moved, then cancelled
+    index.upsert_booking(booking("b1", "a", START + 5 * HOUR, START + 6 * HOUR))
+    assert ids(index.free("cleaning", *slot)) == ["a", "b"]
+    index.upsert_booking(booking("b1", "a", START, START + HOUR, status="cancelled"))
+    assert index.stats()["bookings"] == 0 and "a" not in index.schedules
+    # A re-rated tasker moves in the ranking; one who stopped being a tasker leaves it
+    index.upsert_tasker(tasker("b", 5.5))
+    assert ids(index.free("cleaning", *slot)) == ["b", "a"]
+    index.upsert_tasker({**tasker("b", 5.5), "role": "customer"})
+    assert ids(index.free("cleaning", *slot)) == ["a"]
+    index.upsert_tasker(tasker("a", 5, skills=["Moving"]))
+    assert index.free("cleaning", *slot) == [] and ids(index.free("moving", *slot)) == ["a"]
+
+
+def test_booking_checks_the_tasker_and_the_slot(server):
+    with TestClient(server.app) as http:
+        database = server.supabase.database
+        tasker_id, customer_id = str(uuid.uuid4()), str(uuid.uuid4())
+        database.insert_rows("profiles", [
+            {"id": tasker_id, "email": f"{tasker_id}@example.com", "full_name": "T", "username": tasker_id,
+             "role": "tasker"},
+            {"id": customer_id, "email": f"{customer_id}@example.com", "full_name": "C", "username": customer_id,
+             "role": "customer"}])
+        later = (datetime.now(timezone.utc) + timedelta(days=3)).isoformat()
+
+        def book(**fields):
+            return http.post("/api/bookings", headers=AUTH,
+                             json={"service_type": "Cleaning", "scheduled_at": later, **fields})
+
+        assert book(tasker_id=customer_id).status_code == 400
+        assert book(tasker_id=str(uuid.uuid4())).status_code == 400
+        past = (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat()
+        assert book(tasker_id=tasker_id, scheduled_at=past).status_code == 400
+        assert book(tasker_id=tasker_id, duration_minutes=0).status_code == 422
+        created = book(tasker_id=tasker_id, duration_minutes=90)
+        assert created.status_code == 200, created.text
+        row = created.json()
+        assert row["tasker_id"] == tasker_id and row["status"] == "pending"
+        assert availability.epoch(row["ends_at"]) - availability.epoch(row["starts_at"]) == 90 * 60
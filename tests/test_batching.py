@@ -0,0 +1,142 @@
+"""
+Micro-batching tests: coalescing and order, the per-row fallback after a
+rejected statement, and no second write after a failure the insert may have
+survived (which would duplicate chat messages).
+"""
+
+import asyncio
+
+from fastapi import HTTPException
+from postgrest.exceptions import APIError
+
+from perf import use_backend_path
+
+use_backend_path()
+
+import batching  # noqa: E402
+
+
+class FakeTable:
+    """Stores rows like a multi-row insert; ``reject`` ids fail the statement"""
+
+    def __init__(self, reject=(), fail_after_commit=False):
+        self.rows = []
+        self.statements = 0
+        self.reject = set(reject)
+        self.fail_after_commit = fail_after_commit
+
+    async def write_rows(self, rows):
+        self.statements += 1
+        await asyncio.sleep(0)
+        if any(row["id"] in self.reject for row in rows):
+            raise APIError({"message": "violates foreign key constraint", "code": "23503"})
+        self.rows.extend(rows)
+        if self.fail_after_commit:
+            raise HTTPException(status_code=504, detail="deadline exceeded")
+        return [dict(row, stored=True) for row in rows]
+
+
+def test_concurrent_submits_share_one_insert_in_order():
+    async def scenario():
+        table = FakeTable()
+        writer = batching.BatchWriter(table.write_rows, max_batch=10, max_delay_s=0.01)
+        results = await asyncio.gather(*(writer.submit({"id": i}) for i in range(5)))
+        assert [r["id"] for r in results] == list(range(5)) and all(r["stored"] for r in results)
+        assert table.statements == 1 and [row["id"] for row in table.rows] == list(range(5))
+        assert writer.stats()["mean_batch"] == 5
+
+    asyncio.run(scenario())
+
+
+def test_a_full_batch_is_written_without_waiting_out_the_delay():
+    async def scenario():
+        table = FakeTable()
+        writer = batching.BatchWriter(table.write_rows, max_batch=3, max_delay_s=10.0)
+        results = await asyncio.wait_for(asyncio.gather(*(writer.submit({"id": i}) for i in range(3))), 1.0)
+        assert len(results) == 3
+
+    asyncio.run(scenario())
+
+
+def test_a_rejected_batch_is_retried_row_by_row():
+    async def scenario():
+        table = FakeTable(reject={2})
+        writer = batching.BatchWriter(table.write_rows, max_batch=10, max_delay_s=0.01)
+        results = await asyncio.gather(*(writer.submit({"id": i}) for i in range(4)), return_exceptions=True)
+        assert isinstance(results[2], APIError)
+        assert [r["id"] for i, r in enumerate(results) if i != 2] == [0, 1, 3]
+        assert [row["id"] for row in table.rows] == [0, 1, 3]
+        assert writer.fallbacks == 1
+
+    asyncio.run(scenario())
+
+
+def test_a_failure_after_the_insert_is_not_written_again():
+    async def scenario():
+        table = FakeTable(fail_after_commit=True)
+        writer = batching.BatchWriter(table.write_rows, max_batch=10, max_delay_s=0.01)
+        results = await asyncio.gather(*(writer.submit({"id": i}) for i in range(3)), return_exceptions=True)
+        assert all(isinstance(r, HTTPException) and r.status_code == 504 for r in results)
+        assert table.statements == 1 and len(table.rows) == 3
+        assert writer.fallbacks == 0
+
+    asyncio.run(scenario())
+
+
+def test_an_unexpected_result_fails_the_batch_without_a_second_write():
+    async def scenario():
+        calls = []
+
+        async def short_result(rows):
+            calls.append(rows)
+            return rows[:1]
+
+        writer = batching.BatchWriter(short_result, max_batch=10, max_delay_s=0.01)
+        results = await asyncio.gather(*(writer.submit({"id": i}) for i in range(3)), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert len(calls) == 1
+
+    asyncio.run(scenario())
+
+
+def test_enqueued_rows_are_dropped_past_max_pending():
+    async def scenario():
+        table = FakeTable()
+        writer = batching.BatchWriter(table.write_rows, max_batch=10, max_delay_s=0.01, max_pending=2)
+        assert [writer.enqueue({"id": i}) for i in range(3)] == [True, True, False]
+        await writer.close()
+        assert len(table.rows) == 2 and writer.dropped == 1
+
+    asyncio.run(scenario())
+
+
+def test_message_batch_survives_a_failed_profile_reread(server, monkeypatch):
+    """Messages stored by the insert come back even when the embed re-read fails"""
+    from fastapi.testclient import TestClient
+
+    with TestClient(server.app):
+        database = server.supabase.database
+        customer, tasker = "demo-user-id", "11111111-1111-1111-1111-111111111111"
+        category = database.conn.execute('SELECT "id" FROM "task_categories"').fetchone()[0]
+        task_id = database.insert_rows("tasks", [{
+            "customer_id": customer, "tasker_id": tasker, "category_id": category, "title": "t",
+            "description": "d", "address": "a", "city": "c", "state": "s", "zip_code": "z"}])[0]["id"]
+        real_read = server.db.read
+
+        async def failing_read(operation, query, *args, **kwargs):
+            if operation == "messages.get_batch":
+                raise HTTPException(status_code=504, detail="deadline exceeded")
+            return await real_read(operation, query, *args, **kwargs)
+
+        monkeypatch.setattr(server.db, "read", failing_read)
+        writer = batching.BatchWriter(server.write_message_rows, max_batch=10, max_delay_s=0.01)
+
+        async def send():
+            return await asyncio.gather(*(writer.submit({
+                "id": f"00000000-0000-0000-0000-00000000000{i}", "task_id": task_id, "sender_id": customer,
+                "receiver_id": tasker, "content": f"message {i}"}) for i in range(3)))
+
+        sent = asyncio.run(send())
+        assert [m["content"] for m in sent] == ["message 0", "message 1", "message 2"]
+        stored = database.conn.execute('SELECT count(*) FROM "messages" WHERE "task_id" = ?', (task_id,)).fetchone()
+        assert stored[0] == 3
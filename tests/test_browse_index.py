@@ -0,0 +1,214 @@
+"""
+Browse index tests: OpenTaskIndex answers random filter/sort/page queries
+with the same tasks, in the same order, as the database path of
+GET /api/tasks (``task_list_query`` on the stand-in, whose located queries
+read the ``tasks_nearby`` function), nearest's default radius on both
+paths, plus its upkeep on updates, and the database path's nearest ordering
+across every task in the radius.
+"""
+
+import json
+import random
+from datetime import date, datetime, timedelta, timezone
+
+from perf import use_backend_path
+
+use_backend_path()
+
+import browse_index  # noqa: E402
+import standin  # noqa: E402
+
+CITIES = (("Austin", "TX", 30.27, -97.74), ("Dallas", "TX", 32.78, -96.80), ("Denver", "CO", 39.74, -104.99))
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def make_tasks(database, count, rng):
+    categories = [row[0] for row in database.conn.execute('SELECT "id" FROM "task_categories"')]
+    customer = "22222222-2222-2222-2222-222222222222"
+    rows = []
+    for i in range(count):
+        city, state, lat, lng = rng.choice(CITIES)
+        low = rng.choice([None, rng.randrange(20, 400)])
+        high = rng.choice([None, (low or 0) + rng.randrange(0, 300)])
+        rows.append({
+            "customer_id": customer, "category_id": rng.choice(categories), "title": f"task {i}",
+            "description": "d", "address": "a", "city": city, "state": state, "zip_code": "z",
+            "status": rng.choices(["posted", "assigned", "completed"], [8, 1, 1])[0],
+            "urgency": rng.choice(browse_index.URGENCIES), "task_size": rng.choice(browse_index.TASK_SIZES),
+            "budget_min": low, "budget_max": high,
+            "task_date": rng.choice([None, (date(2026, 3, 1) + timedelta(days=rng.randrange(30))).isoformat()]),
+            "flexible_date": rng.random() < 0.3,
+            "latitude": None if rng.random() < 0.1 else lat + rng.uniform(-0.6, 0.6),
+            "longitude": None if rng.random() < 0.1 else lng + rng.uniform(-0.6, 0.6),
+            "created_at": (START + timedelta(minutes=i)).isoformat(),
+        })
+    inserted = database.insert_rows("tasks", rows)
+    # A flagged repost stays out of the feed
+    database.conn.execute('UPDATE "tasks" SET "duplicate_of" = ? WHERE "id" = ?', (inserted[0]["id"], inserted[1]["id"]))
+    return categories
+
+
+def random_query(rng, categories):
+    q = browse_index.BrowseQuery(sort=rng.choice(browse_index.SORTS), limit=rng.choice([5, 20, 200]),
+                                 offset=rng.choice([0, 0, 3, 40]))
+    if rng.random() < 0.3:
+        q.category_id = rng.choice(categories)
+    if rng.random() < 0.3:
+        # 0 matches tasks without a budget too
+        q.budget_min = rng.choice([0, rng.randrange(0, 400)])
+    if rng.random() < 0.3:
+        q.budget_max = rng.randrange(100, 600)
+    if rng.random() < 0.3:
+        q.urgency = rng.sample(browse_index.URGENCIES, rng.randint(1, 2))
+    if rng.random() < 0.3:
+        q.task_size = rng.sample(browse_index.TASK_SIZES, rng.randint(1, 2))
+    if rng.random() < 0.2:
+        q.date_from = date(2026, 3, 1) + timedelta(days=rng.randrange(15))
+    if rng.random() < 0.2:
+        q.date_to = date(2026, 3, 10) + timedelta(days=rng.randrange(20))
+    if rng.random() < 0.2:
+        q.flexible_date = rng.random() < 0.5
+    city, state, lat, lng = rng.choice(CITIES)
+    if rng.random() < 0.3:
+        q.city, q.state = city, state
+    if q.sort == 'nearest' or rng.random() < 0.2:
+        q.latitude, q.longitude = lat + rng.uniform(-0.2, 0.2), lng + rng.uniform(-0.2, 0.2)
+        # Without a radius, nearest looks within the default one on both paths
+        q.radius_km = rng.choice([None, 5.0, 25.0, 80.0])
+    return q.validate()
+
+
+def database_page(server, client, q):
+    """What GET /api/tasks returns for a tasker, without the index"""
+    def query():
+        return server.task_list_query(client, q, "id").eq("status", "posted").is_("duplicate_of", "null")
+
+    page = query().range(q.offset, q.offset + q.limit - 1).execute().data
+    return [task["id"] for task in page], len(query().execute().data)
+
+
+def index_page(index, q):
+    rows, total = index.query(q)
+    return [row["id"] for row in json.loads(index.render(rows))], total
+
+
+def load_index(client):
+    index = browse_index.OpenTaskIndex()
+    index.replace(client.table("tasks").select("*").eq("status", "posted").execute().data, {})
+    return index
+
+
+def test_index_matches_the_database_path(server):
+    rng = random.Random(41)
+    client = standin.create_client(standin.StandinConfig(), database=standin.StandinDatabase())
+    categories = make_tasks(client.database, 400, rng)
+    index = load_index(client)
+    for _ in range(300):
+        q = random_query(rng, categories)
+        assert index_page(index, q) == database_page(server, client, q), q
+
+
+def test_budget_ties_and_missing_budgets_sort_and_filter_like_the_database(server):
+    client = standin.create_client(standin.StandinConfig(), database=standin.StandinDatabase())
+    database = client.database
+    category = database.conn.execute('SELECT "id" FROM "task_categories"').fetchone()[0]
+    budgets = [(None, None), (50, 100), (80, 100), (None, 100), (0, 0), (None, None)]
+    database.insert_rows("tasks", [{
+        "customer_id": "c", "category_id": category, "title": f"t{i}", "description": "d", "address": "a",
+        "city": "c", "state": "s", "zip_code": "z", "status": "posted", "budget_min": low, "budget_max": high,
+        "created_at": (START + timedelta(minutes=i)).isoformat()} for i, (low, high) in enumerate(budgets)])
+    index = load_index(client)
+    for limit in (2, 3, 6):
+        q = browse_index.BrowseQuery(sort="budget", limit=limit).validate()
+        assert index_page(index, q) == database_page(server, client, q)
+    for budget_min, budget_max in ((0, None), (None, 0), (0, 0), (60, None), (None, 90)):
+        q = browse_index.BrowseQuery(budget_min=budget_min, budget_max=budget_max).validate()
+        assert index_page(index, q) == database_page(server, client, q), (budget_min, budget_max)
+    assert index_page(index, browse_index.BrowseQuery(budget_min=0).validate())[1] == len(budgets)
+
+
+def test_nearest_without_a_radius_uses_the_default_on_both_paths(server):
+    client = standin.create_client(standin.StandinConfig(), database=standin.StandinDatabase())
+    database = client.database
+    category = database.conn.execute('SELECT "id" FROM "task_categories"').fetchone()[0]
+    # 11 km and 111 km north of the query point
+    database.insert_rows("tasks", [{
+        "customer_id": "c", "category_id": category, "title": f"t{i}", "description": "d", "address": "a",
+        "city": "c", "state": "s", "zip_code": "z", "status": "posted", "latitude": 30.0 + lat, "longitude": -97.0,
+        "created_at": (START + timedelta(minutes=i)).isoformat()} for i, lat in enumerate((0.1, 1.0))])
+    q = browse_index.BrowseQuery(latitude=30.0, longitude=-97.0, sort="nearest").validate()
+    assert q.radius_km == browse_index.NEAREST_DEFAULT_RADIUS_KM
+    page = index_page(load_index(client), q)
+    assert page == database_page(server, client, q) and page[1] == 1
+
+
+def test_upsert_and_remove_keep_queries_current():
+    index = browse_index.OpenTaskIndex(capacity=2)
+    newest = browse_index.BrowseQuery(limit=10).validate()
+    for i in range(5):
+        index.upsert({"id": f"t{i}", "status": "posted", "city": "Austin",
+                      "created_at": (START + timedelta(minutes=i)).isoformat()})
+    assert index_page(index, newest) == (["t4", "t3", "t2", "t1", "t0"], 5)
+    index.upsert({"id": "t3", "status": "assigned"})
+    index.upsert({"id": "t1", "status": "posted", "city": "Dallas",
+                  "created_at": (START + timedelta(minutes=1)).isoformat()}, applications_count=2)
+    index.remove("t0")
+    assert index_page(index, newest) == (["t4", "t2", "t1"], 3)
+    assert index_page(index, browse_index.BrowseQuery(city="dallas").validate()) == (["t1"], 1)
+    rows, _ = index.query(browse_index.BrowseQuery(city="Dallas").validate())
+    assert json.loads(index.render(rows))[0]["applications_count"] == 2
+    # A city the index has never seen matches nothing
+    assert index_page(index, browse_index.BrowseQuery(city="Boston").validate()) == ([], 0)
+
+
+def test_the_oldest_task_is_evicted_past_max_tasks():
+    index = browse_index.OpenTaskIndex(max_tasks=3)
+    for i in (1, 0, 2, 3):
+        index.upsert({"id": f"t{i}", "status": "posted", "created_at": (START + timedelta(minutes=i)).isoformat()})
+    assert len(index) == 3 and "t0" not in index and index.evicted == 1
+
+
+def test_nearest_ranks_every_task_in_the_radius(server):
+    """More tasks in the radius than one page of candidates: the nearest are the oldest"""
+    client = standin.create_client(standin.StandinConfig(), database=standin.StandinDatabase())
+    database = client.database
+    category = database.conn.execute('SELECT "id" FROM "task_categories"').fetchone()[0]
+    count = 1500
+    # Created farthest first, so creation order is the reverse of distance order
+    tasks = database.insert_rows("tasks", [{
+        "customer_id": "c", "category_id": category, "title": f"t{i}", "description": "d", "address": "a",
+        "city": "c", "state": "s", "zip_code": "z", "status": "posted",
+        "latitude": 30.0 + (count - i) * 0.0002, "longitude": -97.0,
+        "created_at": (START + timedelta(minutes=i)).isoformat()} for i in range(count)])
+    nearest_first = [task["id"] for task in reversed(tasks)]
+    q = browse_index.BrowseQuery(latitude=30.0, longitude=-97.0, sort="nearest", limit=200, offset=0).validate()
+    assert database_page(server, client, q) == (nearest_first[:200], count)
+    q.offset = 1400
+    assert database_page(server, client, q) == (nearest_first[1400:], count)
+    # Only what is inside the radius, in the requested sort
+    q = browse_index.BrowseQuery(latitude=30.0, longitude=-97.0, radius_km=5.0, limit=200).validate()
+    ids, total = database_page(server, client, q)
+    assert total == sum(server.browse_index.distance_km(30.0, -97.0, t["latitude"], t["longitude"]) <= 5.0
+                        for t in tasks)
+    assert ids == [task["id"] for task in reversed(tasks) if task["id"] in set(ids)]
+
+
+def test_get_tasks_nearest_pages_and_distances(server):
+    from fastapi.testclient import TestClient
+
+    with TestClient(server.app) as http:
+        database = server.supabase.database
+        category = database.conn.execute('SELECT "id" FROM "task_categories"').fetchone()[0]
+        city = f"nearest-{random.random()}"
+        database.insert_rows("tasks", [{
+            "customer_id": "demo-user-id", "category_id": category, "title": f"t{i}", "description": "d",
+            "address": "a", "city": city, "state": "s", "zip_code": "z", "status": "posted",
+            "latitude": 10.0 + i * 0.001, "longitude": 20.0,
+            "created_at": (START + timedelta(minutes=i)).isoformat()} for i in range(30)])
+        params = {"latitude": 10.0, "longitude": 20.0, "sort": "nearest", "city": city, "limit": 10}
+        first = http.get("/api/tasks", params=params, headers={"Authorization": "Bearer x"}).json()
+        assert [task["title"] for task in first] == [f"t{i}" for i in range(10)]
+        assert first[0]["distance_km"] == 0.0 and first[1]["distance_km"] == 0.11
+        last = http.get("/api/tasks", params={**params, "offset": 25},
+                        headers={"Authorization": "Bearer x"}).json()
+        assert [task["title"] for task in last] == [f"t{i}" for i in range(25, 30)]
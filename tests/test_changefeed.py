@@ -0,0 +1,137 @@
+"""
+Change feed tests: sync tokens, the reset of tokens older than tombstones
+are kept (or from before the feed was ordered by transaction), the cut at
+the first unsettled row on every page, tombstones for deleted and vanished
+rows, and GET /api/sync paging through the stand-in's change_log.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from perf import use_backend_path
+
+use_backend_path()
+
+import changefeed  # noqa: E402
+
+NOW = 1_780_000_000.0
+CONFIG = changefeed.SyncConfig(page_size=3, tombstone_days=30)
+AUTH = {"Authorization": "Bearer x"}
+
+
+def log_row(xact, seq, settled=True, entity="task", deleted=False):
+    return {"xact": xact, "seq": seq, "settled": settled, "entity": entity, "entity_id": f"{entity}-{seq}",
+            "deleted": deleted, "changed_at": datetime.fromtimestamp(NOW, timezone.utc).isoformat()}
+
+
+def test_tokens_round_trip():
+    for after, issued in (((0, 0), 0), ((7, 35), 36), ((2 ** 40, 10 ** 12), int(NOW))):
+        assert changefeed.decode_token(changefeed.encode_token(after, issued)) == (after, issued)
+    assert changefeed.encode_token((37, 36), 35) == "11.10.z"
+    for token in ("", "abc", "1.2", "1.2.3.4", "-1.5.5", "1.5.-5", "1.5.?"):
+        with pytest.raises(HTTPException) as raised:
+            changefeed.decode_token(token)
+        assert raised.value.status_code == 400
+
+
+def test_start_resets_tokens_older_than_the_tombstones():
+    assert changefeed.start(None, CONFIG, now=NOW) == ((0, 0), int(NOW), False)
+    recent = changefeed.encode_token((9, 42), int(NOW - 29 * 86400))
+    assert changefeed.start(recent, CONFIG, now=NOW) == ((9, 42), int(NOW - 29 * 86400), False)
+    stale = changefeed.encode_token((9, 42), int(NOW - 31 * 86400))
+    assert changefeed.start(stale, CONFIG, now=NOW) == ((0, 0), int(NOW), True)
+    # A <seq>.<issued> token from before transaction ordering starts over
+    assert changefeed.start("16.z", CONFIG, now=NOW) == ((0, 0), int(NOW), True)
+
+
+def test_a_settled_full_page_continues_without_completing_the_view():
+    issued = int(NOW - 3600)
+    log = [log_row(3, 5), log_row(3, 7), log_row(6, 2)]
+    assert changefeed.next_token(log, (3, 4), issued, True, now=NOW) == \
+        (changefeed.encode_token((6, 2), issued), True)
+
+
+def test_every_page_stops_at_the_first_unsettled_row():
+    issued = int(NOW - 3600)
+    # A transaction still open below a committed one: resume before both
+    log = [log_row(3, 5), log_row(8, 9, settled=False), log_row(9, 6, settled=False)]
+    assert changefeed.next_token(log, (3, 4), issued, True, now=NOW) == \
+        (changefeed.encode_token((3, 5), int(NOW)), False)
+    # Nothing settled: the token stays where it was
+    log = [log_row(8, 5, settled=False), log_row(9, 6, settled=False)]
+    for full_page in (True, False):
+        assert changefeed.next_token(log, (3, 4), issued, full_page, now=NOW) == \
+            (changefeed.encode_token((3, 4), int(NOW)), False)
+    # A short settled page is caught up
+    assert changefeed.next_token([log_row(4, 1)], (3, 4), issued, False, now=NOW) == \
+        (changefeed.encode_token((4, 1), int(NOW)), False)
+    assert changefeed.next_token([], (5, 9), issued, False, now=NOW) == \
+        (changefeed.encode_token((5, 9), int(NOW)), False)
+
+
+def test_deleted_and_vanished_rows_become_tombstones():
+    log = [log_row(1, 1), log_row(1, 2, deleted=True), log_row(1, 3), log_row(2, 4, entity="category"),
+           log_row(3, 5, entity="profile"), log_row(3, 6, entity="message", deleted=True)]
+    changed, deleted = changefeed.changed_ids(log)
+    assert changed == {"task": ["task-1", "task-3"], "category": ["category-4"], "profile": ["profile-5"]}
+    assert deleted == {"task": ["task-2"], "message": ["message-6"]}
+    # task-1 was deleted and the category deactivated after the log read
+    body = changefeed.assemble(changed, deleted, {"task": [{"id": "task-3"}], "category": [],
+                                                  "profile": [{"id": "profile-5", "full_name": "P"}]})
+    assert body["tasks"] == [{"id": "task-3"}] and body["categories"] == []
+    assert body["profile"] == {"id": "profile-5", "full_name": "P"}
+    assert body["deleted"] == {"tasks": ["task-2", "task-1"], "messages": ["message-6"], "categories": ["category-4"]}
+    empty = changefeed.assemble({}, {}, {})
+    assert empty == {"tasks": [], "applications": [], "messages": [], "categories": [], "profile": None,
+                     "deleted": {}}
+
+
+def test_sync_endpoint_pages_and_reports_deletions(server, monkeypatch):
+    monkeypatch.setattr(server.sync_config, "page_size", 2)
+    with TestClient(server.app) as http:
+        database = server.supabase.database
+
+        def sync(token=None):
+            response = http.get("/api/sync", params={"since": token} if token else {}, headers=AUTH)
+            assert response.status_code == 200, response.text
+            return response.json()
+
+        def sync_all(token=None):
+            """Pages until ``more`` is clear: (ids per key, deleted per key, last token)"""
+            seen, gone = {}, {}
+            while True:
+                body = sync(token)
+                for key in ("tasks", "applications", "messages", "categories"):
+                    seen.setdefault(key, []).extend(row["id"] for row in body[key])
+                for key, ids in body["deleted"].items():
+                    gone.setdefault(key, []).extend(ids)
+                token = body["token"]
+                if not body["more"]:
+                    return seen, gone, token
+
+        _, _, token = sync_all()
+        category = database.conn.execute('SELECT "id" FROM "task_categories"').fetchone()[0]
+        tasks = database.insert_rows("tasks", [{
+            "customer_id": "demo-user-id", "category_id": category, "title": f"t{i}", "description": "d",
+            "address": "a", "city": "c", "state": "s", "zip_code": "z"} for i in range(5)])
+        # Someone else's task stays out of the caller's feed
+        database.insert_rows("tasks", [{
+            "customer_id": "someone-else", "category_id": category, "title": "x", "description": "d",
+            "address": "a", "city": "c", "state": "s", "zip_code": "z"}])
+        seen, gone, token = sync_all(token)
+        assert seen["tasks"] == [task["id"] for task in tasks] and gone == {}
+
+        database.conn.execute('DELETE FROM "tasks" WHERE "id" = ?', (tasks[1]["id"],))
+        database.conn.execute('UPDATE "tasks" SET "title" = ? WHERE "id" = ?', ("renamed", tasks[3]["id"]))
+        seen, gone, token = sync_all(token)
+        assert seen["tasks"] == [tasks[3]["id"]] and gone == {"tasks": [tasks[1]["id"]]}
+        assert sync(token)["tasks"] == []
+
+        # A token from before tombstones were pruned starts over
+        after, _ = changefeed.decode_token(token)
+        stale = changefeed.encode_token(after, int((datetime.now(timezone.utc) - timedelta(days=31)).timestamp()))
+        assert sync(stale)["reset"] is True
+        assert http.get("/api/sync", params={"since": "not-a-token"}, headers=AUTH).status_code == 400
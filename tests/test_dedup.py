@@ -0,0 +1,150 @@
+"""
+Near-duplicate tests: MinHash estimates against the exact Jaccard similarity
+of the shingle sets, LSH recall of near copies (and silence on unrelated
+text), the per-customer thresholds, and the ring evicting the oldest tasks
+without leaving stale slots in the buckets.
+"""
+
+import random
+
+import numpy as np
+
+from perf import use_backend_path
+
+use_backend_path()
+
+import dedup  # noqa: E402
+
+WORDS = [f"w{i}" for i in range(5000)]
+
+
+def random_text(rng, length=60):
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+def near_copy(rng, text):
+    """One word replaced"""
+    words = text.split()
+    words[rng.randrange(len(words))] = rng.choice(WORDS)
+    return " ".join(words)
+
+
+def jaccard(a, b):
+    a, b = set(dedup.shingles(a).tolist()), set(dedup.shingles(b).tolist())
+    return len(a & b) / len(a | b)
+
+
+def bucketed_slots(index):
+    slots = []
+    for band in index.buckets:
+        for bucket in band.values():
+            slots.extend(bucket if isinstance(bucket, list) else [bucket])
+    return slots
+
+
+def test_minhash_estimates_jaccard_similarity():
+    rng = random.Random(49)
+    hasher = dedup.MinHasher(256)
+    errors = []
+    for _ in range(100):
+        text = random_text(rng, 30)
+        other = text
+        for _ in range(rng.randrange(0, 8)):
+            other = near_copy(rng, other)
+        estimate = (hasher.signature(text) == hasher.signature(other)).mean()
+        errors.append(estimate - jaccard(text, other))
+    # Unbiased, with a standard error of about sqrt(s(1 - s) / num_perm)
+    assert abs(np.mean(errors)) < 0.01
+    assert max(abs(e) for e in errors) < 0.15
+
+
+def test_batch_signatures_match_single_ones():
+    rng = random.Random(49)
+    hasher = dedup.MinHasher(64)
+    texts = [random_text(rng, rng.randrange(1, 20)) for _ in range(30)] + ["", "  ?! ", "one two"]
+    signatures, signed = hasher.signatures(texts)
+    for text, signature, ok in zip(texts, signatures, signed):
+        single = hasher.signature(text)
+        assert ok == (single is not None)
+        if ok:
+            assert np.array_equal(signature, single)
+    assert hasher.signature("Mount a TV") is not None and hasher.signature("Mount a TV").dtype == np.uint32
+
+
+def test_lsh_recalls_near_copies_and_ignores_unrelated_tasks():
+    rng = random.Random(49)
+    config = dedup.DedupConfig(max_tasks=1000)
+    hasher = dedup.MinHasher(config.num_perm)
+    index = dedup.DuplicateIndex(config)
+    originals = [random_text(rng) for _ in range(500)]
+    for i, text in enumerate(originals):
+        index.add(f"t{i}", f"c{i}", hasher.signature(text))
+    found = across = 0
+    for i, text in enumerate(originals):
+        copy = hasher.signature(near_copy(rng, text))
+        matches = index.matches(copy, f"c{i}")
+        found += bool(matches) and matches[0][0] == f"t{i}"
+        across += bool(index.matches(copy, "someone else"))
+    # Jaccard about 0.9: over the 0.8 threshold, mostly under the 0.95 one across customers
+    assert found / len(originals) >= 0.97
+    assert across / len(originals) < 0.2
+    candidates = 0
+    for _ in range(200):
+        unrelated = hasher.signature(random_text(rng))
+        assert index.matches(unrelated, "c0") == []
+        candidates += len(index.candidates(unrelated))
+    # Buckets, not a scan: unrelated text meets next to no candidates
+    assert candidates / 200 < 1
+
+
+def test_verbatim_copies_match_across_customers():
+    config = dedup.DedupConfig(max_tasks=10)
+    hasher = dedup.MinHasher(config.num_perm)
+    index = dedup.DuplicateIndex(config)
+    text = "Mount a 65 inch TV on a brick wall above the fireplace, hide the cables in the wall"
+    index.add("a", "c1", hasher.signature(text))
+    index.add("b", "c2", hasher.signature(text + " today"))
+    matches = index.matches(hasher.signature(text.upper()), "c3")
+    assert matches[0] == ("a", 1.0) and [task for task, _ in matches] == ["a"]
+    assert index.matches(hasher.signature(text), None)[0] == ("a", 1.0)
+
+
+def test_the_ring_evicts_the_oldest_task():
+    rng = random.Random(49)
+    config = dedup.DedupConfig(max_tasks=4)
+    hasher = dedup.MinHasher(config.num_perm)
+    index = dedup.DuplicateIndex(config)
+    texts = {f"t{i}": random_text(rng) for i in range(7)}
+    for task_id in ("t0", "t1", "t2", "t3"):
+        index.add(task_id, "c", hasher.signature(texts[task_id]))
+    # Re-adding moves a task to the next slot (evicting t0) and leaves its old slot empty
+    index.add("t2", "c", hasher.signature(texts["t2"]))
+    assert sorted(index.slots) == ["t1", "t2", "t3"] and index.evicted == 1
+    # t4 evicts t1, t5 takes the empty slot, t6 evicts t3
+    for task_id in ("t4", "t5", "t6"):
+        index.add(task_id, "c", hasher.signature(texts[task_id]))
+    assert sorted(index.slots) == ["t2", "t4", "t5", "t6"]
+    assert index.evicted == 3
+    assert index.matches(hasher.signature(texts["t0"]), "c") == []
+    assert index.matches(hasher.signature(texts["t3"]), "c") == []
+    assert index.matches(hasher.signature(texts["t2"]), "c") == [("t2", 1.0)]
+    # Every bucketed slot belongs to an indexed task, once per band
+    slots = bucketed_slots(index)
+    assert sorted(slots) == sorted(list(index.slots.values()) * config.bands)
+    assert all(index.ids[slot] is not None for slot in slots)
+    assert index.stats()["tasks"] == 4
+
+
+def test_removing_every_task_empties_the_buckets():
+    rng = random.Random(49)
+    config = dedup.DedupConfig(max_tasks=50)
+    hasher = dedup.MinHasher(config.num_perm)
+    index = dedup.DuplicateIndex(config)
+    base = random_text(rng)
+    # Shared bands: list buckets that shrink back to single slots
+    for i in range(20):
+        index.add(f"t{i}", "c", hasher.signature(base if i % 2 else random_text(rng)))
+    for i in rng.sample(range(20), 20):
+        index.remove(f"t{i}")
+        assert sorted(bucketed_slots(index)) == sorted(list(index.slots.values()) * config.bands)
+    assert len(index) == 0 and all(not band for band in index.buckets)
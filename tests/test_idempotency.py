@@ -0,0 +1,157 @@
+"""
+Idempotency-Key tests: replay of results and 4xx errors, body fingerprint
+mismatches, concurrent duplicates, and which failures are forgotten.
+"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from perf import use_backend_path
+
+use_backend_path()
+
+import idempotency  # noqa: E402
+
+SCOPE = ("user-1", "/api/tasks")
+
+
+def counting(result=None, error=None):
+    calls = []
+
+    async def create():
+        calls.append(1)
+        await asyncio.sleep(0)
+        if error is not None:
+            raise error
+        return result
+
+    return create, calls
+
+
+def test_a_repeated_key_replays_the_first_result():
+    async def scenario():
+        store = idempotency.IdempotencyStore()
+        create, calls = counting({"id": "t1"})
+        assert await store.run("k1", SCOPE, {"title": "a"}, create) == ({"id": "t1"}, False)
+        assert await store.run("k1", SCOPE, {"title": "a"}, create) == ({"id": "t1"}, True)
+        assert len(calls) == 1 and store.replayed == 1
+
+    asyncio.run(scenario())
+
+
+def test_without_a_key_every_request_runs():
+    async def scenario():
+        store = idempotency.IdempotencyStore()
+        create, calls = counting("ok")
+        for _ in range(2):
+            assert await store.run(None, SCOPE, {}, create) == ("ok", False)
+        assert len(calls) == 2 and not store.entries
+
+    asyncio.run(scenario())
+
+
+def test_keys_are_scoped_to_caller_and_path():
+    async def scenario():
+        store = idempotency.IdempotencyStore()
+        create, calls = counting("ok")
+        await store.run("k1", ("user-1", "/api/tasks"), {}, create)
+        await store.run("k1", ("user-2", "/api/tasks"), {}, create)
+        await store.run("k1", ("user-1", "/api/messages"), {}, create)
+        assert len(calls) == 3
+
+    asyncio.run(scenario())
+
+
+def test_reusing_a_key_with_another_body_is_rejected():
+    async def scenario():
+        store = idempotency.IdempotencyStore()
+        create, calls = counting("ok")
+        await store.run("k1", SCOPE, {"title": "a", "budget": 1}, create)
+        # Key order doesn't change the fingerprint
+        assert (await store.run("k1", SCOPE, {"budget": 1, "title": "a"}, create))[1] is True
+        with pytest.raises(HTTPException) as mismatch:
+            await store.run("k1", SCOPE, {"title": "b", "budget": 1}, create)
+        assert mismatch.value.status_code == 422
+        assert len(calls) == 1
+
+    asyncio.run(scenario())
+
+
+def test_an_overlong_key_is_rejected():
+    async def scenario():
+        store = idempotency.IdempotencyStore()
+        create, _ = counting("ok")
+        with pytest.raises(HTTPException) as too_long:
+            await store.run("k" * (idempotency.MAX_KEY_LENGTH + 1), SCOPE, {}, create)
+        assert too_long.value.status_code == 400
+
+    asyncio.run(scenario())
+
+
+def test_a_concurrent_duplicate_waits_for_the_first_attempt():
+    async def scenario():
+        store = idempotency.IdempotencyStore()
+        release = asyncio.Event()
+        calls = []
+
+        async def create():
+            calls.append(1)
+            await release.wait()
+            return "created"
+
+        first = asyncio.ensure_future(store.run("k1", SCOPE, {}, create))
+        second = asyncio.ensure_future(store.run("k1", SCOPE, {}, create))
+        await asyncio.sleep(0)
+        release.set()
+        assert await first == ("created", False)
+        assert await second == ("created", True)
+        assert len(calls) == 1
+
+    asyncio.run(scenario())
+
+
+def test_a_replayed_client_error_is_marked_as_replayed():
+    async def scenario():
+        store = idempotency.IdempotencyStore()
+        create, calls = counting(error=HTTPException(status_code=403, detail="Only customers can create tasks"))
+        with pytest.raises(HTTPException) as original:
+            await store.run("k1", SCOPE, {}, create)
+        assert idempotency.REPLAYED_HEADER not in (original.value.headers or {})
+        with pytest.raises(HTTPException) as replayed:
+            await store.run("k1", SCOPE, {}, create)
+        assert replayed.value.status_code == 403
+        assert replayed.value.detail == "Only customers can create tasks"
+        assert replayed.value.headers[idempotency.REPLAYED_HEADER] == "true"
+        assert replayed.value is not original.value
+        assert len(calls) == 1 and store.replayed == 1
+
+    asyncio.run(scenario())
+
+
+def test_server_errors_are_forgotten_so_a_retry_runs_again():
+    async def scenario():
+        store = idempotency.IdempotencyStore()
+        failing, failed_calls = counting(error=HTTPException(status_code=503, detail="Database unavailable"))
+        with pytest.raises(HTTPException):
+            await store.run("k1", SCOPE, {}, failing)
+        create, calls = counting("created")
+        assert await store.run("k1", SCOPE, {}, create) == ("created", False)
+        assert len(failed_calls) == 1 and len(calls) == 1
+
+    asyncio.run(scenario())
+
+
+def test_entries_expire_and_the_store_is_bounded():
+    async def scenario():
+        store = idempotency.IdempotencyStore(ttl_s=0.01, max_entries=2)
+        create, calls = counting("ok")
+        await store.run("k1", SCOPE, {}, create)
+        await asyncio.sleep(0.02)
+        assert (await store.run("k1", SCOPE, {}, create))[1] is False
+        for key in ("k2", "k3"):
+            await store.run(key, SCOPE, {}, create)
+        assert len(store.entries) == 2 and (*SCOPE, "k1") not in store.entries
+
+    asyncio.run(scenario())
@@ -0,0 +1,264 @@
+"""
+Job queue tests: enqueue and dedupe, retries with backoff, jobs that run out
+of attempts staying ``failed``, handler threads that overrun their timeout
+holding their slot, schedules stored when the queue opens, and cron
+parsing. Ticks are driven by hand instead of the polling runner.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from perf import use_backend_path
+
+use_backend_path()
+
+import jobs  # noqa: E402
+
+
+def make_queue(tmp_path) -> jobs.JobQueue:
+    return jobs.JobQueue(jobs.JobConfig(path=str(tmp_path / "jobs.sqlite3")))
+
+
+async def drain(queue):
+    """Tick until nothing is due and nothing is running"""
+    for _ in range(20):
+        await queue.tick()
+        if not queue._tasks:
+            return
+        await asyncio.gather(*queue._tasks)
+
+
+def rows(queue):
+    return queue.conn.execute('SELECT kind, status, attempts, last_error FROM jobs ORDER BY id').fetchall()
+
+
+def test_the_file_opens_on_start(tmp_path):
+    async def scenario():
+        queue = make_queue(tmp_path)
+        queue.register("noop", lambda payload: None)
+        assert not os.path.exists(queue.config.path)
+        with pytest.raises(RuntimeError):
+            queue.enqueue("noop")
+        await queue.start()
+        assert os.path.exists(queue.config.path) and queue.enqueue("noop") is not None
+        await queue.close()
+        assert queue.conn is None
+
+    asyncio.run(scenario())
+
+
+def test_enqueued_jobs_run_once_per_dedupe_key(tmp_path):
+    async def scenario():
+        queue = make_queue(tmp_path)
+        seen = []
+
+        async def handler(payload):
+            seen.append(payload)
+
+        queue.register("notify", handler)
+        queue.open()
+        assert queue.enqueue("notify", {"n": 1}, dedupe_key="a") is not None
+        assert queue.enqueue("notify", {"n": 2}, dedupe_key="a") is None
+        queue.enqueue("notify", {"n": 3}, delay_s=3600)
+        with pytest.raises(ValueError):
+            queue.enqueue("unknown")
+        await drain(queue)
+        assert seen == [{"n": 1}]
+        assert [status for _, status, _, _ in rows(queue)] == ["done", "queued"]
+        assert queue.stats()["jobs"]["notify"] == {"done": 1, "queued": 1}
+
+    asyncio.run(scenario())
+
+
+def test_batches_take_a_list_of_payloads(tmp_path):
+    async def scenario():
+        queue = make_queue(tmp_path)
+        batches = []
+        queue.register("send", batches.append, batch_size=3)
+        queue.open()
+        for n in range(5):
+            queue.enqueue("send", n)
+        await drain(queue)
+        assert batches == [[0, 1, 2], [3, 4]]
+
+    asyncio.run(scenario())
+
+
+def test_failures_retry_with_backoff_until_success(tmp_path):
+    async def scenario():
+        queue = make_queue(tmp_path)
+        calls = []
+
+        def flaky(payload):
+            calls.append(payload)
+            if len(calls) < 3:
+                raise ConnectionError("down")
+
+        # No backoff, so the retries are due at once
+        queue.register("flaky", flaky, max_attempts=5, backoff_base_s=0)
+        queue.open()
+        queue.enqueue("flaky", "x")
+        await drain(queue)
+        assert len(calls) == 3
+        assert rows(queue) == [("flaky", "done", 3, "down")]
+        assert (queue.retried, queue.completed, queue.failed) == (2, 1, 0)
+
+    asyncio.run(scenario())
+
+
+def test_a_retry_waits_for_its_backoff(tmp_path):
+    async def scenario():
+        queue = make_queue(tmp_path)
+
+        def fail(payload):
+            raise ValueError()
+
+        queue.register("slow", fail, backoff_base_s=1000)
+        queue.open()
+        queue.enqueue("slow")
+        before = time.time()
+        await drain(queue)
+        run_at, attempts, error = queue.conn.execute('SELECT run_at, attempts, last_error FROM jobs').fetchone()
+        assert attempts == 1 and error == "ValueError"
+        assert before <= run_at <= time.time() + 1000
+
+    asyncio.run(scenario())
+
+
+def test_backoff_is_capped_full_jitter():
+    job_type = jobs.JobType("k", None, backoff_base_s=2.0, backoff_max_s=30.0)
+    for attempts, bound in ((1, 2.0), (2, 4.0), (4, 16.0), (10, 30.0)):
+        delays = [job_type.backoff(attempts) for _ in range(200)]
+        assert all(0 <= delay <= bound for delay in delays)
+        assert max(delays) > bound / 2
+
+
+def test_jobs_out_of_attempts_stay_failed(tmp_path):
+    async def scenario():
+        queue = make_queue(tmp_path)
+
+        async def broken(payload):
+            raise RuntimeError("boom")
+
+        async def hangs(payload):
+            await asyncio.sleep(10)
+
+        queue.register("broken", broken, max_attempts=2, backoff_base_s=0)
+        queue.register("hangs", hangs, max_attempts=1, timeout_s=0.01)
+        queue.open()
+        queue.enqueue("broken")
+        queue.enqueue("hangs")
+        await drain(queue)
+        assert rows(queue) == [("broken", "failed", 2, "boom"), ("hangs", "failed", 1, "timed out after 0.01s")]
+        assert queue.failed == 2
+        finished = queue.conn.execute('SELECT count(*) FROM jobs WHERE finished_at IS NOT NULL').fetchone()[0]
+        assert finished == 2
+
+    asyncio.run(scenario())
+
+
+def test_an_overrunning_thread_keeps_its_slot_until_it_returns(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "LEASE_MARGIN_S", 0.1)
+
+    async def scenario():
+        queue = make_queue(tmp_path)
+        release = threading.Event()
+        running, most = [], []
+
+        def stuck(payload):
+            running.append(payload)
+            most.append(len(running))
+            if len(most) == 1:
+                release.wait(5)
+            running.remove(payload)
+
+        queue.register("stuck", stuck, max_attempts=2, backoff_base_s=0, timeout_s=0.01)
+        queue.open()
+        queue.enqueue("stuck", "x")
+        await queue.tick()
+        await asyncio.sleep(0.3)
+        # Timed out, but the thread still runs: no retry beside it, and the lease is renewed
+        await queue.tick()
+        assert most == [1] and queue.running["stuck"] == 1 and queue.overruns == 1
+        assert queue.conn.execute("SELECT status, lease_until > ? FROM jobs", (time.time(),)).fetchone() == \
+            ("running", 1)
+        release.set()
+        await drain(queue)
+        assert most == [1, 1]
+        assert rows(queue) == [("stuck", "done", 2, "timed out after 0.01s")]
+
+    asyncio.run(scenario())
+
+
+def test_an_expired_lease_requeues_the_job(tmp_path):
+    async def scenario():
+        queue = make_queue(tmp_path)
+        queue.register("work", lambda payload: None, max_attempts=2)
+        queue.open()
+        queue.enqueue("work")
+        # A process that claimed it and died
+        queue._claim(queue.types["work"], 1)
+        queue.conn.execute('UPDATE jobs SET lease_until = 0')
+        await drain(queue)
+        assert rows(queue) == [("work", "done", 2, "lease expired")]
+
+    asyncio.run(scenario())
+
+
+def test_schedules_are_stored_when_the_queue_opens(tmp_path):
+    async def scenario():
+        queue = make_queue(tmp_path)
+        runs = []
+        queue.register("tick", runs.append)
+        queue.schedule("every-hour", "tick", every_s=3600, payload="p")
+        assert queue.conn is None
+        queue.open()
+        # Due now: fires once, and the next run moves an interval on
+        queue.conn.execute('UPDATE schedules SET next_run_at = 0')
+        await drain(queue)
+        await drain(queue)
+        assert runs == ["p"]
+        next_run_at = queue.conn.execute('SELECT next_run_at FROM schedules').fetchone()[0]
+        assert next_run_at > time.time() + 3500
+        # Reopening keeps the stored next run
+        await queue.close()
+        queue.open()
+        assert queue.conn.execute('SELECT next_run_at FROM schedules').fetchone()[0] == next_run_at
+        with pytest.raises(ValueError):
+            queue.schedule("bad", "tick")
+        with pytest.raises(ValueError):
+            queue.schedule("bad", "unknown", every_s=1)
+
+    asyncio.run(scenario())
+
+
+def test_cron_fields():
+    assert jobs.Cron("*/15 * * * *").minutes == {0, 15, 30, 45}
+    assert jobs.Cron("5/15 * * * *").minutes == {5, 20, 35, 50}
+    assert jobs.Cron("0 1-10/3 * * *").hours == {1, 4, 7, 10}
+    assert jobs.Cron("0 0 1,15,20-22 * *").days == {1, 15, 20, 21, 22}
+    assert jobs.Cron("0 0 * * 7").weekdays == {0}
+    for expression in ("* * * *", "60 * * * *", "0 24 * * *", "0 0 0 * *", "*/0 * * * *", "10-5 * * * *",
+                       "x * * * *"):
+        with pytest.raises(ValueError):
+            jobs.Cron(expression)
+
+
+def test_cron_next_after():
+    def after(expression, *at):
+        return jobs.Cron(expression).next_after(datetime(*at, tzinfo=timezone.utc))
+
+    assert after("5/15 * * * *", 2026, 1, 1, 10, 20) == datetime(2026, 1, 1, 10, 35, tzinfo=timezone.utc)
+    assert after("5/15 * * * *", 2026, 1, 1, 10, 50) == datetime(2026, 1, 1, 11, 5, tzinfo=timezone.utc)
+    assert after("17 3 * * *", 2026, 1, 1, 3, 17) == datetime(2026, 1, 2, 3, 17, tzinfo=timezone.utc)
+    assert after("0 0 29 2 *", 2026, 1, 1) == datetime(2028, 2, 29, tzinfo=timezone.utc)
+    # Restricted day-of-month and day-of-week: either matches (2026-01-02 is a Friday)
+    assert after("0 9 15 * 5", 2026, 1, 1) == datetime(2026, 1, 2, 9, tzinfo=timezone.utc)
+    assert after("0 9 * * 5", 2026, 1, 3) == datetime(2026, 1, 9, 9, tzinfo=timezone.utc)
+    with pytest.raises(ValueError):
+        jobs.Cron("0 0 31 2 *").next_after(datetime(2026, 1, 1, tzinfo=timezone.utc))
@@ -0,0 +1,116 @@
+"""
+Leaderboard tests: after random upserts and removals every board still
+holds exactly the best ``len(board)`` taskers of its group, at least ``k``
+of them (or the whole group) and at most ``capacity``, refilling from the
+taskers it left out when it runs short.
+"""
+
+import random
+
+from perf import use_backend_path
+
+use_backend_path()
+
+import leaderboards  # noqa: E402
+
+CATEGORIES = ("Plumbing", "Cleaning", "Moving")
+CITIES = ("New York", "Austin", None)
+
+
+def random_tasker(rng, tasker_id):
+    return {"id": tasker_id, "role": rng.choices(["tasker", "customer"], [9, 1])[0],
+            "average_rating": rng.choice([None, 3.0, 4.0, 4.5, 5.0]),
+            "total_tasks_completed": rng.randrange(0, 4), "total_reviews": rng.randrange(0, 4),
+            "skills": rng.sample(CATEGORIES, rng.randint(0, 2)), "city": rng.choice(CITIES),
+            "full_name": f"name {rng.random()}"}
+
+
+def expected_groups(profiles):
+    """Every board's full group, best first"""
+    groups = {}
+    for row in profiles.values():
+        if row["role"] != "tasker":
+            continue
+        tasker = leaderboards._Tasker(row)
+        for key in tasker.boards:
+            groups.setdefault(key, []).append(tasker.rank)
+    return {key: sorted(ranks) for key, ranks in groups.items()}
+
+
+def check(boards, profiles):
+    groups = expected_groups(profiles)
+    for key, ranks in groups.items():
+        board = boards.boards[key]
+        assert board.ranks == ranks[:len(board.ranks)], key
+        assert min(boards.k, len(ranks)) <= len(board.ranks) <= boards.capacity, key
+        if not board.truncated:
+            assert len(board.ranks) == len(ranks), key
+        top = boards.top(key[0], key[1] or None, limit=boards.k)
+        assert [row["id"] for row in top] == [rank[3] for rank in ranks[:boards.k]]
+        assert [row["rank"] for row in top] == list(range(1, len(top) + 1))
+    # Boards left behind by emptied groups hold nobody
+    for key, board in boards.boards.items():
+        if key not in groups:
+            assert board.ranks == [], key
+
+
+def test_random_upserts_and_removals_keep_the_invariants():
+    rng = random.Random(47)
+    boards = leaderboards.Leaderboards(k=3, capacity=5)
+    profiles = {}
+    for i in range(60):
+        profiles[f"t{i}"] = random_tasker(rng, f"t{i}")
+    boards.replace(profiles.values())
+    check(boards, profiles)
+    for step in range(3000):
+        tasker_id = f"t{rng.randrange(80)}"
+        if rng.random() < 0.2:
+            profiles.pop(tasker_id, None)
+            boards.remove(tasker_id)
+        else:
+            profiles[tasker_id] = random_tasker(rng, tasker_id)
+            boards.upsert(profiles[tasker_id])
+        check(boards, profiles)
+    assert boards.refills > 0
+
+
+def test_a_tasker_below_a_full_board_stays_out_until_it_ranks():
+    boards = leaderboards.Leaderboards(k=1, capacity=2)
+    rows = {f"t{i}": {"id": f"t{i}", "average_rating": rating, "skills": ["Plumbing"]}
+            for i, rating in enumerate((5.0, 4.0, 3.0))}
+    boards.replace(rows.values())
+    board = boards.boards[("plumbing", "")]
+    assert [rank[3] for rank in board.ranks] == ["t0", "t1"] and board.truncated
+    boards.upsert({**rows["t2"], "full_name": "renamed"})
+    assert [rank[3] for rank in board.ranks] == ["t0", "t1"]
+    assert boards.taskers["t2"].summary["full_name"] == "renamed"
+    # Better than the last entry: in, and the last one out
+    boards.upsert({**rows["t2"], "average_rating": 4.5})
+    assert [rank[3] for rank in board.ranks] == ["t0", "t2"]
+
+
+def test_a_short_board_refills_from_the_taskers_left_out():
+    boards = leaderboards.Leaderboards(k=2, capacity=2)
+    boards.replace({"id": f"t{i}", "average_rating": 5.0 - i, "skills": ["Moving"]} for i in range(4))
+    boards.remove("t0")
+    assert boards.refills == 1
+    assert [row["id"] for row in boards.top("moving")] == ["t1", "t2"]
+    # No longer a tasker: off every board
+    boards.upsert({"id": "t1", "role": "customer", "skills": ["Moving"]})
+    assert [row["id"] for row in boards.top("moving")] == ["t2", "t3"]
+    assert len(boards) == 2
+
+
+def test_ties_rank_by_completed_tasks_then_reviews_then_id():
+    boards = leaderboards.Leaderboards(k=5)
+    boards.replace([
+        {"id": "b", "average_rating": 4.0, "total_tasks_completed": 2, "total_reviews": 1, "skills": ["Yard"]},
+        {"id": "a", "average_rating": 4.0, "total_tasks_completed": 2, "total_reviews": 1, "skills": ["Yard"]},
+        {"id": "c", "average_rating": 4.0, "total_tasks_completed": 2, "total_reviews": 3, "skills": ["Yard"]},
+        {"id": "d", "average_rating": 4.0, "total_tasks_completed": 5, "total_reviews": 0, "skills": ["Yard"]},
+        {"id": "e", "average_rating": 4.5, "skills": ["Yard"], "city": "Austin"},
+    ])
+    assert [row["id"] for row in boards.top("yard")] == ["e", "d", "c", "a", "b"]
+    assert [row["id"] for row in boards.top("Yard", " AUSTIN ")] == ["e"]
+    assert [row["id"] for row in boards.top("yard", limit=2)] == ["e", "d"]
+    assert boards.top("yard", "Denver") == []
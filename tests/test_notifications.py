@@ -0,0 +1,118 @@
+"""
+Notification tests: the schema's unread counters (the stand-in mirrors the
+triggers) kept in step by batch inserts, retried batches, mark-all-read,
+single updates and deletes, and the Notifier's queue feeding them.
+"""
+
+import asyncio
+
+from perf import use_backend_path
+
+use_backend_path()
+
+import notifications  # noqa: E402
+import standin  # noqa: E402
+
+ALICE, BOB = "alice-id", "bob-id"
+
+
+def unread(client, user_id):
+    rows = client.table("notification_counters").select("unread").eq("user_id", user_id).execute().data
+    return rows[0]["unread"] if rows else None
+
+
+def counted(client, user_id):
+    return len(client.table("notifications").select("id").eq("user_id", user_id).eq("read", False).execute().data)
+
+
+def make_client():
+    return standin.create_client(standin.StandinConfig(), database=standin.StandinDatabase())
+
+
+def rows(user_id, count, read=False):
+    return [{"user_id": user_id, "title": "t", "message": "m", "read": read} for _ in range(count)]
+
+
+def test_a_batch_insert_counts_only_unread_rows_per_user():
+    client = make_client()
+    client.table("notifications").insert(rows(ALICE, 3) + rows(BOB, 2) + rows(ALICE, 2, read=True)).execute()
+    assert unread(client, ALICE) == 3 and unread(client, BOB) == 2
+
+
+def test_mark_all_read_and_single_updates():
+    client = make_client()
+    inserted = client.table("notifications").insert(rows(ALICE, 4) + rows(BOB, 1)).execute().data
+    client.table("notifications").update({"read": True}).eq("id", inserted[0]["id"]).execute()
+    assert unread(client, ALICE) == 3
+    # Marking a read row read again changes nothing
+    client.table("notifications").update({"read": True}).eq("id", inserted[0]["id"]).execute()
+    assert unread(client, ALICE) == 3
+    client.table("notifications").update({"read": False}).eq("id", inserted[0]["id"]).execute()
+    assert unread(client, ALICE) == 4
+    client.table("notifications").update({"read": True}).eq("user_id", ALICE).eq("read", False).execute()
+    assert unread(client, ALICE) == 0 and unread(client, BOB) == 1
+
+
+def test_moving_a_notification_to_another_user_moves_its_count():
+    client = make_client()
+    inserted = client.table("notifications").insert(rows(ALICE, 2) + rows(BOB, 1)).execute().data
+    client.table("notifications").update({"user_id": BOB}).eq("id", inserted[0]["id"]).execute()
+    assert unread(client, ALICE) == 1 and unread(client, BOB) == 2
+
+
+def test_deletes_take_unread_rows_off_the_counter():
+    client = make_client()
+    inserted = client.table("notifications").insert(rows(ALICE, 2) + rows(ALICE, 1, read=True)).execute().data
+    client.table("notifications").delete().eq("id", inserted[2]["id"]).execute()
+    assert unread(client, ALICE) == 2
+    client.table("notifications").delete().eq("user_id", ALICE).execute()
+    assert unread(client, ALICE) == 0
+
+
+def test_counters_match_a_count_after_mixed_writes():
+    client = make_client()
+    inserted = client.table("notifications").insert(rows(ALICE, 6) + rows(BOB, 6)).execute().data
+    for i, row in enumerate(inserted):
+        if i % 3 == 0:
+            client.table("notifications").update({"read": True}).eq("id", row["id"]).execute()
+        elif i % 3 == 1:
+            client.table("notifications").delete().eq("id", row["id"]).execute()
+    for user_id in (ALICE, BOB):
+        assert unread(client, user_id) == counted(client, user_id) == 2
+
+
+def test_a_retried_batch_leaves_stored_rows_alone():
+    client = make_client()
+    batch = [{**row, "id": f"00000000-0000-0000-0000-00000000000{i}"} for i, row in enumerate(rows(ALICE, 3))]
+    client.table("notifications").insert(batch[:2]).execute()
+    client.table("notifications").update({"read": True}).eq("id", batch[0]["id"]).execute()
+    # Like write_notification_rows after a write whose response was lost: ON CONFLICT DO NOTHING
+    stored = client.table("notifications").upsert(batch, ignore_duplicates=True).execute().data
+    assert [row["id"] for row in stored] == [batch[2]["id"]]
+    assert client.table("notifications").select("read").eq("id", batch[0]["id"]).execute().data == [{"read": True}]
+    assert unread(client, ALICE) == counted(client, ALICE) == 2
+
+
+def test_notifier_batches_queued_rows_into_the_counters():
+    async def scenario():
+        client = make_client()
+        statements = []
+
+        async def write_rows(batch):
+            statements.append(len(batch))
+            return client.table("notifications").insert(batch).execute().data
+
+        notifier = notifications.Notifier(write_rows, max_batch=50, max_delay_s=0.01)
+        assert all(notifier.notify(ALICE, "message", "New message", f"hello {i}") for i in range(5))
+        assert notifier.notify(None, "message", "New message", "nobody") is False
+        await notifier.close()
+        assert statements == [5]
+        assert unread(client, ALICE) == 5
+
+    asyncio.run(scenario())
+
+
+def test_preview_collapses_whitespace_and_truncates():
+    assert notifications.preview("  a\n\n b ") == "a b"
+    long = notifications.preview("x" * 500)
+    assert len(long) == notifications.PREVIEW_LENGTH and long.endswith("…")
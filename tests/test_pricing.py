@@ -0,0 +1,103 @@
+"""
+Price band tests: ``grouped_percentiles`` against ``np.percentile`` per
+group, and the bands PriceTables computes from completed tasks, with its
+fallback to coarser levels.
+"""
+
+import random
+from datetime import datetime, timezone
+
+import numpy as np
+
+from perf import use_backend_path
+
+use_backend_path()
+
+import pricing  # noqa: E402
+
+NOW = 1_780_000_000.0
+
+
+def test_grouped_percentiles_match_numpy():
+    rng = np.random.default_rng(48)
+    percentiles = (0, 10, 25, 33.3, 50, 75, 90, 99.5, 100)
+    for _ in range(50):
+        size = int(rng.integers(1, 400))
+        # Unsorted, sparse group ids; some groups of one sample; repeated values
+        groups = rng.choice(rng.integers(-50, 10_000, int(rng.integers(1, 30))), size)
+        values = np.round(rng.lognormal(4, 1, size), int(rng.integers(0, 3)))
+        ids, counts, found = pricing.grouped_percentiles(groups, values, percentiles)
+        assert ids.tolist() == sorted(set(groups.tolist()))
+        for group_id, count, row in zip(ids, counts, found):
+            members = values[groups == group_id]
+            assert count == len(members)
+            np.testing.assert_allclose(row, np.percentile(members, percentiles), rtol=1e-12)
+
+
+def test_grouped_percentiles_of_one_group_and_one_percentile():
+    ids, counts, found = pricing.grouped_percentiles(np.zeros(4, np.int64), np.array([40.0, 10.0, 30.0, 20.0]),
+                                                     (50,))
+    assert (ids.tolist(), counts.tolist(), found.tolist()) == ([0], [4], [[25.0]])
+
+
+def completed(task_id, category, price, size="medium", city="Austin", hours=None, days_ago=1):
+    return {"id": task_id, "status": "completed", "category_id": category, "task_size": size, "city": city,
+            "final_price": price, "estimated_hours": hours,
+            "completed_at": datetime.fromtimestamp(NOW - days_ago * 86400, timezone.utc).isoformat()}
+
+
+def test_bands_match_numpy_and_fall_back_to_coarser_levels():
+    rng = random.Random(48)
+    tables = pricing.PriceTables(window_days=30, min_samples=5)
+    rows = [completed(f"t{i}", "plumbing", rng.randrange(50, 500), size=rng.choice(["small", "medium"]),
+                      city=rng.choice(["Austin", "Dallas"]), hours=rng.choice([None, 1, 2, 4]))
+            for i in range(200)]
+    for row in rows:
+        tables.upsert(row)
+    # Outside the window, cancelled, unpriced or without a category: no sample
+    tables.upsert(completed("old", "plumbing", 10_000, days_ago=90))
+    tables.upsert({**completed("gone", "plumbing", 10_000), "status": "cancelled"})
+    tables.upsert(completed("free", "plumbing", 0))
+    tables.upsert(completed("nocat", None, 10_000))
+    tables.upsert(completed("later", "plumbing", 10_000))
+    tables.upsert({**completed("later", "plumbing", 10_000), "status": "disputed"})
+    tables.compute(now=NOW)
+    assert tables.samples == 200
+
+    def band_of(matches):
+        prices = [row["final_price"] for row in rows if matches(row)]
+        return dict(zip([f"p{p}" for p in pricing.PERCENTILES],
+                        np.round(np.percentile(prices, pricing.PERCENTILES), 2).tolist())), len(prices)
+
+    suggestion = tables.suggest("Plumbing", "Small", " austin ")
+    expected, samples = band_of(lambda row: row["task_size"] == "small" and row["city"] == "Austin")
+    assert suggestion["basis"] == ["category", "task_size", "city"]
+    assert (suggestion["price"], suggestion["samples"]) == (expected, samples)
+    timed = [row for row in rows if row["task_size"] == "small" and row["city"] == "Austin" and row["estimated_hours"]]
+    assert suggestion["estimated_hours"] == float(np.median([row["estimated_hours"] for row in timed]))
+    assert suggestion["hourly_rate"]["p50"] == round(float(np.median(
+        [row["final_price"] / row["estimated_hours"] for row in timed])), 2)
+
+    suggestion = tables.suggest("plumbing", city="Houston")
+    assert suggestion["basis"] == ["category"]
+    assert suggestion["price"] == band_of(lambda row: True)[0]
+    assert tables.suggest("cleaning") is None
+
+
+def test_a_group_below_min_samples_uses_the_next_level():
+    tables = pricing.PriceTables(min_samples=5)
+    # 2 large and 5 small, all in Austin
+    for i in range(7):
+        tables.upsert(completed(f"a{i}", "yard", 100 + i, size="large" if i < 2 else "small"))
+    tables.compute(now=NOW)
+    assert tables.suggest("yard", "large", "Austin")["basis"] == ["category", "city"]
+    assert tables.suggest("yard", "small", "Austin")["basis"] == ["category", "task_size", "city"]
+    assert tables.suggest("yard", "small", "Dallas")["basis"] == ["category", "task_size"]
+    tables.remove("a6")
+    tables.compute(now=NOW)
+    assert tables.suggest("yard", "small", "Austin")["basis"] == ["category", "city"]
+    assert tables.suggest("yard", "small", "Dallas")["basis"] == ["category"]
+    for i in range(2):
+        tables.remove(f"a{i}")
+    tables.compute(now=NOW)
+    assert tables.suggest("yard") is None and tables.stats()["samples"] == 4
@@ -0,0 +1,383 @@
+"""
+Query plan regression tests.
+
+Loads supabase_schema.sql and perf.datagen data into a local Postgres, runs
+``EXPLAIN (ANALYZE, BUFFERS)`` on the queries the API issues through
+PostgREST, and fails when a plan sequentially scans a table that isn't on the
+small-table allowlist, or when its planner cost or execution time regresses
+past the stored baseline in query_plan_baselines.json.
+
+The database named by SKILLHUB_PLAN_TEST_DSN is wiped: its public and auth
+schemas are dropped and rebuilt. Point it at a throwaway database, as a
+superuser: the bulk load skips triggers (see perf.datagen.copy_into_postgres).
+
+Examples:
+    createdb skillhub_plans
+    SKILLHUB_PLAN_TEST_DSN=postgresql://postgres@localhost/skillhub_plans \\
+        python -m pytest tests/test_query_plans.py -v
+
+    # Record (or refresh) the baselines after an intended plan change
+    SKILLHUB_PLAN_TEST_DSN=... SKILLHUB_PLAN_TEST_UPDATE=1 python -m pytest tests/test_query_plans.py
+
+The SQL below is what PostgREST sends for each endpoint, with embeds written
+as lateral joins. GET /api/tasks cases are built by the server's own
+``task_list_query`` and ``apply_role_filter`` on a postgrest-py client that
+never sends anything: its filters, order and page are compiled to SQL, so
+the cases follow the endpoint's filter definitions. Plans are taken as the
+table owner, so row level security predicates are not part of them. Baselines only apply to the scale, seed and
+Postgres major version they were recorded with; otherwise only the
+sequential scan check runs.
+"""
+
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import pytest
+
+psycopg = pytest.importorskip("psycopg")
+
+import postgrest  # noqa: E402
+from psycopg import sql  # noqa: E402
+
+from perf import datagen  # noqa: E402
+
+ROOT = Path(__file__).resolve().parent.parent
+SCHEMA = ROOT / "supabase_schema.sql"
+BASELINES = Path(__file__).resolve().parent / "query_plan_baselines.json"
+
+DSN = os.environ.get("SKILLHUB_PLAN_TEST_DSN")
+SCALE = os.environ.get("SKILLHUB_PLAN_TEST_SCALE", "small")
+SEED = int(os.environ.get("SKILLHUB_PLAN_TEST_SEED", 42))
+UPDATE = os.environ.get("SKILLHUB_PLAN_TEST_UPDATE") == "1"
+
+# Tables small enough that a sequential scan is the right plan
+SEQ_SCAN_ALLOWED = {"task_categories"}
+# Planner cost may grow this much over the baseline (same data, same version)
+COST_TOLERANCE = 0.25
+# Execution time may grow by this factor, and always by the slack
+TIME_FACTOR = 2.0
+TIME_SLACK_MS = 1.0
+# EXPLAIN ANALYZE runs per case; the fastest counts
+RUNS = 3
+
+pytestmark = pytest.mark.skipif(not DSN, reason="SKILLHUB_PLAN_TEST_DSN is not set")
+
+# What Supabase provides and plain Postgres doesn't
+SUPABASE_SHIM = """
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN CREATE ROLE anon NOLOGIN; END IF;
+  IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'authenticated') THEN CREATE ROLE authenticated NOLOGIN; END IF;
+  IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'service_role') THEN
+    CREATE ROLE service_role NOLOGIN BYPASSRLS;
+  END IF;
+END $$;
+CREATE SCHEMA auth;
+CREATE TABLE auth.users (id uuid PRIMARY KEY, email text, raw_user_meta_data jsonb);
+CREATE FUNCTION auth.uid() RETURNS uuid AS $$
+  SELECT nullif(current_setting('request.jwt.claim.sub', true), '')::uuid;
+$$ LANGUAGE sql STABLE;
+"""
+
+TASK_LIST_COLUMNS = """
+    t.*, row_to_json(c) AS task_categories,
+    json_build_object('full_name', cp.full_name, 'username', cp.username, 'avatar_url', cp.avatar_url,
+                      'average_rating', cp.average_rating) AS customer_profile
+"""
+TASK_LIST_JOINS = """
+    LEFT JOIN LATERAL (SELECT name, slug, icon, color FROM public.task_categories
+                       WHERE id = t.category_id) c ON true
+    LEFT JOIN public.profiles cp ON cp.id = t.customer_id
+"""
+
+# Builds requests like the API's client; nothing is sent
+POSTGREST = postgrest.SyncPostgrestClient("http://plans.invalid")
+COMPARISONS = {"eq": "=", "neq": "<>", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+
+@dataclass
+class PlanCase:
+    name: str
+    sql: Optional[str] = None
+    # (server module, sample values) -> postgrest-py request, for cases built like the endpoint's
+    request: Optional[Callable[[Any, dict], Any]] = None
+
+
+def task_list(role: str = "tasker", status: Optional[str] = "posted", **browse):
+    """GET /api/tasks as ``role`` with these browse parameters, built as get_tasks() builds it"""
+    def request(server, sample):
+        q = server.browse_index.BrowseQuery(limit=20, **{
+            name: sample[value[1:]] if isinstance(value, str) and value.startswith("$") else value
+            for name, value in browse.items()}).validate()
+        query = server.task_list_query(POSTGREST, q, "*")
+        if status:
+            query = query.eq("status", status)
+        query = server.apply_role_filter(query, {"id": sample[f"{role}_id"], "role": role})
+        return query.range(q.offset, q.offset + q.limit - 1)
+    return request
+
+
+def split_terms(text: str):
+    """Top-level comma-separated terms of a PostgREST logic filter"""
+    depth, start = 0, 0
+    for i, char in enumerate(text):
+        depth += char == "("
+        depth -= char == ")"
+        if char == "," and depth == 0:
+            yield text[start:i]
+            start = i + 1
+    yield text[start:]
+
+
+def filter_sql(conn, column: str, operator: str, value: str) -> str:
+    negate = operator == "not"
+    if negate:
+        operator, _, value = value.partition(".")
+    ref = f"t.{sql.Identifier(column).as_string(conn)}"
+    if operator == "is":
+        condition = f"{ref} IS {value.upper()}"
+    elif operator == "in":
+        values = [term.strip('"') for term in split_terms(value[1:-1])]
+        condition = f"{ref} IN ({', '.join(sql.Literal(v).as_string(conn) for v in values)})"
+    elif operator in ("and", "or"):
+        condition = logic_sql(conn, operator, value)
+    else:
+        condition = f"{ref} {COMPARISONS[operator]} {sql.Literal(value).as_string(conn)}"
+    return f"NOT ({condition})" if negate else condition
+
+
+def logic_sql(conn, joiner: str, terms: str) -> str:
+    conditions = []
+    for term in split_terms(terms[1:-1]):
+        if term.startswith(("and(", "or(")):
+            conditions.append(logic_sql(conn, term[:term.index("(")], term[term.index("("):]))
+        else:
+            conditions.append(filter_sql(conn, *term.split(".", 2)))
+    return "(" + f" {joiner.upper()} ".join(conditions) + ")"
+
+
+def request_sql(conn, request) -> str:
+    """The task list query PostgREST runs for ``request`` (embeds as TASK_LIST_JOINS)"""
+    where, order, page = [], [], ""
+    for key, value in request.params.multi_items():
+        if key == "select":
+            continue
+        if key == "order":
+            for term in value.split(","):
+                column, *modifiers = term.split(".")
+                order.append(" ".join([f"t.{sql.Identifier(column).as_string(conn)}",
+                                       *(m.upper().replace("NULLS", "NULLS ") for m in modifiers)]))
+        elif key in ("limit", "offset"):
+            page += f" {key.upper()} {int(value)}"
+        elif key in ("and", "or"):
+            where.append(logic_sql(conn, key, value))
+        else:
+            where.append(filter_sql(conn, key, *value.split(".", 1)))
+    kind, _, name = request.path.strip("/").rpartition("/")
+    if kind == "rpc":
+        args = ", ".join(f"{arg} => {sql.Literal(value).as_string(conn)}" for arg, value in request.json.items())
+        source = f"public.{name}({args})"
+    else:
+        source = f"public.{name}"
+    return (f"SELECT {TASK_LIST_COLUMNS} FROM {source} t {TASK_LIST_JOINS}"
+            + (" WHERE " + " AND ".join(where) if where else "")
+            + (" ORDER BY " + ", ".join(order) if order else "") + page)
+
+
+CASES = [
+    # GET /api/tasks
+    PlanCase("tasks.list.tasker_board", request=task_list()),
+    PlanCase("tasks.list.customer", request=task_list("customer", status=None)),
+    PlanCase("tasks.list.category", request=task_list(category_id="$category_id")),
+    PlanCase("tasks.list.place", request=task_list(state="$state", city="$city")),
+    PlanCase("tasks.list.budget", request=task_list(budget_min=100, sort="budget")),
+    PlanCase("tasks.list.soonest", request=task_list(date_from="$today", sort="soonest")),
+    PlanCase("tasks.list.nearest", request=task_list(latitude="$latitude", longitude="$longitude", sort="nearest")),
+    PlanCase("tasks.list.radius", request=task_list(latitude="$latitude", longitude="$longitude", radius_km=10)),
+    PlanCase("applications.counts", """
+        SELECT task_id FROM public.task_applications WHERE task_id = ANY(%(task_ids)s)"""),
+    # GET /api/tasks/{id}
+    PlanCase("tasks.get", """
+        SELECT t.*, row_to_json(c) AS task_categories, row_to_json(cp) AS customer_profile,
+               row_to_json(tp) AS tasker_profile
+        FROM public.tasks t
+        LEFT JOIN LATERAL (SELECT name, slug, icon, color FROM public.task_categories
+                           WHERE id = t.category_id) c ON true
+        LEFT JOIN LATERAL (SELECT full_name, username, avatar_url, average_rating, total_reviews
+                           FROM public.profiles WHERE id = t.customer_id) cp ON true
+        LEFT JOIN LATERAL (SELECT full_name, username, avatar_url, average_rating, total_reviews
+                           FROM public.profiles WHERE id = t.tasker_id) tp ON true
+        WHERE t.id = %(task_id)s"""),
+    PlanCase("applications.for_task", """
+        SELECT a.*, row_to_json(tp) AS tasker_profile
+        FROM public.task_applications a
+        LEFT JOIN LATERAL (SELECT full_name, username, avatar_url, average_rating, total_reviews, hourly_rate,
+                                  bio, skills
+                           FROM public.profiles WHERE id = a.tasker_id) tp ON true
+        WHERE a.task_id = %(task_id)s"""),
+    # GET /api/tasks/{id}/messages
+    PlanCase("messages.for_task", """
+        SELECT m.*, row_to_json(sp) AS sender_profile
+        FROM public.messages m
+        LEFT JOIN LATERAL (SELECT full_name, username, avatar_url
+                           FROM public.profiles WHERE id = m.sender_id) sp ON true
+        WHERE m.task_id = %(message_task_id)s
+        ORDER BY m.created_at"""),
+    # GET /api/me/unread
+    PlanCase("messages.unread_counts", """
+        SELECT * FROM public.unread_message_counts(%(receiver_id)s)"""),
+    PlanCase("messages.unread_counts.inner", """
+        SELECT m.task_id, count(*) AS unread FROM public.messages m
+        WHERE m.receiver_id = %(receiver_id)s AND m.read_at IS NULL
+        GROUP BY m.task_id"""),
+    # GET /api/notifications
+    PlanCase("notifications.list", """
+        SELECT * FROM public.notifications WHERE user_id = %(notified_id)s
+        ORDER BY created_at DESC, id DESC LIMIT 21"""),
+    PlanCase("notifications.list.after_cursor", """
+        SELECT * FROM public.notifications WHERE user_id = %(notified_id)s
+          AND (created_at < %(notification_at)s OR (created_at = %(notification_at)s AND id < %(notification_id)s))
+        ORDER BY created_at DESC, id DESC LIMIT 21"""),
+    PlanCase("notifications.unread", """
+        SELECT unread FROM public.notification_counters WHERE user_id = %(notified_id)s"""),
+    # GET /api/profiles/{id}, /reviews, /rating-distribution
+    PlanCase("profiles.get", """
+        SELECT * FROM public.profiles WHERE id = %(tasker_id)s"""),
+    PlanCase("profiles.rating", """
+        SELECT id, total_reviews, rating_sum, rating_histogram FROM public.profiles WHERE id = %(tasker_id)s"""),
+    PlanCase("reviews.list", """
+        SELECT r.*, row_to_json(rp) AS reviewer
+        FROM public.reviews r
+        LEFT JOIN LATERAL (SELECT full_name, username, avatar_url
+                           FROM public.profiles WHERE id = r.reviewer_id) rp ON true
+        WHERE r.reviewee_id = %(tasker_id)s
+        ORDER BY r.created_at DESC, r.id DESC LIMIT 21"""),
+    PlanCase("reviews.list.after_cursor", """
+        SELECT r.*, row_to_json(rp) AS reviewer
+        FROM public.reviews r
+        LEFT JOIN LATERAL (SELECT full_name, username, avatar_url
+                           FROM public.profiles WHERE id = r.reviewer_id) rp ON true
+        WHERE r.reviewee_id = %(tasker_id)s
+          AND (r.created_at < %(review_at)s OR (r.created_at = %(review_at)s AND r.id < %(review_id)s))
+        ORDER BY r.created_at DESC, r.id DESC LIMIT 21"""),
+]
+
+# Busiest ids in the generated data, so every case reads more than a row or two
+SAMPLE_SQL = {
+    "tasker_id": "SELECT reviewee_id FROM public.reviews GROUP BY 1 ORDER BY count(*) DESC LIMIT 1",
+    "customer_id": "SELECT customer_id FROM public.tasks GROUP BY 1 ORDER BY count(*) DESC LIMIT 1",
+    "category_id": "SELECT category_id FROM public.tasks WHERE status = 'posted' "
+                   "GROUP BY 1 ORDER BY count(*) DESC LIMIT 1",
+    "task_id": "SELECT task_id FROM public.task_applications GROUP BY 1 ORDER BY count(*) DESC LIMIT 1",
+    "message_task_id": "SELECT task_id FROM public.messages GROUP BY 1 ORDER BY count(*) DESC LIMIT 1",
+    "receiver_id": "SELECT receiver_id FROM public.messages WHERE read_at IS NULL "
+                   "GROUP BY 1 ORDER BY count(*) DESC LIMIT 1",
+    "notified_id": "SELECT user_id FROM public.notifications GROUP BY 1 ORDER BY count(*) DESC LIMIT 1",
+    "today": "SELECT current_date",
+}
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def explain(conn, sql: str, params: dict) -> dict:
+    """Fastest of RUNS ``EXPLAIN (ANALYZE, BUFFERS)`` runs of ``sql``"""
+    best = None
+    for _ in range(RUNS):
+        row = conn.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params).fetchone()
+        result = row[0][0]
+        if best is None or result["Execution Time"] < best["Execution Time"]:
+            best = result
+    return best
+
+
+def summarize(result: dict) -> dict:
+    plan = result["Plan"]
+    return {
+        "total_cost": plan["Total Cost"],
+        "execution_ms": round(result["Execution Time"], 3),
+        "shared_blocks": plan.get("Shared Hit Blocks", 0) + plan.get("Shared Read Blocks", 0),
+        "nodes": sorted({node["Node Type"] + (f" on {node['Relation Name']}" if "Relation Name" in node else "")
+                         for node in plan_nodes(plan)}),
+    }
+
+
+@pytest.fixture(scope="module")
+def database():
+    conn = psycopg.connect(DSN, autocommit=True, cursor_factory=psycopg.ClientCursor)
+    # Supabase runs on SSDs with random_page_cost = 1.1; at the default 4 the
+    # planner hashes whole tables instead of probing an index per row
+    conn.execute("SET random_page_cost = 1.1")
+    conn.execute("DROP SCHEMA IF EXISTS public CASCADE")
+    conn.execute("DROP SCHEMA IF EXISTS auth CASCADE")
+    conn.execute("CREATE SCHEMA public")
+    conn.execute(SUPABASE_SHIM)
+    conn.execute(SCHEMA.read_text())
+    with tempfile.TemporaryDirectory() as out_dir:
+        datagen.DataGenerator(datagen.SCALES[SCALE], SEED).generate(datagen.CopyWriter(Path(out_dir)))
+        datagen.copy_into_postgres(DSN, Path(out_dir))
+    yield conn
+    conn.close()
+
+
+@pytest.fixture(scope="module")
+def sample(database):
+    values = {name: database.execute(sql).fetchone()[0] for name, sql in SAMPLE_SQL.items()}
+    values["task_ids"] = [row[0] for row in database.execute(
+        "SELECT id FROM public.tasks WHERE status = 'posted' ORDER BY created_at DESC, id DESC LIMIT 20")]
+    values["state"], values["city"], lat, lng = database.execute(
+        "SELECT state, city, avg(latitude), avg(longitude) FROM public.tasks "
+        "WHERE status = 'posted' AND latitude IS NOT NULL GROUP BY 1, 2 ORDER BY count(*) DESC LIMIT 1").fetchone()
+    values["latitude"], values["longitude"] = float(lat), float(lng)
+    # The last row of a first page, for the keyset cases
+    values["notification_at"], values["notification_id"] = database.execute(
+        "SELECT created_at, id FROM public.notifications WHERE user_id = %s "
+        "ORDER BY created_at DESC, id DESC OFFSET 20 LIMIT 1", (values["notified_id"],)).fetchone()
+    values["review_at"], values["review_id"] = database.execute(
+        "SELECT created_at, id FROM public.reviews WHERE reviewee_id = %s "
+        "ORDER BY created_at DESC, id DESC OFFSET 20 LIMIT 1", (values["tasker_id"],)).fetchone()
+    return values
+
+
+@pytest.fixture(scope="module")
+def baselines(database):
+    meta = {"scale": SCALE, "seed": SEED, "server_version": database.info.server_version // 10000}
+    stored = json.loads(BASELINES.read_text()) if BASELINES.exists() else {}
+    comparable = stored.get("meta") == meta
+    recorded = {}
+    yield (stored.get("cases", {}) if comparable else {}), recorded
+    if UPDATE and recorded:
+        cases = dict(stored.get("cases", {}) if comparable else {}, **recorded)
+        BASELINES.write_text(json.dumps({"meta": meta, "cases": dict(sorted(cases.items()))}, indent=2) + "\n")
+
+
+@pytest.mark.parametrize("case", CASES, ids=lambda case: case.name)
+def test_query_plan(case, database, sample, baselines, server):
+    stored, recorded = baselines
+    if case.request is not None:
+        result = explain(database, request_sql(database, case.request(server, sample)), None)
+    else:
+        result = explain(database, case.sql, sample)
+    current = recorded[case.name] = summarize(result)
+
+    seq_scans = sorted({node["Relation Name"] for node in plan_nodes(result["Plan"])
+                        if node["Node Type"] == "Seq Scan" and node.get("Relation Name") not in SEQ_SCAN_ALLOWED})
+    assert not seq_scans, f"{case.name} scans {', '.join(seq_scans)} sequentially:\n" \
+                          f"{json.dumps(result['Plan'], indent=1)}"
+
+    baseline = stored.get(case.name)
+    if baseline is None or UPDATE:
+        return
+    assert current["total_cost"] <= baseline["total_cost"] * (1 + COST_TOLERANCE), \
+        f"{case.name} cost {current['total_cost']} vs baseline {baseline['total_cost']} " \
+        f"(nodes now {current['nodes']}, were {baseline['nodes']})"
+    time_limit = max(baseline["execution_ms"] * TIME_FACTOR, baseline["execution_ms"] + TIME_SLACK_MS)
+    assert current["execution_ms"] <= time_limit, \
+        f"{case.name} took {current['execution_ms']} ms vs baseline {baseline['execution_ms']} ms"
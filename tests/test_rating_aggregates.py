@@ -0,0 +1,124 @@
+"""
+Rating aggregate tests: the running sum, count, histogram and average the
+review triggers keep on profiles (the stand-in mirrors them), checked
+against a recomputation over the reviews after inserts, rating changes,
+reassignments and deletes, and the rating-distribution endpoint built on them.
+"""
+
+import random
+import uuid
+
+from fastapi.testclient import TestClient
+
+from perf import use_backend_path
+
+use_backend_path()
+
+import standin  # noqa: E402
+
+
+def add_profile(database, role="tasker") -> str:
+    user_id = str(uuid.uuid4())
+    database.insert_rows("profiles", [{"id": user_id, "email": f"{user_id}@example.com", "full_name": "P",
+                                       "username": user_id, "role": role}])
+    return user_id
+
+
+def add_review(client, reviewee, rating, reviewer=None):
+    return client.table("reviews").insert({
+        "task_id": str(uuid.uuid4()), "reviewer_id": reviewer or str(uuid.uuid4()),
+        "reviewee_id": reviewee, "rating": rating}).execute().data[0]
+
+
+def aggregates(client, user_id):
+    return client.table("profiles").select("rating_sum, total_reviews, rating_histogram, average_rating") \
+        .eq("id", user_id).execute().data[0]
+
+
+def recomputed(client, user_id):
+    ratings = [r["rating"] for r in client.table("reviews").select("rating").eq("reviewee_id", user_id).execute().data]
+    return {
+        "rating_sum": sum(ratings),
+        "total_reviews": len(ratings),
+        "rating_histogram": [ratings.count(stars) for stars in range(1, 6)],
+        "average_rating": round(sum(ratings) / len(ratings), 2) if ratings else 0,
+    }
+
+
+def make_client():
+    return standin.create_client(standin.StandinConfig(), database=standin.StandinDatabase())
+
+
+def test_inserts_add_to_the_aggregates():
+    client = make_client()
+    tasker = add_profile(client.database)
+    for rating in (5, 4, 4, 1):
+        add_review(client, tasker, rating)
+    assert aggregates(client, tasker) == {"rating_sum": 14, "total_reviews": 4,
+                                          "rating_histogram": [1, 0, 0, 2, 1], "average_rating": 3.5}
+
+
+def test_a_changed_rating_moves_between_histogram_buckets():
+    client = make_client()
+    tasker = add_profile(client.database)
+    review = add_review(client, tasker, 2)
+    add_review(client, tasker, 5)
+    client.table("reviews").update({"rating": 4}).eq("id", review["id"]).execute()
+    assert aggregates(client, tasker) == recomputed(client, tasker)
+    assert aggregates(client, tasker)["rating_histogram"] == [0, 0, 0, 1, 1]
+    # Rewriting the same rating changes nothing
+    client.table("reviews").update({"rating": 4, "comment": "edited"}).eq("id", review["id"]).execute()
+    assert aggregates(client, tasker)["total_reviews"] == 2
+
+
+def test_a_reassigned_review_moves_between_profiles():
+    client = make_client()
+    first, second = add_profile(client.database), add_profile(client.database)
+    review = add_review(client, first, 3)
+    add_review(client, first, 5)
+    client.table("reviews").update({"reviewee_id": second}).eq("id", review["id"]).execute()
+    assert aggregates(client, first) == recomputed(client, first)
+    assert aggregates(client, second) == recomputed(client, second)
+    assert aggregates(client, second)["total_reviews"] == 1
+
+
+def test_deleting_every_review_returns_to_zero():
+    client = make_client()
+    tasker = add_profile(client.database)
+    for rating in (1, 3, 5):
+        add_review(client, tasker, rating)
+    client.table("reviews").delete().eq("reviewee_id", tasker).execute()
+    assert aggregates(client, tasker) == {"rating_sum": 0, "total_reviews": 0,
+                                          "rating_histogram": [0, 0, 0, 0, 0], "average_rating": 0}
+
+
+def test_aggregates_match_a_recount_after_random_writes():
+    client = make_client()
+    rng = random.Random(7)
+    taskers = [add_profile(client.database) for _ in range(3)]
+    reviews = []
+    for _ in range(200):
+        action = rng.random()
+        if action < 0.5 or not reviews:
+            reviews.append(add_review(client, rng.choice(taskers), rng.randint(1, 5))["id"])
+        elif action < 0.8:
+            client.table("reviews").update({"rating": rng.randint(1, 5), "reviewee_id": rng.choice(taskers)}) \
+                .eq("id", rng.choice(reviews)).execute()
+        else:
+            client.table("reviews").delete().eq("id", reviews.pop(rng.randrange(len(reviews)))).execute()
+    for tasker in taskers:
+        assert aggregates(client, tasker) == recomputed(client, tasker)
+
+
+def test_rating_distribution_endpoint(server):
+    with TestClient(server.app) as http:
+        client = server.supabase
+        tasker = add_profile(client.database)
+        assert http.get(f"/api/profiles/{tasker}/rating-distribution").json()["average_rating"] is None
+        for rating in (5, 5, 4, 2):
+            add_review(client, tasker, rating)
+        body = http.get(f"/api/profiles/{tasker}/rating-distribution").json()
+        assert body["total_reviews"] == 4 and body["average_rating"] == 4.0
+        assert body["distribution"] == {"1": 0, "2": 1, "3": 0, "4": 1, "5": 2}
+        assert body["percentages"]["5"] == 50.0
+        assert http.get(f"/api/profiles/{uuid.uuid4()}/rating-distribution").status_code == 404
@@ -0,0 +1,169 @@
+"""
+Read-replica routing tests.
+
+Routing, read-your-writes pins, lag fallback and failover run against two
+stand-in databases: the replica is a separate database holding different
+rows, so what a read returns shows where it ran.
+
+``test_postgres_replication_lag`` checks the schema's
+``replication_lag_seconds()`` on two local Postgres instances, a primary and
+a streaming standby of it, when both DSNs are set:
+
+    initdb -D primary && pg_ctl -D primary -o "-p 5433" start
+    pg_basebackup -D standby -R -d "port=5433" && pg_ctl -D standby -o "-p 5434" start
+    SKILLHUB_REPLICA_TEST_PRIMARY_DSN="port=5433 dbname=postgres" \\
+    SKILLHUB_REPLICA_TEST_STANDBY_DSN="port=5434 dbname=postgres" \\
+        python -m pytest tests/test_replicas.py
+"""
+
+import asyncio
+import os
+import re
+import time
+from pathlib import Path
+
+import pytest
+
+from perf import use_backend_path
+
+use_backend_path()
+
+import replicas  # noqa: E402
+import resilience  # noqa: E402
+import standin  # noqa: E402
+
+SCHEMA = Path(__file__).resolve().parent.parent / "supabase_schema.sql"
+
+
+def make_setup(**config):
+    primary = standin.create_client(standin.StandinConfig())
+    replica = standin.create_client(standin.StandinConfig(), database=standin.StandinDatabase())
+    for client, name in ((primary, "primary"), (replica, "replica")):
+        client.database.insert_rows("task_categories", [{"name": name, "slug": "where"}])
+    router = replicas.ReplicaRouter(replicas.ReplicaConfig(**config))
+    router.connect(primary, {"replica": replica})
+    db = resilience.ResilientExecutor(resilience.ResilienceConfig(), router=router)
+    return primary, replica, router, db
+
+
+async def served_by(primary, db) -> str:
+    result = await db.read("where", primary.table("task_categories").select("name").eq("slug", "where"))
+    return result.data[0]["name"]
+
+
+async def request(router, method, user_id, handler):
+    """Run ``handler`` as an HTTP request through ReadRoutingMiddleware"""
+    outcome = {}
+
+    async def app(scope, receive, send):
+        if user_id:
+            router.bind_user(user_id)
+        outcome["value"] = await handler()
+
+    await replicas.ReadRoutingMiddleware(app, router)({"type": "http", "method": method}, None, None)
+    return outcome["value"]
+
+
+def test_get_reads_use_a_probed_replica():
+    async def scenario():
+        primary, _, router, db = make_setup()
+        read = lambda: served_by(primary, db)  # noqa: E731
+        assert await request(router, "GET", "alice", read) == "primary"  # not probed yet
+        await router.check()
+        assert await request(router, "GET", "alice", read) == "replica"
+        assert await request(router, "GET", None, read) == "replica"
+        assert router.replicas[0].reads == 2
+    asyncio.run(scenario())
+
+
+def test_writes_and_background_reads_stay_on_the_primary():
+    async def scenario():
+        primary, _, router, db = make_setup()
+        await router.check()
+        assert await request(router, "POST", "alice", lambda: served_by(primary, db)) == "primary"
+        assert await served_by(primary, db) == "primary"
+        assert router.replica_reads == 0
+    asyncio.run(scenario())
+
+
+def test_writer_is_pinned_to_the_primary_for_a_while():
+    async def scenario():
+        primary, _, router, db = make_setup(pin_s=0.05, max_lag_s=0.01, probe_interval_s=0.01)
+        await router.check()
+        read = lambda: served_by(primary, db)  # noqa: E731
+        await request(router, "PATCH", "alice", read)
+        assert await request(router, "GET", "alice", read) == "primary"
+        assert await request(router, "GET", "bob", read) == "replica"
+        assert router.pinned_reads == 1
+        await asyncio.sleep(0.06)
+        assert await request(router, "GET", "alice", read) == "replica"
+    asyncio.run(scenario())
+
+
+def test_pin_window_covers_lag_between_probes():
+    router = replicas.ReplicaRouter(replicas.ReplicaConfig(pin_s=1.0, max_lag_s=2.0, probe_interval_s=3.0))
+    assert router.pin_s == 5.0
+
+
+def test_lagging_replica_leaves_and_rejoins_the_rotation():
+    async def scenario():
+        primary, replica, router, db = make_setup(max_lag_s=1.0)
+        read = lambda: served_by(primary, db)  # noqa: E731
+        replica.database.functions["replication_lag_seconds"] = lambda database: [{"lag_s": 4.5}]
+        await router.check()
+        assert router.replicas[0].lag_s == 4.5
+        assert await request(router, "GET", "alice", read) == "primary"
+        assert router.fallback_reads == 1
+        replica.database.functions["replication_lag_seconds"] = lambda database: [{"lag_s": 0.2}]
+        await router.check()
+        assert await request(router, "GET", "alice", read) == "replica"
+    asyncio.run(scenario())
+
+
+def test_failing_replica_falls_back_to_the_primary():
+    async def scenario():
+        primary, replica, router, db = make_setup()
+        await router.check()
+        replica.config.error_rate = 1.0
+        read = lambda: served_by(primary, db)  # noqa: E731
+        assert await request(router, "GET", "alice", read) == "primary"
+        assert not router.replicas[0].ok and router.replicas[0].failures == 1
+        # Out of rotation until the next good probe: not tried again
+        assert await request(router, "GET", "alice", read) == "primary"
+        assert replica.calls == 2  # the probe and the failed read
+        assert db.breaker.state == "closed"
+
+        replica.config.error_rate = 0.0
+        await router.check()
+        assert await request(router, "GET", "alice", read) == "replica"
+    asyncio.run(scenario())
+
+
+def test_postgres_replication_lag():
+    primary_dsn = os.environ.get("SKILLHUB_REPLICA_TEST_PRIMARY_DSN")
+    standby_dsn = os.environ.get("SKILLHUB_REPLICA_TEST_STANDBY_DSN")
+    if not (primary_dsn and standby_dsn):
+        pytest.skip("SKILLHUB_REPLICA_TEST_PRIMARY_DSN / SKILLHUB_REPLICA_TEST_STANDBY_DSN are not set")
+    psycopg = pytest.importorskip("psycopg")
+    function = re.search(r"CREATE OR REPLACE FUNCTION public\.replication_lag_seconds\(\).*?\$\$ LANGUAGE[^;]*;",
+                         SCHEMA.read_text(), re.S).group(0)
+
+    with psycopg.connect(primary_dsn, autocommit=True) as primary, \
+            psycopg.connect(standby_dsn, autocommit=True) as standby:
+        if not standby.execute("SELECT pg_is_in_recovery()").fetchone()[0]:
+            pytest.skip("SKILLHUB_REPLICA_TEST_STANDBY_DSN is not a standby")
+        primary.execute(function)
+        primary.execute("CREATE TABLE IF NOT EXISTS public.replica_test_marks (mark text PRIMARY KEY)")
+        mark = f"mark-{time.time_ns()}"
+        primary.execute("INSERT INTO public.replica_test_marks VALUES (%s)", (mark,))
+        assert primary.execute("SELECT public.replication_lag_seconds()").fetchone()[0] == 0
+
+        deadline = time.monotonic() + 10
+        while not standby.execute("SELECT 1 FROM public.replica_test_marks WHERE mark = %s", (mark,)).fetchone():
+            assert time.monotonic() < deadline, "the standby did not replay the write within 10s"
+            time.sleep(0.05)
+        # Caught up and streaming: no lag, even though nothing is being written
+        time.sleep(1.0)
+        lag = standby.execute("SELECT public.replication_lag_seconds()").fetchone()[0]
+        assert lag is not None and lag < 1.0
+        primary.execute("DELETE FROM public.replica_test_marks WHERE mark = %s", (mark,))
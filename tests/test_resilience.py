@@ -0,0 +1,152 @@
+"""
+Circuit breaker tests through ResilientExecutor.call: tripping on
+consecutive transient failures, rejecting while open, the half-open trial,
+recovery, and a trial cancelled before it got a verdict.
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from perf import use_backend_path
+
+use_backend_path()
+
+import resilience  # noqa: E402
+
+COOLDOWN_S = 0.05
+
+
+def make_executor(failures: int = 3) -> resilience.ResilientExecutor:
+    return resilience.ResilientExecutor(resilience.ResilienceConfig(
+        read_retries=0, breaker_failures=failures, breaker_cooldown_s=COOLDOWN_S))
+
+
+def failing():
+    raise ConnectionError("connection refused")
+
+
+def healthy():
+    return "ok"
+
+
+async def trip(db: resilience.ResilientExecutor, failures: int = 3):
+    for _ in range(failures):
+        with pytest.raises(resilience.DataUnavailable):
+            await db.call("op", failing, 1.0)
+
+
+def test_consecutive_transient_failures_open_the_breaker():
+    async def scenario():
+        db = make_executor()
+        await trip(db)
+        assert db.breaker.state == "open"
+        calls = []
+        with pytest.raises(resilience.DataUnavailable) as rejected:
+            await db.call("op", lambda: calls.append(1), 1.0)
+        assert rejected.value.status_code == 503 and "Retry-After" in rejected.value.headers
+        assert calls == []
+        assert db.operations["op"].rejected == 1
+
+    asyncio.run(scenario())
+
+
+def test_non_transient_errors_and_successes_reset_the_count():
+    async def scenario():
+        db = make_executor()
+        for _ in range(2):
+            with pytest.raises(resilience.DataUnavailable):
+                await db.call("op", failing, 1.0)
+        with pytest.raises(ValueError):
+            await db.call("op", lambda: (_ for _ in ()).throw(ValueError("bad input")), 1.0)
+        with pytest.raises(resilience.DataUnavailable):
+            await db.call("op", failing, 1.0)
+        assert db.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_half_open_trial_success_closes_the_breaker():
+    async def scenario():
+        db = make_executor()
+        await trip(db)
+        await asyncio.sleep(COOLDOWN_S)
+        assert await db.call("op", healthy, 1.0) == "ok"
+        assert db.breaker.state == "closed"
+        assert await db.call("op", healthy, 1.0) == "ok"
+
+    asyncio.run(scenario())
+
+
+def test_half_open_trial_failure_reopens_the_breaker():
+    async def scenario():
+        db = make_executor()
+        await trip(db)
+        await asyncio.sleep(COOLDOWN_S)
+        with pytest.raises(resilience.DataUnavailable):
+            await db.call("op", failing, 1.0)
+        assert db.breaker.state == "open"
+        assert db.breaker.opened == 2
+
+    asyncio.run(scenario())
+
+
+def test_only_one_trial_runs_while_half_open():
+    async def scenario():
+        db = make_executor()
+        await trip(db)
+        await asyncio.sleep(COOLDOWN_S)
+        release = threading.Event()
+        trial = asyncio.ensure_future(db.call("op", lambda: release.wait(1.0) and "ok", 2.0))
+        await asyncio.sleep(0.01)
+        with pytest.raises(resilience.DataUnavailable):
+            await db.call("op", healthy, 1.0)
+        release.set()
+        assert await trial == "ok"
+        assert db.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_a_cancelled_trial_lets_the_next_call_try():
+    async def scenario():
+        db = make_executor()
+        await trip(db)
+        await asyncio.sleep(COOLDOWN_S)
+        release = threading.Event()
+        trial = asyncio.ensure_future(db.call("op", lambda: release.wait(1.0), 2.0))
+        await asyncio.sleep(0.01)
+        assert db.breaker.trial_running
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        release.set()
+        assert not db.breaker.trial_running
+        # Without the reset every later call would be rejected until a restart
+        assert await db.call("op", healthy, 1.0) == "ok"
+        assert db.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_a_cancelled_call_outside_the_trial_leaves_the_trial_alone():
+    async def scenario():
+        db = make_executor()
+        release = threading.Event()
+        slow = asyncio.ensure_future(db.call("op", lambda: release.wait(1.0), 2.0))
+        await asyncio.sleep(0.01)
+        await trip(db)
+        await asyncio.sleep(COOLDOWN_S)
+        trial_release = threading.Event()
+        trial = asyncio.ensure_future(db.call("op", lambda: trial_release.wait(1.0) and "ok", 2.0))
+        await asyncio.sleep(0.01)
+        slow.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await slow
+        release.set()
+        assert db.breaker.trial_running
+        trial_release.set()
+        assert await trial == "ok"
+
+    asyncio.run(scenario())
@@ -0,0 +1,99 @@
+"""
+Single-flight coalescing tests: identical concurrent reads share one call,
+errors reach every waiter, and a waiter going away doesn't cancel the call.
+"""
+
+import asyncio
+
+import pytest
+
+from perf import use_backend_path
+
+use_backend_path()
+
+import singleflight  # noqa: E402
+
+
+def test_concurrent_calls_with_one_key_run_once():
+    async def scenario():
+        flights = singleflight.SingleFlight()
+        calls = []
+        release = asyncio.Event()
+
+        async def fetch():
+            calls.append(1)
+            await release.wait()
+            return {"id": "t1"}
+
+        waiters = [asyncio.ensure_future(flights.do("task:t1", fetch)) for _ in range(10)]
+        await asyncio.sleep(0)
+        assert flights.stats() == {"executed": 1, "shared": 9, "in_flight": 1}
+        release.set()
+        results = await asyncio.gather(*waiters)
+        assert len(calls) == 1
+        assert all(result is results[0] for result in results)
+        assert flights.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_different_keys_and_later_calls_run_separately():
+    async def scenario():
+        flights = singleflight.SingleFlight()
+        calls = []
+
+        async def fetch(key):
+            calls.append(key)
+            await asyncio.sleep(0)
+            return key
+
+        assert await asyncio.gather(flights.do("a", lambda: fetch("a")),
+                                    flights.do("b", lambda: fetch("b"))) == ["a", "b"]
+        # Finished calls are forgotten: the next read queries again
+        assert await flights.do("a", lambda: fetch("a")) == "a"
+        assert calls == ["a", "b", "a"]
+
+    asyncio.run(scenario())
+
+
+def test_an_error_reaches_every_waiter_and_is_not_cached():
+    async def scenario():
+        flights = singleflight.SingleFlight()
+        attempts = []
+
+        async def failing():
+            attempts.append(1)
+            await asyncio.sleep(0)
+            raise RuntimeError("database down")
+
+        results = await asyncio.gather(*(flights.do("k", failing) for _ in range(3)), return_exceptions=True)
+        assert [type(r) for r in results] == [RuntimeError] * 3
+        assert len(attempts) == 1
+
+        async def recovered():
+            return "ok"
+
+        assert await flights.do("k", recovered) == "ok"
+
+    asyncio.run(scenario())
+
+
+def test_a_cancelled_waiter_leaves_the_shared_call_running():
+    async def scenario():
+        flights = singleflight.SingleFlight()
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return "row"
+
+        first = asyncio.ensure_future(flights.do("k", fetch))
+        second = asyncio.ensure_future(flights.do("k", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        release.set()
+        assert await second == "row"
+
+    asyncio.run(scenario())
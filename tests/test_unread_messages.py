@@ -0,0 +1,60 @@
+"""
+Per-task unread message counts: the stand-in's ``unread_message_counts``
+rpc and GET /api/me/unread, which reads it without marking anything read.
+"""
+
+from fastapi.testclient import TestClient
+
+from perf import use_backend_path
+
+use_backend_path()
+
+import standin  # noqa: E402
+
+CUSTOMER, TASKER = "demo-user-id", "11111111-1111-1111-1111-111111111111"
+AUTH = {"Authorization": "Bearer x"}
+
+
+def add_task(database) -> str:
+    category = database.conn.execute('SELECT "id" FROM "task_categories"').fetchone()[0]
+    return database.insert_rows("tasks", [{
+        "customer_id": CUSTOMER, "tasker_id": TASKER, "category_id": category, "title": "t",
+        "description": "d", "address": "a", "city": "c", "state": "s", "zip_code": "z"}])[0]["id"]
+
+
+def add_messages(database, task_id, count, sender=TASKER, receiver=CUSTOMER, read=False):
+    database.insert_rows("messages", [{
+        "task_id": task_id, "sender_id": sender, "receiver_id": receiver, "content": f"m{i}",
+        "read_at": "2026-01-01T00:00:00+00:00" if read else None} for i in range(count)])
+
+
+def test_rpc_groups_unread_messages_by_task_for_the_receiver():
+    client = standin.create_client(standin.StandinConfig(), database=standin.StandinDatabase())
+    database = client.database
+    first, second, quiet = add_task(database), add_task(database), add_task(database)
+    add_messages(database, first, 3)
+    add_messages(database, first, 2, read=True)
+    add_messages(database, second, 1)
+    add_messages(database, quiet, 4, sender=CUSTOMER, receiver=TASKER)
+    rows = client.rpc("unread_message_counts", {"p_user_id": CUSTOMER}).execute().data
+    assert {row["task_id"]: row["unread"] for row in rows} == {first: 3, second: 1}
+    rows = client.rpc("unread_message_counts", {"p_user_id": TASKER}).execute().data
+    assert {row["task_id"]: row["unread"] for row in rows} == {quiet: 4}
+
+
+def test_unread_endpoint_counts_until_the_thread_is_opened(server):
+    with TestClient(server.app) as http:
+        database = server.supabase.database
+        before = http.get("/api/me/unread", headers=AUTH).json()["total"]
+        first, second = add_task(database), add_task(database)
+        add_messages(database, first, 2)
+        add_messages(database, second, 3)
+        add_messages(database, second, 1, sender=CUSTOMER, receiver=TASKER)
+        counts = http.get("/api/me/unread", headers=AUTH).json()
+        assert counts["total"] == before + 5
+        assert (counts["tasks"][first], counts["tasks"][second]) == (2, 3)
+        # Reading the counts marks nothing read
+        assert http.get("/api/me/unread", headers=AUTH).json() == counts
+        assert len(http.get(f"/api/tasks/{first}/messages", headers=AUTH).json()) == 2
+        counts = http.get("/api/me/unread", headers=AUTH).json()
+        assert counts["total"] == before + 3 and first not in counts["tasks"]